@@ -1,3 +1,4 @@
+import hmac
 import sys
 import os
 
@@ -5,7 +6,31 @@ import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), 'src')))
 
 import flet.fastapi as flet_fastapi
+from fastapi import Request
+from fastapi.responses import PlainTextResponse
 from main import main
+from services import metrics, scheduler
+from services.database import init_db
+
+# Background jobs run once per worker process, before the first session connects
+init_db()
+scheduler.start()
 
 # This 'app' object is what Azure App Service (Uvicorn/Gunicorn) will look for.
 app = flet_fastapi.app(main)
+
+# Prometheus scrape endpoint, only mounted when PMS_METRICS_TOKEN is set;
+# scrapers send it as "Authorization: Bearer <token>"
+METRICS_TOKEN = os.environ.get("PMS_METRICS_TOKEN")
+
+def prometheus_metrics(request: Request):
+    expected = f"Bearer {METRICS_TOKEN}".encode()
+    if not hmac.compare_digest(request.headers.get("authorization", "").encode(), expected):
+        return PlainTextResponse("Unauthorized\n", status_code=401, headers={"WWW-Authenticate": "Bearer"})
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+metrics.install()
+if METRICS_TOKEN:
+    app.add_api_route("/metrics", prometheus_metrics, methods=["GET"], include_in_schema=False)
+    # Flet serves its client from a mount at "/", which would shadow routes added after it
+    app.router.routes.insert(0, app.router.routes.pop())
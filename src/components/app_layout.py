@@ -176,6 +176,7 @@ class AppLayout(ft.Row):
             dests.append(ft.NavigationRailDestination(icon=ft.Icons.PERSON, label="My Profile"))
         elif role == "Inventory":
             dests.append(ft.NavigationRailDestination(icon=ft.Icons.INVENTORY, label="Manage Stock"))
+            dests.append(ft.NavigationRailDestination(icon=ft.Icons.SHOPPING_CART_CHECKOUT, label="Reorder"))
             dests.append(ft.NavigationRailDestination(icon=ft.Icons.PERSON, label="My Profile"))
         elif role == "Billing":
             dests.append(ft.NavigationRailDestination(icon=ft.Icons.RECEIPT_LONG, label="Invoices"))
@@ -185,6 +186,8 @@ class AppLayout(ft.Row):
             dests.append(ft.NavigationRailDestination(icon=ft.Icons.PEOPLE, label="Users"))
             dests.append(ft.NavigationRailDestination(icon=ft.Icons.ANALYTICS, label="Reports"))
             dests.append(ft.NavigationRailDestination(icon=ft.Icons.HISTORY, label="Logs"))
+            dests.append(ft.NavigationRailDestination(icon=ft.Icons.SPEED, label="Diagnostics"))
+            dests.append(ft.NavigationRailDestination(icon=ft.Icons.SCHEDULE, label="Jobs"))
             dests.append(ft.NavigationRailDestination(icon=ft.Icons.INVENTORY, label="Manage Stock"))
         elif role == "Staff":
             dests.append(ft.NavigationRailDestination(icon=ft.Icons.PERSON_SEARCH, label="Find Customer"))
@@ -258,6 +261,7 @@ class AppLayout(ft.Row):
         # Staff modular views
         elif label == "Prescriptions": self.page.go("/pharmacist/prescriptions")
         elif label == "Manage Stock": self.page.go("/inventory/stock")
+        elif label == "Reorder": self.page.go("/inventory/reorder")
         elif label == "Invoices": self.page.go("/billing/invoices")
         elif label == "Find Customer": self.page.go("/staff/search")
         elif label == "All Customers": self.page.go("/staff/patients")
@@ -267,6 +271,8 @@ class AppLayout(ft.Row):
         elif label == "Users": self.page.go("/admin/users")
         elif label == "Reports": self.page.go("/admin/reports")
         elif label == "Logs": self.page.go("/admin/logs")
+        elif label == "Diagnostics": self.page.go("/admin/diagnostics")
+        elif label == "Jobs": self.page.go("/admin/jobs")
 
     # Badge synchronization hook
     def update_cart_count(self):
@@ -0,0 +1,21 @@
+"""Text with search-hit highlighting."""
+
+import flet as ft
+from services.search import HIGHLIGHT_START, HIGHLIGHT_END
+
+def HighlightedText(snippet, size=13, color="outline"):
+    """
+    Render an FTS snippet, showing matched terms in bold primary color.
+
+    Usage:
+        HighlightedText(hit['snippet'])
+    """
+    parts = (snippet or "").split(HIGHLIGHT_START)
+    spans = [ft.TextSpan(parts[0])] if parts[0] else []
+    for part in parts[1:]:
+        hit, _, rest = part.partition(HIGHLIGHT_END)
+        spans.append(ft.TextSpan(hit, ft.TextStyle(weight=ft.FontWeight.BOLD, color="primary")))
+        if rest:
+            spans.append(ft.TextSpan(rest))
+
+    return ft.Text(spans=spans, size=size, color=color)
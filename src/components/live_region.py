@@ -0,0 +1,59 @@
+"""Container that patches its content when rows change in other sessions."""
+
+import threading
+import flet as ft
+
+# Bursts of changes within this window are applied as one patch
+DEBOUNCE_SECONDS = 0.25
+
+class LiveRegion(ft.Container):
+    """
+    Wrap a view and call ``on_changes(ids)`` for rows published on ``topics``.
+
+    Messages are collected per topic and applied together after
+    DEBOUNCE_SECONDS, then the region is updated once. The subscription
+    lives exactly as long as the region is on the page.
+
+    Usage:
+        LiveRegion(content, {ORDERS_TOPIC: patch_orders})
+    """
+
+    def __init__(self, content, handlers, **kwargs):
+        kwargs.setdefault("expand", True)
+        super().__init__(content=content, **kwargs)
+        self.handlers = handlers
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def did_mount(self):
+        for topic in self.handlers:
+            self.page.pubsub.subscribe_topic(topic, self._on_message)
+
+    def will_unmount(self):
+        for topic in self.handlers:
+            self.page.pubsub.unsubscribe_topic(topic)
+        with self._lock:
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+
+    def _on_message(self, topic, ids):
+        with self._lock:
+            self._pending.setdefault(topic, set()).update(ids)
+            if self._timer is None:
+                self._timer = threading.Timer(DEBOUNCE_SECONDS, self._flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _flush(self):
+        with self._lock:
+            pending, self._pending, self._timer = self._pending, {}, None
+        if self.page is None:
+            return
+        for topic, ids in pending.items():
+            try:
+                self.handlers[topic](ids)
+            except Exception as ex:
+                print(f"Live update for '{topic}' failed: {ex}")
+        self.update()
@@ -2,10 +2,13 @@
 
 import flet as ft
 
-def NavigationHeader(title, subtitle="", show_back=True, show_forward=False, back_route=None, forward_route=None):
+def NavigationHeader(title, subtitle="", show_back=True, show_forward=False, back_route=None, forward_route=None, note=None):
     """
     Create a navigation header with back/forward buttons.
     
+    ``note`` is an optional control shown under the subtitle, for status
+    the page updates itself (e.g. report data freshness).
+    
     Usage:
         NavigationHeader("Page Title", "Subtitle", show_back=True)
     """
@@ -40,6 +43,7 @@ def NavigationHeader(title, subtitle="", show_back=True, show_forward=False, bac
         ft.Column([
             ft.Text(title, size=28, weight="bold"),
             ft.Text(subtitle, size=14, color="outline") if subtitle else ft.Container(),
+            *([note] if note else []),
         ], spacing=5, expand=True)
     )
     
@@ -1,6 +1,7 @@
 import flet as ft
 from services.database import init_db
 from services.google_auth import start_callback_server
+from services import live_updates, metrics, query_profiler, render_metrics, scheduler
 from state.app_state import AppState
 import ctypes
 
@@ -22,9 +23,12 @@ from views.admin.admin_dashboard import AdminDashboard
 from views.admin.user_management import UserManagement
 from views.admin.reports_view import ReportsView as AdminReportsView
 from views.admin.logs_view import SystemLogs
+from views.admin.diagnostics_view import DiagnosticsView
+from views.admin.jobs_view import JobsView
 
 from views.inventory.inventory_dashboard import InventoryDashboard
 from views.inventory.manage_stock import ManageStock
+from views.inventory.purchase_suggestions import PurchaseSuggestions
 from views.inventory.profile_view import InventoryProfileView
 
 from views.pharmacist.pharmacist_dashboard import PharmacistDashboard
@@ -50,6 +54,13 @@ from views.staff.help_desk import HelpDeskView
 from views.staff.order_tracking import StaffOrderTracking
 from views.staff.profile_view import StaffProfileView
 def main(page: ft.Page):
+    # Flet runs main on a pool thread without binding the session, so bind it
+    # for the setup and the first render
+    with AppState.use_page(page):
+        start_session(page)
+
+
+def start_session(page: ft.Page):
     page.title = "PharmaOps PMS"
     
     try:
@@ -67,6 +78,10 @@ def main(page: ft.Page):
 
     # Initialize database
     init_db()
+    live_updates.attach(page)
+    query_profiler.enable_from_env()
+    metrics.install()
+    metrics.track_session(page)
 
     def route_change(route):
         page.views.clear()
@@ -80,6 +95,7 @@ def main(page: ft.Page):
         # Public Landing Route
         if troute == "/":
             page.views.append(create_view("/", [ft.Container(content=LandingPage(page), expand=True)], None))
+            render_metrics.view_built()
 
         # Authenticated Routes
         else:
@@ -142,6 +158,7 @@ def main(page: ft.Page):
 
             # Inventory Component Routes
             elif troute == "/inventory/stock": content = ManageStock()
+            elif troute == "/inventory/reorder": content = PurchaseSuggestions()
             elif troute == "/inventory/profile": content = InventoryProfileView()
 
             # Billing Component Routes
@@ -163,6 +180,8 @@ def main(page: ft.Page):
             elif troute == "/admin/users": content = UserManagement()
             elif troute == "/admin/reports": content = AdminReportsView()
             elif troute == "/admin/logs": content = SystemLogs()
+            elif troute == "/admin/diagnostics": content = DiagnosticsView()
+            elif troute == "/admin/jobs": content = JobsView()
 
             # Staff Component Routes
             elif troute == "/staff/search": content = StaffPatientSearch()
@@ -183,6 +202,7 @@ def main(page: ft.Page):
                     page.go("/staff/search")
                     return
 
+            render_metrics.view_built()
             page.views.append(create_view(troute, [AppLayout(page, content)], None))
         
         page.update()
@@ -193,11 +213,14 @@ def main(page: ft.Page):
         page.go(top_view.route)
 
     # OAuth callback processing delegated to landing view
-    page.on_route_change = route_change
+    page.on_route_change = render_metrics.timed_route_change(page, route_change)
     page.on_view_pop = view_pop
     page.go("/")
 
 if __name__ == "__main__":
     # Initialize OAuth callback listener
     start_callback_server(port=8551)
+    # Background jobs run once per process, before the first session connects
+    init_db()
+    scheduler.start()
     ft.app(target=main, view=ft.AppView.WEB_BROWSER, port=8550)
\ No newline at end of file
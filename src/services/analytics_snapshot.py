@@ -0,0 +1,249 @@
+"""Read-only analytics snapshot of the transactional database.
+
+Heavy reports (admin, billing and pharmacist reports) read from
+``storage/analytics.db``, a copy of ``pharmacy.db`` made with SQLite's
+online backup API, instead of the live database that handles checkouts.
+Their long aggregations then take no locks on ``pharmacy.db`` and do not
+push the live working set out of its page cache.
+
+The copy is made with :func:`services.backup.copy_database`: one read
+transaction on the WAL-mode database, so writers are never held up (a
+database not in WAL mode is copied in steps of ``BACKUP_PAGES`` pages).
+It is written to a uniquely named temporary file, switched out of WAL so
+read-only connections need no shared-memory file, and swapped in
+atomically. Reports already running keep reading the file they opened.
+
+Several app processes share the snapshot, so a refresh first takes the
+lease in ``snapshot_lease`` with one conditional UPDATE, as the scheduler
+does for jobs; while another process holds it the current snapshot is
+kept as is.
+
+The scheduler's ``analytics_snapshot`` job keeps the copy fresh. A snapshot
+older than ``REFRESH_SECONDS``, or a missing one, is also rebuilt in the
+background the next time a report asks for a connection; the UI thread
+never waits for a copy. Until the first snapshot exists, reports read the
+live database read-only and :func:`freshness_label` says so.
+
+Usage:
+    python src/services/analytics_snapshot.py refresh
+"""
+
+import glob
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+# Allow running this file directly from the services folder
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from services import database
+from services.backup import copy_database
+from services.database import get_db_connection
+from services.scheduler import OWNER
+
+REFRESH_SECONDS = 15 * 60
+# A refresh holding the lease longer than this is presumed dead
+LEASE_SECONDS = 10 * 60
+
+# Pages per step and the pause between steps when the database is not in WAL mode
+BACKUP_PAGES = 512
+BACKUP_SLEEP = 0.005
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_refresh_lock = threading.Lock()
+
+# refresh_if_due outcomes, exported as a cache hit rate by services.metrics
+_requests = {'fresh': 0, 'stale': 0, 'missing': 0}
+
+
+def snapshot_path():
+    return os.path.join(os.path.dirname(database.DB_FILE), 'analytics.db')
+
+
+def init_snapshot_schema(cursor):
+    """Create the single-row refresh lease."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS snapshot_lease (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            lease_owner TEXT,
+            lease_expires_at TIMESTAMP
+        )
+    """)
+    cursor.execute("INSERT OR IGNORE INTO snapshot_lease (id) VALUES (1)")
+
+
+def _take_lease():
+    """Take the refresh lease unless another live refresh holds it."""
+    now = datetime.now()
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute("""
+            UPDATE snapshot_lease SET lease_owner = ?, lease_expires_at = ?
+            WHERE id = 1 AND (lease_expires_at IS NULL OR lease_expires_at <= ?)
+        """, (OWNER, (now + timedelta(seconds=LEASE_SECONDS)).strftime(TIMESTAMP_FORMAT),
+              now.strftime(TIMESTAMP_FORMAT)))
+        conn.commit()
+        return cursor.rowcount == 1
+    finally:
+        conn.close()
+
+
+def _release_lease():
+    conn = get_db_connection()
+    try:
+        conn.execute("""
+            UPDATE snapshot_lease SET lease_owner = NULL, lease_expires_at = NULL
+            WHERE id = 1 AND lease_owner = ?
+        """, (OWNER,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _remove_temp_files(path):
+    for name in (path, f"{path}-wal", f"{path}-shm", f"{path}-journal"):
+        if os.path.exists(name):
+            os.remove(name)
+
+
+def refresh_snapshot():
+    """
+    Copy the live database into the analytics snapshot.
+
+    Only one refresh runs at a time: a call made while another is in
+    progress in this process waits for it, and one made while another
+    process holds the lease returns at once; neither copies again.
+
+    Returns:
+        str: Timestamp of the snapshot now in place (None if there is none yet)
+    """
+    if not _refresh_lock.acquire(blocking=False):
+        with _refresh_lock:
+            return snapshot_taken_at()
+    try:
+        if not _take_lease():
+            return snapshot_taken_at()
+        try:
+            path = snapshot_path()
+            folder = os.path.dirname(path)
+            # Leftovers of refreshes that died mid-copy; live ones hold the lease
+            for stale in glob.glob(os.path.join(folder, "analytics-*.db.tmp")):
+                if time.time() - os.path.getmtime(stale) > LEASE_SECONDS:
+                    _remove_temp_files(stale)
+
+            handle, temp_path = tempfile.mkstemp(prefix="analytics-", suffix=".db.tmp", dir=folder)
+            os.close(handle)
+            try:
+                taken_at = datetime.now().strftime(TIMESTAMP_FORMAT)
+                copy_database(database.DB_FILE, temp_path, BACKUP_PAGES, BACKUP_SLEEP)
+                target = sqlite3.connect(temp_path)
+                try:
+                    # The copy inherits WAL mode; the snapshot is replaced by rename, so keep it a single file
+                    target.execute("PRAGMA journal_mode = DELETE")
+                    target.execute("CREATE TABLE IF NOT EXISTS snapshot_info (taken_at TEXT NOT NULL)")
+                    target.execute("DELETE FROM snapshot_info")
+                    target.execute("INSERT INTO snapshot_info (taken_at) VALUES (?)", (taken_at,))
+                    target.commit()
+                finally:
+                    target.close()
+                os.replace(temp_path, path)
+            except Exception:
+                _remove_temp_files(temp_path)
+                raise
+            return taken_at
+        finally:
+            _release_lease()
+    finally:
+        _refresh_lock.release()
+
+
+def snapshot_taken_at():
+    """Timestamp of the current snapshot, or None if there is none yet."""
+    path = snapshot_path()
+    if not os.path.exists(path):
+        return None
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        row = conn.execute("SELECT taken_at FROM snapshot_info").fetchone()
+        return row[0] if row else None
+    except sqlite3.OperationalError:
+        return None
+    finally:
+        conn.close()
+
+
+def snapshot_age_seconds(taken_at):
+    return time.time() - datetime.strptime(taken_at, TIMESTAMP_FORMAT).timestamp()
+
+
+def _refresh_in_background():
+    if not _refresh_lock.locked():
+        threading.Thread(target=refresh_snapshot, daemon=True, name="analytics-snapshot").start()
+
+
+def refresh_if_due(max_age=REFRESH_SECONDS, wait=False):
+    """
+    Refresh the snapshot when it is missing or older than ``max_age``.
+
+    The copy runs on a background thread unless ``wait`` is set.
+
+    Returns:
+        bool: True when a snapshot is in place
+    """
+    taken_at = snapshot_taken_at()
+    if taken_at is not None and snapshot_age_seconds(taken_at) < max_age:
+        _requests['fresh'] += 1
+        return True
+    _requests['missing' if taken_at is None else 'stale'] += 1
+    if wait:
+        return refresh_snapshot() is not None
+    _refresh_in_background()
+    return taken_at is not None
+
+
+def request_counts():
+    """How often reports found the snapshot fresh, stale or missing."""
+    return dict(_requests)
+
+
+def get_report_connection():
+    """
+    Read-only connection to the analytics snapshot for report queries.
+
+    Same row factory as ``get_db_connection`` so report code can switch
+    over unchanged. Writes fail with ``sqlite3.OperationalError``. While the
+    first snapshot is still being built this reads the live database, which
+    in WAL mode does not block its writers.
+    """
+    path = snapshot_path() if refresh_if_due() else database.DB_FILE
+    conn = database.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    return database.apply_connect_hooks(conn)
+
+
+def freshness_label():
+    """Header text describing how current the report data is."""
+    taken_at = snapshot_taken_at()
+    if taken_at is None:
+        return "Report data: live (no snapshot yet, building one in the background)"
+    stamp = datetime.strptime(taken_at, TIMESTAMP_FORMAT).strftime("%b %d, %Y %I:%M %p")
+    minutes = int(snapshot_age_seconds(taken_at) // 60)
+    age = "just now" if minutes < 1 else f"{minutes} min ago"
+    return f"Report data as of {stamp} ({age})"
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args and args[0] == "refresh":
+        print(f"✅ Analytics snapshot refreshed at {refresh_snapshot()} → {snapshot_path()}")
+    else:
+        print(__doc__)
+        sys.exit(1)
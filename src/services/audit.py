@@ -0,0 +1,221 @@
+"""Unified, indexed audit event stream.
+
+Domain tables feed ``audit_events`` through triggers, so every registration,
+prescription, order, invoice, inventory addition and ``activity_log`` entry
+lands in one append-only table no matter which view wrote it. The stream is
+indexed on ``(created_at, id)`` and ``(event_type, created_at, id)`` so the
+admin logs page filters by type, time range and text in SQL and pages with
+a keyset cursor instead of merging six LIMITed queries in Python. Text
+search goes through the FTS5 index in :mod:`services.search`.
+"""
+
+from services.database import get_db_connection
+from services.search import to_match_query, fts_available, match_event_ids, event_snippets
+
+# Event categories shown in the logs filter
+EVENT_TYPES = ('users', 'prescriptions', 'orders', 'inventory', 'billing', 'system')
+
+PAGE_SIZE = 50
+
+_LOCAL_NOW = "datetime('now', 'localtime')"
+
+# Source table -> (event type, timestamp column, insert columns as SQL over NEW)
+# The same expressions drive the insert trigger and the one-off backfill.
+_INSERT_SOURCES = {
+    'users': ('users', 'created_at', """
+        'New ' || CASE WHEN NEW.role = 'Patient' THEN 'Customer' ELSE NEW.role END || ' Registered',
+        'User ''' || COALESCE(NEW.full_name, NEW.username) || ''' created account',
+        NEW.id, NEW.username, 'user', NEW.id, NEW.status
+    """),
+    'prescriptions': ('prescriptions', 'created_at', """
+        'Prescription #' || NEW.id || ' ' || COALESCE(NEW.status, 'Pending'),
+        'Prescription for ' || COALESCE((SELECT COALESCE(full_name, username) FROM users WHERE id = NEW.patient_id), 'unknown')
+            || ' status: ' || COALESCE(NEW.status, 'Pending'),
+        NEW.patient_id, (SELECT username FROM users WHERE id = NEW.patient_id), 'prescription', NEW.id, NEW.status
+    """),
+    'orders': ('orders', 'order_date', """
+        'Order #' || NEW.id || ' - ' || COALESCE(NEW.status, 'Pending'),
+        COALESCE((SELECT COALESCE(full_name, username) FROM users WHERE id = NEW.patient_id), 'unknown')
+            || ' placed order for ₱' || printf('%.2f', NEW.total_amount),
+        NEW.patient_id, (SELECT username FROM users WHERE id = NEW.patient_id), 'order', NEW.id, NEW.status
+    """),
+    'medicines': ('inventory', 'created_at', """
+        'Medicine Added',
+        NEW.name || ' added to inventory (Stock: ' || COALESCE(NEW.stock, 0) || ')',
+        NULL, 'system', 'medicine', NEW.id, NULL
+    """),
+    'invoices': ('billing', 'created_at', """
+        'Invoice ' || NEW.invoice_number || ' Generated',
+        'Invoice for ₱' || printf('%.2f', NEW.total_amount) || ' - Status: ' || COALESCE(NEW.status, 'Unpaid'),
+        NEW.billing_clerk_id, (SELECT username FROM users WHERE id = NEW.patient_id), 'invoice', NEW.id, NEW.status
+    """),
+    'activity_log': ('system', 'timestamp', """
+        NEW.action,
+        NEW.details,
+        NEW.user_id, COALESCE((SELECT username FROM users WHERE id = NEW.user_id), CAST(NEW.user_id AS TEXT)),
+        'activity', NEW.id, NULL
+    """),
+}
+
+# Source table -> (event type, columns for status changes)
+_STATUS_SOURCES = {
+    'prescriptions': ('prescriptions', """
+        'Prescription #' || NEW.id || ' ' || NEW.status,
+        'Prescription status changed from ' || COALESCE(OLD.status, 'none') || ' to ' || NEW.status,
+        COALESCE(NEW.pharmacist_id, NEW.patient_id),
+        (SELECT username FROM users WHERE id = COALESCE(NEW.pharmacist_id, NEW.patient_id)),
+        'prescription', NEW.id, NEW.status
+    """),
+    'orders': ('orders', """
+        'Order #' || NEW.id || ' - ' || NEW.status,
+        'Order status changed from ' || COALESCE(OLD.status, 'none') || ' to ' || NEW.status,
+        NEW.staff_id, COALESCE((SELECT username FROM users WHERE id = NEW.staff_id), 'system'),
+        'order', NEW.id, NEW.status
+    """),
+    'invoices': ('billing', """
+        'Invoice ' || NEW.invoice_number || ' ' || NEW.status,
+        'Invoice status changed from ' || COALESCE(OLD.status, 'none') || ' to ' || NEW.status,
+        NEW.billing_clerk_id, COALESCE((SELECT username FROM users WHERE id = NEW.billing_clerk_id), 'system'),
+        'invoice', NEW.id, NEW.status
+    """),
+}
+
+_EVENT_COLUMNS = "created_at, event_type, action, details, actor_id, actor, entity, entity_id, status"
+
+
+def _table_exists(cursor, name, kind='table'):
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = ? AND name = ?", (kind, name))
+    return cursor.fetchone() is not None
+
+
+def init_audit_schema(cursor):
+    """
+    Create the event stream and attach feed triggers to every source table
+    that exists so far.
+
+    Safe to call repeatedly: tables created later (orders, activity_log come
+    from the migration script) are picked up on the next call. A source is
+    backfilled from its existing rows the first time its trigger is created.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS audit_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at TIMESTAMP NOT NULL,
+            event_type TEXT NOT NULL,
+            action TEXT NOT NULL,
+            details TEXT,
+            actor_id INTEGER,
+            actor TEXT,
+            entity TEXT,
+            entity_id INTEGER,
+            status TEXT
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_audit_time ON audit_events(created_at, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_audit_type_time ON audit_events(event_type, created_at, id)")
+
+    for table, (event_type, time_column, columns) in _INSERT_SOURCES.items():
+        trigger = f"trg_audit_{table}_insert"
+        if not _table_exists(cursor, table) or _table_exists(cursor, trigger, 'trigger'):
+            continue
+
+        # Historical rows first, keeping their own timestamps as stored. Every
+        # source column mixes explicit local-time writes with rows left to
+        # DEFAULT CURRENT_TIMESTAMP, so no column can be converted wholesale.
+        cursor.execute(f"""
+            INSERT INTO audit_events ({_EVENT_COLUMNS})
+            SELECT COALESCE(NEW.{time_column}, {_LOCAL_NOW}), '{event_type}', {columns}
+            FROM {table} AS NEW
+        """)
+        timestamp = f"COALESCE(NEW.{time_column}, {_LOCAL_NOW})" if table == 'activity_log' else _LOCAL_NOW
+        cursor.execute(f"""
+            CREATE TRIGGER {trigger} AFTER INSERT ON {table}
+            BEGIN
+                INSERT INTO audit_events ({_EVENT_COLUMNS})
+                VALUES ({timestamp}, '{event_type}', {columns});
+            END
+        """)
+
+    for table, (event_type, columns) in _STATUS_SOURCES.items():
+        trigger = f"trg_audit_{table}_status"
+        if not _table_exists(cursor, table) or _table_exists(cursor, trigger, 'trigger'):
+            continue
+        cursor.execute(f"""
+            CREATE TRIGGER {trigger} AFTER UPDATE OF status ON {table}
+            WHEN NEW.status IS NOT OLD.status
+            BEGIN
+                INSERT INTO audit_events ({_EVENT_COLUMNS})
+                VALUES ({_LOCAL_NOW}, '{event_type}', {columns});
+            END
+        """)
+
+
+def _escape_like(text):
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def query_events(event_type=None, since=None, until=None, search=None, after=None, limit=PAGE_SIZE):
+    """
+    Read one page of the audit stream, newest first.
+
+    Args:
+        event_type (str): One of EVENT_TYPES, or None for all
+        since (str): Inclusive lower bound "YYYY-MM-DD HH:MM:SS"
+        until (str): Exclusive upper bound
+        search (str): Words matched against action, details and actor (FTS5,
+            falling back to a LIKE scan when the index is unavailable)
+        after (tuple): Cursor (created_at, id) returned by the previous page
+        limit (int): Page size
+
+    Returns:
+        tuple: (list of event dicts, next cursor or None when exhausted).
+        When searching, each event carries a highlighted 'snippet'.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    match = to_match_query(search) if search else None
+    use_fts = match is not None and fts_available(cursor)
+
+    clauses = []
+    params = []
+    if event_type:
+        clauses.append("event_type = ?")
+        params.append(event_type)
+    if since:
+        clauses.append("created_at >= ?")
+        params.append(since)
+    if until:
+        clauses.append("created_at < ?")
+        params.append(until)
+    if use_fts:
+        clauses.append(f"id IN ({match_event_ids(match)})")
+        params.append(match)
+    elif search:
+        pattern = f"%{_escape_like(search)}%"
+        clauses.append("(action LIKE ? ESCAPE '\\' OR details LIKE ? ESCAPE '\\' OR actor LIKE ? ESCAPE '\\')")
+        params.extend([pattern, pattern, pattern])
+    if after:
+        clauses.append("(created_at, id) < (?, ?)")
+        params.extend(after)
+
+    query = "SELECT * FROM audit_events"
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    query += " ORDER BY created_at DESC, id DESC LIMIT ?"
+    params.append(limit + 1)
+
+    cursor.execute(query, params)
+    rows = [dict(row) for row in cursor.fetchall()]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = (rows[-1]['created_at'], rows[-1]['id'])
+
+    # Snippets only for the page being returned
+    snippets = event_snippets(cursor, match, [row['id'] for row in rows]) if use_fts else {}
+    conn.close()
+    for row in rows:
+        row['snippet'] = snippets.get(row['id'])
+    return rows, next_cursor
@@ -0,0 +1,299 @@
+"""Asynchronous, batched writer for ``activity_log``.
+
+Business transactions used to ``INSERT INTO activity_log`` inline, which kept
+the SQLite write lock for an extra statement on every hot path. Callers now
+hand events to :func:`log_activity` after their own commit; a background
+thread drains the bounded queue and writes events in batches, one
+transaction per batch (group commit).
+
+* ``durable=True`` blocks the caller until the batch containing the event
+  has committed, for events that must not be lost (payments, invoices).
+* :func:`log_activities` queues the events of one bulk action as a single
+  item, so they always land in the same batch.
+* When the queue is full the caller waits up to ``ENQUEUE_TIMEOUT`` seconds
+  and then writes synchronously, so events are never dropped; both cases are
+  counted in :func:`get_metrics`.
+* A batch the database rejects is rolled back and retried one queued item
+  at a time, so an invalid event (say, a NULL user_id) loses only itself;
+  such events are counted as ``rejected_events``.
+* :func:`shutdown` flushes everything still queued; it is registered with
+  ``atexit`` so the queue drains when the server process exits.
+"""
+
+import atexit
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from services.database import get_db_connection
+
+MAX_QUEUE_SIZE = 10000
+BATCH_SIZE = 500
+# How long the writer waits for more events before committing a partial batch
+BATCH_WINDOW = 0.05
+ENQUEUE_TIMEOUT = 0.5
+DURABLE_TIMEOUT = 5.0
+WRITE_RETRIES = 5
+
+_queue = queue.Queue(maxsize=MAX_QUEUE_SIZE)
+_writer = None
+_writer_lock = threading.Lock()
+_stopping = threading.Event()
+
+_metrics_lock = threading.Lock()
+_metrics = {
+    'enqueued': 0,
+    'written': 0,
+    'batches': 0,
+    'max_batch': 0,
+    'queue_high_water': 0,
+    'blocked_enqueues': 0,
+    'sync_fallbacks': 0,
+    'write_errors': 0,
+    'rejected_events': 0,
+    'durable_timeouts': 0,
+    'last_batch_ms': 0.0,
+}
+
+
+class _Event:
+    __slots__ = ('rows', 'done', 'failed')
+
+    def __init__(self, rows, durable):
+        self.rows = rows
+        self.done = threading.Event() if durable else None
+        self.failed = False
+
+
+class _FlushRequest(_Event):
+    """Marker acknowledged once everything queued before it is committed."""
+    __slots__ = ()
+
+    def __init__(self):
+        super().__init__(None, durable=True)
+
+
+def _bump(**values):
+    with _metrics_lock:
+        for key, value in values.items():
+            _metrics[key] += value
+
+
+def _insert_rows(conn, rows):
+    """Insert rows in one transaction, retrying while the database is locked."""
+    for attempt in range(WRITE_RETRIES):
+        try:
+            conn.executemany("""
+                INSERT INTO activity_log (user_id, action, details, timestamp)
+                VALUES (?, ?, ?, ?)
+            """, rows)
+            conn.commit()
+            return
+        except sqlite3.OperationalError:
+            conn.rollback()
+            if attempt == WRITE_RETRIES - 1:
+                raise
+            time.sleep(0.05 * (2 ** attempt))
+        except Exception:
+            # Nothing from a failed batch may ride along with the next commit
+            conn.rollback()
+            raise
+
+
+def _write_events(conn, events):
+    """
+    Commit the events' rows in one transaction. If the database rejects the
+    batch, write it again one event at a time so only the bad event is lost.
+
+    Returns:
+        int: Rows written
+    """
+    rows = [row for event in events for row in event.rows]
+    try:
+        _insert_rows(conn, rows)
+        return len(rows)
+    except sqlite3.OperationalError as ex:
+        # Still locked after the retries; durable callers write synchronously
+        _bump(write_errors=1)
+        print(f"Audit logger: failed to write {len(rows)} event(s): {ex}")
+        for event in events:
+            event.failed = True
+        return 0
+    except Exception:
+        # Something in the batch was rejected; find it one event at a time
+        return sum(_write_single(conn, event) for event in events)
+
+
+def _write_single(conn, event):
+    try:
+        _insert_rows(conn, event.rows)
+        return len(event.rows)
+    except sqlite3.OperationalError as ex:
+        _bump(write_errors=1)
+        print(f"Audit logger: failed to write {len(event.rows)} event(s): {ex}")
+        event.failed = True
+    except Exception as ex:
+        # Retrying cannot help an event the database rejects
+        _bump(rejected_events=1)
+        print(f"Audit logger: rejected {event.rows!r}: {ex}")
+    return 0
+
+
+def _run_writer():
+    conn = get_db_connection()
+    try:
+        while not (_stopping.is_set() and _queue.empty()):
+            try:
+                first = _queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            batch = [first]
+            deadline = time.monotonic() + BATCH_WINDOW
+            while len(batch) < BATCH_SIZE and not isinstance(batch[-1], _FlushRequest):
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(_queue.get(timeout=remaining) if remaining > 0 else _queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            events = [item for item in batch if item.rows]
+            if events:
+                started = time.perf_counter()
+                written = _write_events(conn, events)
+                if written:
+                    with _metrics_lock:
+                        _metrics['written'] += written
+                        _metrics['batches'] += 1
+                        _metrics['max_batch'] = max(_metrics['max_batch'], written)
+                        _metrics['last_batch_ms'] = (time.perf_counter() - started) * 1000
+
+            # Wake durable callers and flushers only after the commit
+            for item in batch:
+                if item.done:
+                    item.done.set()
+                _queue.task_done()
+    finally:
+        conn.close()
+
+
+def _ensure_writer():
+    global _writer
+    if _writer is not None and _writer.is_alive():
+        return
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _stopping.clear()
+            _writer = threading.Thread(target=_run_writer, name="audit-logger", daemon=True)
+            _writer.start()
+
+
+def _write_now(rows):
+    """Synchronous fallback used when the queue is saturated or stopped."""
+    conn = get_db_connection()
+    try:
+        _insert_rows(conn, rows)
+        _bump(written=len(rows), sync_fallbacks=1)
+    finally:
+        conn.close()
+
+
+def log_activity(user_id, action, details=None, durable=False, timestamp=None):
+    """
+    Record an activity_log event without holding the caller's transaction.
+
+    Call it after the business transaction has committed.
+
+    Args:
+        user_id (int): Acting user
+        action (str): Short action code such as 'invoice_created'
+        details (str): Human readable description
+        durable (bool): Wait until the event is committed before returning
+        timestamp (str): Override "YYYY-MM-DD HH:MM:SS" (defaults to now)
+
+    Returns:
+        bool: False only when a durable event is still queued after DURABLE_TIMEOUT
+    """
+    return log_activities([(user_id, action, details)], durable=durable, timestamp=timestamp)
+
+
+def log_activities(events, durable=False, timestamp=None):
+    """
+    Record several events as one queue item, so they are committed together
+    in a single batch (bulk actions log once, not once per item).
+
+    Args:
+        events (list): (user_id, action, details) tuples
+        durable (bool): Wait until the events are committed before returning
+        timestamp (str): Override "YYYY-MM-DD HH:MM:SS" (defaults to now)
+
+    Returns:
+        bool: False only when durable events are still queued after DURABLE_TIMEOUT
+    """
+    stamp = timestamp or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    rows = [(user_id, action, details, stamp) for user_id, action, details in events]
+    if not rows:
+        return True
+
+    if _stopping.is_set():
+        _write_now(rows)
+        return True
+
+    _ensure_writer()
+    event = _Event(rows, durable)
+    try:
+        _queue.put_nowait(event)
+    except queue.Full:
+        _bump(blocked_enqueues=1)
+        try:
+            _queue.put(event, timeout=ENQUEUE_TIMEOUT)
+        except queue.Full:
+            _write_now(rows)
+            return True
+
+    with _metrics_lock:
+        _metrics['enqueued'] += len(rows)
+        _metrics['queue_high_water'] = max(_metrics['queue_high_water'], _queue.qsize())
+
+    if durable:
+        if not event.done.wait(DURABLE_TIMEOUT):
+            # Still queued; the writer commits it later
+            _bump(durable_timeouts=1)
+            return False
+        if event.failed:
+            _write_now(rows)
+    return True
+
+
+def flush(timeout=DURABLE_TIMEOUT):
+    """Block until every event queued so far is committed. Returns True on success."""
+    if _writer is None or not _writer.is_alive():
+        return _queue.empty()
+    request = _FlushRequest()
+    _queue.put(request)
+    return request.done.wait(timeout)
+
+
+def shutdown(timeout=DURABLE_TIMEOUT):
+    """Flush pending events and stop the writer thread."""
+    global _writer
+    flush(timeout)
+    _stopping.set()
+    if _writer is not None:
+        _writer.join(timeout)
+        _writer = None
+
+
+def get_metrics():
+    """Snapshot of throughput and backpressure counters plus current queue depth."""
+    with _metrics_lock:
+        snapshot = dict(_metrics)
+    snapshot['queue_depth'] = _queue.qsize()
+    snapshot['queue_capacity'] = MAX_QUEUE_SIZE
+    snapshot['writer_alive'] = _writer is not None and _writer.is_alive()
+    return snapshot
+
+
+atexit.register(shutdown)
@@ -0,0 +1,442 @@
+"""Online backups of the live database, with rotation, checksums and restore.
+
+A backup copies ``pharmacy.db`` with SQLite's online backup API. The
+database runs in WAL mode, so the whole copy is one read transaction that
+sees a consistent snapshot while writers keep committing to the WAL.
+
+A database that is not in WAL mode (an old file, or a restored copy that
+was never opened by the app) is copied in steps of ``BACKUP_PAGES`` pages
+instead, so writers wait at most one step. There a write from another
+connection makes SQLite restart the copy, and after ``MAX_RESTARTS``
+restarts the backup fails; the scheduler retries it later.
+
+The copy is checked with ``PRAGMA quick_check`` and gzip-compressed into
+``storage/backups/pharmacy-YYYYmmdd-HHMMSS.db.gz``. Next to it a
+``.json`` manifest holds the SHA-256 of the compressed file and of the
+database inside it, plus the run's report. When the database is unchanged
+since the newest backup (same checksum) the new copy is dropped, and only
+the newest ``KEEP`` backups are kept. Manifests live on disk rather than in
+the database, so rotation still works after a restore.
+
+Each report gives copy throughput and writer impact. ``lock_held_ms`` is the
+total time the copy held its read lock. ``writers`` times the commits this
+process made while the copy ran (see ``database.add_commit_observer``);
+writers in other processes are not seen.
+
+A restore first verifies both checksums and the database's integrity. It
+then takes a ``pre-restore`` backup of the current file and copies the
+backup into place with the backup API, so open connections see the
+restored data.
+
+Usage:
+    python src/services/backup.py create [PAGES_PER_STEP]
+    python src/services/backup.py list
+    python src/services/backup.py verify [NAME]
+    python src/services/backup.py restore NAME [TARGET_DB]
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+# Allow running this file directly from the services folder
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from services import database
+
+# Pages copied per backup step outside WAL mode, and the back-off when a writer holds the lock
+BACKUP_PAGES = 256
+BACKUP_SLEEP = 0.01
+MAX_RESTARTS = 5
+
+# Backups kept by rotation
+KEEP = 14
+
+COMPRESS_LEVEL = 6
+CHUNK_BYTES = 1024 * 1024
+
+# How long a restore waits for other connections to release the database
+RESTORE_TIMEOUT = 30
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# sqlite3_backup_step results that mean a step copied pages (others are BUSY/LOCKED)
+_STEP_COPIED = (0, 101)
+
+_backup_lock = threading.Lock()
+
+
+class _Restarted(Exception):
+    pass
+
+
+def backup_dir():
+    path = os.path.join(os.path.dirname(database.DB_FILE), 'backups')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _manifest_path(name):
+    return os.path.join(backup_dir(), f"{name}.json")
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 1)
+
+
+class _CommitTimer:
+    """Collects the duration of every commit made in this process while active."""
+
+    def __init__(self):
+        self.waits = []
+
+    def __call__(self, seconds):
+        self.waits.append(seconds)
+
+    def __enter__(self):
+        database.add_commit_observer(self)
+        return self
+
+    def __exit__(self, *exc):
+        database.remove_commit_observer(self)
+
+    def report(self):
+        waits = list(self.waits)
+        return {
+            'commits': len(waits),
+            'max_wait_ms': _ms(max(waits, default=0)),
+            'avg_wait_ms': _ms(sum(waits) / len(waits)) if waits else 0,
+            'total_wait_ms': _ms(sum(waits)),
+        }
+
+
+def _journal_mode(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("PRAGMA journal_mode").fetchone()[0].lower()
+    finally:
+        conn.close()
+
+
+def copy_database(source_path, target_path, pages=BACKUP_PAGES, sleep=BACKUP_SLEEP):
+    """
+    Copy a database with the backup API; returns timing and restart figures.
+
+    In WAL mode the copy is a single read transaction that does not block
+    writers. Otherwise it runs in steps of ``pages`` and raises
+    sqlite3.OperationalError after ``MAX_RESTARTS`` restarts.
+    """
+    wal = _journal_mode(source_path) == "wal"
+    stats = {'steps': 0, 'restarts': 0, 'mode': 'snapshot' if wal else 'stepped'}
+    step_times = []
+    state = {'remaining': None, 'step_started': None}
+
+    def progress(status, remaining, total):
+        if status in _STEP_COPIED:
+            step_times.append(time.perf_counter() - state['step_started'])
+            stats['steps'] += 1
+            if state['remaining'] is not None and remaining > state['remaining']:
+                stats['restarts'] += 1
+                if stats['restarts'] > MAX_RESTARTS:
+                    raise _Restarted()
+            state['remaining'] = remaining
+            state['step_started'] = time.perf_counter()
+        else:
+            # Locked out by a writer: the next step starts after the back-off
+            state['step_started'] = time.perf_counter() + sleep
+
+    source = sqlite3.connect(source_path)
+    started = time.perf_counter()
+    try:
+        target = sqlite3.connect(target_path)
+        try:
+            state['step_started'] = time.perf_counter()
+            try:
+                source.backup(target, pages=-1 if wal else pages, progress=progress, sleep=sleep)
+            except _Restarted:
+                raise sqlite3.OperationalError(
+                    f"copy restarted more than {MAX_RESTARTS} times by concurrent writes; "
+                    "enable WAL mode or retry when the database is quieter"
+                ) from None
+        finally:
+            target.close()
+    finally:
+        source.close()
+
+    stats['seconds'] = round(time.perf_counter() - started, 3)
+    stats['max_step_ms'] = _ms(max(step_times, default=0))
+    stats['lock_held_ms'] = _ms(sum(step_times))
+    return stats
+
+
+def _compress(db_path, gz_path):
+    """Gzip ``db_path`` into ``gz_path``; returns (database sha256, seconds)."""
+    started = time.perf_counter()
+    digest = hashlib.sha256()
+    with open(db_path, 'rb') as src, open(gz_path, 'wb') as raw:
+        with gzip.GzipFile(filename=os.path.basename(gz_path)[:-len(".gz")], mode='wb',
+                           compresslevel=COMPRESS_LEVEL, fileobj=raw, mtime=0) as out:
+            for chunk in iter(lambda: src.read(CHUNK_BYTES), b""):
+                digest.update(chunk)
+                out.write(chunk)
+    return digest.hexdigest(), round(time.perf_counter() - started, 3)
+
+
+def create_backup(trigger="manual", pages=BACKUP_PAGES, sleep=BACKUP_SLEEP, keep=KEEP):
+    """
+    Back up the live database into the backup directory.
+
+    Returns:
+        dict: The manifest: name, file, created_at, trigger, sha256, db_sha256,
+        db_bytes, compressed_bytes, page_count, page_size, copy (seconds,
+        mb_per_s, steps, restarts, mode, max_step_ms, lock_held_ms), writers
+        (commits, max_wait_ms, avg_wait_ms, total_wait_ms), compress_seconds,
+        unchanged_since (set when the copy matched the newest backup and was
+        dropped) and rotated (names removed)
+    """
+    with _backup_lock:
+        created = datetime.now()
+        name = f"pharmacy-{created.strftime('%Y%m%d-%H%M%S')}"
+        temp_path = os.path.join(backup_dir(), f"{name}.db.tmp")
+        gz_path = os.path.join(backup_dir(), f"{name}.db.gz")
+        try:
+            with _CommitTimer() as writers:
+                copy = copy_database(database.DB_FILE, temp_path, pages, sleep)
+
+            check = sqlite3.connect(temp_path)
+            try:
+                integrity = check.execute("PRAGMA quick_check").fetchone()[0]
+                page_count = check.execute("PRAGMA page_count").fetchone()[0]
+                page_size = check.execute("PRAGMA page_size").fetchone()[0]
+            finally:
+                check.close()
+            if integrity != "ok":
+                raise sqlite3.DatabaseError(f"backup copy failed quick_check: {integrity}")
+
+            db_bytes = os.path.getsize(temp_path)
+            db_sha256, compress_seconds = _compress(temp_path, gz_path)
+        except Exception:
+            if os.path.exists(gz_path):
+                os.remove(gz_path)
+            raise
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        copy['mb_per_s'] = round(db_bytes / 1048576 / copy['seconds'], 1) if copy['seconds'] else None
+        manifest = {
+            'name': name,
+            'file': os.path.basename(gz_path),
+            'created_at': created.strftime(TIMESTAMP_FORMAT),
+            'trigger': trigger,
+            'sha256': _file_sha256(gz_path),
+            'db_sha256': db_sha256,
+            'db_bytes': db_bytes,
+            'compressed_bytes': os.path.getsize(gz_path),
+            'page_count': page_count,
+            'page_size': page_size,
+            'copy': copy,
+            'writers': writers.report(),
+            'compress_seconds': compress_seconds,
+        }
+
+        backups = list_backups()
+        if backups and backups[0]['db_sha256'] == db_sha256:
+            os.remove(gz_path)
+            manifest['unchanged_since'] = backups[0]['name']
+            manifest['rotated'] = []
+            return manifest
+
+        with open(_manifest_path(name), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        manifest['rotated'] = rotate(keep)
+        return manifest
+
+
+def list_backups():
+    """Manifests of the backups on disk, newest first."""
+    manifests = []
+    for entry in os.listdir(backup_dir()):
+        if not entry.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(backup_dir(), entry), encoding='utf-8') as f:
+                manifests.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return sorted(manifests, key=lambda manifest: manifest['name'], reverse=True)
+
+
+def rotate(keep=KEEP):
+    """Delete all but the newest ``keep`` backups; returns the names removed."""
+    removed = []
+    for manifest in list_backups()[keep:]:
+        for path in (os.path.join(backup_dir(), manifest['file']), _manifest_path(manifest['name'])):
+            if os.path.exists(path):
+                os.remove(path)
+        removed.append(manifest['name'])
+    return removed
+
+
+def _find(name):
+    name = os.path.basename(name)
+    for suffix in (".json", ".db.gz"):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+    path = _manifest_path(name)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No backup named '{name}' in {backup_dir()}")
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _extract(manifest, target_path):
+    """Check the compressed file, decompress it to ``target_path`` and check the database."""
+    gz_path = os.path.join(backup_dir(), manifest['file'])
+    if _file_sha256(gz_path) != manifest['sha256']:
+        raise ValueError(f"{manifest['file']}: checksum mismatch, the file is damaged")
+
+    digest = hashlib.sha256()
+    with gzip.open(gz_path, 'rb') as src, open(target_path, 'wb') as out:
+        for chunk in iter(lambda: src.read(CHUNK_BYTES), b""):
+            digest.update(chunk)
+            out.write(chunk)
+    if digest.hexdigest() != manifest['db_sha256']:
+        raise ValueError(f"{manifest['file']}: database checksum mismatch")
+
+    conn = sqlite3.connect(target_path)
+    try:
+        integrity = conn.execute("PRAGMA integrity_check").fetchone()[0]
+    finally:
+        conn.close()
+    if integrity != "ok":
+        raise ValueError(f"{manifest['file']}: integrity_check failed: {integrity}")
+
+
+def verify_backup(name):
+    """Check a backup's checksums and integrity; raises ValueError when it is damaged."""
+    manifest = _find(name)
+    temp_path = os.path.join(backup_dir(), f"{manifest['name']}.verify.tmp")
+    try:
+        _extract(manifest, temp_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return manifest
+
+
+def restore_backup(name, target=None):
+    """
+    Replace ``target`` (the live database by default) with a verified backup.
+
+    Returns:
+        dict: name, target, seconds and safety_backup (the pre-restore backup's
+        name, or None when there was no database to save)
+    """
+    manifest = _find(name)
+    target = target or database.DB_FILE
+    temp_path = os.path.join(backup_dir(), f"{manifest['name']}.restore.tmp")
+    started = time.perf_counter()
+    try:
+        _extract(manifest, temp_path)
+
+        safety = None
+        if os.path.abspath(target) == os.path.abspath(database.DB_FILE) and os.path.exists(target):
+            safety = create_backup(trigger="pre-restore")
+            safety = safety.get('unchanged_since') or safety['name']
+
+        source = sqlite3.connect(temp_path)
+        dest = sqlite3.connect(target, timeout=RESTORE_TIMEOUT)
+        try:
+            source.backup(dest)
+        finally:
+            dest.close()
+            source.close()
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    return {
+        'name': manifest['name'],
+        'target': target,
+        'seconds': round(time.perf_counter() - started, 3),
+        'safety_backup': safety,
+    }
+
+
+def summary(manifest):
+    """One line describing a backup run, for job history and the CLI."""
+    if manifest.get('unchanged_since'):
+        return f"unchanged since {manifest['unchanged_since']}, nothing kept"
+    copy, writers = manifest['copy'], manifest['writers']
+    return (
+        f"{manifest['name']}: {manifest['db_bytes'] / 1048576:,.1f} MB -> "
+        f"{manifest['compressed_bytes'] / 1048576:,.1f} MB in {copy['seconds']}s "
+        f"({copy['mb_per_s']} MB/s, {copy['steps']} steps, {copy['restarts']} restarts); "
+        + (f"writers waited max {writers['max_wait_ms']} ms, total {writers['total_wait_ms']} ms"
+           if writers.get('commits') else "no commits during the copy")
+    )
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    command = args[0] if args else None
+
+    try:
+        if command == "create":
+            pages = int(args[1]) if len(args) > 1 else BACKUP_PAGES
+            manifest = create_backup(pages=pages)
+            print(f"✅ {summary(manifest)}")
+            if not manifest.get('unchanged_since'):
+                copy = manifest['copy']
+                print(f"   Copy: {copy['mode']}, longest step {copy['max_step_ms']} ms, "
+                      f"read lock held {copy['lock_held_ms']} ms in total")
+                print(f"   Compression: {manifest['compress_seconds']}s, sha256 {manifest['sha256']}")
+            for removed in manifest['rotated']:
+                print(f"   🗑️  Rotated out {removed}")
+        elif command == "list":
+            backups = list_backups()
+            if not backups:
+                print(f"No backups in {backup_dir()}")
+            for manifest in backups:
+                print(f"{manifest['name']}  {manifest['trigger']:<12} "
+                      f"{manifest['compressed_bytes'] / 1048576:>8,.1f} MB  {manifest['copy']['mb_per_s']} MB/s")
+        elif command == "verify":
+            names = args[1:] or [manifest['name'] for manifest in list_backups()]
+            failed = False
+            for name in names:
+                try:
+                    verify_backup(name)
+                    print(f"✅ {name}: checksums and integrity OK")
+                except (ValueError, OSError) as ex:
+                    failed = True
+                    print(f"❌ {ex}")
+            sys.exit(1 if failed else 0)
+        elif command == "restore" and len(args) > 1:
+            result = restore_backup(args[1], args[2] if len(args) > 2 else None)
+            print(f"✅ Restored {result['name']} into {result['target']} in {result['seconds']}s")
+            if result['safety_backup']:
+                print(f"   Previous contents saved as {result['safety_backup']}")
+        else:
+            print(__doc__)
+            sys.exit(1)
+    except (FileNotFoundError, ValueError, sqlite3.DatabaseError) as ex:
+        print(f"❌ {ex}")
+        sys.exit(1)
@@ -0,0 +1,199 @@
+"""Billing queries shared by the invoice, payment, dashboard and report views."""
+
+from services.database import get_db_connection
+
+
+def get_invoices(status="All", payment_method="All", date_start="", date_end="", search=""):
+    """
+    Invoice list with the invoices page filters applied, newest first.
+
+    Returns:
+        list: Rows (id, invoice_number, total_amount, status, created_at,
+        payment_method, payment_date, subtotal, tax, discount, patient_name,
+        patient_id, version)
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    query = """
+        SELECT i.id, i.invoice_number, i.total_amount, i.status, i.created_at,
+               i.payment_method, i.payment_date, i.subtotal, i.tax, i.discount,
+               u.full_name as patient_name, u.id as patient_id, i.version
+        FROM invoices i
+        LEFT JOIN users u ON i.patient_id = u.id
+        WHERE 1=1
+    """
+
+    params = []
+
+    if status != "All":
+        query += " AND i.status = ?"
+        params.append(status)
+
+    if payment_method != "All":
+        query += " AND i.payment_method = ?"
+        params.append(payment_method)
+
+    if date_start:
+        query += " AND DATE(i.created_at) >= ?"
+        params.append(date_start)
+
+    if date_end:
+        query += " AND DATE(i.created_at) <= ?"
+        params.append(date_end)
+
+    if search:
+        query += " AND (i.invoice_number LIKE ? OR u.full_name LIKE ?)"
+        params.append(f"%{search}%")
+        params.append(f"%{search}%")
+
+    query += " ORDER BY i.created_at DESC"
+
+    cursor.execute(query, params)
+    results = cursor.fetchall()
+    conn.close()
+
+    return results
+
+
+def get_payments(payment_method="All", date_start="", date_end="", search=""):
+    """
+    Paid invoices for the payment history page, latest payment first.
+
+    Returns:
+        list: Rows (id, invoice_number, total_amount, payment_method,
+        payment_date, created_at, patient_name, clerk_name)
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    query = """
+        SELECT i.id, i.invoice_number, i.total_amount, i.payment_method,
+               i.payment_date, i.created_at,
+               u.full_name as patient_name,
+               clerk.full_name as clerk_name
+        FROM invoices i
+        LEFT JOIN users u ON i.patient_id = u.id
+        LEFT JOIN users clerk ON i.billing_clerk_id = clerk.id
+        WHERE i.status = 'Paid'
+    """
+
+    params = []
+    if payment_method != "All":
+        query += " AND i.payment_method = ?"
+        params.append(payment_method)
+    if date_start:
+        query += " AND DATE(i.payment_date) >= ?"
+        params.append(date_start)
+    if date_end:
+        query += " AND DATE(i.payment_date) <= ?"
+        params.append(date_end)
+    if search:
+        query += " AND (i.invoice_number LIKE ? OR u.full_name LIKE ?)"
+        params.append(f"%{search}%")
+        params.append(f"%{search}%")
+
+    query += " ORDER BY i.payment_date DESC"
+
+    cursor.execute(query, params)
+    results = cursor.fetchall()
+    conn.close()
+    return results
+
+
+def get_billing_stats(cursor):
+    """
+    Billing dashboard figures.
+
+    Returns:
+        dict: pending_invoices, paid_today, revenue_today, pending_amount
+    """
+    stats = {}
+
+    # Query pending invoice totals
+    cursor.execute("SELECT COUNT(*) FROM invoices WHERE status = 'Unpaid'")
+    stats['pending_invoices'] = cursor.fetchone()[0] or 0
+
+    # Query daily completed transactions count
+    cursor.execute("SELECT COUNT(*) FROM invoices WHERE status = 'Paid' AND DATE(payment_date) = DATE('now')")
+    stats['paid_today'] = cursor.fetchone()[0] or 0
+
+    # Query daily realized revenue
+    cursor.execute("SELECT COALESCE(SUM(total_amount), 0) FROM invoices WHERE status = 'Paid' AND DATE(payment_date) = DATE('now')")
+    stats['revenue_today'] = cursor.fetchone()[0] or 0.0
+
+    # Query total outstanding receivables
+    cursor.execute("SELECT COALESCE(SUM(total_amount), 0) FROM invoices WHERE status = 'Unpaid'")
+    stats['pending_amount'] = cursor.fetchone()[0] or 0.0
+
+    return stats
+
+
+def get_recent_invoices(cursor, limit=5):
+    """Invoices listed on the billing dashboard (id, number, total, status, created_at, patient_name)."""
+    cursor.execute("""
+        SELECT i.id, i.invoice_number, i.total_amount, i.status, i.created_at, u.full_name as patient_name
+        FROM invoices i
+        LEFT JOIN users u ON i.patient_id = u.id
+        ORDER BY i.id ASC LIMIT ?
+    """, (limit,))
+    return cursor.fetchall()
+
+
+def get_billing_report(cursor, date_start, date_end):
+    """
+    Aggregates for the billing report over an inclusive date range.
+
+    Args:
+        cursor: Report cursor (normally the analytics snapshot)
+        date_start (str): "YYYY-MM-DD"
+        date_end (str): "YYYY-MM-DD"
+
+    Returns:
+        dict: summary (total, paid, unpaid, cancelled counts, revenue,
+        pending revenue, average paid invoice), payment_methods rows
+        (method, count, total) and top_patients rows (name, invoices, spent)
+    """
+    # Query aggregated financial metrics
+    cursor.execute("""
+        SELECT
+            COUNT(*) as total_invoices,
+            COALESCE(SUM(CASE WHEN status = 'Paid' THEN 1 ELSE 0 END), 0) as paid_count,
+            COALESCE(SUM(CASE WHEN status = 'Unpaid' THEN 1 ELSE 0 END), 0) as unpaid_count,
+            COALESCE(SUM(CASE WHEN status = 'Cancelled' THEN 1 ELSE 0 END), 0) as cancelled_count,
+            COALESCE(SUM(CASE WHEN status = 'Paid' THEN total_amount ELSE 0 END), 0) as total_revenue,
+            COALESCE(SUM(CASE WHEN status = 'Unpaid' THEN total_amount ELSE 0 END), 0) as pending_revenue,
+            COALESCE(AVG(CASE WHEN status = 'Paid' THEN total_amount END), 0) as avg_invoice_amount
+        FROM invoices
+        WHERE DATE(created_at) BETWEEN ? AND ?
+    """, (date_start, date_end))
+    summary = cursor.fetchone()
+
+    # Query transaction distribution
+    cursor.execute("""
+        SELECT payment_method,
+               COUNT(*) as count,
+               SUM(total_amount) as total
+        FROM invoices
+        WHERE status = 'Paid'
+        AND DATE(payment_date) BETWEEN ? AND ?
+        GROUP BY payment_method
+        ORDER BY total DESC
+    """, (date_start, date_end))
+    payment_methods = cursor.fetchall()
+
+    # Query top revenue contributors
+    cursor.execute("""
+        SELECT u.full_name,
+               COUNT(i.id) as invoice_count,
+               SUM(i.total_amount) as total_spent
+        FROM invoices i
+        LEFT JOIN users u ON i.patient_id = u.id
+        WHERE DATE(i.created_at) BETWEEN ? AND ?
+        GROUP BY u.full_name
+        ORDER BY total_spent DESC
+        LIMIT 10
+    """, (date_start, date_end))
+    top_patients = cursor.fetchall()
+
+    return {'summary': summary, 'payment_methods': payment_methods, 'top_patients': top_patients}
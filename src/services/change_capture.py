@@ -0,0 +1,254 @@
+"""Change data capture for the core business tables.
+
+Triggers on medicines, orders, order_items, invoices, payments and
+prescriptions append one ``change_log`` row per insert, update or delete:
+the table, the row id, the operation and a sequence number. ``seq`` is an
+AUTOINCREMENT key, so it only ever grows, even after old rows are pruned.
+
+Consumers (caches, rollups, search indexes, external exports) register a
+name and read changes after their checkpoint with :func:`read_changes`,
+then store the last sequence they handled with :func:`checkpoint`. Rows
+every registered consumer has passed are pruned, so the log stays as short
+as the slowest consumer allows.
+
+Only ids are captured, not row images: a consumer re-reads the current row
+(or notices it is gone). Several changes to the same row between two reads
+can therefore be handled once.
+
+Usage:
+    python src/services/change_capture.py list
+    python src/services/change_capture.py prune
+"""
+
+import os
+import sys
+from datetime import datetime
+
+# Allow running this file directly from the services folder
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from services.database import get_db_connection
+
+CAPTURED_TABLES = ('medicines', 'orders', 'order_items', 'invoices', 'payments', 'prescriptions')
+
+INSERT = 'I'
+UPDATE = 'U'
+DELETE = 'D'
+
+BATCH_SIZE = 500
+
+# Trigger event -> (operation code, row reference)
+_OPERATIONS = {
+    'INSERT': (INSERT, 'NEW'),
+    'UPDATE': (UPDATE, 'NEW'),
+    'DELETE': (DELETE, 'OLD'),
+}
+
+
+def _now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def init_change_capture_schema(cursor):
+    """
+    Create the change log and consumer checkpoints and attach capture
+    triggers to every captured table that exists so far (safe to call
+    repeatedly; orders, order_items and payments come from the migration
+    script).
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            op TEXT NOT NULL CHECK (op IN ('I', 'U', 'D')),
+            changed_at TIMESTAMP NOT NULL DEFAULT (datetime('now', 'localtime'))
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_change_log_table_seq ON change_log(table_name, seq)")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS change_consumers (
+            name TEXT PRIMARY KEY,
+            position INTEGER NOT NULL DEFAULT 0,
+            registered_at TIMESTAMP,
+            updated_at TIMESTAMP
+        )
+    """)
+
+    for table in CAPTURED_TABLES:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+        if cursor.fetchone() is None:
+            continue
+        for event, (op, ref) in _OPERATIONS.items():
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_cdc_{table}_{event.lower()} AFTER {event} ON {table}
+                BEGIN
+                    INSERT INTO change_log (table_name, row_id, op) VALUES ('{table}', {ref}.id, '{op}');
+                END
+            """)
+
+
+def head_sequence(cursor):
+    """Highest sequence ever assigned (0 before the first change)."""
+    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'")
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def register_consumer(name, from_start=False):
+    """
+    Register a consumer, or return the checkpoint of an existing one.
+
+    Args:
+        name (str): Stable consumer name, e.g. 'dashboard_rollup'
+        from_start (bool): Replay the changes still retained instead of
+            starting at the current head
+
+    Returns:
+        int: The consumer's checkpoint
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        position = 0 if from_start else head_sequence(cursor)
+        cursor.execute("""
+            INSERT OR IGNORE INTO change_consumers (name, position, registered_at, updated_at)
+            VALUES (?, ?, ?, ?)
+        """, (name, position, _now(), _now()))
+        conn.commit()
+        cursor.execute("SELECT position FROM change_consumers WHERE name = ?", (name,))
+        return cursor.fetchone()[0]
+    finally:
+        conn.close()
+
+
+def unregister_consumer(name):
+    """Drop a consumer so it no longer holds back pruning."""
+    conn = get_db_connection()
+    conn.execute("DELETE FROM change_consumers WHERE name = ?", (name,))
+    conn.commit()
+    conn.close()
+    prune_changes()
+
+
+def read_changes(name, limit=BATCH_SIZE, tables=None):
+    """
+    Changes after the consumer's checkpoint, oldest first.
+
+    Reading does not move the checkpoint; call :func:`checkpoint` with the
+    last ``seq`` once the batch has been handled, so a crash replays it.
+
+    Args:
+        name (str): Registered consumer
+        limit (int): Maximum rows
+        tables (list): Subset of CAPTURED_TABLES (None = all)
+
+    Returns:
+        list: sqlite3.Row items (seq, table_name, row_id, op, changed_at)
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT position FROM change_consumers WHERE name = ?", (name,))
+        row = cursor.fetchone()
+        if row is None:
+            raise ValueError(f"Unknown change consumer: {name}")
+
+        query = "SELECT seq, table_name, row_id, op, changed_at FROM change_log WHERE seq > ?"
+        params = [row[0]]
+        if tables:
+            query += f" AND table_name IN ({','.join('?' * len(tables))})"
+            params.extend(tables)
+        cursor.execute(query + " ORDER BY seq LIMIT ?", params + [limit])
+        return cursor.fetchall()
+    finally:
+        conn.close()
+
+
+def checkpoint(name, seq):
+    """
+    Record that ``name`` has handled every change up to ``seq`` and prune
+    what all consumers have passed. Checkpoints never move backwards.
+
+    Returns:
+        bool: False when the consumer is not registered
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        UPDATE change_consumers SET position = MAX(position, ?), updated_at = ?
+        WHERE name = ?
+    """, (seq, _now(), name))
+    updated = cursor.rowcount == 1
+    conn.commit()
+    conn.close()
+    if updated:
+        prune_changes()
+    return updated
+
+
+def changed_ids(changes):
+    """
+    Collapse a batch to the latest operation per row.
+
+    Returns:
+        dict: {(table_name, row_id): op}, where 'D' means the row is gone
+    """
+    latest = {}
+    for change in changes:
+        latest[(change['table_name'], change['row_id'])] = change['op']
+    return latest
+
+
+def prune_changes():
+    """
+    Delete changes every registered consumer has passed. With no consumers
+    registered nothing needs the history, so the whole log is cleared.
+
+    Returns:
+        int: Rows deleted
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT MIN(position) FROM change_consumers")
+    low = cursor.fetchone()[0]
+    if low is None:
+        cursor.execute("DELETE FROM change_log")
+    else:
+        cursor.execute("DELETE FROM change_log WHERE seq <= ?", (low,))
+    deleted = cursor.rowcount
+    conn.commit()
+    conn.close()
+    return deleted
+
+
+def list_consumers():
+    """Consumers with their checkpoint and backlog (changes not yet read)."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT c.name, c.position, c.updated_at,
+               (SELECT COUNT(*) FROM change_log WHERE seq > c.position) AS backlog
+        FROM change_consumers c
+        ORDER BY c.name
+    """)
+    rows = cursor.fetchall()
+    conn.close()
+    return rows
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    command = args[0] if args else "list"
+
+    if command == "list":
+        for consumer in list_consumers():
+            print(f"{consumer['name']:<24} at {consumer['position']:>8}  backlog {consumer['backlog']:>6}  (updated {consumer['updated_at']})")
+    elif command == "prune":
+        print(f"✅ Pruned {prune_changes()} change rows")
+    else:
+        print(__doc__)
+        sys.exit(1)
@@ -0,0 +1,182 @@
+"""Dashboard figures for the admin, pharmacist and staff home pages.
+
+Each function runs on the caller's cursor and returns a dict keyed by the
+names the dashboard view uses.
+"""
+
+from services.reorder import count_reorder_queue
+
+
+def get_admin_dashboard(cursor):
+    """
+    System overview counts and recent activity.
+
+    Returns:
+        dict: total_users, total_patients, total_pharmacists, total_medicines,
+        low_stock_count, out_of_stock, pending_prescriptions, pending_orders,
+        recent_users, recent_prescriptions, recent_orders
+    """
+    data = {}
+
+    # User metrics
+    cursor.execute("SELECT COUNT(*) FROM users")
+    data['total_users'] = cursor.fetchone()[0]
+
+    cursor.execute("SELECT COUNT(*) FROM users WHERE role = 'Patient'")
+    data['total_patients'] = cursor.fetchone()[0]
+
+    cursor.execute("SELECT COUNT(*) FROM users WHERE role = 'Pharmacist'")
+    data['total_pharmacists'] = cursor.fetchone()[0]
+
+    # Inventory metrics
+    cursor.execute("SELECT COUNT(*) FROM medicines")
+    data['total_medicines'] = cursor.fetchone()[0]
+
+    data['low_stock_count'], data['out_of_stock'] = count_reorder_queue(cursor)
+
+    # Clinical metrics
+    cursor.execute("SELECT COUNT(*) FROM prescriptions WHERE status = 'Pending'")
+    data['pending_prescriptions'] = cursor.fetchone()[0]
+
+    # Sales metrics
+    cursor.execute("SELECT COUNT(*) FROM orders WHERE status IN ('Pending', 'Processing')")
+    data['pending_orders'] = cursor.fetchone()[0]
+
+    # Recent user registrations
+    cursor.execute("""
+        SELECT username, role, created_at
+        FROM users
+        ORDER BY created_at DESC
+        LIMIT 5
+    """)
+    data['recent_users'] = cursor.fetchall()
+
+    # Recent prescription updates
+    cursor.execute("""
+        SELECT p.id, p.status, p.created_at, u.username
+        FROM prescriptions p
+        JOIN users u ON p.patient_id = u.id
+        ORDER BY p.created_at DESC
+        LIMIT 3
+    """)
+    data['recent_prescriptions'] = cursor.fetchall()
+
+    # Recent order activity
+    cursor.execute("""
+        SELECT o.id, o.status, o.order_date, u.username
+        FROM orders o
+        JOIN users u ON o.patient_id = u.id
+        ORDER BY o.order_date DESC
+        LIMIT 3
+    """)
+    data['recent_orders'] = cursor.fetchall()
+
+    return data
+
+
+def get_pharmacist_dashboard(cursor, user_id):
+    """
+    Review workload, stock alerts and the pharmacist's own recent activity.
+
+    Returns:
+        dict: pending_rx, approved_rx, total_patients, medicines_available,
+        pending_prescriptions, recent_activities, low_stock_medicines
+    """
+    data = {}
+
+    # Metric: Pending Prescriptions
+    cursor.execute("SELECT COUNT(*) FROM prescriptions WHERE status = 'Pending'")
+    result = cursor.fetchone()
+    data['pending_rx'] = result[0] if result else 0
+
+    # Metric: Today's Approved Prescriptions
+    cursor.execute("""
+        SELECT COUNT(*) FROM prescriptions
+        WHERE status = 'Approved'
+        AND DATE(reviewed_date) = DATE('now')
+    """)
+    result = cursor.fetchone()
+    data['approved_rx'] = result[0] if result else 0
+
+    # Metric: Total Patient Count
+    cursor.execute("SELECT COUNT(*) FROM users WHERE role = 'Patient'")
+    result = cursor.fetchone()
+    data['total_patients'] = result[0] if result else 0
+
+    # Metric: Valid Inventory Items
+    cursor.execute("SELECT COUNT(*) FROM medicines WHERE stock > 0")
+    result = cursor.fetchone()
+    data['medicines_available'] = result[0] if result else 0
+
+    # Pending prescription details
+    cursor.execute("""
+        SELECT p.id, p.created_at, p.status,
+               u.full_name as patient_name,
+               m.name as medicine_name
+        FROM prescriptions p
+        LEFT JOIN users u ON p.patient_id = u.id
+        LEFT JOIN medicines m ON p.medicine_id = m.id
+        WHERE p.status = 'Pending'
+        ORDER BY p.created_at DESC
+        LIMIT 5
+    """)
+    data['pending_prescriptions'] = cursor.fetchall()
+
+    # Recent activity history
+    cursor.execute("""
+        SELECT action, details, timestamp
+        FROM activity_log
+        WHERE user_id = ?
+        ORDER BY timestamp DESC
+        LIMIT 5
+    """, (user_id,))
+    data['recent_activities'] = cursor.fetchall()
+
+    # Inventory shortage alerts (read from the reorder queue, no catalog scan)
+    cursor.execute("""
+        SELECT m.name, m.stock
+        FROM reorder_queue q
+        JOIN medicines m ON m.id = q.medicine_id
+        ORDER BY m.stock ASC
+        LIMIT 15
+    """)
+    data['low_stock_medicines'] = cursor.fetchall()
+
+    return data
+
+
+def get_staff_dashboard(cursor):
+    """
+    Patient counts and the newest registrations.
+
+    Returns:
+        dict: total_patients, new_today, active_prescriptions, recent_patients
+    """
+    data = {}
+
+    # Aggregate patient total
+    cursor.execute("SELECT COUNT(*) FROM users WHERE role = 'Patient'")
+    data['total_patients'] = cursor.fetchone()[0]
+
+    # Current day new user metrics
+    cursor.execute("""
+        SELECT COUNT(*) FROM users
+        WHERE role = 'Patient' AND DATE(created_at) = DATE('now')
+    """)
+    data['new_today'] = cursor.fetchone()[0]
+
+    # Pending prescription volume
+    cursor.execute("SELECT COUNT(*) FROM prescriptions WHERE status = 'Pending'")
+    data['active_prescriptions'] = cursor.fetchone()[0]
+
+    # Most recent user records
+    cursor.execute("""
+        SELECT id, full_name, phone, email, created_at
+        FROM users
+        WHERE role = 'Patient'
+        ORDER BY created_at DESC
+        LIMIT 5
+    """)
+    data['recent_patients'] = cursor.fetchall()
+
+    return data
@@ -1,5 +1,6 @@
 import sqlite3
 import os
+import time
 
 # Resolve absolute path for database persistence
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -11,17 +12,76 @@ if not os.path.exists(DB_PATH):
 
 DB_FILE = os.path.join(DB_PATH, "pharmacy.db")
 
+# Callables run on every new connection (instrumentation such as the query benchmark)
+_connect_hooks = []
+
+def add_connect_hook(hook):
+    """Register ``hook(conn)`` to run on each connection opened from now on."""
+    if hook not in _connect_hooks:
+        _connect_hooks.append(hook)
+
+def remove_connect_hook(hook):
+    if hook in _connect_hooks:
+        _connect_hooks.remove(hook)
+
+def apply_connect_hooks(conn):
+    for hook in list(_connect_hooks):
+        hook(conn)
+    return conn
+
+# Callables told how long each commit took (e.g. the backup's writer-wait report)
+_commit_observers = []
+
+def add_commit_observer(observer):
+    """Register ``observer(seconds)`` to be called after every commit in this process."""
+    if observer not in _commit_observers:
+        _commit_observers.append(observer)
+
+def remove_commit_observer(observer):
+    if observer in _commit_observers:
+        _commit_observers.remove(observer)
+
+class Connection(sqlite3.Connection):
+    """Default connection class; times commits while a commit observer is registered."""
+
+    def commit(self):
+        if not _commit_observers:
+            return super().commit()
+        started = time.perf_counter()
+        try:
+            return super().commit()
+        finally:
+            elapsed = time.perf_counter() - started
+            for observer in list(_commit_observers):
+                observer(elapsed)
+
+# Connection class for new connections (the query profiler swaps in a timing subclass)
+_connection_factory = Connection
+
+def set_connection_factory(factory):
+    """Use ``factory`` (a database.Connection subclass) for new connections; None restores the default."""
+    global _connection_factory
+    _connection_factory = factory or Connection
+
+def connect(database, **kwargs):
+    return sqlite3.connect(database, factory=_connection_factory, **kwargs)
+
 # Initialize SQLite database connection
 def get_db_connection():
-    conn = sqlite3.connect(DB_FILE, check_same_thread=False)
+    conn = connect(DB_FILE, check_same_thread=False)
     conn.row_factory = sqlite3.Row
-    return conn
+    return apply_connect_hooks(conn)
 
 # Execute database schema migration
 def init_db():
     conn = get_db_connection()
     cursor = conn.cursor()
 
+    # Free pages can be reclaimed incrementally (only takes effect on a new, empty file)
+    cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    # Readers (backups, the analytics snapshot, reports) never block writers in WAL mode
+    cursor.execute("PRAGMA journal_mode = WAL")
+
     # Schema: Users
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS users (
@@ -102,6 +162,60 @@ def init_db():
         )
     ''')
 
+    # Schema: Row versions and allowed status transitions
+    from services.versioning import init_versioning_schema
+    init_versioning_schema(cursor)
+
+    # Schema: Prescription review claims (lease queue)
+    from services.review_queue import init_review_queue_schema
+    init_review_queue_schema(cursor)
+
+    # Schema: Stock movement ledger and periodic snapshots
+    from services.stock_ledger import init_ledger_schema, backfill_opening_balances
+    init_ledger_schema(cursor)
+    backfill_opening_balances(cursor)
+
+    # Schema: Medicine lots (FEFO allocation and expiry sweeps)
+    from services.lots import init_lot_schema, backfill_legacy_lots
+    init_lot_schema(cursor)
+    backfill_legacy_lots(cursor)
+
+    # Schema: Per-SKU reorder levels and the trigger-fed low-stock queue
+    from services.reorder import init_reorder_schema
+    init_reorder_schema(cursor)
+
+    # Index: Bulk import upsert key
+    from services.importer import init_import_schema
+    init_import_schema(cursor)
+
+    # Schema: Unified audit event stream (trigger-fed from domain tables)
+    from services.audit import init_audit_schema
+    init_audit_schema(cursor)
+
+    # Schema: Full-text search index over logs and notes
+    from services.search import init_search_schema
+    init_search_schema(cursor)
+
+    # Schema: Monthly activity_log archive catalog
+    from services.log_archive import init_archive_schema
+    init_archive_schema(cursor)
+
+    # Schema: Change data capture log and consumer checkpoints
+    from services.change_capture import init_change_capture_schema
+    init_change_capture_schema(cursor)
+
+    # Schema: Background job leases and run history
+    from services.scheduler import init_scheduler_schema
+    init_scheduler_schema(cursor)
+
+    # Schema: Per-SKU demand forecast cache
+    from services.forecasting import init_forecast_schema
+    init_forecast_schema(cursor)
+
+    # Schema: Analytics snapshot refresh lease
+    from services.analytics_snapshot import init_snapshot_schema
+    init_snapshot_schema(cursor)
+
     # Provision default system accounts
     cursor.execute("SELECT * FROM users WHERE username = 'admin'")
     if not cursor.fetchone():
@@ -17,7 +17,15 @@ parent_dir = os.path.dirname(current_dir)
 sys.path.append(parent_dir)
 # -------------------------------------------------------------------------------
 
+from services import database
 from services.database import init_db
+from services.stock_ledger import backfill_opening_balances
+from services.lots import backfill_legacy_lots
+from services.reorder import count_reorder_queue
+from services.audit import init_audit_schema
+from services.search import init_search_schema
+from services.versioning import init_versioning_schema
+from services.change_capture import init_change_capture_schema
 
 def run_migration_and_seed():
     """Add all necessary fields, tables, AND seed data to existing database."""
@@ -26,12 +34,8 @@ def run_migration_and_seed():
     print("🔄 Initializing base database structures...")
     init_db()
     
-    # Get the correct path to your database
-    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    DB_PATH = os.path.join(BASE_DIR, 'storage')
-    DB_FILE = os.path.join(DB_PATH, "pharmacy.db")
-    
-    conn = sqlite3.connect(DB_FILE)
+    # Same file init_db() just prepared (storage/pharmacy.db unless redirected)
+    conn = sqlite3.connect(database.DB_FILE)
     cursor = conn.cursor()
     
     try:
@@ -392,6 +396,12 @@ def run_migration_and_seed():
             """, meds)
             
             print("✅ Success! 54 Medicines added.")
+            
+            # Seeded stock enters the ledger as opening receipts
+            backfill_opening_balances(cursor)
+            print("✅ Opening stock balances recorded in the stock ledger")
+            backfill_legacy_lots(cursor)
+            print("✅ Opening lots created for seeded medicines")
 
         # ============================================
         # PART 5: DATABASE INDEXES (Performance)
@@ -399,16 +409,23 @@ def run_migration_and_seed():
         print("\n📋 Part 5: Database Indexes")
         print("-" * 50)
         
+        # Composite indexes serve "per patient/user/invoice, newest first" lookups
+        # without a sort (see services/index_advisor.py); they replace the
+        # single-column indexes on the same leading column
+        for superseded in ('idx_activity_user', 'idx_prescriptions_patient', 'idx_orders_patient', 'idx_payments_invoice'):
+            cursor.execute(f"DROP INDEX IF EXISTS {superseded}")
+
         # Activity log indexes
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_activity_user ON activity_log(user_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_activity_user_timestamp ON activity_log(user_id, timestamp)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_activity_timestamp ON activity_log(timestamp)")
         
         # Prescription indexes
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_prescriptions_status ON prescriptions(status)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_prescriptions_patient ON prescriptions(patient_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_prescriptions_patient_created ON prescriptions(patient_id, created_at)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_prescriptions_patient_medicine ON prescriptions(patient_id, medicine_id, status, reviewed_date)")
         
         # Order indexes
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_patient ON orders(patient_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_patient_date ON orders(patient_id, order_date)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_status ON orders(status)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_order_items_order ON order_items(order_id)")
         
@@ -416,10 +433,20 @@ def run_migration_and_seed():
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_invoices_patient ON invoices(patient_id)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_invoices_status ON invoices(status)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_invoices_number ON invoices(invoice_number)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_payments_invoice ON payments(invoice_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_payments_invoice_date ON payments(invoice_id, payment_date)")
         
         print("✅ All database indexes created")
 
+        # Orders and activity_log exist now, so attach their audit feeds
+        init_audit_schema(cursor)
+        print("✅ Audit event stream connected to all domain tables")
+        init_search_schema(cursor)
+        print("✅ Full-text search index covers logs and order notes")
+        init_versioning_schema(cursor)
+        print("✅ Row versioning enabled on orders, invoices and prescriptions")
+        init_change_capture_schema(cursor)
+        print("✅ Change capture enabled on medicines, orders, invoices, payments and prescriptions")
+
         # ============================================
         # PART 6: SAMPLE TRANSACTIONS (Prescriptions/Orders)
         # ============================================
@@ -755,8 +782,9 @@ def run_migration_and_seed():
         # 7.5: Add Low Stock Alerts Activity
         print("📝 Adding low stock alerts to activity log...")
         cursor.execute("""
-            SELECT name, stock FROM medicines 
-            WHERE stock < 10 AND stock > 0
+            SELECT m.name, m.stock FROM reorder_queue q
+            JOIN medicines m ON m.id = q.medicine_id
+            WHERE m.stock > 0
         """)
         low_stock_meds = cursor.fetchall()
         
@@ -808,10 +836,7 @@ def run_migration_and_seed():
         # Count statistics
         cursor.execute("SELECT COUNT(*) FROM medicines")
         med_count = cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(*) FROM medicines WHERE stock < 10")
-        low_stock_count = cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(*) FROM medicines WHERE stock = 0")
-        out_stock_count = cursor.fetchone()[0]
+        low_stock_count, out_stock_count = count_reorder_queue(cursor)
         cursor.execute("SELECT COUNT(*) FROM prescriptions")
         rx_count = cursor.fetchone()[0]
         cursor.execute("SELECT COUNT(*) FROM orders")
@@ -0,0 +1,396 @@
+"""Streaming bulk importer for supplier price lists (CSV or XLSX).
+
+Files are read one row at a time (``csv`` reader or openpyxl in read-only
+mode), validated, and upserted by (supplier, name) in fixed-size chunks. Each
+chunk is a single transaction, so memory stays bounded by the chunk size no
+matter how large the file is.
+
+Stock counts are applied like a manual edit in ManageStock: an increase is
+received as a new lot, a decrease is booked in the stock ledger and drawn
+from the oldest lots, so lot quantities stay in step with ``medicines.stock``.
+
+The web UI only imports files from ``IMPORT_DIR`` (``storage/imports``), see
+:func:`resolve_import_path`.
+
+Usage:
+    python src/services/importer.py pricelist.csv [--supplier NAME]
+    python src/services/importer.py --benchmark [ROWS]
+"""
+
+import csv
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, date
+
+# Allow running this file directly from the services folder
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from services import database
+from services.database import get_db_connection
+from services.stock_ledger import backfill_opening_balances, set_stock
+from services.lots import allocate_fefo, receive_lot
+
+# Rows written per transaction
+CHUNK_SIZE = 1000
+
+# The only folder the web UI may import from
+IMPORT_DIR = os.path.join(database.DB_PATH, 'imports')
+IMPORT_EXTENSIONS = ('.csv', '.xlsx', '.xlsm')
+
+# Rejects kept in memory for the result (all of them are counted and,
+# when a rejects file is given, written out)
+MAX_REPORTED_REJECTS = 200
+
+# Accepted header spellings for each medicines column
+COLUMN_ALIASES = {
+    'name': ('name', 'medicine', 'medicine name', 'product', 'product name', 'item'),
+    'category': ('category', 'type', 'class'),
+    'price': ('price', 'unit price', 'unit_price', 'srp'),
+    'stock': ('stock', 'qty', 'quantity', 'on hand'),
+    'expiry_date': ('expiry_date', 'expiry', 'expiry date', 'exp', 'expiration'),
+    'supplier': ('supplier', 'vendor', 'manufacturer'),
+}
+
+
+def _map_header(header):
+    """Map raw header cells to column names. Returns {column: index}."""
+    lookup = {alias: column for column, aliases in COLUMN_ALIASES.items() for alias in aliases}
+    mapping = {}
+    for index, cell in enumerate(header):
+        key = str(cell or "").strip().lower()
+        if key in lookup and lookup[key] not in mapping:
+            mapping[lookup[key]] = index
+    if 'name' not in mapping or 'price' not in mapping:
+        raise ValueError("File must have at least 'name' and 'price' columns")
+    return mapping
+
+
+def _iter_csv(path):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        yield 1, header
+        for row in reader:
+            if any(cell.strip() for cell in row):
+                yield reader.line_num, row
+
+
+def _iter_xlsx(path):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportError("Reading .xlsx files requires openpyxl (pip install openpyxl)")
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.active
+        for line_number, row in enumerate(sheet.iter_rows(values_only=True), start=1):
+            if line_number == 1 or any(cell not in (None, "") for cell in row):
+                yield line_number, row
+    finally:
+        workbook.close()
+
+
+def iter_rows(path):
+    """
+    Stream (line_number, cells) pairs from a CSV or XLSX file.
+
+    The first pair is the header row. Blank rows are skipped but keep their
+    line numbers so rejects point at the right place in the source file.
+    """
+    if path.lower().endswith(('.xlsx', '.xlsm')):
+        return _iter_xlsx(path)
+    return _iter_csv(path)
+
+
+def list_import_files():
+    """Names of the price lists waiting in IMPORT_DIR, newest first."""
+    os.makedirs(IMPORT_DIR, exist_ok=True)
+    names = [name for name in os.listdir(IMPORT_DIR)
+             if name.lower().endswith(IMPORT_EXTENSIONS) and os.path.isfile(os.path.join(IMPORT_DIR, name))]
+    return sorted(names, key=lambda name: os.path.getmtime(os.path.join(IMPORT_DIR, name)), reverse=True)
+
+
+def resolve_import_path(name):
+    """
+    Path of a file inside IMPORT_DIR, for imports started from the UI.
+
+    Raises:
+        ValueError: When the name points outside IMPORT_DIR, has an unsupported
+        extension or does not exist
+    """
+    root = os.path.realpath(IMPORT_DIR)
+    path = os.path.realpath(os.path.join(root, os.path.basename(name or "")))
+    if os.path.dirname(path) != root or not path.lower().endswith(IMPORT_EXTENSIONS):
+        raise ValueError("Choose a .csv or .xlsx file from the import folder")
+    if not os.path.isfile(path):
+        raise ValueError(f"{os.path.basename(path)} is no longer in the import folder")
+    return path
+
+
+def _cell(row, mapping, column):
+    index = mapping.get(column)
+    if index is None or index >= len(row):
+        return None
+    value = row[index]
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    return value
+
+
+def validate_row(row, mapping, default_supplier=None):
+    """
+    Validate one data row.
+
+    Returns:
+        tuple: (name, category, price, stock or None, expiry_date or None, supplier)
+
+    Raises:
+        ValueError: With a human readable reason when the row is rejected
+    """
+    name = _cell(row, mapping, 'name')
+    if not name:
+        raise ValueError("Missing medicine name")
+    name = str(name)
+
+    supplier = _cell(row, mapping, 'supplier') or default_supplier
+    if not supplier:
+        raise ValueError("Missing supplier")
+
+    price = _cell(row, mapping, 'price')
+    try:
+        price = float(str(price).replace(',', '').replace('₱', ''))
+    except (TypeError, ValueError):
+        raise ValueError("Invalid price")
+    if price < 0:
+        raise ValueError(f"Negative price: {price}")
+
+    stock = _cell(row, mapping, 'stock')
+    if stock is not None:
+        try:
+            stock = int(float(stock))
+        except (TypeError, ValueError):
+            raise ValueError("Invalid stock")
+        if stock < 0:
+            raise ValueError(f"Negative stock: {stock}")
+
+    expiry = _cell(row, mapping, 'expiry_date')
+    if isinstance(expiry, (datetime, date)):
+        expiry = expiry.strftime("%Y-%m-%d")
+    elif expiry is not None:
+        try:
+            expiry = date.fromisoformat(str(expiry)[:10]).isoformat()
+        except ValueError:
+            raise ValueError("Invalid expiry date (use YYYY-MM-DD)")
+
+    category = _cell(row, mapping, 'category')
+    return name, str(category) if category else None, price, stock, expiry, str(supplier)
+
+
+def init_import_schema(cursor):
+    """Index the (supplier, name) upsert key used by the importer."""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_medicines_supplier_name ON medicines(supplier, name)")
+
+
+def _apply_stock(cursor, medicine_id, current, stock, expiry, supplier, reference, user_id):
+    """Move one SKU to the file's stock count the way ManageStock does."""
+    delta = stock - current
+    if delta > 0:
+        # More on hand than recorded arrives as a new lot
+        receive_lot(cursor, medicine_id, delta, expiry, supplier=supplier, user_id=user_id)
+    elif delta < 0:
+        # A lower count consumes the oldest lots first
+        set_stock(cursor, medicine_id, stock, reference, user_id)
+        allocate_fefo(cursor, medicine_id, -delta)
+
+
+def _write_chunk(cursor, chunk, reference, user_id):
+    """
+    Upsert one chunk inside the caller's transaction.
+
+    Prices and descriptive columns are written in bulk; stock counts go
+    through the lots and the ledger per SKU, so lot quantities keep matching
+    ``medicines.stock``.
+
+    Returns:
+        tuple: (rows updated, rows inserted)
+    """
+    cursor.executemany("""
+        UPDATE medicines
+        SET category = COALESCE(?, category), price = ?, expiry_date = COALESCE(?, expiry_date)
+        WHERE supplier = ? AND name = ?
+    """, [
+        (category, price, expiry, supplier, name)
+        for name, category, price, stock, expiry, supplier in chunk
+    ])
+    updated = cursor.rowcount
+
+    # New SKUs start empty; their stock arrives as a lot below
+    cursor.executemany("""
+        INSERT INTO medicines (name, category, price, stock, expiry_date, supplier)
+        SELECT ?, ?, ?, 0, ?, ?
+        WHERE NOT EXISTS (SELECT 1 FROM medicines WHERE supplier = ? AND name = ?)
+    """, [
+        (name, category, price, expiry, supplier, supplier, name)
+        for name, category, price, stock, expiry, supplier in chunk
+    ])
+    inserted = cursor.rowcount
+
+    for name, category, price, stock, expiry, supplier in chunk:
+        if stock is None:
+            continue
+        cursor.execute("SELECT id, COALESCE(stock, 0) FROM medicines WHERE supplier = ? AND name = ?",
+                       (supplier, name))
+        medicine_id, current = cursor.fetchone()
+        _apply_stock(cursor, medicine_id, current, stock, expiry, supplier, reference, user_id)
+
+    return updated, inserted
+
+
+def import_medicines(path, default_supplier=None, user_id=None, chunk_size=CHUNK_SIZE,
+                     rejects_path=None):
+    """
+    Stream a CSV/XLSX price list into the medicines catalog.
+
+    Args:
+        path (str): Source .csv or .xlsx file
+        default_supplier (str): Supplier used for rows without one
+        user_id (int): User running the import (recorded on ledger rows)
+        chunk_size (int): Rows per transaction
+        rejects_path (str): Optional CSV file receiving every rejected row
+
+    Returns:
+        dict: rows_read, inserted, updated, rejected, rejects (first
+              MAX_REPORTED_REJECTS as (line, reason)), seconds, rows_per_sec
+    """
+    started = time.perf_counter()
+    reference = f"import:{os.path.basename(path)}"
+    result = {'rows_read': 0, 'inserted': 0, 'updated': 0, 'rejected': 0, 'rejects': []}
+
+    rows = iter_rows(path)
+    first = next(rows, None)
+    if first is None:
+        raise ValueError("File is empty")
+    mapping = _map_header(first[1])
+
+    rejects_file = open(rejects_path, 'w', newline='', encoding='utf-8') if rejects_path else None
+    rejects_writer = csv.writer(rejects_file) if rejects_file else None
+    if rejects_writer:
+        rejects_writer.writerow(['line', 'reason'])
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        init_import_schema(cursor)
+        conn.commit()
+
+        chunk = {}
+        for line_number, row in rows:
+            result['rows_read'] += 1
+            try:
+                record = validate_row(row, mapping, default_supplier)
+            except ValueError as ex:
+                result['rejected'] += 1
+                if len(result['rejects']) < MAX_REPORTED_REJECTS:
+                    result['rejects'].append((line_number, str(ex)))
+                if rejects_writer:
+                    rejects_writer.writerow([line_number, str(ex)])
+                continue
+
+            # Later rows for the same SKU win within a chunk
+            chunk[(record[5], record[0])] = record
+            if len(chunk) >= chunk_size:
+                updated, inserted = _write_chunk(cursor, list(chunk.values()), reference, user_id)
+                conn.commit()
+                result['updated'] += updated
+                result['inserted'] += inserted
+                chunk.clear()
+
+        if chunk:
+            updated, inserted = _write_chunk(cursor, list(chunk.values()), reference, user_id)
+            result['updated'] += updated
+            result['inserted'] += inserted
+
+        # New SKUs imported without stock still get their opening ledger row
+        backfill_opening_balances(cursor)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+        if rejects_file:
+            rejects_file.close()
+
+    result['seconds'] = time.perf_counter() - started
+    result['rows_per_sec'] = result['rows_read'] / result['seconds'] if result['seconds'] else 0.0
+    return result
+
+
+def run_benchmark(rows=20000, chunk_size=CHUNK_SIZE):
+    """
+    Measure import throughput against a scratch database.
+
+    Generates a synthetic price list with ~1% bad rows, imports it once
+    (all inserts) and again (all updates), and reports rows per second.
+    """
+    import random
+
+    scratch = tempfile.mkdtemp(prefix="pms_import_bench_")
+    csv_path = os.path.join(scratch, "pricelist.csv")
+    original_db = database.DB_FILE
+    database.DB_FILE = os.path.join(scratch, "bench.db")
+    try:
+        database.init_db()
+
+        categories = ['Pain Relief', 'Antibiotics', 'Vitamins', 'Cold & Flu', 'Digestive']
+        with open(csv_path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['name', 'category', 'price', 'stock', 'expiry_date', 'supplier'])
+            for i in range(rows):
+                price = "n/a" if i % 100 == 99 else f"{random.uniform(5, 500):.2f}"
+                writer.writerow([
+                    f"Medicine {i:06d}", random.choice(categories), price,
+                    random.randint(0, 500), f"202{random.randint(6, 9)}-{random.randint(1, 12):02d}-15",
+                    f"Supplier {i % 25:02d}",
+                ])
+
+        print(f"Benchmark: {rows} rows, chunk size {chunk_size}")
+        for label in ("insert pass", "update pass"):
+            result = import_medicines(csv_path, chunk_size=chunk_size)
+            print(f"  {label:12s} {result['rows_per_sec']:>10,.0f} rows/sec  "
+                  f"({result['inserted']} inserted, {result['updated']} updated, "
+                  f"{result['rejected']} rejected, {result['seconds']:.2f}s)")
+    finally:
+        database.DB_FILE = original_db
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if not args:
+        print(__doc__)
+        sys.exit(1)
+
+    if args[0] == "--benchmark":
+        run_benchmark(int(args[1]) if len(args) > 1 else 20000)
+        sys.exit(0)
+
+    supplier = None
+    if "--supplier" in args:
+        supplier = args[args.index("--supplier") + 1]
+
+    summary = import_medicines(args[0], default_supplier=supplier)
+    print(f"Read {summary['rows_read']} rows: {summary['inserted']} inserted, "
+          f"{summary['updated']} updated, {summary['rejected']} rejected "
+          f"({summary['rows_per_sec']:,.0f} rows/sec)")
+    for line_number, reason in summary['rejects']:
+        print(f"  line {line_number}: {reason}")
+    sys.exit(1 if summary['rejected'] else 0)
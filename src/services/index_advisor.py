@@ -0,0 +1,515 @@
+"""Index advisor and query-plan regression check.
+
+Collects the statements the app actually runs, from two sources:
+
+    runtime   every SELECT/UPDATE/DELETE issued by the query benchmark cases
+              (the same service calls the views make), captured with their
+              real parameter values
+    static    SQL string literals in views/, components/ and services/;
+              placeholders are bound to NULL, and fragments that only make
+              sense once concatenated are skipped
+
+Statements are grouped by shape and explained (``EXPLAIN QUERY PLAN``)
+against a synthetic dataset from :mod:`services.query_benchmark`. A plan
+has a problem when it fully scans a table with at least ``MIN_SCAN_ROWS``
+rows, builds an automatic index, or sorts in a temp B-tree. For each
+problem the advisor derives candidate composite indexes from the
+statement's equality, range and ORDER BY columns (plus a covering variant
+when the selected columns fit), creates each one inside a savepoint,
+re-explains, and keeps the smallest candidate that removes the problem.
+
+``check`` fails (exit status 1) when one of ``KNOWN_QUERIES`` is not
+served by an index, or when a statement shape that avoided a full scan in
+the saved plan baseline scans now.
+``tests/test_query_plans.py`` runs the ``KNOWN_QUERIES`` half under
+pytest against a small seeded dataset.
+
+Usage:
+    python src/services/index_advisor.py advise [--preset small] [--seed N] [--regenerate]
+    python src/services/index_advisor.py check [--preset small] [--seed N] [--baseline FILE]
+        [--save-baseline] [--regenerate]
+"""
+
+import ast
+import json
+import os
+import re
+import sqlite3
+import sys
+from datetime import datetime
+
+# Allow running this file directly from the services folder
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from services import database
+from services.query_profiler import statement_shape
+
+SRC_DIR = parent_dir
+SCAN_DIRS = ('views', 'components', 'services')
+DEFAULT_PRESET = 'small'
+DEFAULT_BASELINE = os.path.join(database.DB_PATH, 'bench', 'plans.json')
+
+# Scans of smaller tables are cheap and not reported
+MIN_SCAN_ROWS = 1000
+
+# One-off migration and data generation statements are not hot paths
+SKIP_FILES = ('db_migration.py', 'synthetic_data.py', 'index_advisor.py')
+MAX_INDEX_COLUMNS = 5
+
+# Hot queries that must be answered from an index without a sort
+KNOWN_QUERIES = (
+    ("patient order history",
+     "SELECT * FROM orders WHERE patient_id = ? ORDER BY order_date DESC"),
+    ("approved prescription for a cart line",
+     "SELECT id, pharmacist_id, reviewed_date FROM prescriptions "
+     "WHERE patient_id = ? AND medicine_id = ? AND status = 'Approved' ORDER BY reviewed_date DESC LIMIT 1"),
+    ("patient prescriptions",
+     "SELECT * FROM prescriptions WHERE patient_id = ? ORDER BY created_at DESC"),
+    ("order lines",
+     "SELECT * FROM order_items WHERE order_id = ?"),
+    ("invoice payments",
+     "SELECT * FROM payments WHERE invoice_id = ? ORDER BY payment_date DESC"),
+    ("user activity",
+     "SELECT action, details, timestamp FROM activity_log WHERE user_id = ? ORDER BY timestamp DESC LIMIT 5"),
+)
+
+_STATEMENT_HEADS = ("SELECT", "WITH", "UPDATE", "DELETE")
+
+_KEYWORDS = {
+    'WHERE', 'ON', 'JOIN', 'LEFT', 'RIGHT', 'INNER', 'OUTER', 'CROSS', 'NATURAL', 'USING',
+    'GROUP', 'ORDER', 'LIMIT', 'HAVING', 'UNION', 'EXCEPT', 'INTERSECT', 'SET', 'AS', 'WINDOW',
+}
+
+
+# ---------------------------------------------------------------------------
+# Collection
+# ---------------------------------------------------------------------------
+
+def _add(found, sql, source, params=None):
+    shape = statement_shape(sql)
+    entry = found.setdefault(shape, {'sql': sql, 'params': params, 'sources': []})
+    if source not in entry['sources']:
+        entry['sources'].append(source)
+
+
+def collect_runtime(found):
+    """Statements run by the query benchmark cases, with their real values."""
+    from services.query_benchmark import build_cases, _context
+
+    current = [None]
+
+    def on_statement(sql):
+        head = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ""
+        if head in _STATEMENT_HEADS:
+            _add(found, sql, f"case:{current[0]}")
+
+    def hook(conn):
+        conn.set_trace_callback(on_statement)
+
+    database.add_connect_hook(hook)
+    try:
+        for name, fn in build_cases(_context()):
+            current[0] = name
+            fn()
+    finally:
+        database.remove_connect_hook(hook)
+
+
+def collect_static(found, root=SRC_DIR):
+    """SQL string literals in the application source."""
+    for folder in SCAN_DIRS:
+        for dirpath, _, filenames in os.walk(os.path.join(root, folder)):
+            for filename in sorted(filenames):
+                if not filename.endswith(".py") or filename in SKIP_FILES:
+                    continue
+                path = os.path.join(dirpath, filename)
+                with open(path, encoding='utf-8') as f:
+                    try:
+                        tree = ast.parse(f.read(), path)
+                    except SyntaxError:
+                        continue
+                relative = os.path.relpath(path, root).replace(os.sep, "/")
+                for node in ast.walk(tree):
+                    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+                        text = node.value.strip()
+                        head = text.split(None, 1)[0].upper() if text else ""
+                        if head in _STATEMENT_HEADS and " " in text:
+                            _add(found, text, f"{relative}:{node.lineno}")
+
+
+def _null_params(sql):
+    """NULL for every placeholder, positional or named."""
+    bare = re.sub(r"'(?:[^']|'')*'", "''", sql)
+    bare = re.sub(r"--[^\n]*", "", bare)
+    named = re.findall(r"(?<![:\w]):(\w+)", bare)
+    if named:
+        return {name: None for name in named}
+    return (None,) * bare.count("?")
+
+
+# ---------------------------------------------------------------------------
+# Plans
+# ---------------------------------------------------------------------------
+
+def explain(conn, sql, params=None):
+    """Plan detail lines, or None when the statement does not prepare here."""
+    try:
+        rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params if params is not None else _null_params(sql)).fetchall()
+    except (sqlite3.Error, ValueError):
+        return None
+    return [row[3] for row in rows]
+
+
+def _table_rows(conn):
+    tables = [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' AND sql NOT LIKE 'CREATE VIRTUAL%'"
+    )]
+    counts = {}
+    for table in tables:
+        try:
+            counts[table] = conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+        except sqlite3.Error:
+            counts[table] = 0
+    return counts
+
+
+def plan_issues(plan, aliases, table_rows, limited=False):
+    """
+    Problems in one plan.
+
+    Walking a whole index (``SCAN t USING INDEX``) reads as many rows as a
+    table scan, so it counts as one unless the statement has a LIMIT and
+    no sort, where the index order lets it stop early.
+
+    Returns:
+        dict: scans (tables fully scanned), auto_indexes (tables given an
+        automatic index) and temp_sorts (temp B-tree sorts)
+    """
+    issues = {'scans': [], 'auto_indexes': [], 'temp_sorts': 0}
+    index_scans = []
+    for detail in plan:
+        words = detail.split()
+        if "AUTOMATIC" in detail and detail.startswith(("SEARCH ", "SCAN ")):
+            issues['auto_indexes'].append(aliases.get(words[1], words[1]))
+        elif detail.startswith("SCAN ") and "VIRTUAL TABLE" not in detail:
+            table = aliases.get(words[1], words[1])
+            if table_rows.get(table, 0) >= MIN_SCAN_ROWS:
+                (index_scans if " USING " in detail else issues['scans']).append(table)
+        elif detail.startswith("USE TEMP B-TREE"):
+            issues['temp_sorts'] += 1
+    if not (limited and issues['temp_sorts'] == 0):
+        issues['scans'].extend(index_scans)
+    return issues
+
+
+def _limited(sql):
+    return re.search(r"\bLIMIT\b", sql, re.I) is not None
+
+
+def _score(issues):
+    return (len(issues['scans']), len(issues['auto_indexes']), issues['temp_sorts'])
+
+
+# ---------------------------------------------------------------------------
+# Candidate indexes
+# ---------------------------------------------------------------------------
+
+def _aliases(sql):
+    """Alias (or bare table name) -> table for every FROM/JOIN source."""
+    aliases = {}
+    for table, alias in re.findall(r"\b(?:FROM|JOIN|UPDATE)\s+([A-Za-z_]\w*)(?:\s+(?:AS\s+)?([A-Za-z_]\w*))?", sql, re.I):
+        aliases[table] = table
+        if alias and alias.upper() not in _KEYWORDS:
+            aliases[alias] = table
+    return aliases
+
+
+def _columns(conn, table):
+    return [row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')]
+
+
+def _existing_indexes(conn, table):
+    indexes = []
+    for row in conn.execute(f'PRAGMA index_list("{table}")'):
+        indexes.append(tuple(info[2] for info in conn.execute(f'PRAGMA index_info("{row[1]}")')))
+    return indexes
+
+
+def _owner(qualifier, column, table, aliases, columns_of):
+    """True when ``qualifier.column`` (qualifier optional) is a column of ``table``."""
+    if qualifier:
+        return aliases.get(qualifier) == table
+    if column not in columns_of(table):
+        return False
+    # Unqualified names only count when no other table in the statement has them
+    return {name for name in aliases.values() if column in columns_of(name)} == {table}
+
+
+def candidates(conn, sql, table, aliases):
+    """Column lists worth trying for an index on ``table``, best guess first."""
+    cache = {}
+
+    def columns_of(name):
+        if name not in cache:
+            cache[name] = _columns(conn, name)
+        return cache[name]
+
+    ref = r"(?:\b([A-Za-z_]\w*)\.)?\b([A-Za-z_]\w*)"
+    equality, ranges = [], []
+    for qualifier, column, op in re.findall(ref + r"\s*(==|=|\bIN\s*\(|\bIS\b(?!\s+NOT)|>=|<=|>|<|\bBETWEEN\b)", sql, re.I):
+        if not _owner(qualifier, column, table, aliases, columns_of):
+            continue
+        target = ranges if op.strip().upper() in (">=", "<=", ">", "<", "BETWEEN") else equality
+        if column not in target:
+            target.append(column)
+    for qualifier, column in re.findall(r"=\s*" + ref, sql):
+        if _owner(qualifier, column, table, aliases, columns_of) and column not in equality:
+            equality.append(column)
+    ranges = [column for column in ranges if column not in equality]
+
+    order = []
+    match = re.search(r"\bORDER\s+BY\s+(.+?)(?:\bLIMIT\b|\bOFFSET\b|$)", sql, re.I | re.S)
+    if match:
+        for term in match.group(1).split(","):
+            term_match = re.fullmatch(r"\s*" + ref + r"(?:\s+(?:ASC|DESC))?\s*", term, re.I)
+            if not term_match or not _owner(term_match.group(1), term_match.group(2), table, aliases, columns_of):
+                order = []
+                break
+            if term_match.group(2) not in equality:
+                order.append(term_match.group(2))
+
+    # The integer primary key is the rowid, which every index already carries
+    rowid = {row[1] for row in conn.execute(f'PRAGMA table_info("{table}")') if row[5] and row[2].upper() == "INTEGER"}
+    selected = []
+    select = re.match(r"\s*SELECT\s+(?:DISTINCT\s+)?(.+?)\bFROM\b", sql, re.I | re.S)
+    if select and "*" not in select.group(1):
+        for qualifier, column in re.findall(ref, select.group(1)):
+            if _owner(qualifier, column, table, aliases, columns_of) and column not in selected + list(rowid):
+                selected.append(column)
+
+    options = []
+    for columns in (equality + order, equality + ranges[:1], equality, order):
+        if columns and len(columns) <= MAX_INDEX_COLUMNS and columns not in options:
+            options.append(columns)
+    if options and selected:
+        covering = options[0] + [column for column in selected if column not in options[0]]
+        if len(covering) <= MAX_INDEX_COLUMNS and covering not in options:
+            options.append(covering)
+
+    existing = _existing_indexes(conn, table)
+    return [columns for columns in options
+            if not any(tuple(columns) == index[:len(columns)] for index in existing)]
+
+
+def index_name(table, columns):
+    return f"idx_{table}_{'_'.join(columns)}"
+
+
+def index_ddl(table, columns):
+    return f"CREATE INDEX IF NOT EXISTS {index_name(table, columns)} ON {table}({', '.join(columns)})"
+
+
+def _try_index(conn, sql, params, table, columns):
+    """Plan of ``sql`` with the candidate index in place (rolled back afterwards)."""
+    conn.execute("SAVEPOINT index_advisor")
+    try:
+        conn.execute(index_ddl(table, columns))
+        return explain(conn, sql, params)
+    finally:
+        conn.execute("ROLLBACK TO index_advisor")
+        conn.execute("RELEASE index_advisor")
+
+
+# ---------------------------------------------------------------------------
+# Reports
+# ---------------------------------------------------------------------------
+
+def plan_report(statements, conn, table_rows=None):
+    """
+    Explain every collected statement.
+
+    Returns:
+        dict: {shape: {sources, plan, scans, auto_indexes, temp_sorts}};
+        statements that do not prepare against the dataset are left out
+    """
+    table_rows = _table_rows(conn) if table_rows is None else table_rows
+    report = {}
+    for shape, entry in statements.items():
+        plan = explain(conn, entry['sql'], entry['params'])
+        if plan is None:
+            continue
+        report[shape] = {'sources': entry['sources'], 'plan': plan, **plan_issues(plan, _aliases(entry['sql']), table_rows, _limited(entry['sql']))}
+    return report
+
+
+def advise(statements, conn):
+    """
+    Suggested indexes, each verified against the plans it improves.
+
+    Returns:
+        list[dict]: table, columns, ddl, helps (list of {sources, before, after}),
+        most helpful first
+    """
+    table_rows = _table_rows(conn)
+    suggestions = {}
+    for shape, entry in plan_report(statements, conn, table_rows).items():
+        before = _score(entry)
+        if before == (0, 0, 0):
+            continue
+        sql, params = statements[shape]['sql'], statements[shape]['params']
+        aliases = _aliases(sql)
+        best = None
+        for table in sorted(set(aliases.values())):
+            if table_rows.get(table, 0) < MIN_SCAN_ROWS and table not in entry['auto_indexes']:
+                continue
+            for columns in candidates(conn, sql, table, aliases):
+                plan = _try_index(conn, sql, params, table, columns)
+                if plan is None:
+                    continue
+                after = _score(plan_issues(plan, aliases, table_rows, _limited(sql)))
+                if after < before and (best is None or (after, len(columns)) < (best[0], len(best[2]))):
+                    best = (after, table, columns, plan)
+        if best is None:
+            continue
+        _, table, columns, plan = best
+        suggestion = suggestions.setdefault((table, tuple(columns)), {
+            'table': table, 'columns': columns, 'ddl': index_ddl(table, columns), 'helps': [],
+        })
+        suggestion['helps'].append({'sql': re.sub(r"\s+", " ", sql).strip(), 'sources': entry['sources'],
+                                    'before': entry['plan'], 'after': plan})
+
+    # An index whose columns start with a smaller suggestion's columns serves both
+    merged = sorted(suggestions.values(), key=lambda s: len(s['columns']), reverse=True)
+    kept = []
+    for suggestion in merged:
+        wider = next((k for k in kept if k['table'] == suggestion['table']
+                      and k['columns'][:len(suggestion['columns'])] == suggestion['columns']), None)
+        if wider is not None:
+            wider['helps'].extend(suggestion['helps'])
+        else:
+            kept.append(suggestion)
+    kept.sort(key=lambda s: len(s['helps']), reverse=True)
+    return kept
+
+
+def check_known(conn):
+    """``KNOWN_QUERIES`` that scan, build an automatic index or sort: [(name, plan)]."""
+    table_rows = _table_rows(conn)
+    failures = []
+    for name, sql in KNOWN_QUERIES:
+        plan = explain(conn, sql)
+        if plan is None:
+            failures.append((name, ["(does not prepare)"]))
+            continue
+        issues = plan_issues(plan, _aliases(sql), dict.fromkeys(table_rows, MIN_SCAN_ROWS), _limited(sql))
+        if _score(issues) != (0, 0, 0):
+            failures.append((name, plan))
+    return failures
+
+
+def compare_plans(report, baseline):
+    """Shapes that now fully scan a table they did not scan in ``baseline``: [(shape, sources, tables)]."""
+    regressions = []
+    for shape, entry in report.items():
+        previous = baseline.get(shape)
+        if previous is None:
+            continue
+        new_scans = sorted(set(entry['scans']) - set(previous['scans']))
+        if new_scans:
+            regressions.append((shape, entry['sources'], new_scans))
+    return regressions
+
+
+def load_baseline(path=DEFAULT_BASELINE):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as handle:
+        return json.load(handle)['plans']
+
+
+def save_baseline(report, path=DEFAULT_BASELINE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as handle:
+        json.dump({
+            'saved_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'plans': report,
+        }, handle, indent=2, sort_keys=True)
+
+
+def collect(preset=DEFAULT_PRESET, seed=None, regenerate=False):
+    """Prepare the dataset and gather runtime and static statements: (db file, statements)."""
+    from services.query_benchmark import prepare_dataset
+    from services.synthetic_data import DEFAULT_SEED
+
+    original_db = database.DB_FILE
+    try:
+        db_file = prepare_dataset(preset, DEFAULT_SEED if seed is None else seed, regenerate)
+        statements = {}
+        collect_runtime(statements)
+        collect_static(statements)
+    finally:
+        database.DB_FILE = original_db
+    return db_file, statements
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    command = args.pop(0) if args else None
+    options = {'preset': DEFAULT_PRESET, 'seed': None, 'baseline': DEFAULT_BASELINE}
+    flags = {'--save-baseline': False, '--regenerate': False}
+    while args:
+        arg = args.pop(0)
+        if arg in flags:
+            flags[arg] = True
+        elif arg.startswith("--") and arg[2:] in options and args:
+            options[arg[2:]] = args.pop(0)
+        else:
+            command = None
+            break
+    if command not in ("advise", "check"):
+        print(__doc__)
+        sys.exit(1)
+
+    seed = int(options['seed']) if options['seed'] is not None else None
+    db_file, statements = collect(options['preset'], seed, flags['--regenerate'])
+    conn = sqlite3.connect(db_file, isolation_level=None)
+    try:
+        if command == "advise":
+            report = plan_report(statements, conn)
+            problems = sum(1 for entry in report.values() if _score(entry) != (0, 0, 0))
+            print(f"🔎 {len(statements)} statement shapes collected, {len(report)} explained, {problems} with scans or sorts")
+            suggestions = advise(statements, conn)
+            if not suggestions:
+                print("✅ No index suggestions")
+            for suggestion in suggestions:
+                print(f"\n💡 {suggestion['ddl']};")
+                for helped in suggestion['helps'][:5]:
+                    print(f"   {', '.join(helped['sources'][:3])}")
+                    print(f"     before: {' | '.join(helped['before'])}")
+                    print(f"     after:  {' | '.join(helped['after'])}")
+                if len(suggestion['helps']) > 5:
+                    print(f"   ... and {len(suggestion['helps']) - 5} more statements")
+            sys.exit(0)
+
+        failures = check_known(conn)
+        report = plan_report(statements, conn)
+        if flags['--save-baseline']:
+            save_baseline(report, options['baseline'])
+            print(f"✅ Plan baseline for {len(report)} statement shapes saved to {options['baseline']}")
+
+        baseline = load_baseline(options['baseline'])
+        regressions = compare_plans(report, baseline) if baseline is not None else []
+        for name, plan in failures:
+            print(f"❌ Known query '{name}' is not served by an index: {' | '.join(plan)}")
+        for shape, sources, tables in regressions:
+            print(f"❌ Full scan of {', '.join(tables)} in {', '.join(sources[:3])}\n     {shape}")
+        if failures or regressions:
+            sys.exit(1)
+        if baseline is None:
+            print(f"ℹ️ No plan baseline at {options['baseline']}; run with --save-baseline to create one")
+        print(f"✅ {len(KNOWN_QUERIES)} known queries use indexes; no plan regressions in {len(report)} statement shapes")
+    finally:
+        conn.close()
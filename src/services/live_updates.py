@@ -0,0 +1,41 @@
+"""Cross-session change notifications over Flet's pubsub.
+
+Writers call :func:`publish` after committing, with the ids of the rows
+they changed. Every session showing a live view (see
+``components.live_region.LiveRegion``) receives the ids and patches just
+those cards, so staff see new orders and status changes without pressing
+Refresh and without anyone polling the database.
+
+The pubsub hub is shared by all sessions of the app; :func:`attach` keeps
+a client to it so services without a page can publish too.
+"""
+
+ORDERS_TOPIC = "orders"
+INVOICES_TOPIC = "invoices"
+
+_pubsub = None
+
+
+def attach(page):
+    """Remember a pubsub client; called once per session from main()."""
+    global _pubsub
+    if _pubsub is None:
+        _pubsub = page.pubsub
+
+
+def publish(topic, ids):
+    """
+    Notify subscribed sessions that rows changed.
+
+    Args:
+        topic (str): ORDERS_TOPIC or INVOICES_TOPIC
+        ids (iterable): Ids of the changed (or new) rows
+    """
+    ids = [row_id for row_id in ids if row_id is not None]
+    if _pubsub is None or not ids:
+        return
+    try:
+        _pubsub.send_all_on_topic(topic, ids)
+    except Exception as ex:
+        # Live updates are best effort; the write itself already committed
+        print(f"Live update on '{topic}' failed: {ex}")
@@ -0,0 +1,608 @@
+"""Headless load test: scripted user sessions driving the real app.
+
+Each simulated session hands a :class:`SimulatedPage` to ``main.main``,
+signs in through the landing page and replays a role journey by filling in
+the same fields and clicking the same buttons a user would. Every view,
+handler and query runs exactly as it does for a browser session; only the
+rendering is skipped. ``page.update()`` attaches new controls to the page
+and calls ``did_mount``/``will_unmount`` like Flet does, so live regions
+subscribe and control updates work.
+
+Journeys:
+    patient     search medicines → add 1-3 items to the cart → checkout
+    billing     new invoice for an unpaid order → invoice list
+    pharmacist  prescription list → review next → approve
+
+Sessions run as threads in one process, the way browser sessions share
+one ``app.py`` worker: they contend for the GIL, the app's module-level
+state and the SQLite database. Each thread binds its page with
+``AppState.use_page``, as Flet does for its handler threads, and after
+every journey the harness checks that the session is still signed in as
+its own account, so state leaking between sessions shows up as errors.
+Live updates are delivered within a session only.
+
+Reported: throughput (journeys and steps per second), latency percentiles
+per step and per journey, errors, and memory (process RSS after app import
+and its growth over the run per session, Linux only).
+
+By default the run uses the 'small' synthetic dataset from
+:mod:`services.query_benchmark` (generated on first use), never the demo
+database, since journeys place orders and approve prescriptions.
+
+Usage:
+    python src/services/load_test.py [--sessions 8] [--duration 30] [--journeys N]
+        [--mix patient=6,billing=2,pharmacist=2] [--think-ms 0]
+        [--preset small] [--seed N] [--db FILE] [--json FILE]
+"""
+
+import json
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import traceback
+from types import SimpleNamespace
+
+# Allow running this file directly from the services folder
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from services import database
+
+DEFAULT_SESSIONS = 8
+DEFAULT_DURATION = 30
+DEFAULT_MIX = "patient=6,billing=2,pharmacist=2"
+DEFAULT_PRESET = 'small'
+
+# Seconds to wait for every session to sign in before the timed run starts
+STARTUP_TIMEOUT = 300
+
+ACCOUNTS = {
+    'billing': ('bill', 'bill123', 'Billing'),
+    'pharmacist': ('pharm', 'pharm123', 'Pharmacist'),
+}
+PATIENT_PASSWORD = 'pat123'
+
+SEARCH_TERMS = ("para", "amox", "vita", "cetiri", "ibu", "met", "losar", "zole", "syrup", "")
+
+_BUTTON_TYPES = ('ElevatedButton', 'OutlinedButton', 'TextButton', 'FilledButton', 'IconButton')
+
+
+class SimulatedPubSub:
+    """Per-session stand-in for ``page.pubsub`` (topic subscriptions only)."""
+
+    def __init__(self):
+        self._topics = {}
+
+    def subscribe_topic(self, topic, handler):
+        self._topics[topic] = handler
+
+    def unsubscribe_topic(self, topic):
+        self._topics.pop(topic, None)
+
+    def unsubscribe_all(self):
+        self._topics.clear()
+
+    def send_all_on_topic(self, topic, message):
+        handler = self._topics.get(topic)
+        if handler:
+            handler(topic, message)
+
+    send_others_on_topic = send_all_on_topic
+
+
+class SimulatedPage:
+    """
+    The part of ``ft.Page`` the app uses, without a client.
+
+    ``update()`` walks the views and overlay, attaches controls that are new
+    since the last update (so ``control.update()`` works) and runs their
+    mount hooks, the same bookkeeping Flet does before sending a diff.
+    """
+
+    def __init__(self):
+        self.route = "/"
+        self.views = []
+        self.overlay = []
+        self.title = None
+        self.theme = None
+        self.theme_mode = None
+        self.horizontal_alignment = None
+        self.vertical_alignment = None
+        self.snack_bar = None
+        self.dialog = None
+        self.window = SimpleNamespace(width=None, height=None, resizable=True, center=lambda: None)
+        self.pubsub = SimulatedPubSub()
+        self.on_route_change = None
+        self.on_view_pop = None
+        self.updates = 0
+        self._mounted = {}
+        self._lock = threading.RLock()
+
+    def go(self, route):
+        self.route = route
+        if self.on_route_change:
+            self.on_route_change(SimpleNamespace(route=route, page=self))
+
+    def update(self, *controls):
+        with self._lock:
+            self.updates += 1
+            self._attach()
+
+    def open(self, control):
+        control.open = True
+        if control not in self.overlay:
+            self.overlay.append(control)
+        self.update()
+
+    def close(self, control):
+        control.open = False
+        if control in self.overlay:
+            self.overlay.remove(control)
+        self.update()
+
+    def launch_url(self, url, **kwargs):
+        pass
+
+    def roots(self):
+        roots = list(self.views) + list(self.overlay)
+        for extra in (self.dialog, self.snack_bar):
+            if extra is not None and getattr(extra, 'open', False):
+                roots.append(extra)
+        return roots
+
+    def walk(self, visible_only=False):
+        """Every control on the page, depth first."""
+        stack = list(reversed(self.roots()))
+        while stack:
+            control = stack.pop()
+            if visible_only and getattr(control, 'visible', None) is False:
+                continue
+            yield control
+            stack.extend(reversed(control._get_children()))
+
+    def _attach(self):
+        current = {}
+        for control in self.walk():
+            current[id(control)] = control
+            if control.page is not self:
+                control.page = self
+        for key, control in current.items():
+            if key not in self._mounted:
+                control.did_mount()
+        for key, control in self._mounted.items():
+            if key not in current:
+                control.will_unmount()
+        self._mounted = current
+
+    def control_count(self):
+        return len(self._mounted)
+
+
+class ControlNotFound(Exception):
+    pass
+
+
+def _label(control):
+    """Text a user would read on a control: its text, tooltip, or nested Text values."""
+    for attr in ('text', 'label', 'hint_text'):
+        value = getattr(control, attr, None)
+        if isinstance(value, str) and value:
+            return value
+    tooltip = getattr(control, 'tooltip', None)
+    if isinstance(tooltip, str) and tooltip:
+        return tooltip
+    parts = []
+    stack = list(control._get_children())
+    while stack:
+        child = stack.pop(0)
+        if type(child).__name__ == 'Text' and child.value:
+            parts.append(str(child.value))
+        stack.extend(child._get_children())
+    return " ".join(parts)
+
+
+class Session:
+    """One simulated user: a page plus timing of every step."""
+
+    def __init__(self, name, rng, think=0.0):
+        self.name = name
+        self.rng = rng
+        self.think = think
+        self.page = SimulatedPage()
+        self.samples = []
+
+    def _event(self, control, data=None):
+        return SimpleNamespace(page=self.page, control=control, data=data, name="click", target=None)
+
+    def find(self, label, kinds=None, startswith=False, clickable=False):
+        matches = []
+        for control in self.page.walk(visible_only=True):
+            if kinds and type(control).__name__ not in kinds:
+                continue
+            if clickable and (not getattr(control, 'on_click', None) or getattr(control, 'disabled', False)):
+                continue
+            text = _label(control)
+            if text == label or (startswith and text.startswith(label)):
+                matches.append(control)
+        return matches
+
+    def click(self, label, startswith=False, pick=None, required=True):
+        """Click a visible, enabled button (or other clickable control) by its label."""
+        candidates = self.find(label, _BUTTON_TYPES, startswith, clickable=True)
+        if not candidates:
+            candidates = self.find(label, None, startswith, clickable=True)
+        if not candidates:
+            if required:
+                raise ControlNotFound(f"No clickable '{label}' on {self.page.route}")
+            return False
+        control = pick(candidates) if pick else candidates[0]
+        control.on_click(self._event(control))
+        return True
+
+    def fill(self, label, value):
+        """Type into a field or choose a dropdown value, firing on_change."""
+        fields = self.find(label, ('TextField', 'Dropdown'))
+        if not fields:
+            raise ControlNotFound(f"No field '{label}' on {self.page.route}")
+        field = fields[0]
+        field.value = value
+        if getattr(field, 'on_change', None):
+            field.on_change(self._event(field, value))
+        return field
+
+    def options(self, label):
+        fields = self.find(label, ('Dropdown',))
+        if not fields:
+            raise ControlNotFound(f"No dropdown '{label}' on {self.page.route}")
+        return [option.key or option.text for option in fields[0].options]
+
+    def step(self, journey, name, action):
+        """Run and time one user action; errors are recorded and re-raised."""
+        started = time.perf_counter()
+        error = None
+        try:
+            return action()
+        except Exception as ex:
+            error = f"{type(ex).__name__}: {ex}"
+            raise
+        finally:
+            self.samples.append((journey, name, (time.perf_counter() - started) * 1000, error))
+            if self.think:
+                time.sleep(self.think)
+
+
+# Journeys
+
+def login(session, username, password, role):
+    session.fill("Username or Email", username)
+    session.fill("Password", password)
+    session.fill("Select Role", role)
+    session.click("Login")
+    if session.page.route != "/dashboard":
+        raise RuntimeError(f"Login failed for {username}")
+
+
+def patient_journey(session):
+    rng = session.rng
+    session.step('patient', 'open_search', lambda: session.page.go("/patient/search"))
+
+    def search():
+        session.fill("Search medicines by name...", rng.choice(SEARCH_TERMS))
+        session.click("Search")
+    session.step('patient', 'search', search)
+
+    for _ in range(rng.randint(1, 3)):
+        added = session.step('patient', 'add_to_cart',
+                             lambda: session.click("Add to Cart", pick=lambda found: rng.choice(found[:20]), required=False))
+        if not added:
+            break
+
+    session.step('patient', 'open_cart', lambda: session.page.go("/patient/cart"))
+    session.step('patient', 'checkout', lambda: session.click("Proceed to Checkout", required=False))
+
+
+def billing_journey(session):
+    rng = session.rng
+    session.step('billing', 'open_create_invoice', lambda: session.page.go("/billing/create-invoice"))
+
+    orders = [key for key in session.options("Select Order (Optional)") if key != "None"]
+    if orders:
+        def create():
+            session.fill("Select Order (Optional)", rng.choice(orders[-50:]))
+            session.fill("Payment Method", rng.choice(session.options("Payment Method")))
+            session.click("Create Invoice")
+        session.step('billing', 'create_invoice', create)
+
+    session.step('billing', 'open_invoices', lambda: session.page.go("/billing/invoices"))
+
+
+def pharmacist_journey(session):
+    session.step('pharmacist', 'open_prescriptions', lambda: session.page.go("/pharmacist/prescriptions"))
+    claimed = session.step('pharmacist', 'review_next',
+                           lambda: session.click("Review Next", startswith=True, required=False))
+    if claimed and session.page.route.startswith("/pharmacist/prescription/"):
+        session.step('pharmacist', 'approve', lambda: session.click("Approve Prescription", required=False))
+
+
+JOURNEYS = {
+    'patient': patient_journey,
+    'billing': billing_journey,
+    'pharmacist': pharmacist_journey,
+}
+
+
+def _rss_mb():
+    """Resident memory of this process in MB (None where /proc is unavailable)."""
+    try:
+        with open("/proc/self/status", encoding='utf-8') as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _session_main(spec, options, barrier, results):
+    """Thread body: start the app on a simulated page, sign in, replay journeys."""
+    import main as app
+    from state.app_state import AppState
+
+    session = Session(spec['name'], random.Random(options['seed'] * 1000 + spec['index']),
+                      options['think_ms'] / 1000)
+    report = {'name': spec['name'], 'role': spec['role'], 'journeys': 0, 'errors': []}
+    username = spec['account'][0]
+    with AppState.use_page(session.page):
+        try:
+            session.step('session', 'start', lambda: app.main(session.page))
+            session.step('session', 'login', lambda: login(session, *spec['account']))
+        except Exception:
+            report['errors'].append(traceback.format_exc(limit=3))
+            barrier.abort()
+            results.put({**report, 'samples': session.samples})
+            return
+
+        try:
+            barrier.wait(timeout=STARTUP_TIMEOUT)
+        except threading.BrokenBarrierError:
+            results.put({**report, 'samples': session.samples, 'errors': ["another session failed to start"]})
+            return
+
+        journey = JOURNEYS[spec['role']]
+        started = time.perf_counter()
+        deadline = started + options['duration'] if options['duration'] else None
+        while True:
+            if options['journeys'] and report['journeys'] >= options['journeys']:
+                break
+            if deadline and time.perf_counter() >= deadline:
+                break
+            journey_start = time.perf_counter()
+            try:
+                journey(session)
+            except Exception as ex:
+                report['errors'].append(f"{type(ex).__name__}: {ex}")
+            else:
+                report['journeys'] += 1
+                session.samples.append((spec['role'], 'journey', (time.perf_counter() - journey_start) * 1000, None))
+            user = AppState.get_user()
+            if not user or user['username'] != username:
+                report['errors'].append(f"session state leaked: signed in as {user and user['username']}, expected {username}")
+
+    report.update({
+        'elapsed': time.perf_counter() - started,
+        'page_updates': session.page.updates,
+        'controls': session.page.control_count(),
+        'samples': session.samples,
+    })
+    results.put(report)
+
+
+def parse_mix(mix):
+    weights = {}
+    for part in mix.split(","):
+        role, _, weight = part.partition("=")
+        role = role.strip()
+        if role not in JOURNEYS:
+            raise ValueError(f"Unknown journey: {role} (choose from {', '.join(JOURNEYS)})")
+        weights[role] = int(weight or 1)
+    return weights
+
+
+def plan_sessions(count, weights):
+    """Assign a role and an account to each session, proportionally to ``weights``."""
+    # Smooth weighted round robin, so small runs still get every role
+    total = sum(weights.values())
+    credit = dict.fromkeys(weights, 0)
+    roles = []
+    for _ in range(count):
+        for role, weight in weights.items():
+            credit[role] += weight
+        chosen = max(credit, key=credit.get)
+        credit[chosen] -= total
+        roles.append(chosen)
+
+    conn = database.get_db_connection()
+    patients = [row[0] for row in conn.execute(
+        "SELECT username FROM users WHERE role = 'Patient' AND status = 'Approved' AND password = ? ORDER BY id DESC LIMIT ?",
+        (PATIENT_PASSWORD, count))]
+    conn.close()
+
+    specs = []
+    for index, role in enumerate(roles):
+        if role == 'patient':
+            account = (patients[index % len(patients)] if patients else 'pat', PATIENT_PASSWORD, 'Patient')
+        else:
+            account = ACCOUNTS[role]
+        specs.append({'index': index, 'name': f"{role}-{index}", 'role': role, 'account': account})
+    return specs
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))]
+
+
+def summarize(reports, wall, rss_start=None, rss_end=None):
+    """
+    Aggregate session reports into throughput, latency and memory figures.
+
+    ``rss_start`` and ``rss_end`` are the process RSS in MB after app import
+    and at the end of the run.
+    """
+    steps = {}
+    errors = []
+    for report in reports:
+        errors.extend(f"[{report['name']}] {error}" for error in report['errors'])
+        for journey, name, ms, error in report['samples']:
+            entry = steps.setdefault(f"{journey}.{name}", {'ms': [], 'errors': 0})
+            entry['ms'].append(ms)
+            if error:
+                entry['errors'] += 1
+                errors.append(f"[{report['name']}] {journey}.{name}: {error}")
+
+    latency = {}
+    for key, entry in sorted(steps.items()):
+        latency[key] = {
+            'count': len(entry['ms']),
+            'errors': entry['errors'],
+            'p50_ms': round(_percentile(entry['ms'], 50), 2),
+            'p95_ms': round(_percentile(entry['ms'], 95), 2),
+            'p99_ms': round(_percentile(entry['ms'], 99), 2),
+            'max_ms': round(max(entry['ms']), 2),
+        }
+
+    journeys = sum(report['journeys'] for report in reports)
+    timed_steps = sum(v['count'] for k, v in latency.items()
+                      if not k.startswith('session.') and not k.endswith('.journey'))
+    growth = rss_end - rss_start if rss_start is not None and rss_end is not None else None
+    return {
+        'sessions': len(reports),
+        'wall_seconds': round(wall, 2),
+        'journeys': journeys,
+        'journeys_per_second': round(journeys / wall, 2) if wall else 0,
+        'steps_per_second': round(timed_steps / wall, 2) if wall else 0,
+        'latency': latency,
+        'memory_mb': {
+            'rss_after_import': round(rss_start, 1) if rss_start is not None else None,
+            'growth': round(growth, 1) if growth is not None else None,
+            'growth_per_session': round(growth / max(len(reports), 1), 2) if growth is not None else None,
+        },
+        'page_updates': sum(report.get('page_updates', 0) for report in reports),
+        'errors': errors,
+    }
+
+
+def run(sessions=DEFAULT_SESSIONS, duration=DEFAULT_DURATION, journeys=None, mix=DEFAULT_MIX,
+        think_ms=0, preset=DEFAULT_PRESET, seed=None, db_file=None, verbose=True):
+    """
+    Run a load test and return the summary from :func:`summarize`.
+
+    Args:
+        sessions (int): Concurrent sessions (one thread each)
+        duration (float): Seconds of journeys per session (None/0 with ``journeys``)
+        journeys (int): Journeys per session instead of a fixed duration
+        mix (str): Role weights, e.g. "patient=6,billing=2,pharmacist=2"
+        think_ms (int): Pause after every step, as a user reading the screen
+        preset (str): Synthetic dataset to use when ``db_file`` is not given
+        seed (int): Dataset and journey seed
+        db_file (str): Existing database to run against (it will be written to)
+    """
+    from services.query_benchmark import prepare_dataset
+    from services.synthetic_data import DEFAULT_SEED
+
+    seed = DEFAULT_SEED if seed is None else seed
+    say = print if verbose else (lambda *args, **kwargs: None)
+    if db_file:
+        database.DB_FILE = db_file
+    else:
+        db_file = prepare_dataset(preset, seed)
+
+    specs = plan_sessions(sessions, parse_mix(mix))
+    options = {'seed': seed, 'duration': duration, 'journeys': journeys, 'think_ms': think_ms}
+
+    # Import the app up front so no session's timings include it
+    import main
+    rss_start = _rss_mb()
+
+    barrier = threading.Barrier(len(specs) + 1)
+    results = queue.Queue()
+    threads = [threading.Thread(target=_session_main, args=(spec, options, barrier, results),
+                                name=f"session-{spec['name']}", daemon=True)
+               for spec in specs]
+    say(f"🚦 Starting {len(specs)} sessions against {db_file}")
+    for thread in threads:
+        thread.start()
+
+    try:
+        barrier.wait(timeout=STARTUP_TIMEOUT)
+    except threading.BrokenBarrierError:
+        say("❌ A session failed to start; collecting what finished")
+    started = time.perf_counter()
+
+    reports = []
+    while len(reports) < len(threads):
+        try:
+            reports.append(results.get(timeout=1))
+        except queue.Empty:
+            if not any(thread.is_alive() for thread in threads) and results.empty():
+                say(f"❌ {len(threads) - len(reports)} session(s) exited without reporting")
+                break
+    wall = time.perf_counter() - started
+    for thread in threads:
+        thread.join()
+    return summarize(reports, wall, rss_start, _rss_mb())
+
+
+def print_summary(summary):
+    print(f"\n📈 {summary['sessions']} sessions, {summary['wall_seconds']} s: "
+          f"{summary['journeys']} journeys ({summary['journeys_per_second']}/s), "
+          f"{summary['steps_per_second']} steps/s, {len(summary['errors'])} errors")
+    print(f"\n  {'step':<32}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'errors':>8}")
+    for key, row in summary['latency'].items():
+        print(f"  {key:<32}{row['count']:>7}{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}"
+              f"{row['p99_ms']:>10.1f}{row['max_ms']:>10.1f}{row['errors']:>8}")
+    memory = summary['memory_mb']
+    if memory['growth'] is not None:
+        print(f"\n  Memory: {memory['rss_after_import']} MB after import, +{memory['growth']} MB during the run "
+              f"(+{memory['growth_per_session']} MB per session)")
+    for error in summary['errors'][:10]:
+        print(f"  ⚠️ {error}")
+    if len(summary['errors']) > 10:
+        print(f"  … {len(summary['errors']) - 10} more")
+
+
+if __name__ == "__main__":
+    options = {
+        'sessions': DEFAULT_SESSIONS, 'duration': DEFAULT_DURATION, 'journeys': None, 'mix': DEFAULT_MIX,
+        'think-ms': 0, 'preset': DEFAULT_PRESET, 'seed': None, 'db': None, 'json': None,
+    }
+    args = sys.argv[1:]
+    while args:
+        arg = args.pop(0)
+        if arg.startswith("--") and arg[2:] in options and args:
+            options[arg[2:]] = args.pop(0)
+        else:
+            print(__doc__)
+            sys.exit(1)
+
+    journeys = int(options['journeys']) if options['journeys'] else None
+    summary = run(
+        sessions=int(options['sessions']),
+        duration=0 if journeys else float(options['duration']),
+        journeys=journeys,
+        mix=options['mix'],
+        think_ms=int(options['think-ms']),
+        preset=options['preset'],
+        seed=int(options['seed']) if options['seed'] is not None else None,
+        db_file=options['db'],
+    )
+    print_summary(summary)
+    if options['json']:
+        with open(options['json'], 'w', encoding='utf-8') as handle:
+            json.dump(summary, handle, indent=2)
+        print(f"\n✅ Summary written to {options['json']}")
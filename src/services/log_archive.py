@@ -0,0 +1,374 @@
+"""Monthly archive partitions for ``activity_log``.
+
+Rows older than ``RETENTION_DAYS`` move out of the hot ``activity_log`` table
+into one SQLite file per month under ``storage/archive``. The
+``activity_partitions`` catalog records each file's month, row count and
+time bounds, so :func:`query_activity` ATTACHes only the partitions that
+overlap the requested range. Recent-activity queries never leave the hot
+table.
+
+Archiving also deletes the ``audit_events`` rows (and their search index
+entries) fed from the moved rows, so the hot database actually shrinks;
+the admin logs page reads archived activity back through
+:func:`query_activity`.
+
+Usage:
+    python src/services/log_archive.py archive [RETENTION_DAYS]
+    python src/services/log_archive.py list
+    python src/services/log_archive.py compact [YYYY-MM]
+    python src/services/log_archive.py export YYYY-MM OUT.csv[.gz]
+"""
+
+import csv
+import gzip
+import os
+import sys
+from datetime import datetime, timedelta
+
+# Allow running this file directly from the services folder
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from services import database
+from services.database import get_db_connection
+from services.search import forget_events
+
+RETENTION_DAYS = 90
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_COLUMNS = "id, user_id, action, details, timestamp"
+
+# Audit events fed from the activity rows being moved (bind start, end)
+_ARCHIVED_EVENTS = """
+    SELECT id FROM main.audit_events
+    WHERE event_type = 'system' AND entity = 'activity'
+      AND created_at >= ? AND created_at < ?
+      AND entity_id IN (SELECT id FROM part.activity_log)
+"""
+
+
+def archive_dir():
+    path = os.path.join(os.path.dirname(database.DB_FILE), 'archive')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def partition_path(month):
+    """Archive file for a 'YYYY-MM' month."""
+    return os.path.join(archive_dir(), f"activity_{month.replace('-', '_')}.db")
+
+
+def _next_month(month):
+    year, mon = int(month[:4]), int(month[5:7])
+    return f"{year + mon // 12:04d}-{mon % 12 + 1:02d}"
+
+
+def init_archive_schema(cursor):
+    """Create the partition catalog."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS activity_partitions (
+            month TEXT PRIMARY KEY,
+            path TEXT NOT NULL,
+            row_count INTEGER NOT NULL DEFAULT 0,
+            min_timestamp TEXT,
+            max_timestamp TEXT,
+            archived_at TIMESTAMP,
+            compacted_at TIMESTAMP
+        )
+    """)
+
+
+def archive_old_activity(retention_days=RETENTION_DAYS, now=None):
+    """
+    Move activity_log rows past the retention window into monthly partitions.
+
+    SQLite does not commit across ATTACHed databases atomically in WAL mode,
+    so each month takes two transactions: the copy into the partition is
+    committed and checked against the hot rows first, then the hot rows (and
+    the audit events mirroring them) are deleted in a second transaction on
+    the main database, limited to ids the partition holds. An interruption
+    between the two leaves the month's rows in both places; copies use
+    INSERT OR IGNORE on the original ids, so re-running finishes the move.
+
+    Returns:
+        dict: {month: rows moved}
+    """
+    cutoff = ((now or datetime.now()) - timedelta(days=retention_days)).strftime(TIMESTAMP_FORMAT)
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='activity_log'")
+    if cursor.fetchone() is None:
+        conn.close()
+        return {}
+
+    init_archive_schema(cursor)
+    conn.commit()
+
+    cursor.execute("""
+        SELECT DISTINCT substr(timestamp, 1, 7) FROM activity_log
+        WHERE timestamp < ? ORDER BY 1
+    """, (cutoff,))
+    months = [row[0] for row in cursor.fetchall()]
+
+    moved = {}
+    try:
+        for month in months:
+            start, end = f"{month}-01", f"{_next_month(month)}-01"
+            upper = min(end, cutoff)
+            path = partition_path(month)
+
+            cursor.execute("ATTACH DATABASE ? AS part", (path,))
+            try:
+                # Copy into the partition and commit it on its own
+                cursor.execute("BEGIN")
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS part.activity_log (
+                        id INTEGER PRIMARY KEY,
+                        user_id INTEGER NOT NULL,
+                        action TEXT NOT NULL,
+                        details TEXT,
+                        timestamp TIMESTAMP
+                    )
+                """)
+                cursor.execute("CREATE INDEX IF NOT EXISTS part.idx_activity_timestamp ON activity_log(timestamp)")
+                cursor.execute(f"""
+                    INSERT OR IGNORE INTO part.activity_log ({_COLUMNS})
+                    SELECT {_COLUMNS} FROM main.activity_log
+                    WHERE timestamp >= ? AND timestamp < ?
+                """, (start, upper))
+                cursor.execute("COMMIT")
+
+                cursor.execute("""
+                    SELECT COUNT(*) FROM main.activity_log
+                    WHERE timestamp >= ? AND timestamp < ?
+                      AND id NOT IN (SELECT id FROM part.activity_log)
+                """, (start, upper))
+                missing = cursor.fetchone()[0]
+                if missing:
+                    raise RuntimeError(f"Archive {month}: {missing} row(s) missing from {path} after the copy")
+
+                # Then delete what the partition holds, on the main database only
+                cursor.execute("BEGIN")
+                cursor.execute("""
+                    DELETE FROM main.activity_log
+                    WHERE timestamp >= ? AND timestamp < ?
+                      AND id IN (SELECT id FROM part.activity_log)
+                """, (start, upper))
+                moved[month] = cursor.rowcount
+                cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='audit_events'")
+                if cursor.fetchone() is not None:
+                    forget_events(cursor, _ARCHIVED_EVENTS, (start, upper))
+                    cursor.execute(f"DELETE FROM main.audit_events WHERE id IN ({_ARCHIVED_EVENTS})", (start, upper))
+
+                cursor.execute("SELECT COUNT(*), MIN(timestamp), MAX(timestamp) FROM part.activity_log")
+                count, min_ts, max_ts = cursor.fetchone()
+                cursor.execute("""
+                    INSERT INTO activity_partitions (month, path, row_count, min_timestamp, max_timestamp, archived_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(month) DO UPDATE SET
+                        path = excluded.path, row_count = excluded.row_count,
+                        min_timestamp = excluded.min_timestamp, max_timestamp = excluded.max_timestamp,
+                        archived_at = excluded.archived_at, compacted_at = NULL
+                """, (month, path, count, min_ts, max_ts, datetime.now().strftime(TIMESTAMP_FORMAT)))
+                cursor.execute("COMMIT")
+            except Exception:
+                if conn.in_transaction:
+                    cursor.execute("ROLLBACK")
+                raise
+            finally:
+                cursor.execute("DETACH DATABASE part")
+    finally:
+        conn.close()
+
+    return moved
+
+
+def archive_if_due(retention_days=RETENTION_DAYS):
+    """Run :func:`archive_old_activity` at most once per day."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    init_archive_schema(cursor)
+    conn.commit()
+    cursor.execute("SELECT MAX(archived_at) FROM activity_partitions")
+    last = cursor.fetchone()[0]
+    conn.close()
+    if last and last[:10] == datetime.now().strftime("%Y-%m-%d"):
+        return {}
+    return archive_old_activity(retention_days)
+
+
+def list_partitions():
+    """Return catalog rows, newest month first."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    init_archive_schema(cursor)
+    cursor.execute("SELECT * FROM activity_partitions ORDER BY month DESC")
+    rows = cursor.fetchall()
+    conn.close()
+    return rows
+
+
+def query_activity(since=None, until=None, user_id=None, action=None, limit=None,
+                   search=None, after=None, archived_only=False):
+    """
+    Query activity across the hot table and any archive partitions in range.
+
+    Partitions are only ATTACHed when ``since`` reaches back past the oldest
+    hot row, and only those whose [min, max] bounds overlap the range. With a
+    ``limit``, partitions are visited newest first and the walk stops once
+    older partitions cannot contribute.
+
+    Args:
+        since (str): Inclusive lower bound "YYYY-MM-DD HH:MM:SS" (None = all time)
+        until (str): Exclusive upper bound
+        user_id (int): Filter by user
+        action (str): Filter by action code
+        limit (int): Maximum rows
+        search (str): Case-insensitive text matched against action and details
+        after (tuple): Keyset cursor (timestamp, id); only older rows are returned
+        archived_only (bool): Skip the hot table (its rows are already in the
+            audit stream)
+
+    Returns:
+        list: sqlite3.Row items (id, user_id, action, details, timestamp), newest first
+    """
+    clauses = []
+    params = []
+    if since:
+        clauses.append("timestamp >= ?")
+        params.append(since)
+    if until:
+        clauses.append("timestamp < ?")
+        params.append(until)
+    if user_id is not None:
+        clauses.append("user_id = ?")
+        params.append(user_id)
+    if action:
+        clauses.append("action = ?")
+        params.append(action)
+    if search:
+        clauses.append("(instr(lower(action), lower(?)) > 0 OR instr(lower(COALESCE(details, '')), lower(?)) > 0)")
+        params.extend([search, search])
+    if after:
+        clauses.append("(timestamp, id) < (?, ?)")
+        params.extend(after)
+    where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+    tail = " ORDER BY timestamp DESC, id DESC" + (" LIMIT ?" if limit else "")
+    query_params = params + ([limit] if limit else [])
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    rows = []
+    if not archived_only:
+        cursor.execute(f"SELECT {_COLUMNS} FROM main.activity_log{where}{tail}", query_params)
+        rows = cursor.fetchall()
+
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='activity_partitions'")
+    if cursor.fetchone() is None:
+        conn.close()
+        return rows
+
+    # Hot rows already satisfy the limit and are newer than every archived row
+    cursor.execute("SELECT MAX(max_timestamp) FROM activity_partitions")
+    newest_archived = cursor.fetchone()[0]
+    if newest_archived is None or (limit and len(rows) >= limit and rows[-1]['timestamp'] > newest_archived):
+        conn.close()
+        return rows
+
+    part_query = "SELECT month, path, max_timestamp FROM activity_partitions WHERE row_count > 0"
+    part_params = []
+    if since:
+        part_query += " AND max_timestamp >= ?"
+        part_params.append(since)
+    if until:
+        part_query += " AND min_timestamp < ?"
+        part_params.append(until)
+    cursor.execute(part_query + " ORDER BY month DESC", part_params)
+    partitions = cursor.fetchall()
+
+    for partition in partitions:
+        if limit and len(rows) >= limit:
+            rows.sort(key=lambda r: (r['timestamp'], r['id']), reverse=True)
+            rows = rows[:limit]
+            if rows[-1]['timestamp'] > partition['max_timestamp']:
+                break
+        if not os.path.exists(partition['path']):
+            continue
+        cursor.execute("ATTACH DATABASE ? AS part", (partition['path'],))
+        try:
+            cursor.execute(f"SELECT {_COLUMNS} FROM part.activity_log{where}{tail}", query_params)
+            rows.extend(cursor.fetchall())
+        finally:
+            cursor.execute("DETACH DATABASE part")
+
+    conn.close()
+    rows.sort(key=lambda r: (r['timestamp'], r['id']), reverse=True)
+    return rows[:limit] if limit else rows
+
+
+def compact_partition(month):
+    """VACUUM a cold partition file and stamp it as compacted. Returns bytes saved."""
+    path = partition_path(month)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No archive partition for {month}")
+    before = os.path.getsize(path)
+
+    import sqlite3
+    part = sqlite3.connect(path)
+    part.execute("VACUUM")
+    part.close()
+
+    conn = get_db_connection()
+    conn.execute("UPDATE activity_partitions SET compacted_at = ? WHERE month = ?",
+                 (datetime.now().strftime(TIMESTAMP_FORMAT), month))
+    conn.commit()
+    conn.close()
+    return before - os.path.getsize(path)
+
+
+def export_partition(month, out_path):
+    """Stream one partition to CSV (gzip-compressed when the name ends in .gz). Returns rows written."""
+    path = partition_path(month)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No archive partition for {month}")
+
+    import sqlite3
+    part = sqlite3.connect(path)
+    opener = gzip.open if out_path.endswith('.gz') else open
+    written = 0
+    with opener(out_path, 'wt', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(_COLUMNS.split(', '))
+        for row in part.execute(f"SELECT {_COLUMNS} FROM activity_log ORDER BY timestamp, id"):
+            writer.writerow(row)
+            written += 1
+    part.close()
+    return written
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    command = args[0] if args else "list"
+
+    if command == "archive":
+        result = archive_old_activity(int(args[1]) if len(args) > 1 else RETENTION_DAYS)
+        for month, count in result.items():
+            print(f"📦 {month}: moved {count} rows")
+        print(f"✅ Archived {sum(result.values())} rows into {len(result)} partition(s)")
+    elif command == "list":
+        for p in list_partitions():
+            status = "compacted" if p['compacted_at'] else "open"
+            print(f"{p['month']}  {p['row_count']:>8} rows  {p['min_timestamp']} → {p['max_timestamp']}  ({status})")
+    elif command == "compact":
+        months = [args[1]] if len(args) > 1 else [p['month'] for p in list_partitions()]
+        for month in months:
+            print(f"🗜️  {month}: reclaimed {compact_partition(month):,} bytes")
+    elif command == "export" and len(args) == 3:
+        print(f"✅ Exported {export_partition(args[1], args[2])} rows to {args[2]}")
+    else:
+        print(__doc__)
+        sys.exit(1)
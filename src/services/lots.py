@@ -0,0 +1,281 @@
+"""Lot/batch tracking with first-expiry-first-out (FEFO) allocation.
+
+Stock physically arrives in lots that each carry their own expiry date, so
+``medicine_lots`` keeps one row per received lot with its remaining quantity.
+Sales consume lots in expiry order inside checkout's transaction and record the
+lots they drew from in ``lot_allocations``. Expiry dates are stored as ISO
+``YYYY-MM-DD`` text, which sorts chronologically, so near-expiry sweeps are a
+range scan over a partial index on open lots instead of parsing every
+``medicines.expiry_date`` string in Python.
+
+Lot quantities track units physically on the shelf. Cart reservations only
+touch ``medicines.stock`` (via the stock ledger); lots are drawn down when the
+reservation becomes a sale at checkout. When expired lots leave too few units
+on the shelf to cover the carts, the newest cart lines are shrunk first.
+"""
+
+from datetime import datetime, timedelta
+
+from services.database import get_db_connection
+from services.stock_ledger import record_movement, release_cart_units, RECEIPT, EXPIRY_WRITEOFF
+
+# Default look-ahead window for near-expiry sweeps
+NEAR_EXPIRY_DAYS = 30
+
+
+def init_lot_schema(cursor):
+    """Create the lot and allocation tables plus their expiry indexes."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS medicine_lots (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            medicine_id INTEGER NOT NULL,
+            lot_number TEXT NOT NULL,
+            quantity INTEGER NOT NULL DEFAULT 0,
+            initial_quantity INTEGER NOT NULL DEFAULT 0,
+            expiry_date TEXT,
+            supplier TEXT,
+            unit_cost REAL,
+            received_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (medicine_id) REFERENCES medicines(id)
+        )
+    """)
+    # FEFO lookup per SKU and the catalog-wide near-expiry sweep both only care about open lots
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_lots_medicine_expiry
+        ON medicine_lots(medicine_id, expiry_date) WHERE quantity > 0
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_lots_expiry
+        ON medicine_lots(expiry_date) WHERE quantity > 0
+    """)
+    # Existence checks (e.g. the opening-lot backfill) must also see empty lots
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_lots_medicine ON medicine_lots(medicine_id)")
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS lot_allocations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            lot_id INTEGER NOT NULL,
+            order_id INTEGER,
+            order_item_id INTEGER,
+            quantity INTEGER NOT NULL,
+            allocated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (lot_id) REFERENCES medicine_lots(id)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_lot_allocations_order ON lot_allocations(order_id)")
+
+
+def _sync_medicine_expiry(cursor, medicine_id):
+    """Keep the legacy medicines.expiry_date column at the earliest open lot."""
+    cursor.execute("""
+        UPDATE medicines
+        SET expiry_date = COALESCE((
+            SELECT MIN(expiry_date) FROM medicine_lots
+            WHERE medicine_id = ? AND quantity > 0 AND expiry_date IS NOT NULL
+        ), expiry_date)
+        WHERE id = ?
+    """, (medicine_id, medicine_id))
+
+
+def receive_lot(cursor, medicine_id, quantity, expiry_date, lot_number=None,
+                supplier=None, unit_cost=None, user_id=None):
+    """
+    Receive a new lot into stock.
+
+    Args:
+        cursor: Open cursor inside the caller's transaction
+        medicine_id (int): Medicine being received
+        quantity (int): Units received (must be positive)
+        expiry_date (str): Lot expiry as YYYY-MM-DD
+        lot_number (str): Supplier lot number; generated when omitted
+        supplier (str): Supplier name
+        unit_cost (float): Purchase cost per unit
+        user_id (int): User receiving the lot
+
+    Returns:
+        int: The new lot id
+    """
+    quantity = int(quantity)
+    if quantity <= 0:
+        raise ValueError("Received quantity must be greater than 0")
+    if expiry_date:
+        datetime.strptime(expiry_date, "%Y-%m-%d")  # Reject malformed dates early
+
+    if not lot_number:
+        lot_number = f"LOT-{datetime.now().strftime('%Y%m%d%H%M%S')}-{medicine_id}"
+
+    cursor.execute("""
+        INSERT INTO medicine_lots
+        (medicine_id, lot_number, quantity, initial_quantity, expiry_date, supplier, unit_cost)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, (medicine_id, lot_number, quantity, quantity, expiry_date or None, supplier, unit_cost))
+    lot_id = cursor.lastrowid
+
+    record_movement(cursor, medicine_id, quantity, RECEIPT, f"lot:{lot_number}", user_id)
+    _sync_medicine_expiry(cursor, medicine_id)
+
+    return lot_id
+
+
+def allocate_fefo(cursor, medicine_id, quantity, order_id=None, order_item_id=None):
+    """
+    Draw ``quantity`` units from open lots, earliest expiry first.
+
+    Lots without an expiry date are consumed last. The walk stops as soon as the
+    request is satisfied, so it touches only the few lots it needs.
+
+    Returns:
+        int: Units that could not be matched to any lot (0 when fully allocated)
+    """
+    remaining = int(quantity)
+    cursor.execute("""
+        SELECT id, quantity FROM medicine_lots
+        WHERE medicine_id = ? AND quantity > 0
+        ORDER BY expiry_date IS NULL, expiry_date, id
+    """, (medicine_id,))
+
+    allocations = []
+    for lot_id, available in cursor.fetchall():
+        if remaining <= 0:
+            break
+        take = min(available, remaining)
+        allocations.append((take, lot_id))
+        remaining -= take
+
+    if allocations:
+        cursor.executemany("UPDATE medicine_lots SET quantity = quantity - ? WHERE id = ?", allocations)
+        cursor.executemany("""
+            INSERT INTO lot_allocations (lot_id, order_id, order_item_id, quantity)
+            VALUES (?, ?, ?, ?)
+        """, [(lot_id, order_id, order_item_id, take) for take, lot_id in allocations])
+        _sync_medicine_expiry(cursor, medicine_id)
+
+    return remaining
+
+
+def backfill_legacy_lots(cursor):
+    """
+    Create one opening lot for every medicine that has none yet.
+
+    The lot covers current stock plus units sitting in carts (reserved stock is
+    still on the shelf) and inherits the legacy single expiry date.
+    """
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='cart'")
+    has_cart = cursor.fetchone() is not None
+    reserved = "(SELECT COALESCE(SUM(c.quantity), 0) FROM cart c WHERE c.medicine_id = m.id)" if has_cart else "0"
+
+    cursor.execute(f"""
+        INSERT INTO medicine_lots
+        (medicine_id, lot_number, quantity, initial_quantity, expiry_date, supplier)
+        SELECT m.id, 'OPENING-' || m.id,
+               COALESCE(m.stock, 0) + {reserved},
+               COALESCE(m.stock, 0) + {reserved},
+               NULLIF(m.expiry_date, ''), m.supplier
+        FROM medicines m
+        WHERE COALESCE(m.stock, 0) + {reserved} > 0
+        AND NOT EXISTS (SELECT 1 FROM medicine_lots l WHERE l.medicine_id = m.id)
+    """)
+    return cursor.rowcount
+
+
+def get_lots(medicine_id, include_empty=False):
+    """Return the lots of one medicine in FEFO order."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT id, lot_number, quantity, initial_quantity, expiry_date, supplier, unit_cost, received_at
+        FROM medicine_lots
+        WHERE medicine_id = ? {'' if include_empty else 'AND quantity > 0'}
+        ORDER BY expiry_date IS NULL, expiry_date, id
+    """, (medicine_id,))
+    lots = cursor.fetchall()
+    conn.close()
+    return lots
+
+
+def get_near_expiry_lots(days=NEAR_EXPIRY_DAYS, include_expired=True, limit=None):
+    """
+    Sweep open lots expiring within ``days`` from today.
+
+    The predicate is a plain range on ``expiry_date`` with ``quantity > 0`` so
+    SQLite answers it from ``idx_lots_expiry`` without visiting other lots.
+    """
+    today = datetime.now().strftime("%Y-%m-%d")
+    horizon = (datetime.now() + timedelta(days=days)).strftime("%Y-%m-%d")
+
+    query = """
+        SELECT l.id, l.lot_number, l.quantity, l.expiry_date, l.supplier,
+               m.id AS medicine_id, m.name, m.category
+        FROM medicine_lots l
+        JOIN medicines m ON l.medicine_id = m.id
+        WHERE l.quantity > 0 AND l.expiry_date <= ?
+    """
+    params = [horizon]
+    if not include_expired:
+        query += " AND l.expiry_date >= ?"
+        params.append(today)
+    query += " ORDER BY l.expiry_date, l.id"
+    if limit:
+        query += " LIMIT ?"
+        params.append(limit)
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(query, params)
+    lots = cursor.fetchall()
+    conn.close()
+    return lots
+
+
+def write_off_expired_lots(user_id=None, as_of=None):
+    """
+    Zero out every open lot past its expiry and book expiry write-offs.
+
+    ``medicines.stock`` excludes units reserved in carts, but those units sit
+    in the lots too. Where a medicine's available stock cannot absorb its
+    expired units, the shortfall is released from carts first so the
+    balance never goes negative.
+
+    Returns:
+        tuple: (number of lots written off, total units written off)
+    """
+    as_of = as_of or datetime.now().strftime("%Y-%m-%d")
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT id, medicine_id, lot_number, quantity FROM medicine_lots
+            WHERE quantity > 0 AND expiry_date < ?
+        """, (as_of,))
+        expired = cursor.fetchall()
+
+        expiring = {}
+        for _, medicine_id, _, quantity in expired:
+            expiring[medicine_id] = expiring.get(medicine_id, 0) + quantity
+        for medicine_id, quantity in expiring.items():
+            cursor.execute("SELECT COALESCE(stock, 0) FROM medicines WHERE id = ?", (medicine_id,))
+            row = cursor.fetchone()
+            shortfall = quantity - (row[0] if row else 0)
+            if shortfall > 0:
+                release_cart_units(cursor, medicine_id, shortfall, "lot-expired")
+
+        units = 0
+        for lot_id, medicine_id, lot_number, quantity in expired:
+            cursor.execute("UPDATE medicine_lots SET quantity = 0 WHERE id = ?", (lot_id,))
+            # Lots and stock can disagree on legacy rows; never book the balance below zero
+            cursor.execute("SELECT COALESCE(stock, 0) FROM medicines WHERE id = ?", (medicine_id,))
+            row = cursor.fetchone()
+            written_off = min(quantity, max(row[0], 0)) if row else 0
+            if written_off:
+                record_movement(cursor, medicine_id, -written_off, EXPIRY_WRITEOFF, f"lot:{lot_number}", user_id)
+            _sync_medicine_expiry(cursor, medicine_id)
+            units += quantity
+
+        conn.commit()
+        return len(expired), units
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
@@ -0,0 +1,337 @@
+"""Scheduled SQLite maintenance: statistics, free-page reclaim and WAL checkpoints.
+
+One run performs, within a shared time budget:
+
+    checkpoint   ``PRAGMA wal_checkpoint`` (TRUNCATE, falling back to PASSIVE
+                 when readers are active) when the database is in WAL mode
+    analyze      ``ANALYZE`` the first time, ``PRAGMA optimize`` afterwards,
+                 both capped by ``PRAGMA analysis_limit``; the plans of the
+                 index advisor's known queries are compared before and after
+    vacuum       ``PRAGMA incremental_vacuum`` in steps of ``VACUUM_STEP_PAGES``
+                 until the free list is empty or the budget runs out
+
+Incremental vacuum needs ``auto_vacuum = INCREMENTAL``. New databases get it
+from :func:`services.database.init_db`; an existing file is converted once
+with the ``enable-auto-vacuum`` command (a full VACUUM, so run it off hours).
+
+:func:`run_if_due` (the scheduler's ``database_maintenance`` job) runs when
+the last run is older than ``RUN_INTERVAL`` and traffic is low: inside ``WINDOW_HOURS`` or with fewer
+than ``QUIET_EVENTS`` activity_log events in the last ``QUIET_MINUTES``.
+Each run's report (pages freed, plans changed, per-task timings) is kept in
+``maintenance_runs``.
+
+Usage:
+    python src/services/maintenance.py run [BUDGET_SECONDS]
+    python src/services/maintenance.py history
+    python src/services/maintenance.py enable-auto-vacuum
+"""
+
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Allow running this file directly from the services folder
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from services.database import get_db_connection
+
+RUN_INTERVAL = timedelta(hours=24)
+DEFAULT_BUDGET_SECONDS = 60
+
+# Low-traffic window: these local hours, or a quiet activity log
+WINDOW_HOURS = range(1, 5)
+QUIET_MINUTES = 15
+QUIET_EVENTS = 3
+
+# Rows sampled per index by ANALYZE (0 = all rows)
+ANALYSIS_LIMIT = 1000
+VACUUM_STEP_PAGES = 256
+
+# A run that has not finished after this long is treated as abandoned
+STALE_RUN = timedelta(hours=1)
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_AUTO_VACUUM_MODES = {0: 'none', 1: 'full', 2: 'incremental'}
+
+
+def init_maintenance_schema(cursor):
+    """Create the run history table."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS maintenance_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            started_at TIMESTAMP NOT NULL,
+            finished_at TIMESTAMP,
+            trigger TEXT NOT NULL,
+            report TEXT
+        )
+    """)
+
+
+def _now():
+    return datetime.now().strftime(TIMESTAMP_FORMAT)
+
+
+def _pragma(cursor, name):
+    cursor.execute(f"PRAGMA {name}")
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def _file_stats(cursor):
+    page_size = _pragma(cursor, "page_size")
+    return {
+        'page_size': page_size,
+        'page_count': _pragma(cursor, "page_count"),
+        'freelist_count': _pragma(cursor, "freelist_count"),
+    }
+
+
+def _known_plans(cursor):
+    """Plans of the index advisor's known queries: {name: [detail, ...]}."""
+    from services.index_advisor import KNOWN_QUERIES, explain
+
+    plans = {}
+    for name, sql in KNOWN_QUERIES:
+        plan = explain(cursor.connection, sql)
+        if plan is not None:
+            plans[name] = plan
+    return plans
+
+
+def is_low_traffic(cursor, now=None):
+    """True inside WINDOW_HOURS or when the activity log has been quiet."""
+    now = now or datetime.now()
+    if now.hour in WINDOW_HOURS:
+        return True
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='activity_log'")
+    if cursor.fetchone() is None:
+        return True
+    since = (now - timedelta(minutes=QUIET_MINUTES)).strftime(TIMESTAMP_FORMAT)
+    cursor.execute("SELECT COUNT(*) FROM (SELECT 1 FROM activity_log WHERE timestamp >= ? LIMIT ?)", (since, QUIET_EVENTS))
+    return cursor.fetchone()[0] < QUIET_EVENTS
+
+
+def _checkpoint(cursor, deadline):
+    if str(_pragma(cursor, "journal_mode")).lower() != "wal":
+        return {'status': 'skipped', 'detail': "not in WAL mode"}
+    cursor.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    busy, log_frames, checkpointed = cursor.fetchone()
+    mode = "truncate"
+    if busy:
+        # Readers still need older frames; copy what we can without waiting on them
+        cursor.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        busy, log_frames, checkpointed = cursor.fetchone()
+        mode = "passive"
+    return {
+        'status': 'partial' if busy or checkpointed < log_frames else 'done',
+        'detail': f"{mode}: {checkpointed} of {log_frames} WAL frames checkpointed",
+        'wal_frames': log_frames,
+        'checkpointed': checkpointed,
+    }
+
+
+def _analyze(cursor, deadline):
+    before = _known_plans(cursor)
+    cursor.execute(f"PRAGMA analysis_limit = {ANALYSIS_LIMIT}")
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")
+    if cursor.fetchone() is None:
+        cursor.execute("ANALYZE")
+        detail = f"ANALYZE (analysis_limit {ANALYSIS_LIMIT})"
+    else:
+        cursor.execute("PRAGMA optimize")
+        cursor.fetchall()
+        detail = "PRAGMA optimize"
+    cursor.connection.commit()
+    after = _known_plans(cursor)
+    changed = [
+        {'query': name, 'before': before.get(name), 'after': plan}
+        for name, plan in after.items() if before.get(name) != plan
+    ]
+    return {'status': 'done', 'detail': detail, 'plans_changed': changed}
+
+
+def _vacuum(cursor, deadline):
+    mode = _pragma(cursor, "auto_vacuum")
+    free = _pragma(cursor, "freelist_count")
+    if mode != 2:
+        return {
+            'status': 'skipped',
+            'detail': f"auto_vacuum is {_AUTO_VACUUM_MODES.get(mode, mode)}; run enable-auto-vacuum once to reclaim {free} free pages",
+            'pages_freed': 0,
+        }
+    freed = 0
+    while free and time.monotonic() < deadline:
+        cursor.execute(f"PRAGMA incremental_vacuum({VACUUM_STEP_PAGES})")
+        cursor.fetchall()
+        cursor.connection.commit()
+        remaining = _pragma(cursor, "freelist_count")
+        freed += free - remaining
+        if remaining >= free:
+            break
+        free = remaining
+    return {
+        'status': 'partial' if free else 'done',
+        'detail': f"{freed} pages returned to the filesystem, {free} still free",
+        'pages_freed': freed,
+    }
+
+
+TASKS = (
+    ('checkpoint', _checkpoint),
+    ('analyze', _analyze),
+    ('vacuum', _vacuum),
+)
+
+
+def run_maintenance(budget=DEFAULT_BUDGET_SECONDS, trigger="manual"):
+    """
+    Run every maintenance task within ``budget`` seconds and record the report.
+
+    Tasks that would start after the budget is spent are skipped; the
+    vacuum stops between steps.
+
+    Returns:
+        dict: started_at, finished_at, trigger, budget, tasks ({name: result}),
+        pages_freed, bytes_freed, plans_changed, before and after
+        (page_size, page_count, freelist_count)
+    """
+    started = time.monotonic()
+    deadline = started + budget
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    init_maintenance_schema(cursor)
+    started_at = _now()
+    cursor.execute("INSERT INTO maintenance_runs (started_at, trigger) VALUES (?, ?)", (started_at, trigger))
+    run_id = cursor.lastrowid
+    conn.commit()
+
+    report = {'started_at': started_at, 'trigger': trigger, 'budget': budget, 'tasks': {}}
+    try:
+        report['before'] = _file_stats(cursor)
+        for name, task in TASKS:
+            if time.monotonic() >= deadline:
+                report['tasks'][name] = {'status': 'skipped', 'detail': "time budget spent"}
+                continue
+            task_started = time.monotonic()
+            try:
+                result = task(cursor, deadline)
+            except Exception as ex:
+                conn.rollback()
+                result = {'status': 'failed', 'detail': str(ex)}
+            result['seconds'] = round(time.monotonic() - task_started, 3)
+            report['tasks'][name] = result
+        report['after'] = _file_stats(cursor)
+    finally:
+        report['finished_at'] = _now()
+        report['pages_freed'] = report['tasks'].get('vacuum', {}).get('pages_freed', 0)
+        report['bytes_freed'] = report['pages_freed'] * report.get('before', {}).get('page_size', 0)
+        report['plans_changed'] = report['tasks'].get('analyze', {}).get('plans_changed', [])
+        cursor.execute(
+            "UPDATE maintenance_runs SET finished_at = ?, report = ? WHERE id = ?",
+            (report['finished_at'], json.dumps(report), run_id),
+        )
+        conn.commit()
+        conn.close()
+    return report
+
+
+def _due(cursor, now):
+    """True when no run is in progress and the last one started RUN_INTERVAL ago or more."""
+    cursor.execute("SELECT started_at, finished_at FROM maintenance_runs ORDER BY id DESC LIMIT 1")
+    last = cursor.fetchone()
+    if last is None:
+        return True
+    started_at = datetime.strptime(last['started_at'], TIMESTAMP_FORMAT)
+    if last['finished_at'] is None and now - started_at < STALE_RUN:
+        return False
+    return now - started_at >= RUN_INTERVAL
+
+
+def run_if_due(budget=DEFAULT_BUDGET_SECONDS, now=None):
+    """Run maintenance when it is due and traffic is low; returns the report, or None if skipped."""
+    now = now or datetime.now()
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    init_maintenance_schema(cursor)
+    conn.commit()
+    try:
+        if not (_due(cursor, now) and is_low_traffic(cursor, now)):
+            return None
+    finally:
+        conn.close()
+    return run_maintenance(budget, trigger="scheduled")
+
+
+def get_history(limit=20):
+    """Recent runs, newest first, with their reports decoded."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    init_maintenance_schema(cursor)
+    cursor.execute("SELECT * FROM maintenance_runs ORDER BY id DESC LIMIT ?", (limit,))
+    runs = []
+    for row in cursor.fetchall():
+        run = dict(row)
+        run['report'] = json.loads(run['report']) if run['report'] else None
+        runs.append(run)
+    conn.close()
+    return runs
+
+
+def enable_auto_vacuum():
+    """
+    Switch the database to incremental auto_vacuum.
+
+    Rebuilds the whole file with VACUUM, which blocks writers while it runs.
+
+    Returns:
+        tuple: (previous mode, pages before, pages after)
+    """
+    conn = get_db_connection()
+    conn.isolation_level = None
+    cursor = conn.cursor()
+    previous = _AUTO_VACUUM_MODES.get(_pragma(cursor, "auto_vacuum"))
+    pages_before = _pragma(cursor, "page_count")
+    cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    cursor.execute("VACUUM")
+    pages_after = _pragma(cursor, "page_count")
+    conn.close()
+    return previous, pages_before, pages_after
+
+
+def _print_report(report):
+    print(f"🧹 Maintenance {report['started_at']} → {report['finished_at']} ({report['trigger']}, budget {report['budget']}s)")
+    for name, result in report['tasks'].items():
+        seconds = f" in {result['seconds']}s" if 'seconds' in result else ""
+        print(f"  {name:<11} {result['status']:<8} {result['detail']}{seconds}")
+    print(f"  pages freed: {report['pages_freed']} ({report['bytes_freed'] / 1024:,.0f} KB)")
+    for change in report['plans_changed']:
+        print(f"  plan changed: {change['query']}")
+        print(f"    before: {' | '.join(change['before'] or ['(none)'])}")
+        print(f"    after:  {' | '.join(change['after'])}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    command = args[0] if args else None
+
+    if command == "run":
+        budget = float(args[1]) if len(args) > 1 else DEFAULT_BUDGET_SECONDS
+        _print_report(run_maintenance(budget))
+    elif command == "history":
+        for run in get_history():
+            if run['report']:
+                _print_report(run['report'])
+            else:
+                print(f"🧹 Maintenance {run['started_at']} ({run['trigger']}) did not finish")
+    elif command == "enable-auto-vacuum":
+        previous, before, after = enable_auto_vacuum()
+        print(f"✅ auto_vacuum {previous} → incremental; {before:,} pages → {after:,} pages")
+    else:
+        print(__doc__)
+        sys.exit(1)
@@ -0,0 +1,235 @@
+"""Prometheus metrics for the web deployment (``GET /metrics`` in app.py).
+
+The endpoint is only mounted when ``PMS_METRICS_TOKEN`` is set and answers
+401 unless the scraper sends ``Authorization: Bearer <token>``.
+
+Everything is read from memory except a handful of database gauges, which
+come from small lookups (``sqlite_sequence``, the reorder and review
+queues, consumer checkpoints) and are cached for ``DB_GAUGE_SECONDS`` so
+frequent scrapes cost nothing extra. Checkout and invoice throughput are exported as
+counters (the AUTOINCREMENT high-water marks), so ``rate()`` gives orders
+and invoices per second across all app processes.
+
+Exported families:
+
+- sessions: active Flet sessions in this process
+- route renders: count and build/view/SQL time histograms per route (render_metrics)
+- event handlers: run time histogram per route (render_metrics)
+- handler SQL: statements and time per route and handler while SQL profiling is on
+- database: connections opened (the app opens one per unit of work; there is no pool)
+- report snapshot cache: requests served fresh, stale or rebuilt (analytics_snapshot)
+- queues: reorder queue, claimable prescriptions, change-capture consumer backlog,
+  audit logger queue size and high-water mark
+- throughput: orders, invoices and payments created
+- backups: age, copy throughput and writer wait of the newest backup (services.backup)
+"""
+
+import threading
+import time
+
+from services import analytics_snapshot, audit_logger, backup, database, query_profiler, render_metrics
+from services.change_capture import list_consumers
+from services.reorder import count_reorder_queue
+from services.review_queue import count_available
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DB_GAUGE_SECONDS = 5
+
+_lock = threading.Lock()
+_sessions = set()
+_connections_opened = 0
+_db_gauges = None
+_db_gauges_at = 0.0
+
+
+def _count_connection(conn):
+    global _connections_opened
+    with _lock:
+        _connections_opened += 1
+
+
+def install():
+    """Start counting connections; safe to call from every session."""
+    database.add_connect_hook(_count_connection)
+
+
+def track_session(page):
+    """Count ``page`` as active until Flet closes its session."""
+    session_id = getattr(page, 'session_id', None) or id(page)
+    with _lock:
+        _sessions.add(session_id)
+
+    def on_close(e):
+        with _lock:
+            _sessions.discard(session_id)
+
+    page.on_close = on_close
+
+
+def _label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_label_value(value)}"' for key, value in labels.items()) + "}"
+
+
+class _Writer:
+    def __init__(self):
+        self.lines = []
+
+    def family(self, name, kind, help_text):
+        self.lines.append(f"# HELP {name} {help_text}")
+        self.lines.append(f"# TYPE {name} {kind}")
+
+    def sample(self, name, value, **labels):
+        self.lines.append(f"{name}{_labels(labels)} {value}")
+
+    def histogram(self, name, data, scale=1.0, **labels):
+        """Write a render_metrics histogram dict; ``scale`` converts units (ms to seconds)."""
+        for bound, count in data['buckets']:
+            le = bound if bound == "+Inf" else f"{bound * scale:.10g}"
+            self.sample(f"{name}_bucket", count, **labels, le=le)
+        self.sample(f"{name}_sum", round(data['sum'] * scale, 6), **labels)
+        self.sample(f"{name}_count", data['count'], **labels)
+
+    def text(self):
+        return "\n".join(self.lines) + "\n"
+
+
+def _read_db_gauges():
+    conn = database.get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT name, seq FROM sqlite_sequence WHERE name IN ('orders', 'invoices', 'payments')")
+        created = {row['name']: row['seq'] for row in cursor.fetchall()}
+        reorder_total, reorder_out = count_reorder_queue(cursor)
+    finally:
+        conn.close()
+
+    taken_at = analytics_snapshot.snapshot_taken_at()
+    backups = backup.list_backups()
+    return {
+        'created': created,
+        'reorder_total': reorder_total,
+        'reorder_out': reorder_out,
+        'claimable': count_available(),
+        'backlogs': {row['name']: row['backlog'] for row in list_consumers()},
+        'snapshot_age': analytics_snapshot.snapshot_age_seconds(taken_at) if taken_at else None,
+        'backup': backups[0] if backups else None,
+    }
+
+
+def _db_gauges_cached():
+    global _db_gauges, _db_gauges_at
+    with _lock:
+        if _db_gauges is not None and time.monotonic() - _db_gauges_at < DB_GAUGE_SECONDS:
+            return _db_gauges
+    gauges = _read_db_gauges()
+    with _lock:
+        _db_gauges, _db_gauges_at = gauges, time.monotonic()
+    return gauges
+
+
+def render():
+    """Current metrics in the Prometheus text exposition format."""
+    out = _Writer()
+
+    with _lock:
+        active_sessions = len(_sessions)
+        connections_opened = _connections_opened
+
+    out.family("pms_active_sessions", "gauge", "Flet sessions open in this process.")
+    out.sample("pms_active_sessions", active_sessions)
+
+    # Route renders
+    routes = render_metrics.dump()['routes']
+    out.family("pms_route_renders_total", "counter", "route_change renders per route.")
+    for route, entry in routes.items():
+        out.sample("pms_route_renders_total", entry['renders'], route=route)
+    for metric, key, help_text in (
+        ("pms_route_build_seconds", 'build_ms', "Time to build and send a route, from route_change to page.update()."),
+        ("pms_route_view_seconds", 'view_ms', "Time spent in the route's view constructor."),
+        ("pms_route_db_seconds", 'db_ms', "SQL time during a route render (recorded while SQL profiling is on)."),
+        ("pms_route_handler_seconds", 'handler_ms', "Run time of control event handlers (clicks, changes, submits) per route."),
+    ):
+        out.family(metric, "histogram", help_text)
+        for route, entry in routes.items():
+            out.histogram(metric, entry[key], scale=0.001, route=route)
+    out.family("pms_route_update_bytes", "histogram", "Serialized size of page.update() diffs per route (recorded while SQL profiling is on).")
+    for route, entry in routes.items():
+        out.histogram("pms_route_update_bytes", entry['update_bytes'], route=route)
+
+    # Handler SQL (only populated while profiling)
+    handlers = query_profiler.snapshot()['handlers'] if query_profiler.is_enabled() else []
+    out.family("pms_sql_profiling_enabled", "gauge", "1 while the SQL profiler is recording.")
+    out.sample("pms_sql_profiling_enabled", int(query_profiler.is_enabled()))
+    out.family("pms_handler_statements_total", "counter", "SQL statements run per route and handler.")
+    for row in handlers:
+        out.sample("pms_handler_statements_total", row['statements'], route=row['route'], handler=row['handler'])
+    out.family("pms_handler_sql_seconds_total", "counter", "SQL time per route and handler.")
+    for row in handlers:
+        out.sample("pms_handler_sql_seconds_total", round(row['total_ms'] / 1000, 6), route=row['route'], handler=row['handler'])
+    out.family("pms_handler_sql_max_seconds", "gauge", "Slowest single statement per route and handler.")
+    for row in handlers:
+        out.sample("pms_handler_sql_max_seconds", round(row['max_ms'] / 1000, 6), route=row['route'], handler=row['handler'])
+
+    # Database connections
+    out.family("pms_db_connections_opened_total", "counter", "SQLite connections opened by this process.")
+    out.sample("pms_db_connections_opened_total", connections_opened)
+
+    # Audit logger queue
+    audit = audit_logger.get_metrics()
+    out.family("pms_audit_queue_size", "gauge", "Activity events waiting for the audit logger's writer thread.")
+    out.sample("pms_audit_queue_size", audit['queue_depth'])
+    out.family("pms_audit_queue_high_water", "gauge", "Largest audit logger queue size seen since the process started.")
+    out.sample("pms_audit_queue_high_water", audit['queue_high_water'])
+    out.family("pms_audit_queue_capacity", "gauge", "Audit logger queue bound; enqueues block once it is reached.")
+    out.sample("pms_audit_queue_capacity", audit['queue_capacity'])
+
+    # Report snapshot cache
+    out.family("pms_report_snapshot_requests_total", "counter", "Report connections by snapshot state: fresh (hit), stale (served, refreshing) or missing (rebuilt).")
+    for result, count in analytics_snapshot.request_counts().items():
+        out.sample("pms_report_snapshot_requests_total", count, result=result)
+
+    # Database gauges
+    gauges = _db_gauges_cached()
+    out.family("pms_reorder_queue_depth", "gauge", "Medicines at or below their reorder point.")
+    out.sample("pms_reorder_queue_depth", gauges['reorder_total'])
+    out.family("pms_out_of_stock_medicines", "gauge", "Queued medicines with no stock left.")
+    out.sample("pms_out_of_stock_medicines", gauges['reorder_out'])
+    out.family("pms_review_queue_depth", "gauge", "Pending prescriptions not currently claimed by a pharmacist.")
+    out.sample("pms_review_queue_depth", gauges['claimable'])
+    out.family("pms_change_capture_backlog", "gauge", "Change-log rows a consumer has not read yet.")
+    for name, backlog in gauges['backlogs'].items():
+        out.sample("pms_change_capture_backlog", backlog, consumer=name)
+    out.family("pms_report_snapshot_age_seconds", "gauge", "Age of the analytics snapshot used by reports.")
+    if gauges['snapshot_age'] is not None:
+        out.sample("pms_report_snapshot_age_seconds", round(gauges['snapshot_age'], 1))
+
+    for table, help_text in (
+        ('orders', "Orders created (checkouts and POS sales)."),
+        ('invoices', "Invoices created."),
+        ('payments', "Payments recorded against invoices."),
+    ):
+        name = f"pms_{table}_created_total"
+        out.family(name, "counter", help_text)
+        out.sample(name, gauges['created'].get(table, 0))
+
+    latest = gauges['backup']
+    if latest is not None:
+        out.family("pms_backup_age_seconds", "gauge", "Age of the newest database backup.")
+        out.sample("pms_backup_age_seconds", round(analytics_snapshot.snapshot_age_seconds(latest['created_at']), 1))
+        out.family("pms_backup_bytes", "gauge", "Size of the newest backup, before and after compression.")
+        out.sample("pms_backup_bytes", latest['db_bytes'], state="raw")
+        out.sample("pms_backup_bytes", latest['compressed_bytes'], state="compressed")
+        out.family("pms_backup_copy_bytes_per_second", "gauge", "Copy throughput of the newest backup.")
+        out.sample("pms_backup_copy_bytes_per_second", round(latest['db_bytes'] / latest['copy']['seconds']) if latest['copy']['seconds'] else 0)
+        out.family("pms_backup_writer_wait_seconds", "gauge", "Longest and total write-lock wait measured during the newest backup.")
+        out.sample("pms_backup_writer_wait_seconds", round(latest['writers']['max_wait_ms'] / 1000, 6), stat="max")
+        out.sample("pms_backup_writer_wait_seconds", round(latest['writers']['total_wait_ms'] / 1000, 6), stat="total")
+
+    return out.text()
@@ -0,0 +1,195 @@
+"""Order fulfilment actions shared by the staff and pharmacist views."""
+
+from datetime import datetime
+
+from services.database import get_db_connection
+from services.live_updates import ORDERS_TOPIC, publish
+from services.search import search as search_notes
+from services.versioning import compare_and_set
+
+ORDER_STATUSES = ("Pending", "Processing", "Ready", "Completed", "Cancelled")
+LOCKED_STATUSES = ("Completed", "Cancelled")
+
+# order_items.pharmacist_approved values
+ITEM_PENDING = 0
+ITEM_APPROVED = 1
+ITEM_REJECTED = -1
+
+
+def _now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def get_orders(search_text="", status_filter="All", order_ids=None):
+    """
+    Orders for the tracking board, oldest first.
+
+    Args:
+        search_text (str): Patient name, order id, or note text (full-text index)
+        status_filter (str): Order status or "All"
+        order_ids (list): Restrict to these orders (live updates reload only
+            the orders that changed)
+
+    Returns:
+        tuple: (rows (id, patient_id, full_name, phone, status, total_amount,
+        order_date, updated_at, pharmacy_notes, discount_request,
+        discount_verified, version), {order id: best note hit})
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    sql = """
+        SELECT o.id, o.patient_id, u.full_name, u.phone, o.status,
+               o.total_amount, o.order_date, COALESCE(o.updated_at, o.order_date), o.pharmacy_notes,
+               o.discount_request, o.discount_verified, o.version
+        FROM orders o
+        JOIN users u ON o.patient_id = u.id
+        WHERE 1=1
+    """
+    params = []
+
+    if status_filter != "All":
+        sql += " AND o.status = ?"
+        params.append(status_filter)
+
+    if order_ids is not None:
+        sql += f" AND o.id IN ({','.join('?' * len(order_ids)) or 'NULL'})"
+        params.extend(order_ids)
+
+    matches = {}
+    if search_text:
+        # Pharmacy, patient and item approval notes through the full-text index
+        for hit in search_notes(search_text, entities=['order'], limit=200):
+            if order_ids is None or hit['entity_id'] in order_ids:
+                matches.setdefault(hit['entity_id'], hit)
+        sql += f" AND (u.full_name LIKE ? OR CAST(o.id AS TEXT) LIKE ? OR o.id IN ({','.join('?' * len(matches)) or 'NULL'}))"
+        params.append(f"%{search_text}%")
+        params.append(f"%{search_text}%")
+        params.extend(matches)
+
+    sql += " ORDER BY o.id ASC"
+    cursor.execute(sql, params)
+    orders = cursor.fetchall()
+    conn.close()
+    return orders, matches
+
+
+def get_order_items(order_id):
+    """Items of one order (id, medicine, quantity, unit_price, approved, pharmacist, notes)."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT oi.id, m.name, oi.quantity, oi.unit_price, oi.pharmacist_approved,
+               ph.full_name, oi.approval_notes
+        FROM order_items oi
+        JOIN medicines m ON oi.medicine_id = m.id
+        LEFT JOIN users ph ON oi.pharmacist_id = ph.id
+        WHERE oi.order_id = ?
+    """, (order_id,))
+    items = cursor.fetchall()
+    conn.close()
+    return items
+
+
+def bulk_verify_items(pharmacist_id, item_ids, approve, notes=None):
+    """
+    Approve or reject several order items in one transaction.
+
+    Items that are already verified, or belong to a completed/cancelled
+    order, are skipped and reported.
+
+    Args:
+        pharmacist_id (int): Verifying pharmacist
+        item_ids (list): order_items ids
+        approve (bool): True to approve, False to reject
+        notes (str): Approval notes stored on every item
+
+    Returns:
+        tuple: (list of (item id, order id, medicine name) verified, {item id: reason} skipped)
+    """
+    if not item_ids:
+        return [], {}
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    done, failed = [], {}
+    try:
+        cursor.execute(f"""
+            SELECT oi.id, oi.order_id, oi.pharmacist_approved, o.status, m.name
+            FROM order_items oi
+            JOIN orders o ON o.id = oi.order_id
+            LEFT JOIN medicines m ON m.id = oi.medicine_id
+            WHERE oi.id IN ({','.join('?' * len(item_ids))})
+        """, list(item_ids))
+        items = {row['id']: row for row in cursor.fetchall()}
+
+        for item_id in item_ids:
+            item = items.get(item_id)
+            if item is None:
+                failed[item_id] = "not found"
+            elif item['status'] in LOCKED_STATUSES:
+                failed[item_id] = f"order #{item['order_id']} is {item['status']}"
+            else:
+                # Re-checks the pending state so a concurrent verification is not overwritten
+                cursor.execute("""
+                    UPDATE order_items
+                    SET pharmacist_approved = ?, pharmacist_id = ?, approval_notes = ?
+                    WHERE id = ? AND pharmacist_approved = ?
+                """, (ITEM_APPROVED if approve else ITEM_REJECTED, pharmacist_id,
+                      notes or ("Verified by pharmacist" if approve else "Rejected by pharmacist"),
+                      item_id, ITEM_PENDING))
+                if cursor.rowcount:
+                    done.append((item_id, item['order_id'], item['name']))
+                else:
+                    failed[item_id] = "already verified"
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    publish(ORDERS_TOPIC, {order_id for _, order_id, _ in done})
+    return done, failed
+
+
+def bulk_update_status(staff_id, order_versions, new_status):
+    """
+    Move several orders to ``new_status`` in one transaction.
+
+    Each move is a compare-and-set against the version the board displayed
+    and the state-transition table, so orders changed in another session
+    since, locked (completed/cancelled) orders and no-op moves are reported
+    as conflicts without reading the orders first.
+
+    Args:
+        staff_id (int): Staff member making the change
+        order_versions (dict): {order id: version the board displayed}
+        new_status (str): One of ORDER_STATUSES
+
+    Returns:
+        tuple: (list of order ids updated, {order id: reason} skipped)
+    """
+    if new_status not in ORDER_STATUSES:
+        raise ValueError(f"Unknown order status: {new_status}")
+    if not order_versions:
+        return [], {}
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    done, failed = [], {}
+    try:
+        now = _now()
+        for order_id, version in sorted(order_versions.items()):
+            ok, reason = compare_and_set(cursor, 'orders', order_id, {'staff_id': staff_id, 'updated_at': now},
+                                         expected_version=version, to_status=new_status)
+            if ok:
+                done.append(order_id)
+            else:
+                failed[order_id] = reason
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    publish(ORDERS_TOPIC, done)
+    return done, failed
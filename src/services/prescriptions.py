@@ -0,0 +1,146 @@
+"""Prescription queries shared by the pharmacist list and report views."""
+
+from services.database import get_db_connection
+from services.search import search as search_notes
+
+
+def get_prescriptions(status="All", search=""):
+    """
+    Prescription list with the pharmacist page filters applied, newest first.
+
+    The search matches patient names and prescription ids, plus notes
+    through the full-text index.
+
+    Returns:
+        tuple: (list of prescription dicts, {prescription id: best note hit})
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    # Base query
+    query = """
+        SELECT p.id, p.status, p.created_at, p.dosage, p.frequency, p.duration,
+               p.notes, p.pharmacist_notes, p.reviewed_date,
+               u.full_name as patient_name, u.id as patient_id,
+               m.name as medicine_name, p.version
+        FROM prescriptions p
+        LEFT JOIN users u ON p.patient_id = u.id
+        LEFT JOIN medicines m ON p.medicine_id = m.id
+        WHERE 1=1
+    """
+
+    params = []
+
+    # Apply status filter constraint
+    if status != "All":
+        query += " AND p.status = ?"
+        params.append(status)
+
+    # Apply text search constraint (names and IDs, plus notes via the full-text index)
+    note_matches = {}
+    if search:
+        for hit in search_notes(search, entities=['prescription'], limit=200):
+            note_matches.setdefault(hit['entity_id'], hit)
+        query += f" AND (u.full_name LIKE ? OR p.id LIKE ? OR p.id IN ({','.join('?' * len(note_matches)) or 'NULL'}))"
+        params.append(f"%{search}%")
+        params.append(f"%{search}%")
+        params.extend(note_matches)
+
+    # Apply chronological sort
+    query += " ORDER BY p.created_at DESC"
+
+    cursor.execute(query, params)
+    results = cursor.fetchall()
+    conn.close()
+
+    # Map database rows to dictionaries
+    prescriptions = []
+    for row in results:
+        prescriptions.append({
+            'id': row[0],
+            'status': row[1],
+            'created_at': row[2],
+            'dosage': row[3],
+            'frequency': row[4],
+            'duration': row[5],
+            'notes': row[6],
+            'pharmacist_notes': row[7],
+            'reviewed_date': row[8],
+            'patient_name': row[9],
+            'patient_id': row[10],
+            'medicine': row[11],
+            'version': row[12],
+        })
+
+    return prescriptions, note_matches
+
+
+def get_pharmacy_report(cursor, date_start, date_end):
+    """
+    Aggregates for the pharmacist report over an inclusive date range.
+
+    Args:
+        cursor: Report cursor (normally the analytics snapshot)
+        date_start (str): "YYYY-MM-DD"
+        date_end (str): "YYYY-MM-DD"
+
+    Returns:
+        dict: stats row (total, pending, approved, rejected, dispensed),
+        top_medicines rows (name, count), pharmacist_activity rows
+        (name, reviewed) and low_stock rows (name, stock, expiry_date)
+    """
+    # Get prescription statistics
+    cursor.execute("""
+        SELECT
+            COUNT(*) as total,
+            SUM(CASE WHEN status = 'Pending' THEN 1 ELSE 0 END) as pending,
+            SUM(CASE WHEN status = 'Approved' THEN 1 ELSE 0 END) as approved,
+            SUM(CASE WHEN status = 'Rejected' THEN 1 ELSE 0 END) as rejected,
+            SUM(CASE WHEN status = 'Dispensed' THEN 1 ELSE 0 END) as dispensed
+        FROM prescriptions
+        WHERE DATE(created_at) BETWEEN ? AND ?
+    """, (date_start, date_end))
+    stats = cursor.fetchone()
+
+    # Get top prescribed medicines
+    cursor.execute("""
+        SELECT m.name, COUNT(p.id) as count
+        FROM prescriptions p
+        LEFT JOIN medicines m ON p.medicine_id = m.id
+        WHERE DATE(p.created_at) BETWEEN ? AND ?
+        GROUP BY m.name
+        ORDER BY count DESC
+        LIMIT 5
+    """, (date_start, date_end))
+    top_medicines = cursor.fetchall()
+
+    # Get pharmacist activity
+    cursor.execute("""
+        SELECT
+            u.full_name,
+            COUNT(p.id) as reviewed_count
+        FROM prescriptions p
+        LEFT JOIN users u ON p.pharmacist_id = u.id
+        WHERE p.pharmacist_id IS NOT NULL
+        AND DATE(p.reviewed_date) BETWEEN ? AND ?
+        GROUP BY u.full_name
+        ORDER BY reviewed_count DESC
+    """, (date_start, date_end))
+    pharmacist_activity = cursor.fetchall()
+
+    # Get low stock medicines from the reorder queue
+    cursor.execute("""
+        SELECT m.name, m.stock, m.expiry_date
+        FROM reorder_queue q
+        JOIN medicines m ON m.id = q.medicine_id
+        ORDER BY m.stock ASC
+        LIMIT 10
+    """)
+    low_stock = cursor.fetchall()
+
+    return {
+        'stats': stats,
+        'top_medicines': top_medicines,
+        'pharmacist_activity': pharmacist_activity,
+        'low_stock': low_stock,
+    }
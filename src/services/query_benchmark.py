@@ -0,0 +1,386 @@
+"""Query benchmark suite for the data-access functions behind the main pages.
+
+Runs the same service calls the views make (invoice and payment lists, the
+order board, prescriptions, audit log pages, billing, pharmacy and admin
+reports, the dashboards, full-text search) against synthetic datasets from
+:mod:`services.synthetic_data`, one per preset, and records per case:
+
+    p50_ms, p95_ms  latency over the timed repeats (after warmup runs)
+    rows            rows the call returned
+    vm_steps        SQLite virtual machine steps for one call, counted with
+                    a progress handler; a stable, machine-independent proxy
+                    for rows scanned
+    full_scans      tables (by query alias) read by a full table scan, from
+                    EXPLAIN QUERY PLAN of every statement the call ran
+
+The step count and plans come from one extra instrumented call, so the
+progress handler does not distort the timings.
+
+Results are compared with a baseline file. A case regresses when its p50
+and p95 both grow by more than the threshold (and p95 by at least
+``MIN_DELTA_MS``), when its vm_steps grow by more than the threshold, or
+when it picks up a full scan the baseline did not have. Any regression
+exits with status 1, so the suite can gate a build.
+
+Datasets are generated once into storage/bench/<preset>-<seed>/ and reused;
+delete the folder (or pass --regenerate) after schema changes. Baselines
+are machine specific and are not committed.
+
+Usage:
+    python src/services/query_benchmark.py [--presets small,medium] [--repeat N]
+        [--warmup N] [--seed N] [--threshold 0.25] [--baseline FILE]
+        [--save-baseline] [--regenerate] [--only NAME,...]
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Allow running this file directly from the services folder
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from services import database
+from services.database import get_db_connection
+
+BENCH_DIR = os.path.join(database.DB_PATH, 'bench')
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baseline.json')
+
+DEFAULT_PRESETS = ('small', 'medium')
+DEFAULT_REPEAT = 20
+DEFAULT_WARMUP = 2
+DEFAULT_THRESHOLD = 0.25
+
+# Latency changes smaller than this are noise, whatever the ratio
+MIN_DELTA_MS = 2.0
+
+# Progress handler granularity (vm_steps are counted in these units)
+PROGRESS_STEP = 100
+
+
+def _count(result):
+    """Rows returned by a case: list length, first element of a (rows, extra) tuple, or dict of lists."""
+    if isinstance(result, tuple):
+        result = result[0]
+    if isinstance(result, dict):
+        return sum(len(value) for value in result.values() if isinstance(value, list))
+    return len(result) if result is not None else 0
+
+
+def _context():
+    """Data-dependent arguments (ids, names, dates) picked from the current dataset."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT id FROM users WHERE role = 'Pharmacist' ORDER BY id LIMIT 1")
+    pharmacist_id = cursor.fetchone()[0]
+    cursor.execute("SELECT MAX(id) FROM orders")
+    last_order = cursor.fetchone()[0] or 0
+    conn.close()
+
+    today = datetime.now()
+    return {
+        'pharmacist_id': pharmacist_id,
+        'order_id': last_order,
+        'recent_order_ids': list(range(max(last_order - 9, 1), last_order + 1)),
+        'month_start': (today - timedelta(days=30)).strftime("%Y-%m-%d"),
+        'today': today.strftime("%Y-%m-%d"),
+        'week_ago': (today - timedelta(days=7)).strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+def build_cases(ctx):
+    """
+    Benchmark cases as (name, callable). Each callable makes the same call
+    (or calls) a page makes and returns what the page would render.
+    """
+    from services.analytics_snapshot import get_report_connection, refresh_snapshot
+    from services.audit import query_events
+    from services.billing import (get_invoices, get_payments, get_billing_stats,
+                                  get_recent_invoices, get_billing_report)
+    from services.dashboards import get_admin_dashboard, get_pharmacist_dashboard, get_staff_dashboard
+    from services.orders import get_orders, get_order_items
+    from services.prescriptions import get_prescriptions, get_pharmacy_report
+    from services.reports import (get_user_activity_report, get_inventory_report, get_prescription_summary,
+                                  get_low_stock_report, get_system_usage_report, get_orders_summary,
+                                  get_stock_movement_summary)
+    from services.search import search
+
+    # Reports read the snapshot; take a fresh one of this dataset up front
+    refresh_snapshot()
+
+    def on_cursor(fn, report=False):
+        def run():
+            conn = get_report_connection() if report else get_db_connection()
+            try:
+                return fn(conn.cursor())
+            finally:
+                conn.close()
+        return run
+
+    def billing_dashboard(cursor):
+        return [get_billing_stats(cursor)] + get_recent_invoices(cursor)
+
+    return [
+        ('invoices.all', lambda: get_invoices()),
+        ('invoices.unpaid_month', lambda: get_invoices("Unpaid", "All", ctx['month_start'], ctx['today'])),
+        ('invoices.search', lambda: get_invoices(search="Santos")),
+        ('payments.all', lambda: get_payments()),
+        ('payments.gcash_month', lambda: get_payments("GCash", ctx['month_start'], ctx['today'])),
+        ('orders.board', lambda: get_orders()),
+        ('orders.pending', lambda: get_orders(status_filter="Pending")),
+        ('orders.search_notes', lambda: get_orders("guard house")),
+        ('orders.live_patch', lambda: get_orders(order_ids=ctx['recent_order_ids'])),
+        ('orders.items', lambda: get_order_items(ctx['order_id'])),
+        ('prescriptions.all', lambda: get_prescriptions()),
+        ('prescriptions.pending', lambda: get_prescriptions("Pending")),
+        ('prescriptions.search_notes', lambda: get_prescriptions(search="penicillin")),
+        ('logs.first_page', lambda: query_events()),
+        ('logs.orders_week', lambda: query_events(event_type='orders', since=ctx['week_ago'])),
+        ('logs.search', lambda: query_events(search="logged in")),
+        ('search.all', lambda: search("refills")),
+        ('report.billing_month', on_cursor(lambda cursor: get_billing_report(cursor, ctx['month_start'], ctx['today']), report=True)),
+        ('report.pharmacy_month', on_cursor(lambda cursor: get_pharmacy_report(cursor, ctx['month_start'], ctx['today']), report=True)),
+        ('report.user_activity', on_cursor(get_user_activity_report, report=True)),
+        ('report.inventory', on_cursor(get_inventory_report, report=True)),
+        ('report.prescriptions', on_cursor(get_prescription_summary, report=True)),
+        ('report.low_stock', on_cursor(get_low_stock_report, report=True)),
+        ('report.system_usage', on_cursor(get_system_usage_report, report=True)),
+        ('report.orders_month', on_cursor(lambda cursor: get_orders_summary(cursor, ctx['month_start'], ctx['today']), report=True)),
+        ('report.stock_movements_month', on_cursor(lambda cursor: get_stock_movement_summary(cursor, ctx['month_start'], ctx['today']), report=True)),
+        ('dashboard.admin', on_cursor(get_admin_dashboard)),
+        ('dashboard.billing', on_cursor(billing_dashboard)),
+        ('dashboard.pharmacist', on_cursor(lambda cursor: get_pharmacist_dashboard(cursor, ctx['pharmacist_id']))),
+        ('dashboard.staff', on_cursor(get_staff_dashboard)),
+    ]
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _full_scans(statements):
+    """Tables a set of statements reads with a full table scan."""
+    conn = get_db_connection()
+    tables = set()
+    try:
+        for sql in statements:
+            try:
+                plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+            except sqlite3.Error:
+                continue
+            for row in plan:
+                detail = row[3]
+                if not detail.startswith("SCAN ") or " USING " in detail or "VIRTUAL TABLE" in detail:
+                    continue
+                table = detail.split()[1]
+                # Catalog and full-text shadow tables read by SQLite itself
+                if table.startswith("sqlite_") or "." in table or table == "CONSTANT":
+                    continue
+                tables.add(table)
+    finally:
+        conn.close()
+    return sorted(tables)
+
+
+def _instrumented_run(fn):
+    """Run once with step counting and statement capture on every connection."""
+    steps = [0]
+    statements = []
+
+    def on_step():
+        steps[0] += 1
+        return 0
+
+    def on_statement(sql):
+        head = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ""
+        if head in ("SELECT", "WITH") and sql not in statements:
+            statements.append(sql)
+
+    def hook(conn):
+        conn.set_progress_handler(on_step, PROGRESS_STEP)
+        conn.set_trace_callback(on_statement)
+
+    database.add_connect_hook(hook)
+    try:
+        result = fn()
+    finally:
+        database.remove_connect_hook(hook)
+    return result, steps[0] * PROGRESS_STEP, statements
+
+
+def run_case(fn, repeat=DEFAULT_REPEAT, warmup=DEFAULT_WARMUP):
+    """
+    Measure one case.
+
+    Returns:
+        dict: p50_ms, p95_ms, rows, vm_steps, full_scans
+    """
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+
+    result, vm_steps, statements = _instrumented_run(fn)
+    return {
+        'p50_ms': round(_percentile(timings, 50), 3),
+        'p95_ms': round(_percentile(timings, 95), 3),
+        'rows': _count(result),
+        'vm_steps': vm_steps,
+        'full_scans': _full_scans(statements),
+    }
+
+
+def prepare_dataset(preset, seed, regenerate=False):
+    """Point the app at the dataset for ``preset``, generating it on first use."""
+    from services.synthetic_data import generate
+
+    db_file = os.path.join(BENCH_DIR, f"{preset}-{seed}", 'pharmacy.db')
+    if regenerate and os.path.exists(db_file):
+        os.remove(db_file)
+    if not os.path.exists(db_file):
+        generate(preset, seed=seed, db_file=db_file)
+    database.DB_FILE = db_file
+    return db_file
+
+
+def run_suite(presets=DEFAULT_PRESETS, seed=None, repeat=DEFAULT_REPEAT, warmup=DEFAULT_WARMUP,
+              only=None, regenerate=False, verbose=True):
+    """
+    Run every case against each preset's dataset.
+
+    Returns:
+        dict: {preset: {case name: measurements}}
+    """
+    from services.synthetic_data import DEFAULT_SEED
+
+    seed = DEFAULT_SEED if seed is None else seed
+    say = print if verbose else (lambda *args, **kwargs: None)
+    original_db = database.DB_FILE
+    results = {}
+    try:
+        for preset in presets:
+            prepare_dataset(preset, seed, regenerate)
+            say(f"\n📏 {preset} (seed {seed}, {repeat} runs)")
+            results[preset] = {}
+            for name, fn in build_cases(_context()):
+                if only and not any(name.startswith(prefix) for prefix in only):
+                    continue
+                measured = run_case(fn, repeat, warmup)
+                results[preset][name] = measured
+                scans = f"  scans: {', '.join(measured['full_scans'])}" if measured['full_scans'] else ""
+                say(f"  {name:<28} p50 {measured['p50_ms']:>9.2f} ms  p95 {measured['p95_ms']:>9.2f} ms"
+                    f"  rows {measured['rows']:>7}  steps {measured['vm_steps']:>11,}{scans}")
+    finally:
+        database.DB_FILE = original_db
+    return results
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Regressions of ``results`` against ``baseline`` (same layout).
+
+    Cases or presets missing from the baseline are new and never regress.
+
+    Returns:
+        list: (preset, case, reason) tuples
+    """
+    regressions = []
+    for preset, cases in results.items():
+        for name, now in cases.items():
+            before = baseline.get(preset, {}).get(name)
+            if before is None:
+                continue
+            # A single slow outlier moves p95 alone; require the median to move too
+            slower = all(now[key] > before[key] * (1 + threshold) for key in ('p50_ms', 'p95_ms'))
+            if slower and now['p95_ms'] - before['p95_ms'] >= MIN_DELTA_MS:
+                regressions.append((preset, name, f"p50 {before['p50_ms']:.2f} → {now['p50_ms']:.2f} ms, "
+                                                  f"p95 {before['p95_ms']:.2f} → {now['p95_ms']:.2f} ms"))
+            if now['vm_steps'] > before['vm_steps'] * (1 + threshold):
+                regressions.append((preset, name, f"vm_steps {before['vm_steps']:,} → {now['vm_steps']:,}"))
+            new_scans = set(now['full_scans']) - set(before.get('full_scans', ()))
+            if new_scans:
+                regressions.append((preset, name, f"new full scan of {', '.join(sorted(new_scans))}"))
+    return regressions
+
+
+def load_baseline(path=DEFAULT_BASELINE):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as handle:
+        return json.load(handle).get('results', {})
+
+
+def save_baseline(results, path=DEFAULT_BASELINE, seed=None):
+    """Merge ``results`` into the baseline file (other presets are kept)."""
+    merged = load_baseline(path) or {}
+    merged.update(results)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as handle:
+        json.dump({
+            'saved_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'seed': seed,
+            'results': merged,
+        }, handle, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    options = {
+        'presets': ",".join(DEFAULT_PRESETS), 'repeat': DEFAULT_REPEAT, 'warmup': DEFAULT_WARMUP,
+        'seed': None, 'threshold': DEFAULT_THRESHOLD, 'baseline': DEFAULT_BASELINE, 'only': None,
+    }
+    flags = {'--save-baseline': False, '--regenerate': False}
+    args = sys.argv[1:]
+    while args:
+        arg = args.pop(0)
+        if arg in flags:
+            flags[arg] = True
+        elif arg.startswith("--") and arg[2:] in options and args:
+            options[arg[2:]] = args.pop(0)
+        else:
+            print(__doc__)
+            sys.exit(1)
+
+    from services.synthetic_data import PRESETS, DEFAULT_SEED
+    presets = [p.strip() for p in options['presets'].split(",") if p.strip()]
+    unknown = [p for p in presets if p not in PRESETS]
+    if unknown:
+        print(f"❌ Unknown preset(s): {', '.join(unknown)} (choose from {', '.join(PRESETS)})")
+        sys.exit(1)
+    seed = int(options['seed']) if options['seed'] is not None else DEFAULT_SEED
+
+    results = run_suite(
+        presets,
+        seed=seed,
+        repeat=int(options['repeat']),
+        warmup=int(options['warmup']),
+        only=options['only'].split(",") if options['only'] else None,
+        regenerate=flags['--regenerate'],
+    )
+
+    if flags['--save-baseline']:
+        save_baseline(results, options['baseline'], seed)
+        print(f"\n✅ Baseline saved to {options['baseline']}")
+        sys.exit(0)
+
+    baseline = load_baseline(options['baseline'])
+    if baseline is None:
+        print(f"\nℹ️ No baseline at {options['baseline']}; run with --save-baseline to create one")
+        sys.exit(0)
+
+    regressions = compare(results, baseline, float(options['threshold']))
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) against {options['baseline']}:")
+        for preset, name, reason in regressions:
+            print(f"  [{preset}] {name}: {reason}")
+        sys.exit(1)
+    print(f"\n✅ No regressions against {options['baseline']}")
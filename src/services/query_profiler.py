@@ -0,0 +1,401 @@
+"""SQL statement profiler attributed to routes and UI handlers.
+
+While enabled, new connections are :class:`ProfiledConnection` objects.
+Every statement is timed from ``execute`` until its last row is fetched (or
+the cursor moves on) and charged to the route and handler that ran it, for
+example ``/patient/cart`` and ``CartView.proceed_to_checkout``. The handler
+is the innermost view or component function on the call stack; the route
+is read from the ``page`` (or the event's page) that function can see.
+Statements issued outside any view, such as background refreshes, are
+charged to the route ``(background)`` and the service function.
+
+Per route and handler it keeps the statement count, total and maximum time
+and how many statements triggers ran on their behalf (from the connection's
+trace callback). A handler invocation that runs the same statement shape
+``N_PLUS_ONE_REPEATS`` or more times is recorded as a possible N+1 pattern.
+Statements slower than ``SLOW_QUERY_MS`` go to a bounded slow-query log
+together with their ``EXPLAIN QUERY PLAN``.
+
+Enable with ``PMS_SQL_PROFILE=1`` in the environment or from the admin
+Diagnostics page. Data is kept in memory for the life of the process.
+"""
+
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import weakref
+from collections import Counter, deque
+from datetime import datetime
+
+from services import database
+
+SLOW_QUERY_MS = 100
+N_PLUS_ONE_REPEATS = 5
+SLOW_LOG_SIZE = 200
+
+# Statements further apart than this in one handler frame start a new invocation
+INVOCATION_GAP = 0.5
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+BACKGROUND = "(background)"
+
+_SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_APP_DIRS = tuple(os.path.join(_SRC_DIR, name) + os.sep for name in ('views', 'components'))
+_MAIN_FILE = os.path.join(_SRC_DIR, 'main.py')
+_SERVICES_DIR = os.path.join(_SRC_DIR, 'services') + os.sep
+
+_lock = threading.Lock()
+_enabled = False
+_handlers = {}
+_patterns = {}
+_slow = deque(maxlen=SLOW_LOG_SIZE)
+
+# Statement time per thread, for callers that measure a span (see render_metrics)
+_thread_totals = threading.local()
+
+# Open handler invocation per thread: thread id -> [key, last statement time, route, handler, Counter of shapes].
+# The key is the frame's id and code object, not the frame itself: holding
+# frames would keep their connections and result lists alive.
+_invocations = {}
+
+# Statements whose cursor was garbage collected before they were settled.
+# __del__ can run while _lock is held, so it only queues them here and the
+# next statement or snapshot records them.
+_orphans = deque()
+
+
+class _Statement:
+    __slots__ = ('sql', 'params', 'route', 'handler', 'elapsed', 'trigger_statements', 'connection')
+
+    def __init__(self, sql, params, route, handler, connection):
+        self.sql = sql
+        self.params = params
+        self.route = route
+        self.handler = handler
+        self.elapsed = 0.0
+        self.trigger_statements = 0
+        self.connection = connection
+
+
+def _qualname(code):
+    name = getattr(code, 'co_qualname', code.co_name)
+    return name.replace('.<locals>', '')
+
+
+def _route_from(frame):
+    """Route of the page visible to ``frame`` (its event, page, or self.page)."""
+    while frame is not None:
+        local = frame.f_locals
+        for candidate in (local.get('e'), local.get('page'), local.get('self')):
+            page = getattr(candidate, 'page', candidate)
+            route = getattr(page, 'route', None)
+            if isinstance(route, str):
+                return route
+        frame = frame.f_back
+    return None
+
+
+def _attribute():
+    """(handler frame, route, handler name) for the statement being executed."""
+    frame = sys._getframe(2)
+    service_frame = None
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_APP_DIRS) or filename == _MAIN_FILE:
+            return frame, _route_from(frame) or BACKGROUND, _qualname(frame.f_code)
+        if service_frame is None and filename.startswith(_SERVICES_DIR) and not filename.endswith('query_profiler.py'):
+            service_frame = frame
+        frame = frame.f_back
+    if service_frame is None:
+        return None, BACKGROUND, "(unknown)"
+    module = os.path.splitext(os.path.basename(service_frame.f_code.co_filename))[0]
+    outer = service_frame
+    while outer.f_back is not None and outer.f_back.f_code.co_filename.startswith(_SERVICES_DIR):
+        outer = outer.f_back
+    return outer, BACKGROUND, f"{module}.{_qualname(outer.f_code)}"
+
+
+def statement_shape(sql):
+    """Statement text with literals and whitespace normalized, for grouping."""
+    shape = re.sub(r"\s+", " ", sql).strip()
+    shape = re.sub(r"'(?:[^']|'')*'", "?", shape)
+    shape = re.sub(r"\b\d+(?:\.\d+)?\b", "?", shape)
+    return re.sub(r"\(\s*\?(?:\s*,\s*\?)+\s*\)", "(?, …)", shape)
+
+
+def _close_invocation(thread_id):
+    invocation = _invocations.pop(thread_id, None)
+    if invocation is None:
+        return
+    _, _, route, handler, shapes = invocation
+    for shape, repeats in shapes.items():
+        if repeats >= N_PLUS_ONE_REPEATS:
+            entry = _patterns.setdefault((route, handler, shape), {'invocations': 0, 'max_repeats': 0, 'last_seen': None})
+            entry['invocations'] += 1
+            entry['max_repeats'] = max(entry['max_repeats'], repeats)
+            entry['last_seen'] = datetime.now().strftime(TIMESTAMP_FORMAT)
+
+
+def _drain_orphans():
+    while _orphans:
+        try:
+            statement = _orphans.popleft()
+        except IndexError:
+            return
+        _finish(statement)
+
+
+def _begin(sql, params, connection):
+    _drain_orphans()
+    frame, route, handler = _attribute()
+    key = (id(frame), frame.f_code if frame is not None else None)
+    del frame
+    statement = _Statement(sql, params, route, handler, connection)
+    thread_id = threading.get_ident()
+    now = time.perf_counter()
+    with _lock:
+        invocation = _invocations.get(thread_id)
+        # A frame id can be reused by the next call, so a pause also ends the invocation
+        if invocation is None or invocation[0] != key or now - invocation[1] > INVOCATION_GAP:
+            _close_invocation(thread_id)
+            invocation = _invocations[thread_id] = [key, now, route, handler, Counter()]
+        invocation[1] = now
+        invocation[4][statement_shape(sql)] += 1
+    return statement
+
+
+def _finish(statement):
+    ms = statement.elapsed * 1000
+    _thread_totals.ms = getattr(_thread_totals, 'ms', 0.0) + ms
+    with _lock:
+        entry = _handlers.setdefault((statement.route, statement.handler), {
+            'statements': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'trigger_statements': 0,
+        })
+        entry['statements'] += 1
+        entry['total_ms'] += ms
+        entry['max_ms'] = max(entry['max_ms'], ms)
+        entry['trigger_statements'] += statement.trigger_statements
+    if ms >= SLOW_QUERY_MS:
+        _log_slow(statement, ms)
+
+
+def _log_slow(statement, ms):
+    plan = []
+    target = statement.connection
+    if target is not None:
+        try:
+            conn = sqlite3.connect(target[0], uri=target[1], check_same_thread=False)
+            try:
+                rows = conn.execute(f"EXPLAIN QUERY PLAN {statement.sql}", statement.params or ()).fetchall()
+                plan = [row[3] for row in rows]
+            finally:
+                conn.close()
+        except sqlite3.Error as ex:
+            plan = [f"(plan unavailable: {ex})"]
+    with _lock:
+        _slow.appendleft({
+            'at': datetime.now().strftime(TIMESTAMP_FORMAT),
+            'route': statement.route,
+            'handler': statement.handler,
+            'ms': round(ms, 1),
+            'sql': re.sub(r"\s+", " ", statement.sql).strip(),
+            'plan': plan,
+        })
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """Cursor that times each statement across execute and fetch calls."""
+
+    _pending = None
+
+    def _settle(self):
+        statement, self._pending = self._pending, None
+        if statement is not None:
+            _finish(statement)
+
+    def _run(self, method, sql, parameters):
+        self._settle()
+        statement = _begin(sql, parameters if method == 'execute' else None, self.connection._target)
+        self.connection._active = statement
+        started = time.perf_counter()
+        try:
+            return getattr(super(), method)(sql, parameters)
+        finally:
+            statement.elapsed += time.perf_counter() - started
+            self.connection._active = None
+            own = 1 if method == 'execute' else max(self.rowcount, 0)
+            statement.trigger_statements = max(statement.trigger_statements - own, 0)
+            self._pending = statement
+
+    def execute(self, sql, parameters=()):
+        return self._run('execute', sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._run('executemany', sql, seq_of_parameters)
+
+    def executescript(self, script):
+        self._settle()
+        statement = _begin(script, None, None)
+        started = time.perf_counter()
+        try:
+            return super().executescript(script)
+        finally:
+            statement.elapsed += time.perf_counter() - started
+            _finish(statement)
+
+    def _timed(self, method, *args):
+        statement = self._pending
+        started = time.perf_counter()
+        try:
+            return getattr(super(), method)(*args)
+        finally:
+            if statement is not None:
+                statement.elapsed += time.perf_counter() - started
+
+    def fetchone(self):
+        row = self._timed('fetchone')
+        if row is None:
+            self._settle()
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._timed('fetchmany', self.arraysize if size is None else size)
+        if not rows:
+            self._settle()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed('fetchall')
+        self._settle()
+        return rows
+
+    def __next__(self):
+        try:
+            return self._timed('__next__')
+        except StopIteration:
+            self._settle()
+            raise
+
+    def close(self):
+        self._settle()
+        super().close()
+
+    def __del__(self):
+        # Cursors dropped after one fetchone() still count, recorded later by _drain_orphans
+        statement, self._pending = self._pending, None
+        if statement is not None:
+            _orphans.append(statement)
+
+
+class ProfiledConnection(database.Connection):
+    """Connection whose cursors are profiled; also counts statements run by triggers."""
+
+    def __init__(self, database, *args, **kwargs):
+        super().__init__(database, *args, **kwargs)
+        self._target = (database, kwargs.get('uri', False))
+        self._cursors = weakref.WeakSet()
+        self._active = None
+        self.set_trace_callback(self._on_trace)
+
+    def _on_trace(self, sql):
+        # A statement is traced once itself and again for each trigger program
+        # and trigger statement it sets off; _run subtracts its own traces
+        if self._active is not None:
+            self._active.trigger_statements += 1
+
+    def cursor(self, factory=ProfiledCursor):
+        cursor = super().cursor(factory)
+        self._cursors.add(cursor)
+        return cursor
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, script):
+        return self.cursor().executescript(script)
+
+    def close(self):
+        for cursor in list(self._cursors):
+            if isinstance(cursor, ProfiledCursor):
+                cursor._settle()
+        super().close()
+
+
+def thread_db_ms():
+    """Milliseconds of SQL the current thread has run while profiling was on."""
+    return getattr(_thread_totals, 'ms', 0.0)
+
+
+def enable():
+    global _enabled
+    database.set_connection_factory(ProfiledConnection)
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    database.set_connection_factory(None)
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def enable_from_env():
+    """Turn profiling on when PMS_SQL_PROFILE is set to a true value."""
+    if os.environ.get("PMS_SQL_PROFILE", "").lower() in ("1", "true", "yes", "on"):
+        enable()
+
+
+def reset():
+    with _lock:
+        _handlers.clear()
+        _patterns.clear()
+        _slow.clear()
+        _invocations.clear()
+        _orphans.clear()
+
+
+def snapshot():
+    """
+    Collected data for the diagnostics page.
+
+    Returns:
+        dict: handlers (route, handler, statements, total_ms, max_ms,
+        avg_ms, trigger_statements; slowest total first), n_plus_one
+        (route, handler, sql, invocations, max_repeats, last_seen; open
+        invocations included) and slow (newest first)
+    """
+    _drain_orphans()
+    with _lock:
+        handlers = [{
+            'route': route, 'handler': handler,
+            'statements': entry['statements'],
+            'total_ms': round(entry['total_ms'], 1),
+            'max_ms': round(entry['max_ms'], 1),
+            'avg_ms': round(entry['total_ms'] / entry['statements'], 2) if entry['statements'] else 0,
+            'trigger_statements': entry['trigger_statements'],
+        } for (route, handler), entry in _handlers.items()]
+
+        patterns = {key: dict(value) for key, value in _patterns.items()}
+        for _, _, route, handler, shapes in _invocations.values():
+            for shape, repeats in shapes.items():
+                if repeats >= N_PLUS_ONE_REPEATS:
+                    entry = patterns.setdefault((route, handler, shape), {'invocations': 0, 'max_repeats': 0, 'last_seen': None})
+                    entry['invocations'] += 1
+                    entry['max_repeats'] = max(entry['max_repeats'], repeats)
+        n_plus_one = [{'route': route, 'handler': handler, 'sql': shape, **entry}
+                      for (route, handler, shape), entry in patterns.items()]
+        slow = list(_slow)
+
+    handlers.sort(key=lambda row: row['total_ms'], reverse=True)
+    n_plus_one.sort(key=lambda row: row['max_repeats'], reverse=True)
+    return {'handlers': handlers, 'n_plus_one': n_plus_one, 'slow': slow}
@@ -0,0 +1,282 @@
+"""Route render timing and control-tree size.
+
+Every ``route_change`` is measured as one render of its route:
+
+- ``build_ms``: the whole handler, from clearing the views to ``page.update()``
+- ``view_ms``: the view constructor alone (``PatientDashboard()``, ``ManageStock()``, ...)
+- ``db_ms``: SQL time spent during the render (recorded while SQL profiling is on)
+- ``controls``: controls in the page tree once the render is done
+- ``update_bytes``: serialized size of each ``page.update()`` diff sent to the
+  client, for renders and for event handlers on that route (recorded while
+  SQL profiling is on, since measuring means serializing every diff twice)
+
+Event handlers are timed too: ``handler_ms`` is the run time of each click,
+change or submit handler, recorded under the route the page was on when the
+event arrived.
+
+Numeric path segments are folded into ``:id`` and ``/dashboard`` is split per
+role, so ``/patient/invoice/12`` and ``/patient/invoice/13`` share one entry.
+Each figure is kept as a fixed-bucket histogram; :func:`dump` returns
+everything as plain data and :func:`write_dump` saves it as JSON under
+``storage/diagnostics``.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+import weakref
+from datetime import datetime
+
+from services import database, query_profiler
+from state.app_state import AppState
+
+TIME_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+CONTROL_BUCKETS = (50, 100, 250, 500, 1000, 2500, 5000, 10000)
+BYTE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_lock = threading.Lock()
+_routes = {}
+_local = threading.local()
+
+
+class Histogram:
+    """Fixed-bucket histogram with count, sum and max."""
+
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        index = 0
+        while index < len(self.bounds) and value > self.bounds[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th observation (max for the overflow bucket)."""
+        if not self.count:
+            return 0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        cumulative = []
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            cumulative.append([bound, seen])
+        cumulative.append(["+Inf", self.count])
+        return {
+            'count': self.count,
+            'sum': round(self.total, 2),
+            'max': round(self.max, 2),
+            'avg': round(self.total / self.count, 2) if self.count else 0,
+            'p50': round(self.quantile(0.5), 2),
+            'p95': round(self.quantile(0.95), 2),
+            'buckets': cumulative,
+        }
+
+
+def _new_route():
+    return {
+        'renders': 0,
+        'last_render': None,
+        'build_ms': Histogram(TIME_BUCKETS_MS),
+        'view_ms': Histogram(TIME_BUCKETS_MS),
+        'db_ms': Histogram(TIME_BUCKETS_MS),
+        'controls': Histogram(CONTROL_BUCKETS),
+        'update_bytes': Histogram(BYTE_BUCKETS),
+        'handler_ms': Histogram(TIME_BUCKETS_MS),
+    }
+
+
+def route_key(route):
+    """Route with ids folded into ``:id``; ``/dashboard`` is keyed per role."""
+    key = re.sub(r"/\d+(?=/|$)", "/:id", route or "/")
+    if key == "/dashboard":
+        user = AppState.get_user()
+        if user:
+            key = f"/dashboard ({user['role']})"
+    return key
+
+
+def count_controls(page):
+    """Number of controls in the page's views, overlay included."""
+    stack = list(getattr(page, 'views', None) or []) + list(getattr(page, 'overlay', None) or [])
+    count = 0
+    while stack:
+        control = stack.pop()
+        count += 1
+        stack.extend(control._get_children())
+    return count
+
+
+def _stack():
+    if not hasattr(_local, 'renders'):
+        _local.renders = []
+    return _local.renders
+
+
+def _observe(key, **values):
+    with _lock:
+        entry = _routes.get(key)
+        if entry is None:
+            entry = _routes[key] = _new_route()
+        for name, value in values.items():
+            if value is not None:
+                entry[name].observe(value)
+        return entry
+
+
+class _Render:
+    __slots__ = ('route', 'started', 'db_started', 'view_ms')
+
+    def __init__(self, route):
+        self.route = route
+        self.started = time.perf_counter()
+        self.db_started = query_profiler.thread_db_ms()
+        self.view_ms = None
+
+
+def timed_route_change(page, handler):
+    """Wrap a ``route_change`` handler so each call is recorded as a render."""
+    _watch_updates(page)
+    _watch_handlers(page)
+
+    def route_change(route):
+        render = _Render(page.route)
+        _stack().append(render)
+        try:
+            return handler(route)
+        finally:
+            _stack().pop()
+            db_ms = query_profiler.thread_db_ms() - render.db_started if query_profiler.is_enabled() else None
+            entry = _observe(
+                route_key(render.route),
+                build_ms=(time.perf_counter() - render.started) * 1000,
+                view_ms=render.view_ms,
+                db_ms=db_ms,
+                controls=count_controls(page),
+            )
+            with _lock:
+                entry['renders'] += 1
+                entry['last_render'] = datetime.now().strftime(TIMESTAMP_FORMAT)
+
+    return route_change
+
+
+def view_built():
+    """Mark the end of the view constructor in the current render."""
+    renders = _stack()
+    if renders:
+        renders[-1].view_ms = (time.perf_counter() - renders[-1].started) * 1000
+
+
+def _encoded(value):
+    return getattr(value, '__dict__', None) or str(value)
+
+
+def _watch_updates(page):
+    """
+    Measure each diff the page sends by hooking its connection's send_commands.
+
+    Sizes are only taken while profiling is on; otherwise the hook passes
+    the commands straight through.
+    """
+    conn = getattr(page, '_Page__conn', None)
+    send = getattr(conn, 'send_commands', None)
+    if send is None:
+        return
+    pages = getattr(conn, '_render_metrics_pages', None)
+    if pages is None:
+        pages = conn._render_metrics_pages = {}
+
+        def send_commands(session_id, commands):
+            owner = pages.get(session_id) if query_profiler.is_enabled() else None
+            owner = owner() if owner else None
+            if owner is not None:
+                size = len(json.dumps(commands, default=_encoded, separators=(",", ":")))
+                _observe(route_key(owner.route), update_bytes=size)
+            return send(session_id, commands)
+
+        conn.send_commands = send_commands
+    pages[getattr(page, 'session_id', None)] = weakref.ref(page)
+
+
+def _watch_handlers(page):
+    """Time the control event handlers Flet dispatches through ``page.run_thread``."""
+    run_thread = getattr(page, 'run_thread', None)
+    if run_thread is None or getattr(run_thread, '_render_metrics', False):
+        return
+
+    def timed_run_thread(handler, *args, **kwargs):
+        event = args[0] if args else None
+        # route_change is already measured as a render
+        if getattr(event, 'control', None) is None or getattr(event, 'name', None) == 'route_change':
+            return run_thread(handler, *args, **kwargs)
+        key = route_key(page.route)
+
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return handler(*args, **kwargs)
+            finally:
+                _observe(key, handler_ms=(time.perf_counter() - started) * 1000)
+
+        return run_thread(timed, *args, **kwargs)
+
+    timed_run_thread._render_metrics = True
+    page.run_thread = timed_run_thread
+
+
+def reset():
+    with _lock:
+        _routes.clear()
+
+
+def dump():
+    """
+    All recorded renders as plain data.
+
+    Returns:
+        dict: generated_at and routes, keyed by route; each route has renders,
+        last_render and a histogram dict (count, sum, max, avg, p50, p95,
+        cumulative buckets) for build_ms, view_ms, db_ms, controls,
+        update_bytes and handler_ms
+    """
+    with _lock:
+        routes = {
+            key: {name: value.to_dict() if isinstance(value, Histogram) else value for name, value in entry.items()}
+            for key, entry in _routes.items()
+        }
+    return {'generated_at': datetime.now().strftime(TIMESTAMP_FORMAT), 'routes': routes}
+
+
+def diagnostics_dir():
+    path = os.path.join(os.path.dirname(database.DB_FILE), 'diagnostics')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def write_dump(path=None):
+    """Write :func:`dump` as JSON and return the file path."""
+    if path is None:
+        path = os.path.join(diagnostics_dir(), f"render-metrics-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(dump(), f, indent=2)
+    return path
@@ -0,0 +1,213 @@
+"""Threshold-driven reorder engine backed by an incremental low-stock queue.
+
+Each medicine carries its own ``reorder_point`` and ``reorder_quantity``.
+Triggers on ``medicines`` keep ``reorder_queue`` up to date: a row is added
+only when stock crosses below the reorder point and removed when it climbs
+back above it, so low-stock widgets read a handful of queued rows instead of
+scanning the whole catalog with ``stock < 10``.
+"""
+
+from services.database import get_db_connection
+
+# Defaults applied to medicines that have no explicit levels yet
+DEFAULT_REORDER_POINT = 10
+DEFAULT_REORDER_QUANTITY = 50
+
+
+def init_reorder_schema(cursor):
+    """Add per-SKU reorder levels, the queue table and its maintenance triggers."""
+    cursor.execute("PRAGMA table_info(medicines)")
+    columns = [col[1] for col in cursor.fetchall()]
+    if 'reorder_point' not in columns:
+        cursor.execute(f"ALTER TABLE medicines ADD COLUMN reorder_point INTEGER NOT NULL DEFAULT {DEFAULT_REORDER_POINT}")
+    if 'reorder_quantity' not in columns:
+        cursor.execute(f"ALTER TABLE medicines ADD COLUMN reorder_quantity INTEGER NOT NULL DEFAULT {DEFAULT_REORDER_QUANTITY}")
+
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='reorder_queue'")
+    is_new = cursor.fetchone() is None
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS reorder_queue (
+            medicine_id INTEGER PRIMARY KEY,
+            queued_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (medicine_id) REFERENCES medicines(id)
+        )
+    """)
+
+    # Enqueue on a downward crossing (or a raised reorder point)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_reorder_enqueue
+        AFTER UPDATE OF stock, reorder_point ON medicines
+        WHEN COALESCE(NEW.stock, 0) < NEW.reorder_point
+         AND COALESCE(OLD.stock, 0) >= OLD.reorder_point
+        BEGIN
+            INSERT OR IGNORE INTO reorder_queue (medicine_id) VALUES (NEW.id);
+        END
+    """)
+    # Dequeue on an upward crossing (or a lowered reorder point)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_reorder_dequeue
+        AFTER UPDATE OF stock, reorder_point ON medicines
+        WHEN COALESCE(NEW.stock, 0) >= NEW.reorder_point
+         AND COALESCE(OLD.stock, 0) < OLD.reorder_point
+        BEGIN
+            DELETE FROM reorder_queue WHERE medicine_id = NEW.id;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_reorder_insert
+        AFTER INSERT ON medicines
+        WHEN COALESCE(NEW.stock, 0) < NEW.reorder_point
+        BEGIN
+            INSERT OR IGNORE INTO reorder_queue (medicine_id) VALUES (NEW.id);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_reorder_delete
+        AFTER DELETE ON medicines
+        BEGIN
+            DELETE FROM reorder_queue WHERE medicine_id = OLD.id;
+        END
+    """)
+
+    if is_new:
+        reconcile_reorder_queue(cursor)
+
+
+def reconcile_reorder_queue(cursor):
+    """
+    Rebuild the queue from a full catalog scan.
+
+    Only needed once when the queue is first created, or as a periodic safety
+    net; day-to-day maintenance is done by the triggers.
+
+    Returns:
+        tuple: (rows added, rows removed)
+    """
+    cursor.execute("""
+        INSERT OR IGNORE INTO reorder_queue (medicine_id)
+        SELECT id FROM medicines WHERE COALESCE(stock, 0) < reorder_point
+    """)
+    added = cursor.rowcount
+    cursor.execute("""
+        DELETE FROM reorder_queue WHERE medicine_id NOT IN (
+            SELECT id FROM medicines WHERE COALESCE(stock, 0) < reorder_point
+        )
+    """)
+    return added, cursor.rowcount
+
+
+def set_reorder_levels(cursor, medicine_id, reorder_point, reorder_quantity):
+    """Update one SKU's reorder levels; the triggers re-evaluate its queue entry."""
+    reorder_point = int(reorder_point)
+    reorder_quantity = int(reorder_quantity)
+    if reorder_point < 0 or reorder_quantity <= 0:
+        raise ValueError("Reorder point must be >= 0 and reorder quantity > 0")
+    cursor.execute(
+        "UPDATE medicines SET reorder_point = ?, reorder_quantity = ? WHERE id = ?",
+        (reorder_point, reorder_quantity, medicine_id)
+    )
+
+
+def get_reorder_queue(limit=None, out_of_stock=None):
+    """
+    Read queued low-stock medicines, lowest stock first.
+
+    Args:
+        limit (int): Maximum number of rows
+        out_of_stock (bool): True for only zero-stock rows, False to exclude them
+
+    Returns:
+        list: sqlite3.Row items (id, name, category, price, stock, reorder_point,
+              reorder_quantity, supplier, expiry_date, queued_at)
+    """
+    query = """
+        SELECT m.id, m.name, m.category, m.price, COALESCE(m.stock, 0) AS stock,
+               m.reorder_point, m.reorder_quantity, m.supplier, m.expiry_date, q.queued_at
+        FROM reorder_queue q
+        JOIN medicines m ON m.id = q.medicine_id
+    """
+    if out_of_stock is True:
+        query += " WHERE COALESCE(m.stock, 0) <= 0"
+    elif out_of_stock is False:
+        query += " WHERE COALESCE(m.stock, 0) > 0"
+    query += " ORDER BY stock ASC, m.name"
+
+    params = []
+    if limit:
+        query += " LIMIT ?"
+        params.append(limit)
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
+    conn.close()
+    return rows
+
+
+def count_reorder_queue(cursor=None):
+    """Return (queued low-stock count, of which out of stock)."""
+    own = cursor is None
+    if own:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+    cursor.execute("""
+        SELECT COUNT(*), COALESCE(SUM(CASE WHEN COALESCE(m.stock, 0) <= 0 THEN 1 ELSE 0 END), 0)
+        FROM reorder_queue q
+        JOIN medicines m ON m.id = q.medicine_id
+    """)
+    total, out = cursor.fetchone()
+    if own:
+        conn.close()
+    return total, out
+
+
+def get_purchase_suggestions():
+    """
+    Build purchase suggestions grouped by supplier.
+
+    Each queued SKU is topped up to its reorder point plus one reorder
+    quantity, valued at the latest lot cost when known (else shelf price).
+
+    Returns:
+        list: dicts with supplier, items, total_units and estimated_cost
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT m.id, m.name, m.category, COALESCE(m.stock, 0) AS stock,
+               m.reorder_point, m.reorder_quantity, COALESCE(m.supplier, 'Unassigned') AS supplier,
+               COALESCE((SELECT l.unit_cost FROM medicine_lots l
+                         WHERE l.medicine_id = m.id AND l.unit_cost IS NOT NULL
+                         ORDER BY l.id DESC LIMIT 1), m.price, 0) AS unit_cost
+        FROM reorder_queue q
+        JOIN medicines m ON m.id = q.medicine_id
+        ORDER BY supplier, m.name
+    """)
+    rows = cursor.fetchall()
+    conn.close()
+
+    suppliers = {}
+    for row in rows:
+        suggested = max(row['reorder_point'] - row['stock'], 0) + row['reorder_quantity']
+        group = suppliers.setdefault(row['supplier'], {
+            'supplier': row['supplier'],
+            'items': [],
+            'total_units': 0,
+            'estimated_cost': 0.0,
+        })
+        group['items'].append({
+            'id': row['id'],
+            'name': row['name'],
+            'category': row['category'],
+            'stock': row['stock'],
+            'reorder_point': row['reorder_point'],
+            'reorder_quantity': row['reorder_quantity'],
+            'suggested_quantity': suggested,
+            'unit_cost': row['unit_cost'],
+        })
+        group['total_units'] += suggested
+        group['estimated_cost'] += suggested * (row['unit_cost'] or 0)
+
+    return list(suppliers.values())
@@ -0,0 +1,227 @@
+"""Admin report queries, run against the analytics snapshot by the reports view."""
+
+from datetime import datetime, timedelta
+
+from services.reorder import count_reorder_queue
+from services.stock_ledger import get_valuation_as_of, get_movement_report
+
+
+def get_user_activity_report(cursor):
+    """
+    Returns:
+        dict: role_stats rows (role, count) and recent_users rows
+        (username, full_name, role, created_at), newest ten
+    """
+    cursor.execute("""
+        SELECT role, COUNT(*) as count
+        FROM users
+        GROUP BY role
+        ORDER BY count DESC
+    """)
+    role_stats = cursor.fetchall()
+
+    cursor.execute("""
+        SELECT username, full_name, role, created_at
+        FROM users
+        ORDER BY created_at DESC
+        LIMIT 10
+    """)
+    recent_users = cursor.fetchall()
+
+    return {'role_stats': role_stats, 'recent_users': recent_users}
+
+
+def get_inventory_report(cursor):
+    """
+    Returns:
+        dict: total_medicines, low_stock, out_of_stock, total_value,
+        categories rows (category, count, total_stock) and top_stock rows
+        (name, category, stock, price, value). Only total_medicines is set
+        when the catalog is empty.
+    """
+    cursor.execute("SELECT COUNT(*) FROM medicines")
+    total_meds = cursor.fetchone()[0] or 0
+    if total_meds == 0:
+        return {'total_medicines': 0}
+
+    low_stock, out_of_stock = count_reorder_queue(cursor)
+
+    cursor.execute("SELECT SUM(CAST(stock AS REAL) * CAST(price AS REAL)) FROM medicines")
+    result = cursor.fetchone()
+    total_value = float(result[0]) if result and result[0] else 0.0
+
+    cursor.execute("""
+        SELECT category, COUNT(*) as count, SUM(stock) as total_stock
+        FROM medicines
+        GROUP BY category
+        ORDER BY count DESC
+    """)
+    categories = cursor.fetchall()
+
+    cursor.execute("""
+        SELECT name, category, stock, price, (CAST(stock AS REAL) * CAST(price AS REAL)) as value
+        FROM medicines
+        ORDER BY stock DESC
+        LIMIT 10
+    """)
+    top_stock = cursor.fetchall()
+
+    return {
+        'total_medicines': total_meds,
+        'low_stock': low_stock,
+        'out_of_stock': out_of_stock,
+        'total_value': total_value,
+        'categories': categories,
+        'top_stock': top_stock,
+    }
+
+
+def get_prescription_summary(cursor):
+    """
+    Returns:
+        dict: total, pending, approved, rejected and recent rows
+        (id, status, created_at, full_name, username), newest fifteen.
+        Only total is set when there are no prescriptions.
+    """
+    cursor.execute("""
+        SELECT
+            COUNT(*) as total,
+            COALESCE(SUM(CASE WHEN status = 'Pending' THEN 1 ELSE 0 END), 0) as pending,
+            COALESCE(SUM(CASE WHEN status = 'Approved' THEN 1 ELSE 0 END), 0) as approved,
+            COALESCE(SUM(CASE WHEN status = 'Rejected' THEN 1 ELSE 0 END), 0) as rejected
+        FROM prescriptions
+    """)
+    total, pending, approved, rejected = cursor.fetchone()
+    if not total:
+        return {'total': 0}
+
+    cursor.execute("""
+        SELECT p.id, p.status, p.created_at, u.full_name, u.username
+        FROM prescriptions p
+        JOIN users u ON p.patient_id = u.id
+        ORDER BY p.created_at DESC
+        LIMIT 15
+    """)
+    recent = cursor.fetchall()
+
+    return {'total': total, 'pending': pending, 'approved': approved, 'rejected': rejected, 'recent': recent}
+
+
+def get_low_stock_report(cursor):
+    """
+    Returns:
+        dict: low_stock rows (name, category, stock, price, supplier) below
+        their reorder point but not empty, and out_of_stock rows
+        (name, category, price, supplier)
+    """
+    cursor.execute("""
+        SELECT m.name, m.category, m.stock, m.price, m.supplier
+        FROM reorder_queue q
+        JOIN medicines m ON m.id = q.medicine_id
+        WHERE m.stock > 0
+        ORDER BY m.stock ASC
+    """)
+    low_stock = cursor.fetchall()
+
+    cursor.execute("""
+        SELECT m.name, m.category, m.price, m.supplier
+        FROM reorder_queue q
+        JOIN medicines m ON m.id = q.medicine_id
+        WHERE COALESCE(m.stock, 0) <= 0
+        ORDER BY m.name
+    """)
+    out_of_stock = cursor.fetchall()
+
+    return {'low_stock': low_stock, 'out_of_stock': out_of_stock}
+
+
+def get_system_usage_report(cursor):
+    """
+    Returns:
+        dict: users, medicines, prescriptions and orders counts plus
+        users_by_role rows (role, count)
+    """
+    cursor.execute("""
+        SELECT
+            (SELECT COUNT(*) FROM users),
+            (SELECT COUNT(*) FROM medicines),
+            (SELECT COUNT(*) FROM prescriptions),
+            (SELECT COUNT(*) FROM orders)
+    """)
+    users, medicines, prescriptions, orders = cursor.fetchone()
+
+    cursor.execute("""
+        SELECT role, COUNT(*) as count
+        FROM users
+        GROUP BY role
+    """)
+    users_by_role = cursor.fetchall()
+
+    return {
+        'users': users,
+        'medicines': medicines,
+        'prescriptions': prescriptions,
+        'orders': orders,
+        'users_by_role': users_by_role,
+    }
+
+
+def get_orders_summary(cursor, date_start, date_end):
+    """
+    Order figures over an inclusive date range.
+
+    Args:
+        cursor: Report cursor (normally the analytics snapshot)
+        date_start (str): "YYYY-MM-DD"
+        date_end (str): "YYYY-MM-DD"
+
+    Returns:
+        dict: total, revenue (completed orders only), pending, completed and
+        recent rows (id, total_amount, status, order_date, username), newest
+        fifteen overall
+    """
+    cursor.execute("""
+        SELECT
+            COUNT(*),
+            COALESCE(SUM(CASE WHEN status = 'Completed' THEN total_amount END), 0),
+            COALESCE(SUM(CASE WHEN status = 'Pending' THEN 1 ELSE 0 END), 0),
+            COALESCE(SUM(CASE WHEN status = 'Completed' THEN 1 ELSE 0 END), 0)
+        FROM orders
+        WHERE DATE(order_date) BETWEEN ? AND ?
+    """, (date_start, date_end))
+    total, revenue, pending, completed = cursor.fetchone()
+
+    cursor.execute("""
+        SELECT o.id, o.total_amount, o.status, o.order_date, u.username
+        FROM orders o
+        JOIN users u ON o.patient_id = u.id
+        ORDER BY o.order_date DESC
+        LIMIT 15
+    """)
+    recent = cursor.fetchall()
+
+    return {
+        'total': total,
+        'revenue': float(revenue),
+        'pending': pending,
+        'completed': completed,
+        'recent': recent,
+    }
+
+
+def get_stock_movement_summary(cursor, date_start, date_end):
+    """
+    Opening and closing valuation plus per-SKU movements for a period.
+
+    The opening value is taken at the end of the day before ``date_start``.
+
+    Returns:
+        dict: opening_value, closing_value and movements (see
+        :func:`services.stock_ledger.get_movement_report`)
+    """
+    opening_at = (datetime.strptime(date_start[:10], "%Y-%m-%d") - timedelta(days=1)).strftime("%Y-%m-%d")
+    return {
+        'opening_value': get_valuation_as_of(opening_at, cursor),
+        'closing_value': get_valuation_as_of(date_end, cursor),
+        'movements': get_movement_report(date_start, date_end, cursor),
+    }
@@ -0,0 +1,280 @@
+"""Claim/lease work queue for pharmacist prescription review.
+
+Pending prescriptions are handed out one pharmacist at a time. Claiming is a
+single ``UPDATE ... RETURNING`` statement, so two pharmacists asking at the
+same moment always get different prescriptions. Each claim is a lease: if a
+pharmacist walks away, the prescription goes back to the queue after
+``LEASE_SECONDS``. Approving or rejecting only succeeds while the reviewer
+holds the claim (or nobody does), so a review can no longer silently
+overwrite another.
+
+A pharmacist may hold up to ``MAX_CLAIMS`` leases: the prescription on
+screen plus one prefetched behind it, so "Approve & Next" never waits on
+the queue.
+"""
+
+from datetime import datetime, timedelta
+
+from services.database import get_db_connection
+
+LEASE_SECONDS = 300
+MAX_CLAIMS = 2
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# A row another pharmacist may take: pending and not under a live lease
+_CLAIMABLE = "status = 'Pending' AND (claimed_by IS NULL OR claimed_by = ? OR claim_expires_at <= ?)"
+
+
+def _now():
+    return datetime.now().strftime(TIMESTAMP_FORMAT)
+
+
+def _expiry():
+    return (datetime.now() + timedelta(seconds=LEASE_SECONDS)).strftime(TIMESTAMP_FORMAT)
+
+
+def init_review_queue_schema(cursor):
+    """Add claim columns to prescriptions and the queue-order index."""
+    cursor.execute("PRAGMA table_info(prescriptions)")
+    columns = [col[1] for col in cursor.fetchall()]
+    if 'claimed_by' not in columns:
+        cursor.execute("ALTER TABLE prescriptions ADD COLUMN claimed_by INTEGER")
+    if 'claim_expires_at' not in columns:
+        cursor.execute("ALTER TABLE prescriptions ADD COLUMN claim_expires_at TIMESTAMP")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_prescriptions_status_created ON prescriptions(status, created_at)")
+
+
+def _held_claims(cursor, pharmacist_id, now):
+    cursor.execute("""
+        SELECT id FROM prescriptions
+        WHERE status = 'Pending' AND claimed_by = ? AND claim_expires_at > ?
+        ORDER BY created_at, id
+    """, (pharmacist_id, now))
+    return [row[0] for row in cursor.fetchall()]
+
+
+def _claim_oldest(cursor, pharmacist_id, now, exclude=()):
+    """Atomically lease the oldest claimable prescription not in ``exclude``."""
+    skip = f" AND id NOT IN ({','.join('?' * len(exclude))})" if exclude else ""
+    cursor.execute(f"""
+        UPDATE prescriptions
+        SET claimed_by = ?, claim_expires_at = ?
+        WHERE id = (
+            SELECT id FROM prescriptions
+            WHERE {_CLAIMABLE}{skip}
+            ORDER BY created_at, id
+            LIMIT 1
+        )
+        AND {_CLAIMABLE}
+        RETURNING id
+    """, (pharmacist_id, _expiry(), pharmacist_id, now, *exclude, pharmacist_id, now))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def claim_next(pharmacist_id, skip=None):
+    """
+    Get the next prescription this pharmacist should review.
+
+    Returns one of the caller's live claims first (oldest first, e.g. the
+    prefetched one), otherwise leases the oldest unclaimed prescription.
+
+    Args:
+        pharmacist_id (int): Reviewer
+        skip (int): Prescription to pass over (the one just finished)
+
+    Returns:
+        int: Prescription id, or None when the queue is empty
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        now = _now()
+        held = [rx_id for rx_id in _held_claims(cursor, pharmacist_id, now) if rx_id != skip]
+        if held:
+            return held[0]
+        rx_id = _claim_oldest(cursor, pharmacist_id, now, exclude=(skip,) if skip else ())
+        conn.commit()
+        return rx_id
+    finally:
+        conn.close()
+
+
+def prefetch_next(pharmacist_id, current_id):
+    """
+    Lease one more prescription behind ``current_id`` so the next one is
+    ready the moment the current review is done. Holds at most MAX_CLAIMS.
+
+    Returns:
+        int: The prefetched prescription id, or None when the queue is empty
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        now = _now()
+        held = [rx_id for rx_id in _held_claims(cursor, pharmacist_id, now) if rx_id != current_id]
+        if len(held) >= MAX_CLAIMS - 1:
+            return held[0] if held else None
+        rx_id = _claim_oldest(cursor, pharmacist_id, now, exclude=(current_id,))
+        conn.commit()
+        return rx_id
+    finally:
+        conn.close()
+
+
+def claim(pharmacist_id, rx_id):
+    """
+    Lease a specific prescription (opening it from the list) or renew the
+    caller's lease on it.
+
+    Returns:
+        tuple: (True, None) when the caller holds the lease, otherwise
+        (False, holder name) when another pharmacist is reviewing it or
+        (False, None) when it is no longer pending
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        now = _now()
+        cursor.execute(f"""
+            UPDATE prescriptions SET claimed_by = ?, claim_expires_at = ?
+            WHERE id = ? AND {_CLAIMABLE}
+        """, (pharmacist_id, _expiry(), rx_id, pharmacist_id, now))
+        conn.commit()
+        if cursor.rowcount:
+            return True, None
+
+        cursor.execute("""
+            SELECT p.status, COALESCE(u.full_name, u.username) AS holder
+            FROM prescriptions p LEFT JOIN users u ON u.id = p.claimed_by
+            WHERE p.id = ?
+        """, (rx_id,))
+        row = cursor.fetchone()
+        if row is None or row['status'] != 'Pending':
+            return False, None
+        return False, row['holder']
+    finally:
+        conn.close()
+
+
+def release_claim(pharmacist_id, rx_id):
+    """Give a prescription back to the queue without reviewing it."""
+    conn = get_db_connection()
+    conn.execute("""
+        UPDATE prescriptions SET claimed_by = NULL, claim_expires_at = NULL
+        WHERE id = ? AND claimed_by = ?
+    """, (rx_id, pharmacist_id))
+    conn.commit()
+    conn.close()
+
+
+def complete_review(cursor, pharmacist_id, rx_id, status, notes=None, expected_version=None):
+    """
+    Approve or reject a prescription inside the caller's transaction.
+
+    Succeeds only if it is still pending, not leased to someone else, the
+    move is an allowed state transition and, when ``expected_version`` is
+    given, nobody changed it since the caller read it. The lease is
+    cleared with the review.
+
+    Args:
+        cursor: Open cursor (caller commits)
+        pharmacist_id (int): Reviewer
+        rx_id (int): Prescription id
+        status (str): 'Approved' or 'Rejected'
+        notes (str): Pharmacist notes; None keeps the existing ones
+        expected_version (int): Version the reviewer saw (None skips the check)
+
+    Returns:
+        bool: False when another pharmacist holds, changed or already finished it
+    """
+    now = _now()
+    query = f"""
+        UPDATE prescriptions
+        SET status = ?, pharmacist_id = ?, pharmacist_notes = COALESCE(?, pharmacist_notes),
+            reviewed_date = ?, claimed_by = NULL, claim_expires_at = NULL, version = version + 1
+        WHERE id = ? AND {_CLAIMABLE}
+          AND EXISTS (SELECT 1 FROM state_transitions
+                      WHERE entity = 'prescriptions' AND from_status = prescriptions.status AND to_status = ?)
+    """
+    params = [status, pharmacist_id, notes, now, rx_id, pharmacist_id, now, status]
+    if expected_version is not None:
+        query += " AND version = ?"
+        params.append(expected_version)
+    cursor.execute(query, params)
+    return cursor.rowcount == 1
+
+
+def bulk_review(pharmacist_id, rx_versions, status, notes=None):
+    """
+    Approve or reject several prescriptions in one transaction.
+
+    Each prescription is a compare-and-set against the version the list
+    displayed, lease-checked like :func:`complete_review`; ones that cannot
+    be reviewed are reported instead of aborting the batch. Logging is left
+    to the caller so it can be written as one batch.
+
+    Args:
+        rx_versions (dict): {prescription id: version the list displayed}
+
+    Returns:
+        tuple: (list of reviewed ids, {id: reason} for the ones skipped)
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    done, failed = [], {}
+    try:
+        for rx_id, version in sorted(rx_versions.items()):
+            if complete_review(cursor, pharmacist_id, rx_id, status, notes, expected_version=version):
+                done.append(rx_id)
+        conn.commit()
+
+        missed = [rx_id for rx_id in sorted(rx_versions) if rx_id not in done]
+        if missed:
+            cursor.execute(f"""
+                SELECT p.id, p.status, p.version, COALESCE(u.full_name, u.username) AS holder
+                FROM prescriptions p LEFT JOIN users u ON u.id = p.claimed_by
+                WHERE p.id IN ({','.join('?' * len(missed))})
+            """, missed)
+            found = {row['id']: row for row in cursor.fetchall()}
+            for rx_id in missed:
+                row = found.get(rx_id)
+                if row is None:
+                    failed[rx_id] = "not found"
+                elif row['status'] != 'Pending':
+                    failed[rx_id] = f"already {row['status']}"
+                elif row['version'] != rx_versions[rx_id]:
+                    failed[rx_id] = "changed since the list was loaded"
+                else:
+                    failed[rx_id] = f"in review by {row['holder']}"
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return done, failed
+
+
+def get_active_claims():
+    """Live leases keyed by prescription id -> holder (for list badges)."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT p.id, p.claimed_by, COALESCE(u.full_name, u.username) AS holder
+        FROM prescriptions p LEFT JOIN users u ON u.id = p.claimed_by
+        WHERE p.status = 'Pending' AND p.claimed_by IS NOT NULL AND p.claim_expires_at > ?
+    """, (_now(),))
+    claims = {row['id']: (row['claimed_by'], row['holder']) for row in cursor.fetchall()}
+    conn.close()
+    return claims
+
+
+def count_available(pharmacist_id=None):
+    """Pending prescriptions the caller could claim right now."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT COUNT(*) FROM prescriptions WHERE {_CLAIMABLE}", (pharmacist_id, _now()))
+    count = cursor.fetchone()[0]
+    conn.close()
+    return count
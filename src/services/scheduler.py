@@ -0,0 +1,583 @@
+"""In-process scheduler for periodic background jobs.
+
+Jobs are registered with either an interval (seconds) or a five-field cron
+expression (``minute hour day month weekday``, local time, supporting ``*``,
+lists, ranges and ``/step``). :func:`start` launches one daemon thread per
+process that wakes every ``TICK_SECONDS`` and runs whatever is due, each job
+on its own worker thread so a slow job never delays the others.
+
+Several app processes can share one database: before running, a process
+takes the job's lease in ``scheduled_jobs`` with a single conditional
+UPDATE, so each due run happens exactly once. The lease lasts the job's
+timeout plus ``LEASE_GRACE``. A run that outlives its timeout is recorded
+as ``timeout`` and keeps the lease until it expires, so it cannot overlap
+with the next run. Failed and timed-out runs are retried up to ``retries``
+times with exponential backoff, then the job waits for its next regular
+slot. Every run is recorded in ``job_runs`` (kept ``HISTORY_DAYS``).
+
+Set ``PMS_SCHEDULER=0`` to keep a process from running jobs.
+
+Usage:
+    python src/services/scheduler.py list
+    python src/services/scheduler.py run JOB_NAME
+"""
+
+import os
+import socket
+import sys
+import threading
+import time
+import traceback
+import uuid
+from datetime import datetime, timedelta
+
+# Allow running this file directly from the services folder
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from services.database import get_db_connection
+
+TICK_SECONDS = 15
+LEASE_GRACE = 60
+HISTORY_DAYS = 30
+
+DEFAULT_TIMEOUT = 300
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 60
+MAX_BACKOFF = 3600
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Run outcomes
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+TIMEOUT = 'timeout'
+
+_lock = threading.Lock()
+_jobs = {}
+_running = set()
+_started = False
+
+# Identifies this process in leases and run history
+OWNER = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def init_scheduler_schema(cursor):
+    """Create the job lease and run history tables."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS scheduled_jobs (
+            name TEXT PRIMARY KEY,
+            schedule TEXT NOT NULL,
+            next_run_at TIMESTAMP NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            lease_owner TEXT,
+            lease_expires_at TIMESTAMP,
+            last_started_at TIMESTAMP,
+            last_finished_at TIMESTAMP,
+            last_status TEXT,
+            last_error TEXT
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS job_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job TEXT NOT NULL,
+            owner TEXT NOT NULL,
+            attempt INTEGER NOT NULL DEFAULT 1,
+            started_at TIMESTAMP NOT NULL,
+            finished_at TIMESTAMP,
+            duration_ms INTEGER,
+            status TEXT NOT NULL,
+            result TEXT,
+            error TEXT
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_job_runs_job_started ON job_runs(job, started_at)")
+
+
+def _now():
+    return datetime.now().replace(microsecond=0)
+
+
+def _fmt(moment):
+    return moment.strftime(TIMESTAMP_FORMAT)
+
+
+# ---------------------------------------------------------------------------
+# Triggers
+# ---------------------------------------------------------------------------
+
+_CRON_FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 6))
+
+
+def _parse_cron_field(text, low, high):
+    values = set()
+    for part in text.split(","):
+        step = 1
+        if "/" in part:
+            part, step_text = part.split("/", 1)
+            step = int(step_text)
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start, end = (int(value) for value in part.split("-", 1))
+        else:
+            start = end = int(part)
+            if step != 1:
+                end = high
+        if high == 6:
+            # Weekday 7 is Sunday too
+            start, end = (0 if start == 7 else start), (6 if end == 7 else end)
+        if start < low or end > high or start > end or step < 1:
+            raise ValueError(f"cron field '{text}' is out of range {low}-{high}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+def parse_cron(expr):
+    """Parse ``minute hour day month weekday`` into sets of allowed values."""
+    fields = expr.split()
+    if len(fields) != 5:
+        raise ValueError(f"cron expression '{expr}' needs 5 fields")
+    parsed = [_parse_cron_field(text, low, high) for text, (low, high) in zip(fields, _CRON_FIELDS)]
+    # Like cron: when both day and weekday are restricted, either may match
+    parsed.append(fields[2] != "*" and fields[4] != "*")
+    return parsed
+
+
+def next_cron_time(expr, after):
+    """First minute strictly after ``after`` matching the cron expression."""
+    minutes, hours, days, months, weekdays, either_day = parse_cron(expr)
+    moment = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    limit = moment + timedelta(days=366 * 4)
+    while moment < limit:
+        if moment.month not in months:
+            moment = (moment.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            continue
+        day_ok, weekday_ok = moment.day in days, (moment.weekday() + 1) % 7 in weekdays
+        if not ((day_ok or weekday_ok) if either_day else (day_ok and weekday_ok)):
+            moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+            continue
+        if moment.hour not in hours:
+            moment = moment.replace(minute=0) + timedelta(hours=1)
+            continue
+        if moment.minute not in minutes:
+            moment += timedelta(minutes=1)
+            continue
+        return moment
+    raise ValueError(f"cron expression '{expr}' never matches")
+
+
+class Job:
+    """A registered job: what to run, when, and how to handle failure."""
+
+    def __init__(self, name, func, interval=None, cron=None, timeout=DEFAULT_TIMEOUT,
+                 retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, description=""):
+        if (interval is None) == (cron is None):
+            raise ValueError(f"job '{name}' needs exactly one of interval or cron")
+        if cron is not None:
+            parse_cron(cron)
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.cron = cron
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.description = description
+
+    @property
+    def schedule(self):
+        return f"cron {self.cron}" if self.cron else f"every {self.interval}s"
+
+    def next_after(self, moment):
+        if self.cron:
+            return next_cron_time(self.cron, moment)
+        return moment + timedelta(seconds=self.interval)
+
+    def retry_delay(self, attempts):
+        return min(self.backoff * 2 ** (attempts - 1), MAX_BACKOFF)
+
+
+def register(name, func, **kwargs):
+    """Register (or replace) a job; see :class:`Job` for the options."""
+    job = Job(name, func, **kwargs)
+    with _lock:
+        _jobs[name] = job
+    return job
+
+
+def get_registered():
+    with _lock:
+        return dict(_jobs)
+
+
+# ---------------------------------------------------------------------------
+# Leases and runs
+# ---------------------------------------------------------------------------
+
+def _sync_jobs(cursor):
+    """Add registered jobs to scheduled_jobs and reschedule those whose trigger changed."""
+    now = _now()
+    for job in get_registered().values():
+        cursor.execute("SELECT schedule FROM scheduled_jobs WHERE name = ?", (job.name,))
+        row = cursor.fetchone()
+        if row is None:
+            cursor.execute(
+                "INSERT INTO scheduled_jobs (name, schedule, next_run_at) VALUES (?, ?, ?)",
+                (job.name, job.schedule, _fmt(job.next_after(now))),
+            )
+        elif row[0] != job.schedule:
+            cursor.execute(
+                "UPDATE scheduled_jobs SET schedule = ?, next_run_at = ?, attempts = 0 WHERE name = ?",
+                (job.schedule, _fmt(job.next_after(now)), job.name),
+            )
+
+
+def _claim(job, now):
+    """Take the job's lease if it is due and not held; returns the attempt number or None."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            UPDATE scheduled_jobs
+            SET lease_owner = ?, lease_expires_at = ?, last_started_at = ?, attempts = attempts + 1
+            WHERE name = ? AND next_run_at <= ?
+              AND (lease_expires_at IS NULL OR lease_expires_at <= ?)
+        """, (OWNER, _fmt(now + timedelta(seconds=job.timeout + LEASE_GRACE)), _fmt(now),
+              job.name, _fmt(now), _fmt(now)))
+        if cursor.rowcount != 1:
+            conn.rollback()
+            return None
+        cursor.execute("SELECT attempts FROM scheduled_jobs WHERE name = ?", (job.name,))
+        attempt = cursor.fetchone()[0]
+        cursor.execute(
+            "INSERT INTO job_runs (job, owner, attempt, started_at, status) VALUES (?, ?, ?, ?, ?)",
+            (job.name, OWNER, attempt, _fmt(now), RUNNING),
+        )
+        run_id = cursor.lastrowid
+        conn.commit()
+        return attempt, run_id
+    finally:
+        conn.close()
+
+
+def _finish(job, run_id, attempt, status, started, result=None, error=None):
+    now = _now()
+    if status == SUCCEEDED:
+        next_run, attempts = job.next_after(now), 0
+    elif attempt <= job.retries:
+        next_run, attempts = now + timedelta(seconds=job.retry_delay(attempt)), attempt
+    else:
+        next_run, attempts = job.next_after(now), 0
+    # A timed-out worker may still be running, so its lease is left to expire
+    release = status != TIMEOUT
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            UPDATE job_runs SET finished_at = ?, duration_ms = ?, status = ?, result = ?, error = ?
+            WHERE id = ?
+        """, (_fmt(now), int((time.monotonic() - started) * 1000), status,
+              None if result is None else str(result)[:500], error, run_id))
+        cursor.execute(f"""
+            UPDATE scheduled_jobs
+            SET next_run_at = ?, attempts = ?, last_finished_at = ?, last_status = ?, last_error = ?
+                {", lease_owner = NULL, lease_expires_at = NULL" if release else ""}
+            WHERE name = ? AND lease_owner = ?
+        """, (_fmt(next_run), attempts, _fmt(now), status, error, job.name, OWNER))
+        cursor.execute("DELETE FROM job_runs WHERE job = ? AND started_at < ?",
+                       (job.name, _fmt(now - timedelta(days=HISTORY_DAYS))))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _execute(job, attempt, run_id):
+    """Run one claimed job with its timeout and record the outcome."""
+    started = time.monotonic()
+    outcome = {}
+
+    def target():
+        try:
+            outcome['result'] = job.func()
+        except Exception:
+            outcome['error'] = traceback.format_exc(limit=5)
+
+    worker = threading.Thread(target=target, daemon=True, name=f"job:{job.name}")
+    worker.start()
+    worker.join(job.timeout)
+    try:
+        if worker.is_alive():
+            _finish(job, run_id, attempt, TIMEOUT, started, error=f"still running after {job.timeout}s")
+        elif 'error' in outcome:
+            _finish(job, run_id, attempt, FAILED, started, error=outcome['error'])
+        else:
+            _finish(job, run_id, attempt, SUCCEEDED, started, result=outcome.get('result'))
+    except Exception as ex:
+        print(f"Job '{job.name}' finished but its outcome was not recorded: {ex}")
+    finally:
+        with _lock:
+            _running.discard(job.name)
+
+
+def run_due(now=None):
+    """Start every due job this process can lease; returns the names started."""
+    now = now or _now()
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM scheduled_jobs WHERE next_run_at <= ?", (_fmt(now),))
+    due = [row[0] for row in cursor.fetchall()]
+    conn.close()
+
+    started = []
+    registered = get_registered()
+    for name in due:
+        job = registered.get(name)
+        with _lock:
+            if job is None or name in _running:
+                continue
+            _running.add(name)
+        claimed = _claim(job, now)
+        if claimed is None:
+            with _lock:
+                _running.discard(name)
+            continue
+        threading.Thread(target=_execute, args=(job, *claimed), daemon=True, name=f"run:{name}").start()
+        started.append(name)
+    return started
+
+
+def _loop():
+    while True:
+        try:
+            run_due()
+        except Exception as ex:
+            print(f"Job scheduler tick failed: {ex}")
+        time.sleep(TICK_SECONDS)
+
+
+def start():
+    """Register the default jobs and start the scheduler thread once per process."""
+    global _started
+    if os.environ.get("PMS_SCHEDULER", "").lower() in ("0", "false", "no", "off"):
+        return False
+    with _lock:
+        if _started:
+            return False
+        _started = True
+    register_default_jobs()
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    init_scheduler_schema(cursor)
+    _sync_jobs(cursor)
+    conn.commit()
+    _check_jobs(cursor)
+    conn.close()
+    threading.Thread(target=_loop, daemon=True, name="job-scheduler").start()
+    return True
+
+
+def run_now(name):
+    """
+    Make a job due immediately (the next tick picks it up).
+
+    Returns:
+        bool: False when the job has no scheduled_jobs row, i.e. no process
+        has started the scheduler against this database
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("UPDATE scheduled_jobs SET next_run_at = ?, attempts = 0 WHERE name = ?", (_fmt(_now()), name))
+    queued = cursor.rowcount > 0
+    conn.commit()
+    conn.close()
+    return queued
+
+
+def _check_jobs(cursor):
+    """Fail startup if a registered job did not get its scheduled_jobs row."""
+    names = list(get_registered())
+    cursor.execute(f"SELECT name FROM scheduled_jobs WHERE name IN ({','.join('?' * len(names))})", names)
+    missing = set(names) - {row[0] for row in cursor.fetchall()}
+    if missing:
+        raise RuntimeError(f"Job scheduler: no scheduled_jobs row for {', '.join(sorted(missing))}")
+
+
+def get_jobs():
+    """
+    Jobs with their lease state and runtime statistics over the kept history.
+
+    Returns:
+        list[dict]: name, schedule, next_run_at, last_started_at, last_finished_at,
+        last_status, last_error, lease_owner, lease_expires_at, attempts, runs,
+        failures, avg_ms, max_ms, last_ms, description
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    init_scheduler_schema(cursor)
+    cursor.execute("""
+        SELECT j.*,
+               COUNT(r.id) AS runs,
+               COALESCE(SUM(CASE WHEN r.status IN ('failed', 'timeout') THEN 1 ELSE 0 END), 0) AS failures,
+               AVG(r.duration_ms) AS avg_ms,
+               MAX(r.duration_ms) AS max_ms,
+               (SELECT duration_ms FROM job_runs
+                WHERE job = j.name AND finished_at IS NOT NULL
+                ORDER BY started_at DESC, id DESC LIMIT 1) AS last_ms
+        FROM scheduled_jobs j
+        LEFT JOIN job_runs r ON r.job = j.name
+        GROUP BY j.name
+        ORDER BY j.name
+    """)
+    registered = get_registered()
+    jobs = []
+    for row in cursor.fetchall():
+        job = dict(row)
+        job['description'] = registered[job['name']].description if job['name'] in registered else ""
+        jobs.append(job)
+    conn.close()
+    return jobs
+
+
+def get_runs(name=None, limit=50):
+    """Most recent runs, newest first, optionally for one job."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    init_scheduler_schema(cursor)
+    if name:
+        cursor.execute("SELECT * FROM job_runs WHERE job = ? ORDER BY started_at DESC, id DESC LIMIT ?", (name, limit))
+    else:
+        cursor.execute("SELECT * FROM job_runs ORDER BY started_at DESC, id DESC LIMIT ?", (limit,))
+    rows = cursor.fetchall()
+    conn.close()
+    return rows
+
+
+# ---------------------------------------------------------------------------
+# Default jobs
+# ---------------------------------------------------------------------------
+
+def _refresh_analytics_snapshot():
+    from services.analytics_snapshot import refresh_snapshot
+    return f"snapshot taken at {refresh_snapshot()}"
+
+
+def _refresh_demand_forecast():
+    from services.forecasting import refresh_forecast_cache
+    count, _ = refresh_forecast_cache()
+    return f"forecast cached for {count} SKUs"
+
+
+def _expire_cart_reservations():
+    from services.stock_ledger import release_stale_reservations
+    lines, units = release_stale_reservations()
+    return f"{lines} cart lines released ({units} units)"
+
+
+def _write_off_expired_lots():
+    from services.lots import write_off_expired_lots
+    lots, units = write_off_expired_lots()
+    return f"{lots} expired lots written off ({units} units)"
+
+
+def _reconcile_reorder_queue():
+    from services.reorder import reconcile_reorder_queue
+    conn = get_db_connection()
+    try:
+        added, removed = reconcile_reorder_queue(conn.cursor())
+        conn.commit()
+    finally:
+        conn.close()
+    return f"reorder queue: {added} added, {removed} removed"
+
+
+def _snapshot_stock():
+    from services.stock_ledger import snapshot_if_due
+    conn = get_db_connection()
+    try:
+        taken = snapshot_if_due(conn.cursor())
+        conn.commit()
+    finally:
+        conn.close()
+    return "stock snapshot taken" if taken is not None else "stock snapshot not due"
+
+
+def _archive_activity():
+    from services.log_archive import archive_if_due
+    moved = archive_if_due()
+    return f"{sum(moved.values())} activity rows archived" if moved else "nothing to archive"
+
+
+def _prune_change_log():
+    from services.change_capture import prune_changes
+    return f"{prune_changes()} change rows pruned"
+
+
+def _database_maintenance():
+    from services.maintenance import run_if_due
+    report = run_if_due()
+    if report is None:
+        return "not due or traffic too high"
+    return f"{report['pages_freed']} pages freed, {len(report['plans_changed'])} plans changed"
+
+
+def _backup_database():
+    from services.backup import create_backup, summary
+    return summary(create_backup(trigger="scheduled"))
+
+
+def register_default_jobs():
+    register('analytics_snapshot', _refresh_analytics_snapshot, interval=15 * 60, timeout=600,
+             description="Rebuild the read-only report snapshot")
+    register('demand_forecast', _refresh_demand_forecast, interval=60 * 60, timeout=900,
+             description="Recompute the per-SKU demand forecast shown on purchase suggestions")
+    register('cart_reservation_expiry', _expire_cart_reservations, interval=30 * 60,
+             description="Release stock held by cart lines older than the cart hold time")
+    register('expired_lot_writeoff', _write_off_expired_lots, cron="5 0 * * *",
+             description="Write off lots past their expiry date")
+    register('reorder_reconcile', _reconcile_reorder_queue, cron="20 * * * *",
+             description="Rebuild the reorder queue from the catalog as a safety net for the triggers")
+    register('stock_snapshot', _snapshot_stock, interval=60 * 60,
+             description="Take the daily per-SKU stock balance snapshot")
+    register('activity_archive', _archive_activity, cron="30 1 * * *", timeout=1800,
+             description="Move old activity_log rows into monthly partitions")
+    register('change_log_prune', _prune_change_log, interval=60 * 60,
+             description="Delete change-capture rows every consumer has read")
+    register('database_maintenance', _database_maintenance, interval=60 * 60, timeout=900,
+             description="ANALYZE, incremental vacuum and WAL checkpoint in low-traffic windows")
+    register('backup', _backup_database, cron="0 2 * * *", timeout=3600, retries=2,
+             description="Online backup of the database into storage/backups, with rotation")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    command = args[0] if args else None
+
+    if command == "list":
+        register_default_jobs()
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        init_scheduler_schema(cursor)
+        _sync_jobs(cursor)
+        conn.commit()
+        conn.close()
+        for job in get_jobs():
+            avg = f"{job['avg_ms'] / 1000:.1f}s" if job['avg_ms'] is not None else "-"
+            print(f"{job['name']:<24} {job['schedule']:<18} next {job['next_run_at']}  "
+                  f"last {job['last_status'] or '-':<9} runs {job['runs']:>4}  avg {avg}")
+    elif command == "run" and len(args) > 1:
+        register_default_jobs()
+        job = get_registered().get(args[1])
+        if job is None:
+            print(f"❌ Unknown job '{args[1]}'")
+            sys.exit(1)
+        started = time.monotonic()
+        print(f"✅ {job.name}: {job.func()} ({time.monotonic() - started:.1f}s)")
+    else:
+        print(__doc__)
+        sys.exit(1)
@@ -0,0 +1,239 @@
+"""Full-text search over audit events and free-text notes.
+
+One FTS5 table, ``search_index``, holds the searchable text of every source
+column. Its rowid encodes the source: ``row id * 8 + source code``, so
+triggers keep it in sync with direct rowid updates and deletes, and a hit
+maps back to its entity without a side table.
+
+Indexed sources:
+    audit_events      action, details and actor (covers activity_log)
+    prescriptions     notes, pharmacist_notes
+    orders            pharmacy_notes, notes
+    order_items       approval_notes (reported against the parent order)
+
+:func:`search` ranks hits across all entities with bm25 and returns
+snippets; :func:`match_event_ids` lets ``query_events`` filter the audit
+stream through the index.
+"""
+
+import re
+import sqlite3
+
+from services.database import get_db_connection
+
+# Snippet highlight markers (control characters never typed into notes)
+HIGHLIGHT_START = "\x02"
+HIGHLIGHT_END = "\x03"
+
+_SOURCE_BITS = 3
+
+# code -> (table, body expression over NEW, entity, field)
+_SOURCES = {
+    0: ('audit_events', "NEW.action || ' ' || COALESCE(NEW.details, '') || ' ' || COALESCE(NEW.actor, '')", 'log', 'details'),
+    1: ('prescriptions', "NEW.notes", 'prescription', 'notes'),
+    2: ('prescriptions', "NEW.pharmacist_notes", 'prescription', 'pharmacist_notes'),
+    3: ('orders', "NEW.pharmacy_notes", 'order', 'pharmacy_notes'),
+    4: ('orders', "NEW.notes", 'order', 'notes'),
+    5: ('order_items', "NEW.approval_notes", 'order_item', 'approval_notes'),
+}
+
+LOG_SOURCE = 0
+
+ENTITIES = ('log', 'prescription', 'order')
+
+
+def _exists(cursor, name, kind='table'):
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = ? AND name = ?", (kind, name))
+    return cursor.fetchone() is not None
+
+
+def _column_exists(cursor, table, column):
+    cursor.execute(f"PRAGMA table_info({table})")
+    return any(row[1] == column for row in cursor.fetchall())
+
+
+def init_search_schema(cursor):
+    """
+    Create the FTS5 index and attach sync triggers to every source that
+    exists so far. Each source is backfilled the first time its triggers
+    are created, so this is safe to call repeatedly (the migration script
+    calls it again once orders and order_items exist).
+
+    Returns:
+        bool: False when this SQLite build has no FTS5 (search falls back to LIKE)
+    """
+    try:
+        cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+                body,
+                tokenize = 'unicode61 remove_diacritics 2',
+                prefix = '2 3'
+            )
+        """)
+    except sqlite3.OperationalError:
+        return False
+
+    for code, (table, body, _, field) in _SOURCES.items():
+        trigger = f"trg_search_{table}_{code}"
+        column = None if table == 'audit_events' else field
+        if (not _exists(cursor, table) or _exists(cursor, f"{trigger}_insert", 'trigger')
+                or (column and not _column_exists(cursor, table, column))):
+            continue
+
+        key = f"(NEW.id << {_SOURCE_BITS}) | {code}"
+        cursor.execute(f"""
+            INSERT OR REPLACE INTO search_index (rowid, body)
+            SELECT {key}, {body} FROM {table} AS NEW
+            WHERE COALESCE({body}, '') != ''
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER {trigger}_insert AFTER INSERT ON {table}
+            WHEN COALESCE({body}, '') != ''
+            BEGIN
+                INSERT INTO search_index (rowid, body) VALUES ({key}, {body});
+            END
+        """)
+        if column is None:
+            # audit_events is append-only
+            continue
+        cursor.execute(f"""
+            CREATE TRIGGER {trigger}_update AFTER UPDATE OF {column} ON {table}
+            BEGIN
+                DELETE FROM search_index WHERE rowid = (OLD.id << {_SOURCE_BITS}) | {code};
+                INSERT INTO search_index (rowid, body)
+                SELECT {key}, {body} WHERE COALESCE({body}, '') != '';
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER {trigger}_delete AFTER DELETE ON {table}
+            BEGIN
+                DELETE FROM search_index WHERE rowid = (OLD.id << {_SOURCE_BITS}) | {code};
+            END
+        """)
+    return True
+
+
+def fts_available(cursor):
+    return _exists(cursor, 'search_index')
+
+
+def to_match_query(text):
+    """
+    Turn free user input into a safe FTS5 query.
+
+    Quoted "phrases" stay phrases; every other word becomes a prefix term,
+    and all terms must match. FTS5 operators typed by the user are treated
+    as plain words.
+
+    Returns:
+        str: MATCH expression, or None when the input has no searchable words
+    """
+    terms = []
+    for phrase, word in re.findall(r'"([^"]+)"|(\w+)', text or ""):
+        if phrase:
+            words = re.findall(r'\w+', phrase)
+            if words:
+                terms.append('"' + " ".join(words) + '"')
+        else:
+            terms.append(f'"{word}"*')
+    return " ".join(terms) or None
+
+
+def match_event_ids(match):
+    """SQL fragment selecting audit_events ids that match (bind ``match`` once)."""
+    return (f"SELECT rowid >> {_SOURCE_BITS} FROM search_index "
+            f"WHERE search_index MATCH ? AND (rowid & {(1 << _SOURCE_BITS) - 1}) = {LOG_SOURCE}")
+
+
+def forget_events(cursor, id_query, params=()):
+    """Drop audit events from the index; ``id_query`` selects their ids (audit_events has no delete trigger)."""
+    if not fts_available(cursor):
+        return
+    cursor.execute(f"""
+        DELETE FROM search_index
+        WHERE rowid IN (SELECT (id << {_SOURCE_BITS}) | {LOG_SOURCE} FROM ({id_query}))
+    """, params)
+
+
+def event_snippets(cursor, match, event_ids, tokens=16):
+    """Highlighted snippets for one page of matching audit events, keyed by event id."""
+    if not event_ids:
+        return {}
+    rowids = [(event_id << _SOURCE_BITS) | LOG_SOURCE for event_id in event_ids]
+    cursor.execute(f"""
+        SELECT rowid, snippet(search_index, 0, ?, ?, '…', ?) FROM search_index
+        WHERE search_index MATCH ? AND rowid IN ({','.join('?' * len(rowids))})
+    """, [HIGHLIGHT_START, HIGHLIGHT_END, tokens, match] + rowids)
+    return {rowid >> _SOURCE_BITS: snippet for rowid, snippet in cursor.fetchall()}
+
+
+def search(text, entities=None, limit=20, tokens=16):
+    """
+    Ranked full-text search across logs, prescription notes and order notes.
+
+    Args:
+        text (str): User input, e.g. 'penicillin allergy' or '"no refills"'
+        entities (list): Subset of ENTITIES to search (None = all)
+        limit (int): Maximum hits
+        tokens (int): Approximate snippet length in words
+
+    Returns:
+        list: dicts with entity, entity_id, field, snippet and score (lower is
+        better). order_items hits are reported as entity 'order' with the
+        parent order id and field 'approval_notes'.
+    """
+    match = to_match_query(text)
+    if not match:
+        return []
+
+    codes = [code for code, (_, _, entity, _) in _SOURCES.items()
+             if entities is None or (entity if entity != 'order_item' else 'order') in entities]
+    if not codes:
+        return []
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    if not fts_available(cursor):
+        conn.close()
+        return []
+
+    try:
+        cursor.execute(f"""
+            SELECT rowid, snippet(search_index, 0, ?, ?, '…', ?) AS snippet, bm25(search_index) AS score
+            FROM search_index
+            WHERE search_index MATCH ?
+              AND (rowid & {(1 << _SOURCE_BITS) - 1}) IN ({','.join('?' * len(codes))})
+            ORDER BY score
+            LIMIT ?
+        """, [HIGHLIGHT_START, HIGHLIGHT_END, tokens, match] + codes + [limit])
+        rows = cursor.fetchall()
+
+        hits = []
+        for row in rows:
+            code = row['rowid'] & ((1 << _SOURCE_BITS) - 1)
+            _, _, entity, field = _SOURCES[code]
+            hits.append({
+                'entity': entity,
+                'entity_id': row['rowid'] >> _SOURCE_BITS,
+                'field': field,
+                'snippet': row['snippet'],
+                'score': row['score'],
+            })
+
+        # Report order item notes against their order
+        item_ids = [hit['entity_id'] for hit in hits if hit['entity'] == 'order_item']
+        if item_ids:
+            cursor.execute(f"SELECT id, order_id FROM order_items WHERE id IN ({','.join('?' * len(item_ids))})", item_ids)
+            parents = dict(cursor.fetchall())
+            for hit in hits:
+                if hit['entity'] == 'order_item':
+                    hit['entity'], hit['entity_id'] = 'order', parents.get(hit['entity_id'])
+    finally:
+        conn.close()
+
+    return [hit for hit in hits if hit['entity_id'] is not None]
+
+
+def plain_snippet(snippet):
+    """Strip highlight markers, for contexts that render plain text."""
+    return (snippet or "").replace(HIGHLIGHT_START, "").replace(HIGHLIGHT_END, "")
@@ -0,0 +1,351 @@
+"""Append-only stock movement ledger with periodic balance snapshots.
+
+Every change to ``medicines.stock`` goes through :func:`record_movement`, which
+applies the signed quantity to the medicine row and appends a row to
+``stock_movements`` in the caller's transaction. ``stock_snapshots`` stores the
+balance of every SKU at a point in time together with the last ledger id it
+covers, so point-in-time stock is computed as "nearest snapshot + short delta"
+instead of replaying the whole history.
+"""
+
+from datetime import datetime, timedelta
+
+from services.database import get_db_connection
+
+# Ledger movement types (quantity is signed: receipts positive, sales negative)
+RECEIPT = 'receipt'
+SALE = 'sale'
+RESERVATION = 'reservation'
+RELEASE = 'release'
+ADJUSTMENT = 'adjustment'
+EXPIRY_WRITEOFF = 'expiry_writeoff'
+
+MOVEMENT_TYPES = (RECEIPT, SALE, RESERVATION, RELEASE, ADJUSTMENT, EXPIRY_WRITEOFF)
+
+# How often a fresh per-SKU snapshot is taken
+SNAPSHOT_INTERVAL = timedelta(days=1)
+
+# Cart lines older than this give their reserved stock back
+CART_HOLD = timedelta(hours=48)
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _now():
+    return datetime.now().strftime(TIMESTAMP_FORMAT)
+
+
+def init_ledger_schema(cursor):
+    """Create the ledger and snapshot tables if they do not exist yet."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS stock_movements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            medicine_id INTEGER NOT NULL,
+            movement_type TEXT NOT NULL,
+            quantity INTEGER NOT NULL,
+            balance_after INTEGER,
+            reference TEXT,
+            user_id INTEGER,
+            created_at TIMESTAMP NOT NULL,
+            FOREIGN KEY (medicine_id) REFERENCES medicines(id),
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_movements_medicine ON stock_movements(medicine_id, created_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_movements_created ON stock_movements(created_at)")
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS stock_snapshots (
+            medicine_id INTEGER NOT NULL,
+            snapshot_at TIMESTAMP NOT NULL,
+            stock INTEGER NOT NULL,
+            last_movement_id INTEGER NOT NULL,
+            PRIMARY KEY (medicine_id, snapshot_at),
+            FOREIGN KEY (medicine_id) REFERENCES medicines(id)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_snapshots_taken ON stock_snapshots(snapshot_at)")
+
+
+def record_movement(cursor, medicine_id, quantity, movement_type, reference=None, user_id=None):
+    """
+    Apply a signed stock change and append it to the ledger.
+
+    Runs on the caller's cursor so the stock update and its ledger row commit
+    (or roll back) together with the rest of the business transaction.
+
+    Args:
+        cursor: Open cursor inside the caller's transaction
+        medicine_id (int): Medicine whose stock changes
+        quantity (int): Signed change (negative removes stock)
+        movement_type (str): One of MOVEMENT_TYPES
+        reference (str): Free-form reference such as "order:12" or "cart:4"
+        user_id (int): User responsible for the change
+
+    Returns:
+        int: The stock balance after the movement
+    """
+    if movement_type not in MOVEMENT_TYPES:
+        raise ValueError(f"Unknown movement type: {movement_type}")
+
+    cursor.execute("UPDATE medicines SET stock = stock + ? WHERE id = ?", (quantity, medicine_id))
+    cursor.execute("SELECT stock FROM medicines WHERE id = ?", (medicine_id,))
+    row = cursor.fetchone()
+    if row is None:
+        raise ValueError(f"Medicine #{medicine_id} not found")
+    balance = row[0]
+
+    cursor.execute("""
+        INSERT INTO stock_movements
+        (medicine_id, movement_type, quantity, balance_after, reference, user_id, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, (medicine_id, movement_type, quantity, balance, reference, user_id, _now()))
+
+    return balance
+
+
+def set_stock(cursor, medicine_id, new_stock, reference=None, user_id=None):
+    """Record an absolute stock count (e.g. a manual edit) as an adjustment movement."""
+    cursor.execute("SELECT stock FROM medicines WHERE id = ?", (medicine_id,))
+    row = cursor.fetchone()
+    current = row[0] if row and row[0] is not None else 0
+    delta = int(new_stock) - current
+    if delta == 0:
+        return current
+    return record_movement(cursor, medicine_id, delta, ADJUSTMENT, reference, user_id)
+
+
+def record_sale_from_reservation(cursor, medicine_id, quantity, reference=None, user_id=None):
+    """
+    Convert a cart reservation into a sale at checkout.
+
+    Stock was already taken out when the item was reserved, so this appends a
+    matching release/sale pair that nets to zero on the balance but lets
+    movement reports tell sold units apart from units that sat in carts.
+    """
+    cursor.execute("SELECT stock FROM medicines WHERE id = ?", (medicine_id,))
+    row = cursor.fetchone()
+    balance = row[0] if row else 0
+    now = _now()
+    cursor.executemany("""
+        INSERT INTO stock_movements
+        (medicine_id, movement_type, quantity, balance_after, reference, user_id, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, [
+        (medicine_id, RELEASE, quantity, balance + quantity, reference, user_id, now),
+        (medicine_id, SALE, -quantity, balance, reference, user_id, now),
+    ])
+
+
+def release_stale_reservations(max_age=CART_HOLD):
+    """
+    Return stock held in carts untouched for longer than ``max_age`` to the shelf.
+
+    ``cart.added_at`` is refreshed whenever the patient changes a line's
+    quantity, so it marks the last touch rather than the first add. Each
+    expired cart line is released through the ledger and deleted in one
+    transaction, exactly as if the patient had removed it.
+
+    Returns:
+        tuple: (cart lines released, units released)
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'cart'")
+        if cursor.fetchone() is None:
+            return 0, 0
+        # cart.added_at defaults to CURRENT_TIMESTAMP, which is UTC
+        cutoff = (datetime.utcnow() - max_age).strftime(TIMESTAMP_FORMAT)
+        cursor.execute("SELECT id, patient_id, medicine_id, quantity FROM cart WHERE added_at < ?", (cutoff,))
+        stale = cursor.fetchall()
+        units = 0
+        for cart_id, patient_id, medicine_id, quantity in stale:
+            record_movement(cursor, medicine_id, quantity, RELEASE, f"cart:{cart_id}:expired", patient_id)
+            cursor.execute("DELETE FROM cart WHERE id = ?", (cart_id,))
+            units += quantity
+        conn.commit()
+        return len(stale), units
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def release_cart_units(cursor, medicine_id, units, reason):
+    """
+    Take back up to ``units`` reserved units of a medicine from patients' carts.
+
+    Newest cart lines give way first, so the earliest reservations are kept.
+    Lines are shrunk (or deleted when emptied) and each release goes through
+    the ledger on the caller's cursor.
+
+    Returns:
+        int: Units released
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'cart'")
+    if cursor.fetchone() is None:
+        return 0
+    cursor.execute("""
+        SELECT id, patient_id, quantity FROM cart
+        WHERE medicine_id = ? AND quantity > 0
+        ORDER BY added_at DESC, id DESC
+    """, (medicine_id,))
+    released = 0
+    for cart_id, patient_id, quantity in cursor.fetchall():
+        if released >= units:
+            break
+        take = min(quantity, units - released)
+        if take == quantity:
+            cursor.execute("DELETE FROM cart WHERE id = ?", (cart_id,))
+        else:
+            cursor.execute("UPDATE cart SET quantity = quantity - ? WHERE id = ?", (take, cart_id))
+        record_movement(cursor, medicine_id, take, RELEASE, f"cart:{cart_id}:{reason}", patient_id)
+        released += take
+    return released
+
+
+def backfill_opening_balances(cursor):
+    """
+    Give every medicine without ledger history an opening receipt.
+
+    Medicines inserted before the ledger existed (or seeded directly) would
+    otherwise read as zero stock in point-in-time reports.
+    """
+    cursor.execute("""
+        INSERT INTO stock_movements
+        (medicine_id, movement_type, quantity, balance_after, reference, user_id, created_at)
+        SELECT m.id, ?, COALESCE(m.stock, 0), COALESCE(m.stock, 0), 'opening balance', NULL, ?
+        FROM medicines m
+        WHERE NOT EXISTS (SELECT 1 FROM stock_movements sm WHERE sm.medicine_id = m.id)
+    """, (RECEIPT, _now()))
+    return cursor.rowcount
+
+
+def take_snapshot(cursor, taken_at=None):
+    """Store the current balance of every SKU. Returns the snapshot timestamp."""
+    taken_at = taken_at or _now()
+    cursor.execute("SELECT COALESCE(MAX(id), 0) FROM stock_movements")
+    last_id = cursor.fetchone()[0]
+    cursor.execute("""
+        INSERT OR REPLACE INTO stock_snapshots (medicine_id, snapshot_at, stock, last_movement_id)
+        SELECT id, ?, COALESCE(stock, 0), ? FROM medicines
+    """, (taken_at, last_id))
+    return taken_at
+
+
+def snapshot_if_due(cursor):
+    """Take a snapshot when the latest one is older than SNAPSHOT_INTERVAL."""
+    cursor.execute("SELECT MAX(snapshot_at) FROM stock_snapshots")
+    latest = cursor.fetchone()[0]
+    if latest:
+        try:
+            if datetime.now() - datetime.strptime(str(latest)[:19], TIMESTAMP_FORMAT) < SNAPSHOT_INTERVAL:
+                return None
+        except ValueError:
+            pass
+    return take_snapshot(cursor)
+
+
+def get_stock_as_of(as_of, medicine_id=None, cursor=None):
+    """
+    Compute stock balances at a past point in time.
+
+    Each SKU starts from its nearest snapshot taken at or before ``as_of`` and
+    adds only the ledger rows written after that snapshot, so the cost is
+    bounded by the snapshot interval rather than the full history.
+
+    Args:
+        as_of (str): Timestamp "YYYY-MM-DD HH:MM:SS" (a bare date means end of day)
+        medicine_id (int): Restrict the result to one SKU
+        cursor: Cursor to read through (e.g. the analytics snapshot); None opens one
+
+    Returns:
+        list: sqlite3.Row items with id, name, category, price, stock and value
+    """
+    if len(as_of) == 10:
+        as_of = f"{as_of} 23:59:59"
+
+    own = cursor is None
+    if own:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+
+    query = """
+        WITH base AS (
+            SELECT m.id, m.name, m.category, m.price,
+                   (SELECT s.stock FROM stock_snapshots s
+                    WHERE s.medicine_id = m.id AND s.snapshot_at <= :as_of
+                    ORDER BY s.snapshot_at DESC LIMIT 1) AS snap_stock,
+                   (SELECT s.last_movement_id FROM stock_snapshots s
+                    WHERE s.medicine_id = m.id AND s.snapshot_at <= :as_of
+                    ORDER BY s.snapshot_at DESC LIMIT 1) AS snap_movement
+            FROM medicines m
+            WHERE (:medicine_id IS NULL OR m.id = :medicine_id)
+        )
+        SELECT b.id, b.name, b.category, b.price,
+               COALESCE(b.snap_stock, 0) + COALESCE((
+                   SELECT SUM(sm.quantity) FROM stock_movements sm
+                   WHERE sm.medicine_id = b.id
+                   AND sm.id > COALESCE(b.snap_movement, 0)
+                   AND sm.created_at <= :as_of
+               ), 0) AS stock
+        FROM base b
+        ORDER BY b.name
+    """
+    cursor.execute(query, {"as_of": as_of, "medicine_id": medicine_id})
+    rows = cursor.fetchall()
+    if own:
+        conn.close()
+
+    return [
+        {
+            'id': r['id'],
+            'name': r['name'],
+            'category': r['category'],
+            'price': r['price'] or 0.0,
+            'stock': r['stock'],
+            'value': (r['price'] or 0.0) * r['stock'],
+        }
+        for r in rows
+    ]
+
+
+def get_valuation_as_of(as_of, cursor=None):
+    """Total inventory value (stock x current price) at a past point in time."""
+    return sum(item['value'] for item in get_stock_as_of(as_of, cursor=cursor))
+
+
+def get_movement_report(date_from, date_to, cursor=None):
+    """
+    Summarize movements per SKU and type between two dates (inclusive).
+
+    Returns:
+        list: dicts with medicine id/name and one signed total per movement type
+    """
+    own = cursor is None
+    if own:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+    cursor.execute("""
+        SELECT sm.medicine_id, m.name, sm.movement_type, SUM(sm.quantity) AS qty
+        FROM stock_movements sm
+        LEFT JOIN medicines m ON sm.medicine_id = m.id
+        WHERE sm.created_at >= ? AND sm.created_at <= ?
+        GROUP BY sm.medicine_id, sm.movement_type
+        ORDER BY m.name
+    """, (f"{date_from[:10]} 00:00:00", f"{date_to[:10]} 23:59:59"))
+    rows = cursor.fetchall()
+    if own:
+        conn.close()
+
+    report = {}
+    for row in rows:
+        entry = report.setdefault(row['medicine_id'], {
+            'medicine_id': row['medicine_id'],
+            'name': row['name'] or f"#{row['medicine_id']}",
+            **{t: 0 for t in MOVEMENT_TYPES},
+        })
+        entry[row['movement_type']] = row['qty']
+    return list(report.values())
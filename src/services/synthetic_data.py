@@ -0,0 +1,450 @@
+"""Seeded synthetic dataset generator for performance testing.
+
+Builds on :func:`services.db_migration.run_migration_and_seed` (schema, demo
+accounts and the 54 demo medicines), then bulk-loads a realistic volume of
+patients, SKUs, orders with line items, prescriptions, invoices, payments,
+stock ledger movements, opening lots and activity logs with ``executemany``.
+The same preset and seed always produce the same rows, so benchmark runs
+compare like with like.
+
+Distributions:
+    order times     trend upwards over the period, weekday/weekend and
+                    hour-of-day peaks (late morning and early evening)
+    basket size     1 + geometric (mean ~2.3 lines, capped at 12)
+    SKU popularity  Zipf-like: a few SKUs account for most lines
+    patients        Zipf-like: regulars place many orders, most place few
+    statuses        old orders are settled (Completed/Cancelled), the last
+                    few days hold the Pending/Processing/Ready working set
+
+Rows are written in chunks of ``CHUNK_SIZE`` orders, one transaction each,
+with ``synchronous = OFF`` and an in-memory journal on the load connection
+only (a crashed load is simply regenerated); WAL is switched back on when
+the load finishes. Triggers stay active, so audit, search, change capture
+and reorder data are produced exactly as the app would; they are most of
+the load time (roughly seconds for small, a minute for medium and ten for
+large).
+
+Usage:
+    python src/services/synthetic_data.py PRESET [SEED] [DB_FILE]
+
+    PRESET is small, medium or large (1M orders); DB_FILE defaults to
+    storage/pharmacy.db. Generating into a separate file keeps the demo
+    database untouched, e.g.:
+
+    python src/services/synthetic_data.py medium 42 /tmp/pms_medium.db
+"""
+
+import contextlib
+import io
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+# Allow running this file directly from the services folder
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.dirname(current_dir)
+if parent_dir not in sys.path:
+    sys.path.append(parent_dir)
+
+from services import database
+from services.database import get_db_connection
+from services.stock_ledger import RECEIPT, SALE
+
+DEFAULT_SEED = 42
+
+# Orders drive every other volume; the ratios below scale from them
+PRESETS = {
+    'small': {'patients': 500, 'medicines': 300, 'orders': 5_000, 'days': 180},
+    'medium': {'patients': 20_000, 'medicines': 2_000, 'orders': 100_000, 'days': 365},
+    'large': {'patients': 150_000, 'medicines': 8_000, 'orders': 1_000_000, 'days': 730},
+}
+
+PRESCRIPTIONS_PER_ORDER = 0.25
+INVOICED_SHARE = 0.7          # of completed orders
+LOGS_PER_ORDER = 1.5
+
+CHUNK_SIZE = 20_000
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+TAX_RATE = 0.12
+
+# Relative order volume per weekday (Mon..Sun) and hour of day
+_WEEKDAY_WEIGHTS = (1.0, 0.95, 0.95, 1.0, 1.15, 1.3, 0.8)
+_HOUR_WEIGHTS = (
+    0.1, 0.05, 0.05, 0.05, 0.1, 0.3, 0.8, 1.5, 2.2, 2.8, 3.2, 3.0,
+    2.6, 2.3, 2.2, 2.3, 2.6, 3.0, 3.1, 2.5, 1.8, 1.1, 0.6, 0.3,
+)
+
+_FIRST_NAMES = ("Juan", "Maria", "Jose", "Ana", "Mark", "Grace", "Paolo", "Liza", "Carlo", "Bea",
+                "Miguel", "Rosa", "Angelo", "Joy", "Rafael", "Kim", "Nico", "Faith", "Enzo", "Trisha")
+_LAST_NAMES = ("Santos", "Reyes", "Cruz", "Bautista", "Garcia", "Mendoza", "Torres", "Flores",
+               "Villanueva", "Ramos", "Castillo", "Aquino", "Navarro", "Domingo", "Lopez", "Dela Cruz")
+_CITIES = ("Manila", "Quezon City", "Makati", "Pasig", "Taguig", "Cebu City", "Davao City", "Iloilo City")
+
+_CATEGORIES = ("Pain Relief", "Antibiotics", "Vitamins", "Cough & Cold", "Allergy", "Digestive",
+               "Diabetes", "Hypertension", "First Aid", "Skin Care")
+_STEMS = ("Amoxi", "Cetiri", "Lora", "Parace", "Ibupro", "Metfor", "Amlo", "Losar", "Omepra",
+          "Ascor", "Multivi", "Dextro", "Guaife", "Ambro", "Mefena", "Carbo", "Clinda", "Azithro")
+_SUFFIXES = ("cin", "zine", "tadine", "tamol", "fen", "min", "dipine", "tan", "zole", "bate", "tex", "mox")
+_FORMS = ("Tablet", "Capsule", "Syrup", "Suspension", "Cream", "Drops")
+_SUPPLIERS = ("Unilab", "Pfizer", "GSK", "Sanofi", "RiteMed", "Generika", "Novartis", "Abbott")
+
+_PAYMENT_METHODS = ("Cash", "Credit Card", "Debit Card", "GCash", "PayMaya", "Bank Transfer")
+_PAYMENT_WEIGHTS = (45, 12, 8, 22, 8, 5)
+
+_DOCTORS = ("Dr. Santos", "Dr. Reyes", "Dr. Lim", "Dr. Tan", "Dr. Garcia", "Dr. Uy")
+_DOSAGES = ("250mg", "500mg", "1 tablet", "5ml", "10ml", "2 capsules")
+_FREQUENCIES = ("Once daily", "Twice daily", "Three times daily", "Every 6 hours", "As needed")
+
+_RX_NOTES = ("Take after meals", "Allergic to penicillin", "Follow-up in two weeks",
+             "Do not take with alcohol", "Reduce dose if drowsy", "No refills", "")
+_ORDER_NOTES = ("Please call upon arrival", "Leave at the guard house", "Senior citizen ID on file", "")
+
+_LOG_ACTIONS = (
+    ('login', "User logged in"),
+    ('view_medicines', "Browsed the medicine catalog"),
+    ('cart_add', "Added an item to the cart"),
+    ('profile_update', "Updated profile details"),
+)
+
+
+def _zipf_cum_weights(count, exponent):
+    total = 0.0
+    cumulative = []
+    for rank in range(1, count + 1):
+        total += 1.0 / rank ** exponent
+        cumulative.append(total)
+    return cumulative
+
+
+def _order_times(rng, count, start, days):
+    """Sorted order timestamps following the trend, weekday and hour weights."""
+    day_weights = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        growth = 0.6 + 0.8 * offset / max(days - 1, 1)
+        day_weights.append(growth * _WEEKDAY_WEIGHTS[day.weekday()])
+    days_drawn = rng.choices(range(days), weights=day_weights, k=count)
+    hours_drawn = rng.choices(range(24), weights=_HOUR_WEIGHTS, k=count)
+    seconds = sorted(d * 86400 + h * 3600 + rng.randrange(3600) for d, h in zip(days_drawn, hours_drawn))
+    return [start + timedelta(seconds=s) for s in seconds]
+
+
+def _basket_size(rng):
+    # 1 + geometric(p = 0.43), capped
+    return min(12, 1 + int(math.log(1.0 - rng.random()) / math.log(0.57)))
+
+
+def _quantity(rng):
+    return rng.choice((1, 1, 1, 2, 2, 3, 4, 5, 10, 20, 30))
+
+
+def _fmt(moment):
+    return moment.strftime(TIMESTAMP_FORMAT)
+
+
+def _user_ids(cursor, role):
+    cursor.execute("SELECT id FROM users WHERE role = ? ORDER BY id", (role,))
+    return [row[0] for row in cursor.fetchall()]
+
+
+def _next_id(cursor, table):
+    cursor.execute(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {table}")
+    return cursor.fetchone()[0]
+
+
+def _seed_patients(cursor, rng, count, before):
+    first_id = _next_id(cursor, 'users')
+    rows = []
+    for n in range(count):
+        user_id = first_id + n
+        first, last = rng.choice(_FIRST_NAMES), rng.choice(_LAST_NAMES)
+        joined = before - timedelta(days=rng.randint(1, 900), seconds=rng.randrange(86400))
+        rows.append((
+            user_id, f"patient{user_id:07d}", 'pat123', 'Patient', first, last,
+            f"{first.lower()}.{user_id}@example.com", f"09{rng.randrange(10**9):09d}",
+            f"{rng.randint(1940, 2006)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            f"{rng.randint(1, 999)} {rng.choice(_LAST_NAMES)} St., {rng.choice(_CITIES)}",
+            'Approved', _fmt(joined),
+        ))
+    cursor.executemany("""
+        INSERT INTO users (id, username, password, role, full_name, last_name, email, phone, dob, address, status, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+    return [row[0] for row in rows]
+
+
+def _seed_medicines(cursor, rng, count, start):
+    first_id = _next_id(cursor, 'medicines')
+    rows = []
+    for n in range(count):
+        name = f"{rng.choice(_STEMS)}{rng.choice(_SUFFIXES)} {rng.choice((50, 100, 250, 500, 1000))}mg {rng.choice(_FORMS)} #{first_id + n}"
+        price = round(min(2500.0, rng.lognormvariate(3.3, 0.9)), 2)
+        expiry = start + timedelta(days=rng.randint(200, 1500))
+        rows.append((first_id + n, name, rng.choice(_CATEGORIES), price, 0,
+                     expiry.strftime("%Y-%m-%d"), rng.choice(_SUPPLIERS), _fmt(start)))
+    cursor.executemany("""
+        INSERT INTO medicines (id, name, category, price, stock, expiry_date, supplier, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+
+
+def _order_status(rng, age_days):
+    if age_days < 1:
+        return rng.choices(("Pending", "Processing", "Ready", "Completed"), weights=(45, 25, 15, 15))[0]
+    if age_days < 4:
+        return rng.choices(("Pending", "Processing", "Ready", "Completed", "Cancelled"), weights=(10, 15, 20, 50, 5))[0]
+    return rng.choices(("Completed", "Cancelled"), weights=(94, 6))[0]
+
+
+def generate(preset='small', seed=DEFAULT_SEED, db_file=None, verbose=True, **overrides):
+    """
+    Build a synthetic dataset.
+
+    Args:
+        preset (str): Key of PRESETS
+        seed (int): Random seed; the same seed reproduces the same rows
+        db_file (str): Target database (None = the configured storage/pharmacy.db)
+        verbose (bool): Print progress
+        **overrides: Replace preset values (patients, medicines, orders, days)
+
+    Returns:
+        dict: Rows generated per table and elapsed seconds
+    """
+    if preset not in PRESETS:
+        raise ValueError(f"Unknown preset: {preset} (choose from {', '.join(PRESETS)})")
+    config = {**PRESETS[preset], **overrides}
+    rng = random.Random(seed)
+    say = print if verbose else (lambda *args, **kwargs: None)
+    started = time.time()
+
+    if db_file:
+        os.makedirs(os.path.dirname(os.path.abspath(db_file)), exist_ok=True)
+        database.DB_FILE = db_file
+
+    # Schema, demo accounts and demo medicines (the migration is chatty)
+    from services.db_migration import run_migration_and_seed
+    with contextlib.redirect_stdout(io.StringIO()):
+        run_migration_and_seed()
+    say(f"🧪 Generating '{preset}' dataset (seed {seed}) into {database.DB_FILE}")
+
+    # Day-aligned window ending today, so "today" reports have data
+    end = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    start = end - timedelta(days=config['days'])
+
+    conn = get_db_connection()
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA journal_mode = MEMORY")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA cache_size = -200000")
+    cursor = conn.cursor()
+    counts = {}
+
+    try:
+        patient_ids = _seed_patients(cursor, rng, config['patients'], start)
+        _seed_medicines(cursor, rng, config['medicines'], start)
+        conn.commit()
+        counts['patients'] = len(patient_ids)
+        counts['medicines'] = config['medicines']
+        say(f"👥 {len(patient_ids):,} patients, 💊 {config['medicines']:,} new SKUs")
+
+        cursor.execute("SELECT id, price FROM medicines ORDER BY id")
+        catalog = cursor.fetchall()
+        medicine_ids = [row[0] for row in catalog]
+        prices = {row[0]: row[1] or 1.0 for row in catalog}
+        # Popularity ranks are shuffled so the hot SKUs are spread over the id range
+        popular = medicine_ids[:]
+        rng.shuffle(popular)
+        sku_weights = _zipf_cum_weights(len(popular), 1.05)
+        regulars = patient_ids[:]
+        rng.shuffle(regulars)
+        patient_weights = _zipf_cum_weights(len(regulars), 0.7)
+
+        staff_ids = _user_ids(cursor, 'Staff') or _user_ids(cursor, 'Admin')
+        pharmacist_ids = _user_ids(cursor, 'Pharmacist') or staff_ids
+        clerk_ids = _user_ids(cursor, 'Billing') or staff_ids
+
+        # Opening receipts are written once the sold volume per SKU is known
+        sold = dict.fromkeys(medicine_ids, 0)
+        order_id = _next_id(cursor, 'orders')
+        item_id = _next_id(cursor, 'order_items')
+        invoice_id = _next_id(cursor, 'invoices')
+        rx_id = _next_id(cursor, 'prescriptions')
+        first_ids = {'orders': order_id, 'invoices': invoice_id, 'prescriptions': rx_id}
+        totals = dict.fromkeys(('orders', 'order_items', 'invoices', 'payments', 'prescriptions', 'activity_log'), 0)
+
+        times = _order_times(rng, config['orders'], start, config['days'])
+        for chunk_start in range(0, len(times), CHUNK_SIZE):
+            orders, items, movements, invoices, payments, prescriptions, logs = [], [], [], [], [], [], []
+
+            for placed in times[chunk_start:chunk_start + CHUNK_SIZE]:
+                patient_id = rng.choices(regulars, cum_weights=patient_weights)[0]
+                age_days = (end - placed).total_seconds() / 86400 - 1
+                status = _order_status(rng, age_days)
+                settled = status in ("Completed", "Cancelled")
+                updated = placed + timedelta(minutes=rng.randint(5, 2880)) if settled else placed
+                discount = rng.choices(("None", "Senior Citizen", "PWD"), weights=(90, 7, 3))[0]
+
+                subtotal = 0.0
+                basket = set(rng.choices(popular, cum_weights=sku_weights, k=_basket_size(rng)))
+                for medicine_id in basket:
+                    quantity = _quantity(rng)
+                    price = prices[medicine_id]
+                    line = round(price * quantity, 2)
+                    subtotal += line
+                    approved = 1 if settled or rng.random() < 0.5 else 0
+                    items.append((item_id, order_id, medicine_id, quantity, price, line, approved,
+                                  rng.choice(pharmacist_ids) if approved else None,
+                                  "Verified by pharmacist" if approved else None))
+                    if status != "Cancelled":
+                        sold[medicine_id] += quantity
+                        movements.append((medicine_id, SALE, -quantity, f"order:{order_id}", patient_id, _fmt(placed)))
+                    item_id += 1
+
+                total = round(subtotal * (1 + TAX_RATE), 2)
+                method = rng.choices(_PAYMENT_METHODS, weights=_PAYMENT_WEIGHTS)[0]
+                invoiced = status == "Completed" and rng.random() < INVOICED_SHARE
+                orders.append((
+                    order_id, patient_id, _fmt(placed), status, total, method,
+                    "Paid" if status == "Completed" else "Unpaid",
+                    rng.choice(staff_ids) if status != "Pending" else None,
+                    None, _fmt(updated), rng.choice(_ORDER_NOTES) or None,
+                    discount, 1 if discount != "None" and settled else 0,
+                ))
+
+                if invoiced:
+                    clerk = rng.choice(clerk_ids)
+                    issued = updated + timedelta(minutes=rng.randint(1, 120))
+                    paid_at = issued + timedelta(minutes=rng.randint(0, 4320))
+                    paid = paid_at < end - timedelta(days=1) or rng.random() < 0.5
+                    invoices.append((
+                        invoice_id, f"INV-{placed.strftime('%Y%m%d')}-{invoice_id:07d}", patient_id, order_id,
+                        round(subtotal, 2), round(subtotal * TAX_RATE, 2), 0.0, total,
+                        "Paid" if paid else "Unpaid", method if paid else None,
+                        _fmt(paid_at) if paid else None, clerk, f"Generated for order #{order_id}", _fmt(issued),
+                    ))
+                    if paid:
+                        payments.append((invoice_id, total, method, _fmt(paid_at),
+                                         f"TXN{invoice_id:09d}", clerk, f"Paid via {method}"))
+                    invoice_id += 1
+
+                if rng.random() < PRESCRIPTIONS_PER_ORDER:
+                    submitted = placed - timedelta(hours=rng.randint(1, 72))
+                    rx_status = "Pending" if age_days < 2 and rng.random() < 0.6 else rng.choices(
+                        ("Approved", "Rejected", "Dispensed"), weights=(70, 8, 22))[0]
+                    reviewed = rx_status != "Pending"
+                    prescriptions.append((
+                        rx_id, patient_id, None, rx_status, rng.choice(_RX_NOTES) or None,
+                        rng.choice(tuple(basket)), rng.choice(_DOSAGES), rng.choice(_FREQUENCIES),
+                        rng.choice((5, 7, 14, 30)), rng.choice(_DOCTORS),
+                        rng.choice(pharmacist_ids) if reviewed else None,
+                        ("Dosage confirmed" if rx_status != "Rejected" else "Prescription unreadable") if reviewed else None,
+                        _fmt(submitted + timedelta(minutes=rng.randint(10, 600))) if reviewed else None,
+                        _fmt(submitted),
+                    ))
+                    rx_id += 1
+
+                for _ in range(int(LOGS_PER_ORDER) + (rng.random() < LOGS_PER_ORDER % 1)):
+                    action, details = rng.choice(_LOG_ACTIONS)
+                    logs.append((patient_id, action, details, _fmt(placed - timedelta(seconds=rng.randint(30, 1800)))))
+                logs.append((patient_id, 'order_placed', f"Placed order #{order_id} for ₱{total:,.2f}", _fmt(placed)))
+
+                order_id += 1
+
+            cursor.executemany("""
+                INSERT INTO orders (id, patient_id, order_date, status, total_amount, payment_method, payment_status,
+                                    staff_id, pharmacy_notes, updated_at, notes, discount_request, discount_verified)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, orders)
+            cursor.executemany("""
+                INSERT INTO order_items (id, order_id, medicine_id, quantity, unit_price, subtotal,
+                                         pharmacist_approved, pharmacist_id, approval_notes)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, items)
+            cursor.executemany("""
+                INSERT INTO stock_movements (medicine_id, movement_type, quantity, reference, user_id, created_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, movements)
+            cursor.executemany("""
+                INSERT INTO invoices (id, invoice_number, patient_id, order_id, subtotal, tax, discount, total_amount,
+                                      status, payment_method, payment_date, billing_clerk_id, notes, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, invoices)
+            cursor.executemany("""
+                INSERT INTO payments (invoice_id, amount, payment_method, payment_date, transaction_id, processed_by, notes)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, payments)
+            cursor.executemany("""
+                INSERT INTO prescriptions (id, patient_id, image_path, status, notes, medicine_id, dosage, frequency,
+                                           duration, doctor_name, pharmacist_id, pharmacist_notes, reviewed_date, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, prescriptions)
+            cursor.executemany("INSERT INTO activity_log (user_id, action, details, timestamp) VALUES (?, ?, ?, ?)", logs)
+            conn.commit()
+
+            for table, rows in (('orders', orders), ('order_items', items), ('invoices', invoices),
+                                ('payments', payments), ('prescriptions', prescriptions), ('activity_log', logs)):
+                totals[table] += len(rows)
+            say(f"📦 {totals['orders']:,} / {len(times):,} orders ({time.time() - started:.0f}s)")
+
+        # Opening receipts cover everything sold plus a buffer, so the
+        # ledger still balances to the stock column; each receipt is one lot
+        # holding the buffer, so stock also equals the sum of open lots
+        receipts = []
+        lots = []
+        stock = {}
+        for medicine_id in medicine_ids:
+            buffer = rng.choice((0, 5, 20, 50, 120, 300, 800))
+            stock[medicine_id] = buffer
+            if sold[medicine_id] + buffer:
+                receipts.append((medicine_id, RECEIPT, sold[medicine_id] + buffer, "synthetic:opening", None, _fmt(start)))
+                lots.append((f"SYN-{start:%Y%m%d}-{medicine_id}", buffer, sold[medicine_id] + buffer, _fmt(start), medicine_id))
+        cursor.executemany("""
+            INSERT INTO stock_movements (medicine_id, movement_type, quantity, reference, user_id, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, receipts)
+        cursor.executemany("""
+            INSERT INTO medicine_lots (medicine_id, lot_number, quantity, initial_quantity, expiry_date, supplier, received_at)
+            SELECT id, ?, ?, ?, NULLIF(expiry_date, ''), supplier, ? FROM medicines WHERE id = ?
+        """, lots)
+        cursor.executemany("UPDATE medicines SET stock = stock + ? WHERE id = ?",
+                           [(quantity, medicine_id) for medicine_id, quantity in stock.items()])
+
+        # Insert triggers stamp audit events with the load time; move them to
+        # the business timestamps so the logs page reads like real history
+        for entity, table, column, first in (('order', 'orders', 'order_date', first_ids['orders']),
+                                             ('invoice', 'invoices', 'created_at', first_ids['invoices']),
+                                             ('prescription', 'prescriptions', 'created_at', first_ids['prescriptions']),
+                                             ('user', 'users', 'created_at', patient_ids[0] if patient_ids else 0)):
+            cursor.execute(f"""
+                UPDATE audit_events
+                SET created_at = (SELECT {column} FROM {table} WHERE id = audit_events.entity_id)
+                WHERE entity = ? AND entity_id >= ?
+            """, (entity, first))
+        conn.commit()
+        counts.update(totals)
+        # Back to the journal mode init_db sets for the app
+        conn.execute("PRAGMA journal_mode = WAL")
+    finally:
+        conn.close()
+
+    # Nobody has consumed the load's change capture rows
+    from services.change_capture import prune_changes
+    prune_changes()
+
+    counts['seconds'] = round(time.time() - started, 1)
+    say("✅ " + ", ".join(f"{table} {count:,}" for table, count in counts.items() if table != 'seconds')
+        + f" in {counts['seconds']}s")
+    return counts
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if not args or args[0] not in PRESETS:
+        print(__doc__)
+        sys.exit(1)
+    generate(args[0], int(args[1]) if len(args) > 1 else DEFAULT_SEED, args[2] if len(args) > 2 else None)
@@ -0,0 +1,146 @@
+"""Optimistic concurrency for orders, invoices and prescriptions.
+
+Each table carries a ``version`` column. Views remember the version they
+rendered and write through :func:`compare_and_set`, which only applies when
+the row is still at that version, so two staff members acting on the same
+order no longer overwrite each other (e.g. applying a discount twice).
+
+Status changes are also checked against ``state_transitions`` inside the
+same UPDATE, so an invalid move such as Completed -> Pending is rejected
+without reading the row first. The row is only read again after a failed
+write, to explain why it failed.
+
+Writers that do not use compare-and-set still bump the version: an AFTER
+UPDATE trigger increments it whenever a business column changes without
+an explicit version bump.
+"""
+
+# table -> {from status: allowed target statuses}
+TRANSITIONS = {
+    'orders': {
+        'Pending': ('Processing', 'Ready', 'Completed', 'Cancelled'),
+        'Processing': ('Pending', 'Ready', 'Completed', 'Cancelled'),
+        'Ready': ('Pending', 'Processing', 'Completed', 'Cancelled'),
+        'Completed': (),
+        'Cancelled': (),
+    },
+    'invoices': {
+        'Unpaid': ('Paid', 'Partially Paid', 'Cancelled'),
+        'Partially Paid': ('Paid', 'Partially Paid', 'Cancelled'),
+        'Paid': (),
+        'Cancelled': (),
+    },
+    'prescriptions': {
+        'Pending': ('Approved', 'Rejected'),
+        'Approved': ('Dispensed',),
+        'Rejected': (),
+        'Dispensed': (),
+    },
+}
+
+# Columns whose change counts as a new version when a writer bypasses compare_and_set
+_VERSIONED_COLUMNS = {
+    'orders': ('status', 'total_amount', 'discount_verified', 'payment_status', 'pharmacy_notes'),
+    'invoices': ('status', 'total_amount', 'discount', 'payment_method', 'payment_date'),
+    'prescriptions': ('status', 'pharmacist_id', 'pharmacist_notes', 'medicine_id', 'dosage',
+                      'frequency', 'duration', 'doctor_name'),
+}
+
+
+def init_versioning_schema(cursor):
+    """
+    Create the transition table and add version columns and bump triggers
+    to every versioned table that exists so far (safe to call repeatedly;
+    orders and invoices come from the migration script).
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS state_transitions (
+            entity TEXT NOT NULL,
+            from_status TEXT NOT NULL,
+            to_status TEXT NOT NULL,
+            PRIMARY KEY (entity, from_status, to_status)
+        ) WITHOUT ROWID
+    """)
+    cursor.executemany(
+        "INSERT OR IGNORE INTO state_transitions (entity, from_status, to_status) VALUES (?, ?, ?)",
+        [(table, source, target)
+         for table, edges in TRANSITIONS.items()
+         for source, targets in edges.items()
+         for target in targets],
+    )
+
+    for table, columns in _VERSIONED_COLUMNS.items():
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+        if cursor.fetchone() is None:
+            continue
+        cursor.execute(f"PRAGMA table_info({table})")
+        existing = [col[1] for col in cursor.fetchall()]
+        if 'version' not in existing:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        watched = ", ".join(col for col in columns if col in existing)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_version AFTER UPDATE OF {watched} ON {table}
+            WHEN NEW.version = OLD.version
+            BEGIN
+                UPDATE {table} SET version = version + 1 WHERE id = NEW.id;
+            END
+        """)
+
+
+def transition_allowed(table, from_status, to_status):
+    """In-memory check used to enable/disable status buttons."""
+    return to_status in TRANSITIONS.get(table, {}).get(from_status, ())
+
+
+def compare_and_set(cursor, table, row_id, changes=None, expected_version=None, to_status=None):
+    """
+    Update one row only if it is still at ``expected_version`` and, when
+    ``to_status`` is given, its current status may move there.
+
+    Args:
+        cursor: Open cursor (caller commits)
+        table (str): 'orders', 'invoices' or 'prescriptions'
+        row_id (int): Row id
+        changes (dict): Column -> new value
+        expected_version (int): Version the caller read (None skips the check)
+        to_status (str): New status, validated against state_transitions
+
+    Returns:
+        tuple: (True, None) on success, or (False, reason) describing the conflict
+    """
+    if table not in TRANSITIONS:
+        raise ValueError(f"{table} is not versioned")
+
+    assignments = [f"{column} = ?" for column in (changes or {})]
+    params = list((changes or {}).values())
+    if to_status is not None:
+        assignments.append("status = ?")
+        params.append(to_status)
+    assignments.append("version = version + 1")
+
+    query = f"UPDATE {table} SET {', '.join(assignments)} WHERE id = ?"
+    params.append(row_id)
+    if expected_version is not None:
+        query += " AND version = ?"
+        params.append(expected_version)
+    if to_status is not None:
+        query += f"""
+            AND EXISTS (SELECT 1 FROM state_transitions
+                        WHERE entity = '{table}' AND from_status = {table}.status AND to_status = ?)"""
+        params.append(to_status)
+
+    cursor.execute(query, params)
+    if cursor.rowcount == 1:
+        return True, None
+    return False, _conflict_reason(cursor, table, row_id, expected_version, to_status)
+
+
+def _conflict_reason(cursor, table, row_id, expected_version, to_status):
+    cursor.execute(f"SELECT status, version FROM {table} WHERE id = ?", (row_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return "not found"
+    status, version = row[0], row[1]
+    if expected_version is not None and version != expected_version:
+        return f"was changed by someone else (now {status})"
+    return f"cannot change from {status} to {to_status}"
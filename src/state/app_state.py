@@ -1,52 +1,102 @@
-# Manages global application state and user sessions
+# Manages application state per user session
+import contextlib
+import threading
+from contextvars import ContextVar
+
 import flet as ft
 
+# Session page for code Flet does not run in a session context: main() on the
+# executor thread, background threads and the headless load test
+_bound_page = ContextVar("pms_session_page", default=None)
+
+
+class _SessionState:
+    """Signed-in user, layout and listeners of one session (one page)."""
+
+    def __init__(self):
+        self.user = None
+        self.app_layout = None  # Reference to AppLayout for global success indicator
+        self.listeners = {}
+
+
 class AppState:
-    current_user = None
-    app_layout = None  # Reference to AppLayout for global success indicator
-    _listeners = {}
+    # Several sessions share one worker process, so state lives on each page;
+    # this one is only used outside any session (scripts and CLIs)
+    _default = _SessionState()
+    _lock = threading.Lock()
+
+    @staticmethod
+    @contextlib.contextmanager
+    def use_page(page):
+        """Resolve AppState to ``page``'s session in this thread for the block."""
+        token = _bound_page.set(page)
+        try:
+            yield
+        finally:
+            _bound_page.reset(token)
+
+    @staticmethod
+    def current_page():
+        """Page of the session being served, or None outside a session."""
+        return _bound_page.get() or ft.context.page
+
+    @staticmethod
+    def _state():
+        page = AppState.current_page()
+        if page is None:
+            return AppState._default
+        state = getattr(page, '_app_state', None)
+        if state is None:
+            with AppState._lock:
+                state = getattr(page, '_app_state', None)
+                if state is None:
+                    state = page._app_state = _SessionState()
+        return state
 
     @staticmethod
     def set_user(user_row):
         if user_row:
             # Save the important details
-            AppState.current_user = {
+            AppState._state().user = {
                 "id": user_row["id"],
                 "username": user_row["username"],
                 "role": user_row["role"],
                 "full_name": user_row["full_name"]
             }
         else:
-            AppState.current_user = None
+            AppState._state().user = None
 
     @staticmethod
     def get_user():
-        return AppState.current_user
+        return AppState._state().user
     
     @staticmethod
     def set_app_layout(layout):
         """Store the AppLayout reference for global access"""
-        AppState.app_layout = layout
+        AppState._state().app_layout = layout
     
     @staticmethod
     def show_success(duration=2):
         """Show the success indicator from anywhere in the app"""
-        if AppState.app_layout:
-            AppState.app_layout.show_success_indicator(duration)
+        layout = AppState._state().app_layout
+        if layout:
+            layout.show_success_indicator(duration)
     
     @staticmethod
     def add_listener(event_name, callback):
         """Register a listener for an event."""
-        if event_name not in AppState._listeners:
-            AppState._listeners[event_name] = []
-        AppState._listeners[event_name].append(callback)
+        listeners = AppState._state().listeners
+        if event_name not in listeners:
+            listeners[event_name] = []
+        listeners[event_name].append(callback)
     
     @staticmethod
     def remove_listener(event_name, callback):
         """Remove a listener for an event."""
-        if event_name in AppState._listeners:
-            if callback in AppState._listeners[event_name]:
-                AppState._listeners[event_name].remove(callback)
+        listeners = AppState._state().listeners
+        if event_name in listeners:
+            if callback in listeners[event_name]:
+                listeners[event_name].remove(callback)
     
     @staticmethod
     def show_toast(page, message, type="success", duration=0.8):
@@ -108,9 +158,10 @@ class AppState:
 
     @staticmethod
     def emit_event(event_name, *args, **kwargs):
-        """Emit an event to all registered listeners."""
-        if event_name in AppState._listeners:
-            for callback in AppState._listeners[event_name]:
+        """Emit an event to the listeners registered by this session."""
+        listeners = AppState._state().listeners
+        if event_name in listeners:
+            for callback in list(listeners[event_name]):
                 try:
                     callback(*args, **kwargs)
                 except Exception:
@@ -2,6 +2,7 @@
 
 import flet as ft
 from services.database import get_db_connection
+from services.dashboards import get_admin_dashboard
 from datetime import datetime, timedelta
 
 def AdminDashboard():
@@ -11,62 +12,17 @@ def AdminDashboard():
     conn = get_db_connection()
     cursor = conn.cursor()
     
-    # User metrics
-    cursor.execute("SELECT COUNT(*) FROM users")
-    total_users = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COUNT(*) FROM users WHERE role = 'Patient'")
-    total_patients = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COUNT(*) FROM users WHERE role = 'Pharmacist'")
-    total_pharmacists = cursor.fetchone()[0]
-    
-    # Inventory metrics
-    cursor.execute("SELECT COUNT(*) FROM medicines")
-    total_medicines = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COUNT(*) FROM medicines WHERE stock < 10")
-    low_stock_count = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COUNT(*) FROM medicines WHERE stock = 0")
-    out_of_stock = cursor.fetchone()[0]
-    
-    # Clinical metrics
-    cursor.execute("SELECT COUNT(*) FROM prescriptions WHERE status = 'Pending'")
-    pending_prescriptions = cursor.fetchone()[0]
-    
-    # Sales metrics
-    cursor.execute("SELECT COUNT(*) FROM orders WHERE status IN ('Pending', 'Processing')")
-    pending_orders = cursor.fetchone()[0]
-    
-    # Fetch recent user registrations
-    cursor.execute("""
-        SELECT username, role, created_at
-        FROM users
-        ORDER BY created_at DESC
-        LIMIT 5
-    """)
-    recent_users = cursor.fetchall()
-    
-    # Fetch recent prescription updates
-    cursor.execute("""
-        SELECT p.id, p.status, p.created_at, u.username
-        FROM prescriptions p
-        JOIN users u ON p.patient_id = u.id
-        ORDER BY p.created_at DESC
-        LIMIT 3
-    """)
-    recent_prescriptions = cursor.fetchall()
-    
-    # Fetch recent order activity
-    cursor.execute("""
-        SELECT o.id, o.status, o.order_date, u.username
-        FROM orders o
-        JOIN users u ON o.patient_id = u.id
-        ORDER BY o.order_date DESC
-        LIMIT 3
-    """)
-    recent_orders = cursor.fetchall()
+    data = get_admin_dashboard(cursor)
+    total_users = data['total_users']
+    total_patients = data['total_patients']
+    total_pharmacists = data['total_pharmacists']
+    total_medicines = data['total_medicines']
+    low_stock_count, out_of_stock = data['low_stock_count'], data['out_of_stock']
+    pending_prescriptions = data['pending_prescriptions']
+    pending_orders = data['pending_orders']
+    recent_users = data['recent_users']
+    recent_prescriptions = data['recent_prescriptions']
+    recent_orders = data['recent_orders']
     
     conn.close()
     
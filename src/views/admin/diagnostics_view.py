@@ -0,0 +1,251 @@
+"""Diagnostics: route render timings, per-route SQL profile, N+1 patterns and slow queries."""
+
+import flet as ft
+from services import query_profiler, render_metrics
+from state.app_state import AppState
+
+def DiagnosticsView():
+    """Admin-only view of render metrics and the SQL profiler's collected data."""
+
+    user = AppState.get_user()
+    if not user or user['role'] != "Admin":
+        return ft.Text("Access denied. Administrators only.", color="error", size=16)
+
+    renders_container = ft.Column(spacing=6)
+    handlers_container = ft.Column(spacing=6)
+    patterns_container = ft.Column(spacing=8)
+    slow_container = ft.Column(spacing=8)
+    status_text = ft.Text("", size=12, color="outline")
+
+    def header_row(labels):
+        return ft.Container(
+            content=ft.Row([ft.Text(label, size=12, weight="bold", expand=expand) for label, expand in labels]),
+            bgcolor="surfaceVariant",
+            padding=10,
+            border_radius=8,
+        )
+
+    def empty(message):
+        return ft.Text(message, color="outline", italic=True)
+
+    def section(title, icon, body):
+        return ft.Container(
+            content=ft.Column([
+                ft.Row([
+                    ft.Icon(icon, color="primary", size=24),
+                    ft.Text(title, size=20, weight="bold"),
+                ], spacing=10),
+                ft.Divider(height=20),
+                body,
+            ], spacing=10),
+            padding=20,
+            bgcolor="surface",
+            border_radius=10,
+            border=ft.border.all(1, "outlineVariant"),
+        )
+
+    def load_data(e=None):
+        data = query_profiler.snapshot()
+        status_text.value = (
+            f"Profiling is {'on' if query_profiler.is_enabled() else 'off'} · "
+            f"{sum(row['statements'] for row in data['handlers'])} statements recorded · "
+            f"slow threshold {query_profiler.SLOW_QUERY_MS} ms"
+        )
+
+        # Route renders
+        routes = render_metrics.dump()['routes']
+        renders_container.controls.clear()
+        if routes:
+            renders_container.controls.append(header_row([
+                ("Route", 3), ("Renders", 1), ("Build p50 / p95 ms", 2), ("View p95 ms", 1),
+                ("DB p95 ms", 1), ("Controls p95", 1), ("Update p95 KB", 1),
+            ]))
+            ordered = sorted(routes.items(), key=lambda item: item[1]['build_ms']['p95'], reverse=True)
+            for route, entry in ordered:
+                build = entry['build_ms']
+                renders_container.controls.append(
+                    ft.Container(
+                        content=ft.Row([
+                            ft.Text(route, size=12, expand=3, selectable=True),
+                            ft.Text(f"{entry['renders']:,}", size=12, expand=1),
+                            ft.Text(f"{build['p50']:,.0f} / {build['p95']:,.0f}", size=12, expand=2,
+                                    color="error" if build['p95'] >= 1000 else None),
+                            ft.Text(f"{entry['view_ms']['p95']:,.0f}", size=12, expand=1),
+                            ft.Text(f"{entry['db_ms']['p95']:,.0f}" if entry['db_ms']['count'] else "-", size=12, expand=1),
+                            ft.Text(f"{entry['controls']['p95']:,.0f}", size=12, expand=1),
+                            ft.Text(f"{entry['update_bytes']['p95'] / 1024:,.1f}" if entry['update_bytes']['count'] else "-", size=12, expand=1),
+                        ]),
+                        padding=10,
+                        border=ft.border.all(1, "outlineVariant"),
+                        border_radius=8,
+                    )
+                )
+        else:
+            renders_container.controls.append(empty("No pages rendered yet"))
+
+        # Per route and handler
+        handlers_container.controls.clear()
+        if data['handlers']:
+            handlers_container.controls.append(header_row([
+                ("Route", 2), ("Handler", 3), ("Statements", 1), ("Total ms", 1),
+                ("Avg ms", 1), ("Max ms", 1), ("By triggers", 1),
+            ]))
+            for row in data['handlers'][:100]:
+                handlers_container.controls.append(
+                    ft.Container(
+                        content=ft.Row([
+                            ft.Text(row['route'], size=12, expand=2),
+                            ft.Text(row['handler'], size=12, expand=3, selectable=True),
+                            ft.Text(f"{row['statements']:,}", size=12, expand=1),
+                            ft.Text(f"{row['total_ms']:,.1f}", size=12, expand=1),
+                            ft.Text(f"{row['avg_ms']:,.2f}", size=12, expand=1),
+                            ft.Text(f"{row['max_ms']:,.1f}", size=12, expand=1,
+                                    color="error" if row['max_ms'] >= query_profiler.SLOW_QUERY_MS else None),
+                            ft.Text(f"{row['trigger_statements']:,}", size=12, expand=1),
+                        ]),
+                        padding=10,
+                        border=ft.border.all(1, "outlineVariant"),
+                        border_radius=8,
+                    )
+                )
+        else:
+            handlers_container.controls.append(empty("No statements recorded yet"))
+
+        # Repeated statements inside one handler call
+        patterns_container.controls.clear()
+        if data['n_plus_one']:
+            for row in data['n_plus_one'][:50]:
+                patterns_container.controls.append(
+                    ft.Container(
+                        content=ft.Column([
+                            ft.Row([
+                                ft.Icon(ft.Icons.REPEAT, color="tertiary", size=18),
+                                ft.Text(f"{row['handler']}  ·  {row['route']}", size=13, weight="bold", expand=True),
+                                ft.Text(f"up to {row['max_repeats']}× per call · {row['invocations']} call(s)", size=12, color="outline"),
+                            ], spacing=8),
+                            ft.Text(row['sql'], size=12, font_family="monospace", selectable=True),
+                        ], spacing=6),
+                        padding=12,
+                        border=ft.border.all(1, "outlineVariant"),
+                        border_radius=8,
+                    )
+                )
+        else:
+            patterns_container.controls.append(
+                empty(f"No statement repeated {query_profiler.N_PLUS_ONE_REPEATS}+ times within one handler call")
+            )
+
+        # Slow query log
+        slow_container.controls.clear()
+        if data['slow']:
+            for row in data['slow']:
+                slow_container.controls.append(
+                    ft.Container(
+                        content=ft.Column([
+                            ft.Row([
+                                ft.Icon(ft.Icons.TIMER, color="error", size=18),
+                                ft.Text(f"{row['ms']:,.1f} ms", size=13, weight="bold", color="error"),
+                                ft.Text(f"{row['handler']}  ·  {row['route']}", size=13, expand=True),
+                                ft.Text(row['at'], size=12, color="outline"),
+                            ], spacing=8),
+                            ft.Text(row['sql'], size=12, font_family="monospace", selectable=True),
+                            ft.Container(
+                                content=ft.Column(
+                                    [ft.Text(line, size=11, font_family="monospace") for line in row['plan']]
+                                    or [ft.Text("No plan", size=11, italic=True)],
+                                    spacing=2,
+                                ),
+                                bgcolor="surfaceVariant",
+                                padding=8,
+                                border_radius=6,
+                            ),
+                        ], spacing=6),
+                        padding=12,
+                        border=ft.border.all(1, "outlineVariant"),
+                        border_radius=8,
+                    )
+                )
+        else:
+            slow_container.controls.append(empty(f"No statements over {query_profiler.SLOW_QUERY_MS} ms"))
+
+        if e:
+            e.page.update()
+
+    def toggle_profiling(e):
+        if e.control.value:
+            query_profiler.enable()
+        else:
+            query_profiler.disable()
+        load_data(e)
+
+    def reset_data(e):
+        query_profiler.reset()
+        render_metrics.reset()
+        load_data(e)
+
+    def export_renders(e):
+        try:
+            path = render_metrics.write_dump()
+            e.page.snack_bar = ft.SnackBar(content=ft.Text(f"Render metrics saved to {path}"), bgcolor="primary")
+        except OSError as ex:
+            e.page.snack_bar = ft.SnackBar(content=ft.Text(f"Export failed: {ex}"), bgcolor="error")
+        e.page.snack_bar.open = True
+        e.page.update()
+
+    profiling_switch = ft.Switch(
+        label="Profile SQL statements",
+        value=query_profiler.is_enabled(),
+        on_change=toggle_profiling,
+    )
+
+    load_data()
+
+    return ft.Column([
+        # Header
+        ft.Row([
+            ft.Text("Query Diagnostics", size=28, weight="bold"),
+        ]),
+        ft.Text("Page render times, SQL time per route and handler, repeated statements and slow queries", size=14, color="outline"),
+
+        ft.Container(height=20),
+
+        # Controls
+        ft.Container(
+            content=ft.Column([
+                ft.Row([
+                    profiling_switch,
+                    ft.ElevatedButton(
+                        "Refresh",
+                        icon=ft.Icons.REFRESH,
+                        bgcolor="primary",
+                        color="onPrimary",
+                        on_click=load_data,
+                    ),
+                    ft.OutlinedButton(
+                        "Export JSON",
+                        icon=ft.Icons.DOWNLOAD,
+                        on_click=export_renders,
+                    ),
+                    ft.OutlinedButton(
+                        "Reset",
+                        icon=ft.Icons.DELETE_SWEEP,
+                        on_click=reset_data,
+                    ),
+                ], spacing=10, wrap=True),
+                status_text,
+            ], spacing=15),
+            padding=20,
+            bgcolor="surface",
+            border_radius=10,
+            border=ft.border.all(1, "outlineVariant"),
+        ),
+
+        ft.Container(height=20),
+        section("Route Renders", ft.Icons.WEB, renders_container),
+        ft.Container(height=20),
+        section("Routes and Handlers", ft.Icons.SPEED, handlers_container),
+        ft.Container(height=20),
+        section("Possible N+1 Patterns", ft.Icons.REPEAT, patterns_container),
+        ft.Container(height=20),
+        section("Slow Query Log", ft.Icons.TIMER, slow_container),
+    ], scroll=ft.ScrollMode.AUTO, spacing=0)
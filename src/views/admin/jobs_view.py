@@ -0,0 +1,186 @@
+"""Background jobs: schedules, lease state, runtimes and recent runs."""
+
+import flet as ft
+from services import scheduler
+from state.app_state import AppState
+
+STATUS_COLORS = {
+    scheduler.SUCCEEDED: "primary",
+    scheduler.RUNNING: "tertiary",
+    scheduler.FAILED: "error",
+    scheduler.TIMEOUT: "error",
+}
+
+def JobsView():
+    """Admin-only view of the in-process job scheduler."""
+
+    user = AppState.get_user()
+    if not user or user['role'] != "Admin":
+        return ft.Text("Access denied. Administrators only.", color="error", size=16)
+
+    jobs_container = ft.Column(spacing=6)
+    runs_container = ft.Column(spacing=6)
+    status_text = ft.Text("", size=12, color="outline")
+
+    def header_row(labels):
+        return ft.Container(
+            content=ft.Row([ft.Text(label, size=12, weight="bold", expand=expand) for label, expand in labels]),
+            bgcolor="surfaceVariant",
+            padding=10,
+            border_radius=8,
+        )
+
+    def empty(message):
+        return ft.Text(message, color="outline", italic=True)
+
+    def seconds(ms):
+        return "-" if ms is None else f"{ms / 1000:,.1f}s"
+
+    def status_label(status):
+        return ft.Text(status or "never run", size=12, color=STATUS_COLORS.get(status, "outline"), weight="bold")
+
+    def section(title, icon, body):
+        return ft.Container(
+            content=ft.Column([
+                ft.Row([
+                    ft.Icon(icon, color="primary", size=24),
+                    ft.Text(title, size=20, weight="bold"),
+                ], spacing=10),
+                ft.Divider(height=20),
+                body,
+            ], spacing=10),
+            padding=20,
+            bgcolor="surface",
+            border_radius=10,
+            border=ft.border.all(1, "outlineVariant"),
+        )
+
+    def run_now(e, name):
+        if scheduler.run_now(name):
+            e.page.snack_bar = ft.SnackBar(
+                content=ft.Text(f"'{name}' queued; it starts within {scheduler.TICK_SECONDS} seconds"),
+                bgcolor="primary",
+            )
+        else:
+            e.page.snack_bar = ft.SnackBar(
+                content=ft.Text(f"'{name}' is not scheduled; the job scheduler has not started"),
+                bgcolor="error",
+            )
+        e.page.snack_bar.open = True
+        load_data(e)
+
+    def load_data(e=None):
+        jobs = scheduler.get_jobs()
+        leased = [job['name'] for job in jobs if job['lease_owner']]
+        status_text.value = (
+            f"{len(jobs)} jobs · {len(leased)} leased · this process is {scheduler.OWNER}"
+            f"{'' if scheduler.get_registered() else ' (scheduler not started here)'}"
+        )
+
+        jobs_container.controls.clear()
+        if jobs:
+            jobs_container.controls.append(header_row([
+                ("Job", 3), ("Schedule", 2), ("Last run", 2), ("Status", 1), ("Last", 1),
+                ("Avg / Max", 1), ("Failures", 1), ("Next run", 2), ("", 1),
+            ]))
+            for job in jobs:
+                detail = [ft.Text(job['name'], size=12, weight="bold")]
+                if job['description']:
+                    detail.append(ft.Text(job['description'], size=11, color="outline"))
+                if job['lease_owner']:
+                    detail.append(ft.Text(f"Leased by {job['lease_owner']} until {job['lease_expires_at']}", size=11, color="tertiary"))
+                if job['last_status'] in (scheduler.FAILED, scheduler.TIMEOUT) and job['last_error']:
+                    detail.append(ft.Text(job['last_error'].strip().splitlines()[-1], size=11, color="error", selectable=True))
+                jobs_container.controls.append(
+                    ft.Container(
+                        content=ft.Row([
+                            ft.Column(detail, spacing=2, expand=3),
+                            ft.Text(job['schedule'], size=12, expand=2),
+                            ft.Text(job['last_started_at'] or "-", size=12, expand=2),
+                            ft.Container(status_label(job['last_status']), expand=1),
+                            ft.Text(seconds(job['last_ms']), size=12, expand=1),
+                            ft.Text(f"{seconds(job['avg_ms'])} / {seconds(job['max_ms'])}", size=12, expand=1),
+                            ft.Text(f"{job['failures']} of {job['runs']}", size=12, expand=1,
+                                    color="error" if job['failures'] else None),
+                            ft.Text(job['next_run_at'] + (f" (retry {job['attempts']})" if job['attempts'] else ""),
+                                    size=12, expand=2),
+                            ft.Container(
+                                ft.TextButton("Run now", icon=ft.Icons.PLAY_ARROW,
+                                              on_click=lambda e, name=job['name']: run_now(e, name)),
+                                expand=1,
+                            ),
+                        ], vertical_alignment=ft.CrossAxisAlignment.START),
+                        padding=10,
+                        border=ft.border.all(1, "outlineVariant"),
+                        border_radius=8,
+                    )
+                )
+        else:
+            jobs_container.controls.append(empty("No jobs registered yet"))
+
+        runs_container.controls.clear()
+        runs = scheduler.get_runs(limit=50)
+        if runs:
+            runs_container.controls.append(header_row([
+                ("Job", 3), ("Started", 2), ("Duration", 1), ("Attempt", 1), ("Status", 1), ("Result", 4),
+            ]))
+            for run in runs:
+                outcome = run['result'] or ((run['error'] or "").strip().splitlines() or [""])[-1]
+                runs_container.controls.append(
+                    ft.Container(
+                        content=ft.Row([
+                            ft.Text(run['job'], size=12, expand=3),
+                            ft.Text(run['started_at'], size=12, expand=2),
+                            ft.Text(seconds(run['duration_ms']), size=12, expand=1),
+                            ft.Text(str(run['attempt']), size=12, expand=1),
+                            ft.Container(status_label(run['status']), expand=1),
+                            ft.Text(outcome, size=12, expand=4,
+                                    selectable=True, color="error" if run['error'] else None),
+                        ]),
+                        padding=10,
+                        border=ft.border.all(1, "outlineVariant"),
+                        border_radius=8,
+                    )
+                )
+        else:
+            runs_container.controls.append(empty("No runs recorded yet"))
+
+        if e:
+            e.page.update()
+
+    load_data()
+
+    return ft.Column([
+        # Header
+        ft.Row([
+            ft.Text("Background Jobs", size=28, weight="bold"),
+        ]),
+        ft.Text("Scheduled housekeeping, its runtimes and recent outcomes", size=14, color="outline"),
+
+        ft.Container(height=20),
+
+        # Controls
+        ft.Container(
+            content=ft.Column([
+                ft.Row([
+                    ft.ElevatedButton(
+                        "Refresh",
+                        icon=ft.Icons.REFRESH,
+                        bgcolor="primary",
+                        color="onPrimary",
+                        on_click=load_data,
+                    ),
+                ], spacing=10, wrap=True),
+                status_text,
+            ], spacing=15),
+            padding=20,
+            bgcolor="surface",
+            border_radius=10,
+            border=ft.border.all(1, "outlineVariant"),
+        ),
+
+        ft.Container(height=20),
+        section("Jobs", ft.Icons.SCHEDULE, jobs_container),
+        ft.Container(height=20),
+        section("Recent Runs", ft.Icons.HISTORY, runs_container),
+    ], scroll=ft.ScrollMode.AUTO, spacing=0)
@@ -1,8 +1,11 @@
 """System activity logs with real database data."""
 
 import flet as ft
+from services.audit import query_events, PAGE_SIZE
 from services.database import get_db_connection
-from datetime import datetime, timedelta, timezone
+from services.log_archive import query_activity
+from components.highlighted_text import HighlightedText
+from datetime import datetime, timedelta
 
 def SystemLogs():
     """System logs and activity monitoring with real data."""
@@ -18,6 +21,8 @@ def SystemLogs():
             ft.dropdown.Option("prescriptions", "Prescriptions"),
             ft.dropdown.Option("orders", "Orders"),
             ft.dropdown.Option("inventory", "Inventory Changes"),
+            ft.dropdown.Option("billing", "Billing"),
+            ft.dropdown.Option("system", "System Actions"),
         ],
         value="all",
         width=250,
@@ -44,151 +49,110 @@ def SystemLogs():
         width=300,
     )
     
-    def get_real_logs():
-        """Get real activity logs from database."""
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        logs = []
-        
-        # Query system registration volume
-        cursor.execute("""
-            SELECT id, username, full_name, role, created_at
-            FROM users
-            ORDER BY created_at DESC
-            LIMIT 20
-        """)
-        users = cursor.fetchall()
-        
-        for user in users:
-            logs.append({
-                "timestamp": user[4],
-                "user": user[1],
-                "action": f"New {'Customer' if user[3] == 'Patient' else user[3]} Registered",
-                "details": f"User '{user[2] or user[1]}' created account",
-                "type": "users",
-                "icon": ft.Icons.PERSON_ADD,
-                "color": "primary",
-            })
-        
-        # Query system prescription volume
-        cursor.execute("""
-            SELECT p.id, p.status, p.created_at, u.username, u.full_name
-            FROM prescriptions p
-            JOIN users u ON p.patient_id = u.id
-            ORDER BY p.created_at DESC
-            LIMIT 20
-        """)
-        prescriptions = cursor.fetchall()
-        
-        for rx in prescriptions:
-            status = rx[1]
-            color = "primary" if status == "Approved" else "tertiary" if status == "Pending" else "error"
-            icon = ft.Icons.CHECK_CIRCLE if status == "Approved" else ft.Icons.PENDING if status == "Pending" else ft.Icons.CANCEL
-            
-            logs.append({
-                "timestamp": rx[2],
-                "user": rx[3],
-                "action": f"Prescription #{rx[0]} {status}",
-                "details": f"Prescription for {rx[4] or rx[3]} status: {status}",
-                "type": "prescriptions",
-                "icon": icon,
-                "color": color,
-            })
-        
-        # Query commerce operations volume
-        cursor.execute("""
-            SELECT o.id, o.status, o.order_date, o.total_amount, u.username, u.full_name
-            FROM orders o
-            JOIN users u ON o.patient_id = u.id
-            ORDER BY o.order_date DESC
-            LIMIT 20
-        """)
-        orders = cursor.fetchall()
-        
-        for order in orders:
-            status = order[1]
-            color = "primary" if status == "Completed" else "tertiary" if status == "Pending" else "secondary"
-            
-            logs.append({
-                "timestamp": order[2],
-                "user": order[4],
-                "action": f"Order #{order[0]} - {status}",
-                "details": f"{order[5] or order[4]} placed order for ₱{order[3]:.2f}",
-                "type": "orders",
-                "icon": ft.Icons.SHOPPING_CART,
-                "color": color,
-            })
-        
-        # Query inventory modifications
-        cursor.execute("""
-            SELECT id, name, stock, created_at
-            FROM medicines
-            ORDER BY created_at DESC
-            LIMIT 15
-        """)
-        medicines = cursor.fetchall()
-        
-        for med in medicines:
-            logs.append({
-                "timestamp": med[3],
-                "user": "system",
-                "action": "Medicine Added",
-                "details": f"{med[1]} added to inventory (Stock: {med[2]})",
-                "type": "inventory",
-                "icon": ft.Icons.INVENTORY,
-                "color": "secondary",
-            })
-        
-        # Query billing generation activity
-        cursor.execute("""
-            SELECT i.id, i.invoice_number, i.total_amount, i.status, i.created_at, u.username
-            FROM invoices i
-            JOIN users u ON i.patient_id = u.id
-            ORDER BY i.created_at DESC
-            LIMIT 15
-        """)
-        invoices = cursor.fetchall()
-        
-        for inv in invoices:
-            logs.append({
-                "timestamp": inv[4],
-                "user": inv[5],
-                "action": f"Invoice {inv[1]} Generated",
-                "details": f"Invoice for ₱{inv[2]:.2f} - Status: {inv[3]}",
-                "type": "billing",
-                "icon": ft.Icons.RECEIPT,
-                "color": "tertiary",
-            })
-            
-        # Query system action audit table
-        try:
-            cursor.execute("""
-                SELECT timestamp, user_id, action, details 
-                FROM activity_log 
-                ORDER BY timestamp DESC 
-                LIMIT 30
-            """)
-            activities = cursor.fetchall()
-            for act in activities:
-                logs.append({
-                    "timestamp": act[0],
-                    "user": str(act[1]), # User ID
-                    "action": act[2],
-                    "details": act[3],
-                    "type": "system",
-                    "icon": ft.Icons.SETTINGS,
-                    "color": "secondary",
-                })
-        except:
-            pass # Table might not exist
-        
-        conn.close()
-        
-        # Enforce reverse chronological order
-        logs.sort(key=lambda x: x['timestamp'], reverse=True)
-        
-        return logs
+    # Keyset cursors of the last rendered page per source, {'audit': ..., 'archive': ...};
+    # a source missing from the dict is exhausted (None when both are)
+    next_cursor = None
+
+    # Visual style per event type
+    type_styles = {
+        "users": (ft.Icons.PERSON_ADD, "primary"),
+        "prescriptions": (ft.Icons.MEDICAL_SERVICES, "tertiary"),
+        "orders": (ft.Icons.SHOPPING_CART, "secondary"),
+        "inventory": (ft.Icons.INVENTORY, "secondary"),
+        "billing": (ft.Icons.RECEIPT, "tertiary"),
+        "system": (ft.Icons.SETTINGS, "secondary"),
+    }
+
+    def to_log(event):
+        """Convert an audit_events row into the card format."""
+        icon, color = type_styles.get(event['event_type'], (ft.Icons.SETTINGS, "secondary"))
+        status = event['status']
+        if status in ("Approved", "Completed", "Paid"):
+            icon, color = (ft.Icons.CHECK_CIRCLE, "primary") if event['event_type'] == "prescriptions" else (icon, "primary")
+        elif status in ("Rejected", "Cancelled", "Cancelled by patient"):
+            icon, color = (ft.Icons.CANCEL, "error") if event['event_type'] == "prescriptions" else (icon, "error")
+        elif status == "Pending" and event['event_type'] == "prescriptions":
+            icon = ft.Icons.PENDING
+
+        return {
+            "timestamp": event['created_at'],
+            "user": event['actor'] or "system",
+            "action": event['action'],
+            "details": event['details'] or "",
+            "snippet": event.get('snippet'),
+            "type": event['event_type'],
+            "icon": icon,
+            "color": color,
+        }
+
+    def to_archived_log(row, usernames):
+        """Convert an archived activity_log row into the card format."""
+        icon, color = type_styles["system"]
+        return {
+            "timestamp": row['timestamp'],
+            "user": usernames.get(row['user_id'], str(row['user_id'])),
+            "action": row['action'],
+            "details": row['details'] or "",
+            "snippet": None,
+            "type": "system",
+            "icon": icon,
+            "color": color,
+        }
+
+    def get_archived_logs(since, search, after):
+        """One page of activity moved out to the monthly archive partitions."""
+        rows = query_activity(since=since, search=search, after=after, limit=PAGE_SIZE + 1, archived_only=True)
+        user_ids = {row['user_id'] for row in rows}
+        usernames = {}
+        if user_ids:
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT id, username FROM users WHERE id IN ({','.join('?' * len(user_ids))})", list(user_ids))
+            usernames = {row['id']: row['username'] for row in cursor.fetchall()}
+            conn.close()
+        more = len(rows) > PAGE_SIZE
+        return [(to_archived_log(row, usernames), (row['timestamp'], row['id'])) for row in rows[:PAGE_SIZE]], more
+
+    def get_real_logs(after=None):
+        """
+        Fetch one page of logs with all filters applied in SQL: the audit
+        stream merged with archived activity (system events moved out of the
+        hot tables), newest first.
+        """
+        after = after or {'audit': None, 'archive': None}
+        since = None
+        if date_filter.value != "all":
+            now = datetime.now()
+            if date_filter.value == "today":
+                cutoff = now.replace(hour=0, minute=0, second=0, microsecond=0)
+            elif date_filter.value == "week":
+                cutoff = now - timedelta(days=7)
+            else:  # month
+                cutoff = now - timedelta(days=30)
+            since = cutoff.strftime("%Y-%m-%d %H:%M:%S")
+
+        event_type = None if log_type_filter.value == "all" else log_type_filter.value
+        search = search_field.value.strip() if search_field.value else None
+
+        # Each source yields (log, its own cursor) pairs and whether more rows remain
+        sources = {}
+        if 'audit' in after:
+            events, cursor = query_events(event_type=event_type, since=since, search=search, after=after['audit'])
+            sources['audit'] = ([(to_log(event), (event['created_at'], event['id'])) for event in events], cursor is not None)
+        if 'archive' in after and event_type in (None, "system"):
+            sources['archive'] = get_archived_logs(since, search, after['archive'])
+
+        merged = sorted(
+            ((log, name, key) for name, (entries, _) in sources.items() for log, key in entries),
+            key=lambda item: item[2][0], reverse=True,
+        )[:PAGE_SIZE]
+
+        cursor = {}
+        for name, (entries, more) in sources.items():
+            taken = [key for _, source, key in merged if source == name]
+            if more or len(taken) < len(entries):
+                cursor[name] = taken[-1] if taken else after[name]
+        return [log for log, _, _ in merged], cursor or None
     
     def create_log_entry(log):
         """Create a log entry card."""
@@ -221,7 +185,7 @@ def SystemLogs():
                             border_radius=10,
                         ),
                     ], spacing=10),
-                    ft.Text(log['details'], size=13, color="outline"),
+                    HighlightedText(log['snippet']) if log['snippet'] else ft.Text(log['details'], size=13, color="outline"),
                     ft.Row([
                         ft.Icon(ft.Icons.PERSON, size=14, color="outline"),
                         ft.Text(log['user'], size=12, color="outline"),
@@ -237,9 +201,9 @@ def SystemLogs():
         )
     
     def get_time_ago(log_time):
-        """Convert UTC datetime to 'time ago' format."""
-        # Use UTC time since SQLite stores CURRENT_TIMESTAMP in UTC
-        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        """Convert a local timestamp to 'time ago' format."""
+        # Audit events are stamped in local time
+        now = datetime.now()
         
         # Handle potential microseconds in timestamp
         try:
@@ -263,72 +227,21 @@ def SystemLogs():
         else:
             return "Just now"
     
+    load_more_button = ft.OutlinedButton("Load More", icon=ft.Icons.EXPAND_MORE, visible=False)
+    shown_label = ft.Text("", size=14, color="outline", weight="bold")
+
     def load_logs(e=None):
-        """Load and filter logs."""
+        """Load the first page of logs for the current filters."""
+        nonlocal next_cursor
         logs_container.controls.clear()
-        
-        # Get logs from database
-        all_logs = get_real_logs()
-        
-        # Apply filters
-        log_type = log_type_filter.value
-        date_range = date_filter.value
-        search_query = search_field.value.lower() if search_field.value else ""
-        
-        # Filter by type
-        if log_type != "all":
-            all_logs = [log for log in all_logs if log['type'] == log_type]
-        
-        # Filter by date
-        if date_range != "all":
-            # Use UTC since SQLite stores CURRENT_TIMESTAMP in UTC
-            now = datetime.now(timezone.utc).replace(tzinfo=None)
-            
-            if date_range == "today":
-                # Get start of today (UTC)
-                cutoff = now.replace(hour=0, minute=0, second=0, microsecond=0)
-            elif date_range == "week":
-                cutoff = now - timedelta(days=7)
-            else:  # month
-                cutoff = now - timedelta(days=30)
-            
-            # Filter with proper timestamp parsing
-            filtered_logs = []
-            for log in all_logs:
-                try:
-                    # Handle potential microseconds in timestamp
-                    timestamp_str = str(log['timestamp']).split('.')[0]
-                    log_datetime = datetime.strptime(timestamp_str, "%Y-%m-%d %H:%M:%S")
-                    
-                    if log_datetime >= cutoff:
-                        filtered_logs.append(log)
-                except:
-                    # If parsing fails, include the log to be safe
-                    filtered_logs.append(log)
-            
-            all_logs = filtered_logs
-        
-        # Execute client-side fuzzy search filter
-        if search_query:
-            all_logs = [
-                log for log in all_logs
-                if search_query in log['action'].lower() 
-                or search_query in log['details'].lower()
-                or search_query in log['user'].lower()
-            ]
-        
+
+        logs, next_cursor = get_real_logs()
+
         # Conditional empty state rendering
-        if all_logs:
-            logs_container.controls.append(
-                ft.Text(
-                    f"Showing {len(all_logs)} log entries",
-                    size=14,
-                    color="outline",
-                    weight="bold",
-                )
-            )
-            
-            for log in all_logs[:50]:  # Show max 50 logs
+        if logs:
+            shown_label.value = f"Showing {len(logs)}{'+' if next_cursor else ''} log entries"
+            logs_container.controls.append(shown_label)
+            for log in logs:
                 logs_container.controls.append(create_log_entry(log))
         else:
             logs_container.controls.append(
@@ -342,9 +255,27 @@ def SystemLogs():
                     alignment=ft.alignment.center,
                 )
             )
+        load_more_button.visible = next_cursor is not None
         
         if e:
             e.page.update()
+
+    def load_more(e):
+        """Append the next page after the current cursor."""
+        nonlocal next_cursor
+        if next_cursor is None:
+            return
+        logs, next_cursor = get_real_logs(after=next_cursor)
+        for log in logs:
+            logs_container.controls.append(create_log_entry(log))
+        shown_label.value = f"Showing {len(logs_container.controls) - 1}{'+' if next_cursor else ''} log entries"
+        load_more_button.visible = next_cursor is not None
+        e.page.update()
+
+    load_more_button.on_click = load_more
+    log_type_filter.on_change = load_logs
+    date_filter.on_change = load_logs
+    search_field.on_submit = load_logs
     
     # Initialize primary component state
     class FakePage:
@@ -399,6 +330,7 @@ def SystemLogs():
                 ], spacing=10),
                 ft.Divider(height=20),
                 logs_container,
+                ft.Row([load_more_button], alignment=ft.MainAxisAlignment.CENTER),
             ], spacing=10),
             padding=20,
             bgcolor="surface",
@@ -1,9 +1,14 @@
 """System reports generation with real database data - COMPLETE FIX."""
 
 import flet as ft
-from services.database import get_db_connection
+from services.analytics_snapshot import get_report_connection, freshness_label
+from services.reports import (
+    get_user_activity_report, get_inventory_report, get_prescription_summary,
+    get_low_stock_report, get_system_usage_report, get_orders_summary, get_stock_movement_summary,
+)
 from datetime import datetime, timedelta
 from utils.notifications import show_success, show_error
+from services.stock_ledger import RECEIPT, SALE, RESERVATION, RELEASE, ADJUSTMENT, EXPIRY_WRITEOFF
 
 def ReportsView():
     """Reports interface with real database statistics."""
@@ -21,6 +26,7 @@ def ReportsView():
             ft.dropdown.Option("low_stock", "Low Stock Alert Report"),
             ft.dropdown.Option("system_usage", "System Usage Statistics"),
             ft.dropdown.Option("orders_summary", "Orders Summary Report"),
+            ft.dropdown.Option("stock_movements", "Stock Movement Report"),
         ],
         value="user_activity",
         width=300,
@@ -65,28 +71,11 @@ def ReportsView():
     def generate_user_activity_report():
         """Generate user activity report from real data."""
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # Get user counts by role
-            cursor.execute("""
-                SELECT role, COUNT(*) as count
-                FROM users
-                GROUP BY role
-                ORDER BY count DESC
-            """)
-            role_stats = cursor.fetchall()
-            
-            # Get recent registrations
-            cursor.execute("""
-                SELECT username, full_name, role, created_at
-                FROM users
-                ORDER BY created_at DESC
-                LIMIT 10
-            """)
-            recent_users = cursor.fetchall()
-            
+            conn = get_report_connection()
+            report = get_user_activity_report(conn.cursor())
             conn.close()
+            role_stats = report['role_stats']
+            recent_users = report['recent_users']
             
             # Build report
             controls = [
@@ -161,16 +150,13 @@ def ReportsView():
     def generate_inventory_report():
         """Generate inventory status report from real data."""
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # Get inventory statistics
-            cursor.execute("SELECT COUNT(*) FROM medicines")
-            total_meds = cursor.fetchone()[0] or 0
+            conn = get_report_connection()
+            report = get_inventory_report(conn.cursor())
+            conn.close()
+            total_meds = report['total_medicines']
             
             # If no medicines, show a helpful message
             if total_meds == 0:
-                conn.close()
                 return [
                     ft.Container(
                         content=ft.Column([
@@ -183,35 +169,11 @@ def ReportsView():
                     )
                 ]
             
-            cursor.execute("SELECT COUNT(*) FROM medicines WHERE stock < 10")
-            low_stock = cursor.fetchone()[0] or 0
-            
-            cursor.execute("SELECT COUNT(*) FROM medicines WHERE stock = 0")
-            out_of_stock = cursor.fetchone()[0] or 0
-            
-            cursor.execute("SELECT SUM(CAST(stock AS REAL) * CAST(price AS REAL)) FROM medicines")
-            result = cursor.fetchone()
-            total_value = float(result[0]) if result and result[0] else 0.0
-            
-            # Get medicines by category
-            cursor.execute("""
-                SELECT category, COUNT(*) as count, SUM(stock) as total_stock
-                FROM medicines
-                GROUP BY category
-                ORDER BY count DESC
-            """)
-            categories = cursor.fetchall()
-            
-            # Get top 10 medicines by stock
-            cursor.execute("""
-                SELECT name, category, stock, price, (CAST(stock AS REAL) * CAST(price AS REAL)) as value
-                FROM medicines
-                ORDER BY stock DESC
-                LIMIT 10
-            """)
-            top_stock = cursor.fetchall()
-            
-            conn.close()
+            low_stock = report['low_stock']
+            out_of_stock = report['out_of_stock']
+            total_value = report['total_value']
+            categories = report['categories']
+            top_stock = report['top_stock']
             
             # Build report
             controls = [
@@ -296,16 +258,13 @@ def ReportsView():
     def generate_prescription_report():
         """Generate prescription summary report from real data."""
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # Get prescription statistics
-            cursor.execute("SELECT COUNT(*) FROM prescriptions")
-            total_rx = cursor.fetchone()[0] or 0
+            conn = get_report_connection()
+            report = get_prescription_summary(conn.cursor())
+            conn.close()
+            total_rx = report['total']
             
             # If no prescriptions, show a helpful message
             if total_rx == 0:
-                conn.close()
                 return [
                     ft.Container(
                         content=ft.Column([
@@ -318,26 +277,10 @@ def ReportsView():
                     )
                 ]
             
-            cursor.execute("SELECT COUNT(*) FROM prescriptions WHERE status = 'Pending'")
-            pending = cursor.fetchone()[0] or 0
-            
-            cursor.execute("SELECT COUNT(*) FROM prescriptions WHERE status = 'Approved'")
-            approved = cursor.fetchone()[0] or 0
-            
-            cursor.execute("SELECT COUNT(*) FROM prescriptions WHERE status = 'Rejected'")
-            rejected = cursor.fetchone()[0] or 0
-            
-            # Get recent prescriptions
-            cursor.execute("""
-                SELECT p.id, p.status, p.created_at, u.full_name, u.username
-                FROM prescriptions p
-                JOIN users u ON p.patient_id = u.id
-                ORDER BY p.created_at DESC
-                LIMIT 15
-            """)
-            recent_rx = cursor.fetchall()
-            
-            conn.close()
+            pending = report['pending']
+            approved = report['approved']
+            rejected = report['rejected']
+            recent_rx = report['recent']
             
             # Build report
             controls = [
@@ -413,28 +356,12 @@ def ReportsView():
     def generate_low_stock_report():
         """Generate low stock alert report from real data."""
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # Get low stock items (stock < 10 but > 0)
-            cursor.execute("""
-                SELECT name, category, stock, price, supplier
-                FROM medicines
-                WHERE stock < 10 AND stock > 0
-                ORDER BY stock ASC
-            """)
-            low_stock_items = cursor.fetchall()
-            
-            # Get out of stock items
-            cursor.execute("""
-                SELECT name, category, price, supplier
-                FROM medicines
-                WHERE stock = 0
-                ORDER BY name
-            """)
-            out_of_stock_items = cursor.fetchall()
-            
+            # Items below their reorder point come from the reorder queue
+            conn = get_report_connection()
+            report = get_low_stock_report(conn.cursor())
             conn.close()
+            low_stock_items = report['low_stock']
+            out_of_stock_items = report['out_of_stock']
             
             # Build report
             controls = [
@@ -496,7 +423,7 @@ def ReportsView():
                     ft.Container(
                         content=ft.Row([
                             ft.Icon(ft.Icons.WARNING, color="tertiary", size=30),
-                            ft.Text(f"{len(low_stock_items)} items have LOW STOCK (< 10 units)", 
+                            ft.Text(f"{len(low_stock_items)} items are BELOW REORDER POINT", 
                                    size=16, weight="bold", color="tertiary"),
                         ], spacing=10),
                         bgcolor=ft.Colors.with_opacity(0.1, "tertiary"),
@@ -554,25 +481,17 @@ def ReportsView():
     def generate_system_usage_report():
         """Generate system usage statistics from real data."""
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # Get various counts
-            cursor.execute("SELECT COUNT(*) FROM users")
-            total_users = cursor.fetchone()[0] or 0
-            
-            cursor.execute("SELECT COUNT(*) FROM medicines")
-            total_medicines = cursor.fetchone()[0] or 0
-            
-            cursor.execute("SELECT COUNT(*) FROM prescriptions")
-            total_prescriptions = cursor.fetchone()[0] or 0
-            
-            cursor.execute("SELECT COUNT(*) FROM orders")
-            total_orders = cursor.fetchone()[0] or 0
+            conn = get_report_connection()
+            report = get_system_usage_report(conn.cursor())
+            conn.close()
+            total_users = report['users']
+            total_medicines = report['medicines']
+            total_prescriptions = report['prescriptions']
+            total_orders = report['orders']
+            users_by_role = report['users_by_role']
             
             # If no meaningful data beyond users, show a helpful message
             if total_medicines == 0 and total_orders == 0 and total_prescriptions == 0:
-                conn.close()
                 return [
                     ft.Container(
                         content=ft.Column([
@@ -585,16 +504,6 @@ def ReportsView():
                     )
                 ]
             
-            # Get users by role
-            cursor.execute("""
-                SELECT role, COUNT(*) as count
-                FROM users
-                GROUP BY role
-            """)
-            users_by_role = cursor.fetchall()
-            
-            conn.close()
-            
             # Build report
             controls = [
                 ft.Text("System Usage Statistics", size=24, weight="bold"),
@@ -647,36 +556,18 @@ def ReportsView():
     def generate_orders_summary():
         """Generate orders summary report from real data."""
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # Parse date filters
-            try:
-                date_from = date_from.value if hasattr(date_from, 'value') else date_from
-                date_to = date_to.value if hasattr(date_to, 'value') else date_to
-            except:
-                date_from = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
-                date_to = datetime.now().strftime("%Y-%m-%d")
-            
-            # Get order statistics with date filter
-            cursor.execute("""
-                SELECT COUNT(*), SUM(total_amount) FROM orders 
-                WHERE DATE(order_date) BETWEEN ? AND ?
-            """, (date_from, date_to))
-            result = cursor.fetchone()
-            total_orders = result[0] or 0
-            
-            # Get total revenue from COMPLETED orders only within date range (per finance division)
-            cursor.execute("""
-                SELECT SUM(total_amount) FROM orders 
-                WHERE status = 'Completed' AND DATE(order_date) BETWEEN ? AND ?
-            """, (date_from, date_to))
-            revenue_result = cursor.fetchone()
-            total_revenue = float(revenue_result[0]) if revenue_result and revenue_result[0] else 0.0
+            start = date_from.value or (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
+            end = date_to.value or datetime.now().strftime("%Y-%m-%d")
+
+            # Revenue counts COMPLETED orders only within the date range (per finance division)
+            conn = get_report_connection()
+            report = get_orders_summary(conn.cursor(), start, end)
+            conn.close()
+            total_orders = report['total']
+            total_revenue = report['revenue']
             
             # If no orders, show a helpful message
             if total_orders == 0:
-                conn.close()
                 return [
                     ft.Container(
                         content=ft.Column([
@@ -689,29 +580,9 @@ def ReportsView():
                     )
                 ]
             
-            cursor.execute("""
-                SELECT COUNT(*) FROM orders 
-                WHERE status = 'Pending' AND DATE(order_date) BETWEEN ? AND ?
-            """, (date_from, date_to))
-            pending = cursor.fetchone()[0] or 0
-            
-            cursor.execute("""
-                SELECT COUNT(*) FROM orders 
-                WHERE status = 'Completed' AND DATE(order_date) BETWEEN ? AND ?
-            """, (date_from, date_to))
-            completed = cursor.fetchone()[0] or 0
-            
-            # Get recent orders
-            cursor.execute("""
-                SELECT o.id, o.total_amount, o.status, o.order_date, u.username
-                FROM orders o
-                JOIN users u ON o.patient_id = u.id
-                ORDER BY o.order_date DESC
-                LIMIT 15
-            """)
-            orders = cursor.fetchall()
-            
-            conn.close()
+            pending = report['pending']
+            completed = report['completed']
+            orders = report['recent']
             
             controls = [
                 ft.Text("Orders Summary Report", size=24, weight="bold"),
@@ -766,7 +637,85 @@ def ReportsView():
             return controls
         except Exception as e:
             return [ft.Text(f"Error generating orders report: {str(e)}", color="error", size=14)]
-    
+
+    def generate_stock_movement_report():
+        """Generate point-in-time valuation and movements from the stock ledger."""
+        try:
+            start = date_from.value or (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
+            end = date_to.value or datetime.now().strftime("%Y-%m-%d")
+
+            # Opening balance is the end of the day before the period starts
+            conn = get_report_connection()
+            report = get_stock_movement_summary(conn.cursor(), start, end)
+            conn.close()
+            opening_value = report['opening_value']
+            closing_value = report['closing_value']
+            movements = report['movements']
+
+            sold = -sum(m[SALE] for m in movements)
+            received = sum(m[RECEIPT] for m in movements)
+            written_off = -sum(m[EXPIRY_WRITEOFF] for m in movements)
+
+            controls = [
+                ft.Text("Stock Movement Report", size=24, weight="bold"),
+                ft.Text(f"Period: {start} to {end} | Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}",
+                       size=12, color="outline"),
+                ft.Divider(height=20),
+
+                ft.Row([
+                    create_summary_card("Opening Value", f"₱{opening_value:,.2f}", ft.Icons.INVENTORY, "primary"),
+                    create_summary_card("Closing Value", f"₱{closing_value:,.2f}", ft.Icons.PAYMENTS, "secondary"),
+                    create_summary_card("Units Received", received, ft.Icons.LOCAL_SHIPPING, "primary"),
+                    create_summary_card("Units Sold", sold, ft.Icons.SHOPPING_CART, "tertiary"),
+                    create_summary_card("Written Off", written_off, ft.Icons.DELETE_SWEEP, "error"),
+                ], spacing=15, run_spacing=15),
+
+                ft.Container(height=20),
+                ft.Text("Movements by Medicine", size=18, weight="bold"),
+                ft.Container(height=10),
+            ]
+
+            if not movements:
+                controls.append(ft.Text("No stock movements in this period", color="outline", italic=True))
+                return controls
+
+            controls.append(
+                ft.Container(
+                    content=ft.Row([
+                        ft.Text("Medicine", size=12, weight="bold", expand=2),
+                        ft.Text("Received", size=12, weight="bold", expand=1),
+                        ft.Text("Sold", size=12, weight="bold", expand=1),
+                        ft.Text("Reserved (net)", size=12, weight="bold", expand=1),
+                        ft.Text("Adjusted", size=12, weight="bold", expand=1),
+                        ft.Text("Written Off", size=12, weight="bold", expand=1),
+                    ]),
+                    bgcolor="surfaceVariant",
+                    padding=10,
+                    border_radius=8,
+                )
+            )
+
+            for m in movements:
+                controls.append(
+                    ft.Container(
+                        content=ft.Row([
+                            ft.Text(str(m['name']), size=12, expand=2),
+                            ft.Text(str(m[RECEIPT]), size=12, expand=1),
+                            ft.Text(str(-m[SALE]), size=12, expand=1),
+                            ft.Text(str(-(m[RESERVATION] + m[RELEASE])), size=12, expand=1),
+                            ft.Text(str(m[ADJUSTMENT]), size=12, expand=1),
+                            ft.Text(str(-m[EXPIRY_WRITEOFF]), size=12, expand=1),
+                        ]),
+                        padding=10,
+                        border=ft.border.all(1, "outlineVariant"),
+                        border_radius=8,
+                    )
+                )
+
+            return controls
+        except Exception as e:
+            return [ft.Text(f"Error generating stock movement report: {str(e)}", color="error", size=14)]
+
     def generate_report(e):
         """Execute selected report generator."""
         # Clear controls completely first
@@ -781,6 +730,7 @@ def ReportsView():
             "low_stock": generate_low_stock_report,
             "system_usage": generate_system_usage_report,
             "orders_summary": generate_orders_summary,
+            "stock_movements": generate_stock_movement_report,
         }
 
         generator = report_generators.get(report_type.value)
@@ -793,6 +743,7 @@ def ReportsView():
                 for ctrl in report_controls:
                     report_output.controls.append(ctrl)
                 show_success(e.page, f"Report generated successfully!")
+                freshness.value = freshness_label()
             except Exception as ex:
                 report_output.controls = [
                     ft.Container(
@@ -808,11 +759,14 @@ def ReportsView():
         e.page.update()
     
     # --- PAGE LAYOUT ---
+    freshness = ft.Text(freshness_label(), size=12, color="outline", italic=True)
+
     return ft.Column([
         ft.Row([
             ft.Text("System Reports", size=28, weight="bold"),
         ]),
         ft.Text("Generate comprehensive system reports", size=14, color="outline"),
+        freshness,
         
         ft.Container(height=20),
         
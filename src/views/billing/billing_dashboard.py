@@ -3,8 +3,11 @@
 import flet as ft
 from datetime import datetime, timedelta
 from services.database import get_db_connection
+from services.billing import get_billing_stats, get_recent_invoices
 from state.app_state import AppState
 from components.navigation_header import NavigationHeader
+from components.live_region import LiveRegion
+from services.live_updates import INVOICES_TOPIC
 
 def BillingDashboard():
     """Main billing dashboard with statistics and quick actions."""
@@ -13,10 +16,7 @@ def BillingDashboard():
     user_name = user['full_name'] if user else "Billing Clerk"
     
     # Initialize default metric values
-    pending_invoices = 0
-    paid_today = 0
-    revenue_today = 0.0
-    pending_amount = 0.0
+    stats = {'pending_invoices': 0, 'paid_today': 0, 'revenue_today': 0.0, 'pending_amount': 0.0}
     recent_invoices = []
     recent_activities = []
 
@@ -25,30 +25,10 @@ def BillingDashboard():
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        # Query pending invoice totals
-        cursor.execute("SELECT COUNT(*) FROM invoices WHERE status = 'Unpaid'")
-        pending_invoices = cursor.fetchone()[0] or 0
-        
-        # Query daily completed transactions count
-        cursor.execute("SELECT COUNT(*) FROM invoices WHERE status = 'Paid' AND DATE(payment_date) = DATE('now')")
-        paid_today = cursor.fetchone()[0] or 0
-        
-        # Query daily realized revenue
-        cursor.execute("SELECT COALESCE(SUM(total_amount), 0) FROM invoices WHERE status = 'Paid' AND DATE(payment_date) = DATE('now')")
-        revenue_today = cursor.fetchone()[0] or 0.0
-        
-        # Query total outstanding receivables
-        cursor.execute("SELECT COALESCE(SUM(total_amount), 0) FROM invoices WHERE status = 'Unpaid'")
-        pending_amount = cursor.fetchone()[0] or 0.0
+        stats.update(get_billing_stats(cursor))
         
         # Query recent invoice records
-        cursor.execute("""
-            SELECT i.id, i.invoice_number, i.total_amount, i.status, i.created_at, u.full_name as patient_name
-            FROM invoices i
-            LEFT JOIN users u ON i.patient_id = u.id
-            ORDER BY i.id ASC LIMIT 5
-        """)
-        recent_invoices = cursor.fetchall()
+        recent_invoices = get_recent_invoices(cursor)
         
         # Query recent user activity
         try:
@@ -66,21 +46,27 @@ def BillingDashboard():
     
     # UI Component Definitions
     
+    # Value labels by stats key, patched by live updates
+    stat_values = {}
+
+    def format_stat(value, is_currency):
+        return f"₱{value:,.2f}" if is_currency else str(value)
+
     # UI Component: Statistics Card (Fixed Dimension)
-    def create_stat_card(title, value, icon, color, subtitle="", is_currency=False):
-        display_value = f"₱{value:,.2f}" if is_currency else str(value)
+    def create_stat_card(title, key, icon, color, subtitle="", is_currency=False):
+        stat_values[key] = (ft.Text(
+            format_stat(stats[key], is_currency),
+            size=28 if is_currency else 32,
+            weight="bold",
+            color=color,
+        ), is_currency)
         return ft.Container(
             content=ft.Column([
                 ft.Row([
                     ft.Icon(icon, color=color, size=40),
                     ft.Column([
                         ft.Text(title, size=14, color="outline"),
-                        ft.Text(
-                            display_value,
-                            size=28 if is_currency else 32,
-                            weight="bold",
-                            color=color,
-                        ),
+                        stat_values[key][0],
                         # Vertical alignment spacer
                         ft.Text(subtitle, size=11, color="outline") if subtitle else ft.Container(height=16),
                     ], spacing=2, expand=True),
@@ -137,6 +123,7 @@ def BillingDashboard():
             border=ft.border.all(1, "outlineVariant"),
             border_radius=8,
             bgcolor="surface",
+            data=inv[0],
         )
     
     def create_activity_item(action, details, timestamp):
@@ -145,20 +132,42 @@ def BillingDashboard():
         return ft.Text(f"{icon} {details}", size=12, color="outline")
     
     # Render dynamic lists
-    invoice_widgets = [create_invoice_item(inv) for inv in recent_invoices] if recent_invoices else [ft.Container(content=ft.Text("No recent invoices", color="outline"), padding=20)]
+    def render_invoices(invoices):
+        return [create_invoice_item(inv) for inv in invoices] if invoices else [ft.Container(content=ft.Text("No recent invoices", color="outline"), padding=20)]
+
+    invoices_column = ft.Column(render_invoices(recent_invoices), spacing=10)
     activity_widgets = [create_activity_item(a[0], a[1], a[2]) for a in recent_activities] if recent_activities else [ft.Text("No recent activity", color="outline")]
     
-    return ft.Column([
+    # Live update: refresh the stat values and only the changed invoice rows
+    def patch_invoices(invoice_ids):
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        stats.update(get_billing_stats(cursor))
+        invoices = get_recent_invoices(cursor)
+        conn.close()
+
+        for key, (text, is_currency) in stat_values.items():
+            text.value = format_stat(stats[key], is_currency)
+
+        shown = [row.data for row in invoices_column.controls if row.data is not None]
+        if shown != [inv[0] for inv in invoices]:
+            invoices_column.controls = render_invoices(invoices)
+        else:
+            for index, inv in enumerate(invoices):
+                if inv[0] in invoice_ids:
+                    invoices_column.controls[index] = create_invoice_item(inv)
+
+    return LiveRegion(ft.Column([
         NavigationHeader(f"Welcome, {user_name}", "Billing Dashboard - Manage invoices and payments", show_back=False),
         
         ft.Container(
             content=ft.Column([
                 # Stats (Fixed Height)
                 ft.Row([
-                    create_stat_card("Pending Invoices", pending_invoices, ft.Icons.PENDING_ACTIONS, "error", "Awaiting payment"),
-                    create_stat_card("Paid Today", paid_today, ft.Icons.CHECK_CIRCLE, "primary", "Completed transactions"),
-                    create_stat_card("Today's Revenue", revenue_today, ft.Icons.ATTACH_MONEY, "primary", is_currency=True),
-                    create_stat_card("Pending Amount", pending_amount, ft.Icons.MONEY_OFF, "error", is_currency=True),
+                    create_stat_card("Pending Invoices", 'pending_invoices', ft.Icons.PENDING_ACTIONS, "error", "Awaiting payment"),
+                    create_stat_card("Paid Today", 'paid_today', ft.Icons.CHECK_CIRCLE, "primary", "Completed transactions"),
+                    create_stat_card("Today's Revenue", 'revenue_today', ft.Icons.ATTACH_MONEY, "primary", is_currency=True),
+                    create_stat_card("Pending Amount", 'pending_amount', ft.Icons.MONEY_OFF, "error", is_currency=True),
                 ], spacing=15), 
                 
                 ft.Container(height=20),
@@ -187,7 +196,7 @@ def BillingDashboard():
                         content=ft.Column([
                             ft.Row([ft.Icon(ft.Icons.RECEIPT, color="primary"), ft.Text("Recent Invoices", size=20, weight="bold")], spacing=10),
                             ft.Divider(),
-                            *invoice_widgets,
+                            invoices_column,
                             ft.TextButton("View All Invoices →", on_click=lambda e: e.page.go("/billing/invoices")),
                         ], spacing=10),
                         padding=20, bgcolor="surface", border_radius=10, border=ft.border.all(1, "outlineVariant"), expand=2,
@@ -206,4 +215,4 @@ def BillingDashboard():
             ], spacing=0, expand=True),
             padding=20,
         ),
-    ], scroll=ft.ScrollMode.AUTO, spacing=0, expand=True)
\ No newline at end of file
+    ], scroll=ft.ScrollMode.AUTO, spacing=0, expand=True), {INVOICES_TOPIC: patch_invoices})
\ No newline at end of file
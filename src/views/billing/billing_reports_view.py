@@ -2,7 +2,8 @@
 
 import flet as ft
 from datetime import datetime, timedelta
-from services.database import get_db_connection
+from services.analytics_snapshot import get_report_connection, freshness_label
+from services.billing import get_billing_report
 from state.app_state import AppState
 from components.navigation_header import NavigationHeader
 from utils.notifications import show_success, show_error
@@ -12,6 +13,7 @@ def BillingReportsView():
     
     # Initialize primary report container
     report_container = ft.Column(spacing=20)
+    freshness = ft.Text(freshness_label(), size=12, color="outline", italic=True)
     
     # Default reporting interval
     date_from = ft.TextField(
@@ -66,56 +68,17 @@ def BillingReportsView():
         report_container.controls.append(ft.ProgressRing())
         e.page.update()
         
-        conn = get_db_connection()
+        conn = get_report_connection()
         cursor = conn.cursor()
         
         try:
             date_start = date_from.value
             date_end = date_to.value
             
-            # Query aggregated financial metrics
-            cursor.execute("""
-                SELECT 
-                    COUNT(*) as total_invoices,
-                    COALESCE(SUM(CASE WHEN status = 'Paid' THEN 1 ELSE 0 END), 0) as paid_count,
-                    COALESCE(SUM(CASE WHEN status = 'Unpaid' THEN 1 ELSE 0 END), 0) as unpaid_count,
-                    COALESCE(SUM(CASE WHEN status = 'Cancelled' THEN 1 ELSE 0 END), 0) as cancelled_count,
-                    COALESCE(SUM(CASE WHEN status = 'Paid' THEN total_amount ELSE 0 END), 0) as total_revenue,
-                    COALESCE(SUM(CASE WHEN status = 'Unpaid' THEN total_amount ELSE 0 END), 0) as pending_revenue,
-                    COALESCE(AVG(CASE WHEN status = 'Paid' THEN total_amount END), 0) as avg_invoice_amount
-                FROM invoices
-                WHERE DATE(created_at) BETWEEN ? AND ?
-            """, (date_start, date_end))
-            
-            summary = cursor.fetchone()
-            total_invoices, paid_count, unpaid_count, cancelled_count, total_revenue, pending_revenue, avg_invoice = summary
-            
-            # Query transaction distribution
-            cursor.execute("""
-                SELECT payment_method, 
-                       COUNT(*) as count,
-                       SUM(total_amount) as total
-                FROM invoices
-                WHERE status = 'Paid'
-                AND DATE(payment_date) BETWEEN ? AND ?
-                GROUP BY payment_method
-                ORDER BY total DESC
-            """, (date_start, date_end))
-            payment_methods = cursor.fetchall()
-            
-            # Query top revenue contributors
-            cursor.execute("""
-                SELECT u.full_name,
-                       COUNT(i.id) as invoice_count,
-                       SUM(i.total_amount) as total_spent
-                FROM invoices i
-                LEFT JOIN users u ON i.patient_id = u.id
-                WHERE DATE(i.created_at) BETWEEN ? AND ?
-                GROUP BY u.full_name
-                ORDER BY total_spent DESC
-                LIMIT 10
-            """, (date_start, date_end))
-            top_patients = cursor.fetchall()
+            report = get_billing_report(cursor, date_start, date_end)
+            total_invoices, paid_count, unpaid_count, cancelled_count, total_revenue, pending_revenue, avg_invoice = report['summary']
+            payment_methods = report['payment_methods']
+            top_patients = report['top_patients']
             
             conn.close()
             
@@ -254,6 +217,7 @@ def BillingReportsView():
                 )
             )
 
+            freshness.value = freshness_label()
             e.page.update()
             show_success(e.page, f"Report generated successfully!")
 
@@ -272,6 +236,7 @@ def BillingReportsView():
             "Billing Reports",
             "View overall billing situation and analytics",
             show_back=False,
+            note=freshness,
         ),
         
         ft.Container(
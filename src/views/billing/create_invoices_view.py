@@ -3,6 +3,8 @@
 import flet as ft
 from datetime import datetime
 from services.database import get_db_connection
+from services.audit_logger import log_activity
+from services.live_updates import ORDERS_TOPIC, INVOICES_TOPIC, publish
 from state.app_state import AppState
 from components.navigation_header import NavigationHeader
 from utils.notifications import show_success, show_error, INVOICE_CREATED, REQUIRED_FIELDS
@@ -150,16 +152,17 @@ def CreateInvoicesView():
 
             invoice_id = cursor.lastrowid
 
-            cursor.execute("""
-                INSERT INTO activity_log (user_id, action, details, timestamp)
-                VALUES (?, 'invoice_created', ?, ?)
-            """, (user['id'], f"Created invoice {invoice_number} for patient ID {patient_id} - Amount: ₱{total:,.2f}", datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
-
             if order_id:
                 cursor.execute("UPDATE orders SET payment_status = 'Invoiced' WHERE id = ?", (order_id,))
 
             conn.commit()
             conn.close()
+            publish(INVOICES_TOPIC, [invoice_id])
+            publish(ORDERS_TOPIC, [order_id])
+
+            log_activity(user['id'], 'invoice_created',
+                         f"Created invoice {invoice_number} for patient ID {patient_id} - Amount: ₱{total:,.2f}",
+                         durable=True)
 
             show_success(e.page, f"{INVOICE_CREATED} Invoice #{invoice_number}")
 
@@ -3,6 +3,9 @@
 import flet as ft
 from datetime import datetime
 from services.database import get_db_connection
+from services.billing import get_invoices
+from services.versioning import compare_and_set, transition_allowed
+from services.live_updates import INVOICES_TOPIC, publish
 from state.app_state import AppState
 from components.navigation_header import NavigationHeader
 
@@ -64,54 +67,9 @@ def InvoicesListView():
         expand=True,
     )
     
-    # Query execution function
-    def get_invoices_from_db(status="All", payment_method="All", date_start="", date_end="", search=""):
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        query = """
-            SELECT i.id, i.invoice_number, i.total_amount, i.status, i.created_at,
-                   i.payment_method, i.payment_date, i.subtotal, i.tax, i.discount,
-                   u.full_name as patient_name, u.id as patient_id
-            FROM invoices i
-            LEFT JOIN users u ON i.patient_id = u.id
-            WHERE 1=1
-        """
-        
-        params = []
-        
-        if status != "All":
-            query += " AND i.status = ?"
-            params.append(status)
-        
-        if payment_method != "All":
-            query += " AND i.payment_method = ?"
-            params.append(payment_method)
-        
-        if date_start:
-            query += " AND DATE(i.created_at) >= ?"
-            params.append(date_start)
-        
-        if date_end:
-            query += " AND DATE(i.created_at) <= ?"
-            params.append(date_end)
-        
-        if search:
-            query += " AND (i.invoice_number LIKE ? OR u.full_name LIKE ?)"
-            params.append(f"%{search}%")
-            params.append(f"%{search}%")
-        
-        query += " ORDER BY i.created_at DESC"
-        
-        cursor.execute(query, params)
-        results = cursor.fetchall()
-        conn.close()
-        
-        return results
-    
     # Render comprehensive invoice card
     def create_invoice_card(inv):
-        inv_id, inv_number, total, status, created_at, payment_method, payment_date, subtotal, tax, discount, patient_name, patient_id = inv
+        inv_id, inv_number, total, status, created_at, payment_method, payment_date, subtotal, tax, discount, patient_name, patient_id, version = inv
         
         status_colors = {
             "Paid": "primary",
@@ -192,8 +150,8 @@ def InvoicesListView():
                     ft.OutlinedButton(
                         "Mark as Paid",
                         icon=ft.Icons.PAYMENT,
-                        disabled=(status == "Paid" or status == "Cancelled"),
-                        on_click=lambda e, inv_id=inv_id: mark_as_paid(e, inv_id),
+                        disabled=not transition_allowed('invoices', status, "Paid"),
+                        on_click=lambda e, inv_id=inv_id, version=version: mark_as_paid(e, inv_id, version),
                     ),
                     
                     # Update cancellation state
@@ -202,8 +160,8 @@ def InvoicesListView():
                         icon=ft.Icons.DELETE,
                         icon_color="error",
                         style=ft.ButtonStyle(color="error"),
-                        disabled=(status == "Paid" or status == "Cancelled"),
-                        on_click=lambda e, inv_id=inv_id: cancel_invoice(e, inv_id),
+                        disabled=not transition_allowed('invoices', status, "Cancelled"),
+                        on_click=lambda e, inv_id=inv_id, version=version: cancel_invoice(e, inv_id, version),
                     ),
                 ], spacing=10, wrap=True),
             ], spacing=10),
@@ -217,41 +175,35 @@ def InvoicesListView():
     def view_invoice_detail(e, inv_id):
         e.page.go(f"/billing/invoice/{inv_id}")
     
-    def mark_as_paid(e, inv_id):
+    # Compare-and-set status change against the version the card shows
+    def set_invoice_status(e, inv_id, version, new_status, changes, success_message, color):
         conn = get_db_connection()
-        conn.execute("""
-            UPDATE invoices 
-            SET status = 'Paid',
-                payment_date = ?
-            WHERE id = ?
-        """, (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), inv_id))
-        
+        cursor = conn.cursor()
+        ok, reason = compare_and_set(cursor, 'invoices', inv_id, changes, expected_version=version, to_status=new_status)
         conn.commit()
         conn.close()
+        if ok:
+            publish(INVOICES_TOPIC, [inv_id])
         
-        e.page.snack_bar = ft.SnackBar(content=ft.Text("Marked as Paid!"), bgcolor="primary")
+        message = success_message if ok else f"Invoice {reason}. The list has been reloaded."
+        e.page.snack_bar = ft.SnackBar(content=ft.Text(message), bgcolor=color if ok else "error")
         e.page.snack_bar.open = True
         e.page.update()
         
         load_invoices(e)
+
+    def mark_as_paid(e, inv_id, version):
+        set_invoice_status(e, inv_id, version, 'Paid', {'payment_date': datetime.now().strftime("%Y-%m-%d %H:%M:%S")},
+                           "Marked as Paid!", "primary")
     
-    def cancel_invoice(e, inv_id):
-        conn = get_db_connection()
-        conn.execute("UPDATE invoices SET status = 'Cancelled' WHERE id = ?", (inv_id,))
-        conn.commit()
-        conn.close()
-        
-        e.page.snack_bar = ft.SnackBar(content=ft.Text("Invoice Cancelled!"), bgcolor="error")
-        e.page.snack_bar.open = True
-        e.page.update()
-        
-        load_invoices(e)
+    def cancel_invoice(e, inv_id, version):
+        set_invoice_status(e, inv_id, version, 'Cancelled', {}, "Invoice Cancelled!", "error")
     
     # Populate invoice lists
     def load_invoices(e=None):
         invoices_container.controls.clear()
         
-        invoices = get_invoices_from_db(
+        invoices = get_invoices(
             status_filter.value,
             payment_method_filter.value,
             date_from.value,
@@ -2,7 +2,7 @@
 
 import flet as ft
 from datetime import datetime, timedelta
-from services.database import get_db_connection
+from services.billing import get_payments
 from state.app_state import AppState
 from components.navigation_header import NavigationHeader
 
@@ -50,44 +50,6 @@ def PaymentHistoryView():
         expand=True
     )
     
-    # Query transaction records
-    def get_payments_from_db(payment_method="All", date_start="", date_end="", search=""):
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        query = """
-            SELECT i.id, i.invoice_number, i.total_amount, i.payment_method,
-                   i.payment_date, i.created_at,
-                   u.full_name as patient_name,
-                   clerk.full_name as clerk_name
-            FROM invoices i
-            LEFT JOIN users u ON i.patient_id = u.id
-            LEFT JOIN users clerk ON i.billing_clerk_id = clerk.id
-            WHERE i.status = 'Paid'
-        """
-        
-        params = []
-        if payment_method != "All":
-            query += " AND i.payment_method = ?"
-            params.append(payment_method)
-        if date_start:
-            query += " AND DATE(i.payment_date) >= ?"
-            params.append(date_start)
-        if date_end:
-            query += " AND DATE(i.payment_date) <= ?"
-            params.append(date_end)
-        if search:
-            query += " AND (i.invoice_number LIKE ? OR u.full_name LIKE ?)"
-            params.append(f"%{search}%")
-            params.append(f"%{search}%")
-        
-        query += " ORDER BY i.payment_date DESC"
-        
-        cursor.execute(query, params)
-        results = cursor.fetchall()
-        conn.close()
-        return results
-    
     # Render transaction component
     def create_payment_card(payment):
         inv_id, inv_number, amount, payment_method, payment_date, created_at, patient_name, clerk_name = payment
@@ -133,7 +95,7 @@ def PaymentHistoryView():
     def load_payments(e=None):
         payments_container.controls.clear()
         
-        payments = get_payments_from_db(
+        payments = get_payments(
             payment_method_filter.value, 
             date_from.value, 
             date_to.value, 
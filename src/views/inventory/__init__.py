@@ -1,5 +1,6 @@
 from .inventory_dashboard import InventoryDashboard
 from .manage_stock import ManageStock
+from .purchase_suggestions import PurchaseSuggestions
 from .profile_view import InventoryProfileView
 
-__all__ = ['InventoryDashboard', 'ManageStock']
\ No newline at end of file
+__all__ = ['InventoryDashboard', 'ManageStock', 'PurchaseSuggestions']
\ No newline at end of file
@@ -1,14 +1,24 @@
 import flet as ft
 from services.database import get_db_connection
+from services.reorder import count_reorder_queue
+from services.lots import get_near_expiry_lots, write_off_expired_lots, NEAR_EXPIRY_DAYS
+from state.app_state import AppState
+from utils.notifications import show_success, show_error, show_info
+from datetime import datetime
 
 def InventoryDashboard():
     """Main screen for Inventory Manager."""
-    
+
     # Retrieve KPIs from database
     conn = get_db_connection()
     total_meds = conn.execute("SELECT COUNT(*) FROM medicines").fetchone()[0]
-    low_stock_count = conn.execute("SELECT COUNT(*) FROM medicines WHERE stock < 10").fetchone()[0]
     conn.close()
+    low_stock_count, _ = count_reorder_queue()
+
+    # Near-expiry sweep (index range scan over open lots)
+    expiring_lots = get_near_expiry_lots(NEAR_EXPIRY_DAYS)
+    today = datetime.now().strftime("%Y-%m-%d")
+    expired_count = sum(1 for lot in expiring_lots if lot['expiry_date'] < today)
 
     # Metric card component factory
     def create_stat_card(title, value, icon, color):
@@ -29,20 +39,69 @@ def InventoryDashboard():
             expand=True,
         )
 
+    # Expiring lot row component
+    def create_lot_row(lot):
+        is_expired = lot['expiry_date'] < today
+        return ft.Container(
+            content=ft.Row([
+                ft.Icon(ft.Icons.EVENT_BUSY if is_expired else ft.Icons.SCHEDULE, color="error" if is_expired else "tertiary", size=20),
+                ft.Text(lot['name'], weight="bold", expand=3),
+                ft.Text(lot['lot_number'], size=12, color="outline", expand=2),
+                ft.Text(f"{lot['quantity']} units", size=12, expand=1),
+                ft.Text(lot['expiry_date'], size=12, weight="bold", color="error" if is_expired else "tertiary", expand=1),
+            ], spacing=10),
+            padding=10,
+            border=ft.border.all(1, "outlineVariant"),
+            border_radius=8,
+        )
+
+    def write_off_expired(e):
+        try:
+            user = AppState.get_user()
+            lots, units = write_off_expired_lots(user['id'] if user else None)
+            if lots:
+                show_success(e.page, f"Wrote off {units} units from {lots} expired lot(s)")
+                e.page.go("/dashboard")
+            else:
+                show_info(e.page, "No expired lots to write off")
+        except Exception as ex:
+            show_error(e.page, f"Write-off failed: {str(ex)}")
+
     return ft.Column([
         ft.Text("Inventory Dashboard", size=28, weight="bold"),
         ft.Container(height=20),
-        
+
         # Key Performance Indicators row
         ft.Row([
             create_stat_card("Total Products", total_meds, ft.Icons.INVENTORY_2, "primary"),
             create_stat_card("Low Stock Items", low_stock_count, ft.Icons.WARNING, "error"),
+            create_stat_card(f"Lots Expiring ({NEAR_EXPIRY_DAYS}d)", len(expiring_lots), ft.Icons.EVENT, "tertiary"),
         ], spacing=15),
 
         ft.Container(height=20),
-        
+
         # Navigation action buttons
         ft.Text("Quick Actions", size=20, weight="bold"),
-        ft.ElevatedButton("Manage Stock", icon=ft.Icons.EDIT, on_click=lambda e: e.page.go("/inventory/stock"), height=50),
-        
-    ], scroll=ft.ScrollMode.AUTO)
\ No newline at end of file
+        ft.Row([
+            ft.ElevatedButton("Manage Stock", icon=ft.Icons.EDIT, on_click=lambda e: e.page.go("/inventory/stock"), height=50),
+            ft.ElevatedButton(f"Purchase Suggestions ({low_stock_count})", icon=ft.Icons.SHOPPING_CART_CHECKOUT, on_click=lambda e: e.page.go("/inventory/reorder"), height=50),
+            ft.OutlinedButton(
+                f"Write Off Expired ({expired_count})",
+                icon=ft.Icons.DELETE_SWEEP,
+                on_click=write_off_expired,
+                disabled=expired_count == 0,
+                height=50,
+            ),
+        ], spacing=10),
+
+        ft.Container(height=20),
+
+        # Near-expiry lots list
+        ft.Text("Expiring Lots (First-Expiry-First-Out)", size=20, weight="bold"),
+        ft.Column(
+            [create_lot_row(lot) for lot in expiring_lots[:20]]
+            if expiring_lots else [ft.Text("No lots expiring soon", color="outline", italic=True)],
+            spacing=8,
+        ),
+
+    ], scroll=ft.ScrollMode.AUTO)
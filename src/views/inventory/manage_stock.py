@@ -1,7 +1,12 @@
 import flet as ft
 from services.database import get_db_connection
+from services.stock_ledger import set_stock
+from services.lots import receive_lot, allocate_fefo
+from services.importer import import_medicines, list_import_files, resolve_import_path, IMPORT_DIR
+from services.reorder import set_reorder_levels, DEFAULT_REORDER_POINT, DEFAULT_REORDER_QUANTITY
+from state.app_state import AppState
 from datetime import datetime
-from utils.notifications import show_success, show_error, show_warning, show_info, CREATE_SUCCESS, UPDATE_SUCCESS, DELETE_SUCCESS, REQUIRED_FIELDS, LOW_STOCK, OUT_OF_STOCK
+from utils.notifications import show_success, show_error, show_warning, show_info, CREATE_SUCCESS, UPDATE_SUCCESS, DELETE_SUCCESS, REQUIRED_FIELDS, LOW_STOCK, OUT_OF_STOCK, STOCK_UPDATED
 
 def ManageStock():
     """Page to Add, Update, Delete, and Search Medicines."""
@@ -9,6 +14,7 @@ def ManageStock():
     # Component State Initialization
     selected_medicine_id = None 
     medicine_to_delete = None 
+    receiving_medicine_id = None
     
     # UI Component: Styled Input Field
     def create_input(label, icon=None, numeric=False, in_row=False):
@@ -106,6 +112,19 @@ def ManageStock():
     stock_input = create_input("Stock Qty", None, numeric=True, in_row=True)
     expiry_input = create_input("Expiry (YYYY-MM-DD)", ft.Icons.CALENDAR_TODAY)
     supplier_input = create_input("Supplier", ft.Icons.LOCAL_SHIPPING)
+    reorder_point_input = create_input("Reorder Point", None, numeric=True, in_row=True)
+    reorder_qty_input = create_input("Reorder Qty", None, numeric=True, in_row=True)
+
+    # Bulk Import Form Fields
+    import_file_dropdown = ft.Dropdown(label="Price list", options=[], expand=True)
+    import_supplier_input = create_input("Default Supplier (if not in file)", ft.Icons.LOCAL_SHIPPING)
+    import_result = ft.Column(spacing=4, scroll=ft.ScrollMode.AUTO, height=0)
+
+    # Lot Receipt Form Fields
+    lot_number_input = create_input("Lot Number (optional)", ft.Icons.QR_CODE)
+    lot_qty_input = create_input("Quantity", None, numeric=True, in_row=True)
+    lot_cost_input = create_input("Unit Cost (PHP)", None, numeric=True, in_row=True)
+    lot_expiry_input = create_input("Lot Expiry (YYYY-MM-DD)", ft.Icons.CALENDAR_TODAY)
 
     # Core Table Components
     table_header = create_table_row([
@@ -163,11 +182,11 @@ def ManageStock():
             params.append(category_filter.value)
 
         if stock_filter.value == "Low Stock":
-            query += " AND stock > 0 AND stock < 10"
+            query += " AND stock > 0 AND id IN (SELECT medicine_id FROM reorder_queue)"
         elif stock_filter.value == "Out of Stock":
             query += " AND stock = 0"
         elif stock_filter.value == "Good Stock":
-            query += " AND stock >= 10"
+            query += " AND id NOT IN (SELECT medicine_id FROM reorder_queue)"
 
         query += " ORDER BY id ASC"
 
@@ -198,7 +217,7 @@ def ManageStock():
         for m in meds:
             if m['stock'] == 0:
                 stock_color = "error"
-            elif m['stock'] < 10:
+            elif m['stock'] < m['reorder_point']:
                 stock_color = "orange"
             else:
                 stock_color = "primary"
@@ -213,6 +232,13 @@ def ManageStock():
                     ft.Text(m['expiry_date']),
                     ft.Text(m['supplier'] or "N/A"),
                     ft.Row([
+                        ft.IconButton(
+                            icon=ft.Icons.MOVE_TO_INBOX,
+                            icon_size=18,
+                            icon_color="secondary",
+                            tooltip="Receive Lot",
+                            on_click=lambda e, med=m: open_receive_dialog(e, med)
+                        ),
                         ft.IconButton(
                             icon=ft.Icons.EDIT,
                             icon_size=18,
@@ -242,6 +268,7 @@ def ManageStock():
         name_input.value = ""; category_input.value = None
         price_input.value = ""; stock_input.value = ""
         expiry_input.value = ""; supplier_input.value = ""
+        reorder_point_input.value = str(DEFAULT_REORDER_POINT); reorder_qty_input.value = str(DEFAULT_REORDER_QUANTITY)
         dialog.title = ft.Row([ft.Icon(ft.Icons.ADD_BOX, color="primary"), ft.Text("Add New Medicine")])
         e.page.open(dialog)
 
@@ -251,6 +278,7 @@ def ManageStock():
         name_input.value = med['name']; category_input.value = med['category']
         price_input.value = str(med['price']); stock_input.value = str(med['stock'])
         expiry_input.value = med['expiry_date']; supplier_input.value = med['supplier']
+        reorder_point_input.value = str(med['reorder_point']); reorder_qty_input.value = str(med['reorder_quantity'])
         dialog.title = ft.Row([ft.Icon(ft.Icons.EDIT, color="primary"), ft.Text("Edit Medicine")])
         e.page.open(dialog)
 
@@ -259,17 +287,99 @@ def ManageStock():
             show_error(e.page, REQUIRED_FIELDS); e.page.update(); return
         try:
             conn = get_db_connection(); cursor = conn.cursor()
+            user = AppState.get_user(); user_id = user['id'] if user else None
+            # Stock quantities are written through the ledger so every change has history
             if selected_medicine_id is None:
-                cursor.execute("INSERT INTO medicines (name, category, price, stock, expiry_date, supplier) VALUES (?, ?, ?, ?, ?, ?)", 
-                    (name_input.value, category_input.value, float(price_input.value), int(stock_input.value), expiry_input.value, supplier_input.value))
+                cursor.execute("INSERT INTO medicines (name, category, price, stock, expiry_date, supplier) VALUES (?, ?, ?, 0, ?, ?)", 
+                    (name_input.value, category_input.value, float(price_input.value), expiry_input.value, supplier_input.value))
+                new_id = cursor.lastrowid
+                set_reorder_levels(cursor, new_id, reorder_point_input.value or DEFAULT_REORDER_POINT,
+                                   reorder_qty_input.value or DEFAULT_REORDER_QUANTITY)
+                if int(stock_input.value) > 0:
+                    # Opening quantity arrives as the first lot
+                    receive_lot(cursor, new_id, int(stock_input.value), expiry_input.value or None,
+                                supplier=supplier_input.value, user_id=user_id)
                 msg = CREATE_SUCCESS.format(name_input.value)
             else:
-                cursor.execute("UPDATE medicines SET name=?, category=?, price=?, stock=?, expiry_date=?, supplier=? WHERE id=?",
-                    (name_input.value, category_input.value, float(price_input.value), int(stock_input.value), expiry_input.value, supplier_input.value, selected_medicine_id))
+                cursor.execute("UPDATE medicines SET name=?, category=?, price=?, expiry_date=?, supplier=? WHERE id=?",
+                    (name_input.value, category_input.value, float(price_input.value), expiry_input.value, supplier_input.value, selected_medicine_id))
+                set_reorder_levels(cursor, selected_medicine_id, reorder_point_input.value or DEFAULT_REORDER_POINT,
+                                   reorder_qty_input.value or DEFAULT_REORDER_QUANTITY)
+                cursor.execute("SELECT stock FROM medicines WHERE id = ?", (selected_medicine_id,))
+                delta = int(stock_input.value) - (cursor.fetchone()[0] or 0)
+                if delta > 0:
+                    receive_lot(cursor, selected_medicine_id, delta, expiry_input.value or None,
+                                supplier=supplier_input.value, user_id=user_id)
+                elif delta < 0:
+                    # Manual count-down consumes the oldest lots first
+                    set_stock(cursor, selected_medicine_id, int(stock_input.value), "manage_stock:edit", user_id)
+                    allocate_fefo(cursor, selected_medicine_id, -delta)
                 msg = UPDATE_SUCCESS.format(name_input.value)
             conn.commit(); conn.close(); e.page.close(dialog); load_data(); show_success(e.page, msg); e.page.update()
         except Exception as ex: show_error(e.page, f"Error: {str(ex)}"); e.page.update()
 
+    def open_receive_dialog(e, med):
+        nonlocal receiving_medicine_id
+        receiving_medicine_id = med['id']
+        lot_number_input.value = ""; lot_qty_input.value = ""
+        lot_expiry_input.value = ""; lot_cost_input.value = ""
+        receive_dialog.title = ft.Row([ft.Icon(ft.Icons.MOVE_TO_INBOX, color="primary"), ft.Text(f"Receive Lot: {med['name']}")])
+        e.page.open(receive_dialog)
+
+    def save_lot(e):
+        if receiving_medicine_id is None: return
+        if not lot_qty_input.value or not lot_expiry_input.value:
+            show_error(e.page, REQUIRED_FIELDS); e.page.update(); return
+        try:
+            conn = get_db_connection(); cursor = conn.cursor()
+            user = AppState.get_user()
+            cursor.execute("SELECT supplier FROM medicines WHERE id = ?", (receiving_medicine_id,))
+            supplier = cursor.fetchone()[0]
+            receive_lot(cursor, receiving_medicine_id, int(lot_qty_input.value), lot_expiry_input.value,
+                        lot_number=lot_number_input.value or None, supplier=supplier,
+                        unit_cost=float(lot_cost_input.value) if lot_cost_input.value else None,
+                        user_id=user['id'] if user else None)
+            conn.commit(); conn.close()
+            e.page.close(receive_dialog); load_data(); show_success(e.page, STOCK_UPDATED); e.page.update()
+        except Exception as ex: show_error(e.page, f"Error: {str(ex)}"); e.page.update()
+
+    def open_import_dialog(e):
+        # Only files placed in the import folder can be imported from here
+        files = list_import_files()
+        import_file_dropdown.options = [ft.dropdown.Option(name) for name in files]
+        import_file_dropdown.value = files[0] if files else None
+        import_supplier_input.value = ""
+        import_result.controls.clear(); import_result.height = 0
+        e.page.open(import_dialog)
+
+    def run_import(e):
+        if not import_file_dropdown.value:
+            show_error(e.page, REQUIRED_FIELDS); e.page.update(); return
+        try:
+            user = AppState.get_user()
+            result = import_medicines(resolve_import_path(import_file_dropdown.value),
+                                      default_supplier=import_supplier_input.value or None,
+                                      user_id=user['id'] if user else None)
+        except Exception as ex:
+            show_error(e.page, f"Import failed: {str(ex)}"); e.page.update(); return
+
+        import_result.controls.clear()
+        import_result.controls.append(ft.Text(
+            f"{result['inserted']} added, {result['updated']} updated, {result['rejected']} rejected "
+            f"({result['rows_per_sec']:,.0f} rows/sec)", weight="bold"))
+        for line_number, reason in result['rejects']:
+            import_result.controls.append(ft.Text(f"Line {line_number}: {reason}", size=12, color="error"))
+        if result['rejected'] > len(result['rejects']):
+            import_result.controls.append(ft.Text(f"... and {result['rejected'] - len(result['rejects'])} more", size=12, color="outline"))
+        import_result.height = 200 if result['rejects'] else None
+
+        load_data()
+        if result['rejected']:
+            show_warning(e.page, f"Imported with {result['rejected']} rejected row(s)")
+        else:
+            show_success(e.page, f"Imported {result['inserted'] + result['updated']} medicines")
+        e.page.update()
+
     def prompt_delete(e, med_id):
         nonlocal medicine_to_delete; medicine_to_delete = med_id; e.page.open(del_dialog)
 
@@ -282,9 +392,22 @@ def ManageStock():
     dialog = ft.AlertDialog(bgcolor="surface", content=ft.Container(width=500, content=ft.Column([
         name_input, ft.Container(height=5), category_input, ft.Container(height=5),
         ft.Row([price_input, stock_input], spacing=15), ft.Container(height=5), expiry_input,
-        ft.Container(height=5), supplier_input], tight=True, horizontal_alignment=ft.CrossAxisAlignment.STRETCH)),
+        ft.Container(height=5), supplier_input, ft.Container(height=5),
+        ft.Row([reorder_point_input, reorder_qty_input], spacing=15)], tight=True, horizontal_alignment=ft.CrossAxisAlignment.STRETCH)),
         actions=[ft.TextButton("Cancel", on_click=lambda e: e.page.close(dialog)), ft.ElevatedButton("Save", bgcolor="primary", color="onPrimary", on_click=save_medicine)])
 
+    receive_dialog = ft.AlertDialog(bgcolor="surface", content=ft.Container(width=400, content=ft.Column([
+        lot_number_input, ft.Container(height=5), ft.Row([lot_qty_input, lot_cost_input], spacing=15),
+        ft.Container(height=5), lot_expiry_input], tight=True, horizontal_alignment=ft.CrossAxisAlignment.STRETCH)),
+        actions=[ft.TextButton("Cancel", on_click=lambda e: e.page.close(receive_dialog)), ft.ElevatedButton("Receive", bgcolor="primary", color="onPrimary", on_click=save_lot)])
+
+    import_dialog = ft.AlertDialog(bgcolor="surface", title=ft.Row([ft.Icon(ft.Icons.UPLOAD_FILE, color="primary"), ft.Text("Import Price List")]),
+        content=ft.Container(width=500, content=ft.Column([
+        import_file_dropdown, ft.Container(height=5), import_supplier_input, ft.Container(height=5),
+        ft.Text(f"Place .csv or .xlsx files in {IMPORT_DIR}. Rows are matched by supplier and name; existing medicines are updated.", size=12, color="outline"),
+        import_result], tight=True, horizontal_alignment=ft.CrossAxisAlignment.STRETCH)),
+        actions=[ft.TextButton("Close", on_click=lambda e: e.page.close(import_dialog)), ft.ElevatedButton("Import", bgcolor="primary", color="onPrimary", on_click=run_import)])
+
     del_dialog = ft.AlertDialog(bgcolor="surface", title=ft.Text("Confirm Delete"), content=ft.Text("Are you sure you want to delete this medicine?"),
         actions=[ft.TextButton("Cancel", on_click=lambda e: e.page.close(del_dialog)), ft.ElevatedButton("Delete", bgcolor="error", color="white", on_click=confirm_delete_action)])
 
@@ -294,7 +417,10 @@ def ManageStock():
     return ft.Column([
         ft.Row([
             ft.Text("Stock Management", size=28, weight="bold"),
-            ft.ElevatedButton("Add Medicine", icon=ft.Icons.ADD, bgcolor="primary", color="onPrimary", on_click=open_add_dialog),
+            ft.Row([
+                ft.OutlinedButton("Import", icon=ft.Icons.UPLOAD_FILE, on_click=open_import_dialog),
+                ft.ElevatedButton("Add Medicine", icon=ft.Icons.ADD, bgcolor="primary", color="onPrimary", on_click=open_add_dialog),
+            ], spacing=10),
         ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
         
         ft.Container(height=10),
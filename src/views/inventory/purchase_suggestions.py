@@ -0,0 +1,133 @@
+import flet as ft
+from services.reorder import get_purchase_suggestions
+from services.forecasting import get_cached_forecast, LEAD_TIME_DAYS, REVIEW_PERIOD_DAYS
+from services import scheduler
+from datetime import datetime
+
+def PurchaseSuggestions():
+    """Purchase suggestions built from the reorder queue, grouped by supplier."""
+
+    suggestions = get_purchase_suggestions()
+    total_skus = sum(len(group['items']) for group in suggestions)
+    total_cost = sum(group['estimated_cost'] for group in suggestions)
+
+    # Demand forecast for the whole catalog, cached by the demand_forecast job
+    forecast, forecast_at = get_cached_forecast()
+    # run_now finds no job row when the scheduler is not running in this deployment
+    forecast_queued = forecast_at is None and scheduler.run_now('demand_forecast')
+    forecast_by_id = {
+        med_id: (row['days_of_cover'], row['suggested_quantity'])
+        for med_id, row in forecast.items()
+    }
+    at_risk = sum(1 for row in forecast.values() if row['days_of_cover'] < LEAD_TIME_DAYS + REVIEW_PERIOD_DAYS)
+
+    def format_cover(cover):
+        return "—" if cover == float('inf') else f"{cover:.0f}d"
+
+    # Metric card component factory
+    def create_stat_card(title, value, icon, color):
+        return ft.Container(
+            content=ft.Row([
+                ft.Icon(icon, color=color, size=40),
+                ft.Column([
+                    ft.Text(title, size=14, color="outline"),
+                    ft.Text(str(value), size=28, weight="bold", color=color),
+                ], spacing=2, expand=True),
+            ], spacing=15),
+            padding=20,
+            bgcolor="surface",
+            border_radius=10,
+            border=ft.border.all(1, "outlineVariant"),
+            expand=True,
+        )
+
+    # Suggested line item row
+    def create_item_row(item):
+        stock_color = "error" if item['stock'] <= 0 else "orange"
+        cover, forecast_qty = forecast_by_id.get(item['id'], (float('inf'), 0))
+        return ft.Container(
+            content=ft.Row([
+                ft.Text(item['name'], weight="bold", expand=3),
+                ft.Text(item['category'] or "N/A", size=12, color="outline", expand=2),
+                ft.Text(str(item['stock']), size=12, weight="bold", color=stock_color, expand=1),
+                ft.Text(str(item['reorder_point']), size=12, expand=1),
+                ft.Text(str(item['suggested_quantity']), size=12, weight="bold", color="primary", expand=1),
+                ft.Text(format_cover(cover), size=12, expand=1),
+                ft.Text(str(forecast_qty), size=12, color="tertiary", expand=1),
+                ft.Text(f"₱{item['suggested_quantity'] * (item['unit_cost'] or 0):,.2f}", size=12, expand=1),
+            ], spacing=10),
+            padding=10,
+            border=ft.border.all(1, "outlineVariant"),
+            border_radius=8,
+        )
+
+    # Supplier section with its header row and line items
+    def create_supplier_section(group):
+        return ft.Container(
+            content=ft.Column([
+                ft.Row([
+                    ft.Icon(ft.Icons.LOCAL_SHIPPING, color="primary"),
+                    ft.Text(group['supplier'], size=18, weight="bold", expand=True),
+                    ft.Text(f"{group['total_units']} units · ₱{group['estimated_cost']:,.2f}", size=13, color="outline"),
+                ], spacing=10),
+                ft.Container(
+                    content=ft.Row([
+                        ft.Text("Medicine", size=12, weight="bold", expand=3),
+                        ft.Text("Category", size=12, weight="bold", expand=2),
+                        ft.Text("Stock", size=12, weight="bold", expand=1),
+                        ft.Text("Reorder Pt", size=12, weight="bold", expand=1),
+                        ft.Text("Order Qty", size=12, weight="bold", expand=1),
+                        ft.Text("Cover", size=12, weight="bold", expand=1),
+                        ft.Text("Forecast Qty", size=12, weight="bold", expand=1),
+                        ft.Text("Est. Cost", size=12, weight="bold", expand=1),
+                    ], spacing=10),
+                    bgcolor="surfaceVariant",
+                    padding=10,
+                    border_radius=8,
+                ),
+                *[create_item_row(item) for item in group['items']],
+            ], spacing=8),
+            padding=15,
+            bgcolor="surface",
+            border_radius=10,
+            border=ft.border.all(1, "outlineVariant"),
+        )
+
+    return ft.Column([
+        ft.Row([
+            ft.Text("Purchase Suggestions", size=28, weight="bold"),
+            ft.Row([
+                ft.OutlinedButton("Manage Stock", icon=ft.Icons.EDIT, on_click=lambda e: e.page.go("/inventory/stock")),
+                ft.ElevatedButton("Refresh", icon=ft.Icons.REFRESH, on_click=lambda e: e.page.go("/inventory/reorder")),
+            ], spacing=10),
+        ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
+        ft.Text(
+            f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')} · "
+            + (f"Forecast as of {forecast_at[:16]}" if forecast_at
+               else "Forecast is being computed, refresh in a minute" if forecast_queued
+               else "No forecast yet: the job scheduler is not running"),
+            size=12, color="outline",
+        ),
+        ft.Container(height=10),
+
+        ft.Row([
+            create_stat_card("SKUs to Reorder", total_skus, ft.Icons.WARNING, "error"),
+            create_stat_card("Suppliers", len(suggestions), ft.Icons.LOCAL_SHIPPING, "primary"),
+            create_stat_card(f"Cover < {LEAD_TIME_DAYS + REVIEW_PERIOD_DAYS}d (Forecast)", at_risk, ft.Icons.TRENDING_DOWN, "orange"),
+            create_stat_card("Estimated Cost", f"₱{total_cost:,.2f}", ft.Icons.PAYMENTS, "tertiary"),
+        ], spacing=15),
+
+        ft.Container(height=20),
+
+        ft.Column(
+            [create_supplier_section(group) for group in suggestions]
+            if suggestions else [ft.Container(
+                content=ft.Column([
+                    ft.Icon(ft.Icons.CHECK_CIRCLE, color="primary", size=50),
+                    ft.Text("All medicines are above their reorder points", size=18, weight="bold", color="primary"),
+                ], spacing=10, horizontal_alignment=ft.CrossAxisAlignment.CENTER),
+                padding=50,
+            )],
+            spacing=15,
+        ),
+    ], scroll=ft.ScrollMode.AUTO)
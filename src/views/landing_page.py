@@ -237,7 +237,12 @@ def LandingPage(page: ft.Page):
                 login_error.value = str(e)
                 page.update()
 
-        t = threading.Thread(target=_poll, daemon=True)
+        def _poll_in_session():
+            # Background threads start outside the session; the result signs this page in
+            with AppState.use_page(page):
+                _poll()
+
+        t = threading.Thread(target=_poll_in_session, daemon=True)
         t.start()
 
     def _process_google_result(result):
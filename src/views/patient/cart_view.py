@@ -3,6 +3,9 @@
 import flet as ft
 from state import AppState
 from services.database import get_db_connection
+from services.stock_ledger import record_movement, record_sale_from_reservation, RESERVATION, RELEASE
+from services.lots import allocate_fefo
+from services.live_updates import ORDERS_TOPIC, publish
 from utils.notifications import show_success, show_error, show_warning, ITEM_REMOVED, ORDER_PLACED, OPERATION_FAILED
 
 def CartView():
@@ -93,8 +96,13 @@ def CartView():
                     return
 
             # Update both tables in a single transaction
-            cursor.execute("UPDATE cart SET quantity = ? WHERE id = ?", (new_quantity, cart_id))
-            cursor.execute("UPDATE medicines SET stock = stock - ? WHERE id = ?", (diff, medicine_id))
+            # Touching the line renews its reservation hold
+            cursor.execute("UPDATE cart SET quantity = ?, added_at = CURRENT_TIMESTAMP WHERE id = ?", (new_quantity, cart_id))
+            record_movement(
+                cursor, medicine_id, -diff,
+                RESERVATION if diff > 0 else RELEASE,
+                f"cart:{cart_id}", user_id
+            )
             
             conn.commit()
 
@@ -119,8 +127,8 @@ def CartView():
         conn = get_db_connection()
         cursor = conn.cursor()
         try:
-            # Restore the stock in medicines table
-            cursor.execute("UPDATE medicines SET stock = stock + ? WHERE id = ?", (quantity, medicine_id))
+            # Release the reserved stock back to the shelf
+            record_movement(cursor, medicine_id, quantity, RELEASE, f"cart:{cart_id}", user_id)
             
             # Delete from cart
             cursor.execute("DELETE FROM cart WHERE id = ?", (cart_id,))
@@ -297,13 +305,19 @@ def CartView():
                         VALUES (?, ?, ?, ?, ?, 0, NULL, NULL)
                     """, (order_id, medicine_id, quantity, unit_price, subtotal_item))
 
+                # Draw the sold units from lots, earliest expiry first
+                allocate_fefo(cursor, medicine_id, quantity, order_id, cursor.lastrowid)
+
                 # Inventory deduction REMOVED from here because it's now handled in real-time
                 # when items are added to the cart or quantities are adjusted.
+                # The ledger still records the reserved units as sold against this order.
+                record_sale_from_reservation(cursor, medicine_id, quantity, f"order:{order_id}", user_id)
 
             # Clear processed cart
             cursor.execute("DELETE FROM cart WHERE patient_id = ?", (user_id,))
 
             conn.commit()
+            publish(ORDERS_TOPIC, [order_id])
 
             # Emit cart changed event to update badge across app
             try:
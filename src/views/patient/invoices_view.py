@@ -3,6 +3,9 @@
 import flet as ft
 from state.app_state import AppState
 from services.database import get_db_connection
+from services.audit_logger import log_activity
+from services.versioning import compare_and_set
+from services.live_updates import INVOICES_TOPIC, publish
 from datetime import datetime
 
 def PatientInvoicesView():
@@ -125,7 +128,7 @@ def PatientInvoicesView():
         conn = get_db_connection()
         cursor = conn.cursor()
         cursor.execute("""
-            SELECT invoice_number, total_amount, status
+            SELECT invoice_number, total_amount, status, version
             FROM invoices 
             WHERE id = ?
         """, (invoice_id,))
@@ -141,7 +144,7 @@ def PatientInvoicesView():
             e.page.update()
             return
         
-        invoice_number, total_amount, status = invoice_data
+        invoice_number, total_amount, status, version = invoice_data
         
         # Initialize payment form inputs
         payment_method = ft.Dropdown(
@@ -222,34 +225,30 @@ def PatientInvoicesView():
             cursor = conn.cursor()
             
             try:
-                cursor.execute("""
-                    UPDATE invoices 
-                    SET status = ?,
-                        payment_method = ?,
-                        payment_date = ?,
-                        notes = ?
-                    WHERE id = ?
-                """, (
-                    new_status,
-                    payment_method.value,
-                    datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                    combined_notes,
-                    invoice_id
-                ))
+                # Only applies if the invoice is unchanged since the dialog opened
+                ok, reason = compare_and_set(cursor, 'invoices', invoice_id, {
+                    'payment_method': payment_method.value,
+                    'payment_date': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    'notes': combined_notes,
+                }, expected_version=version, to_status=new_status)
                 
-                # Record system action
-                cursor.execute("""
-                    INSERT INTO activity_log (user_id, action, details, timestamp)
-                    VALUES (?, ?, ?, ?)
-                """, (
+                conn.commit()
+                conn.close()
+
+                if ok:
+                    publish(INVOICES_TOPIC, [invoice_id])
+                else:
+                    error_text.value = f"Payment not recorded: this invoice {reason}. Please close and try again."
+                    dialog_e.page.update()
+                    return
+                
+                # Record system action (durable: payments must not be lost)
+                log_activity(
                     user['id'],
                     'payment_submitted',
                     f"Payment of ₱{amount:.2f} for invoice {invoice_number} via {payment_method.value}",
-                    datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                ))
-                
-                conn.commit()
-                conn.close()
+                    durable=True,
+                )
                 
                 # Dismiss modal
                 dialog_e.page.close(payment_dialog)
@@ -3,6 +3,7 @@
 import flet as ft
 from state import AppState
 from services.database import get_db_connection
+from services.stock_ledger import record_movement, RESERVATION
 
 def MedicineSearch():
     """Medicine search and browse view with cart integration."""
@@ -149,8 +150,8 @@ def MedicineSearch():
             """)
             
             # 3. Update stock and cart in a single transaction
-            # Deduct 1 from stock
-            cursor.execute("UPDATE medicines SET stock = stock - 1 WHERE id = ?", (medicine_id,))
+            # Reserve 1 unit through the stock ledger
+            record_movement(cursor, medicine_id, -1, RESERVATION, f"cart:patient:{user_id}", user_id)
             
             # Check if item already in cart
             cursor.execute("""
@@ -160,7 +161,8 @@ def MedicineSearch():
             existing = cursor.fetchone()
             
             if existing:
-                cursor.execute("UPDATE cart SET quantity = quantity + 1 WHERE id = ?", (existing[0],))
+                # Touching the line renews its reservation hold
+                cursor.execute("UPDATE cart SET quantity = quantity + 1, added_at = CURRENT_TIMESTAMP WHERE id = ?", (existing[0],))
                 show_snackbar(e, f"Updated {medicine_name} quantity in cart")
             else:
                 cursor.execute("""
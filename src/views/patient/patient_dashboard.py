@@ -73,12 +73,12 @@ def PatientDashboard():
     """, (user_id,))
     recent_prescriptions = cursor.fetchall()
     
-    # Fetch low stock alerts
+    # Fetch low stock alerts (read from the reorder queue, no catalog scan)
     cursor.execute("""
-        SELECT name, stock
-        FROM medicines
-        WHERE stock < 10 
-        ORDER BY stock ASC
+        SELECT m.name, m.stock
+        FROM reorder_queue q
+        JOIN medicines m ON m.id = q.medicine_id
+        ORDER BY m.stock ASC
         LIMIT 15
     """)
     low_stock_medicines = cursor.fetchall()
@@ -51,7 +51,7 @@ def PharmacistMedicineSearch():
         if med['stock'] == 0:
             stock_color = "error"
             stock_status = "Out of Stock"
-        elif med['stock'] < 10:
+        elif med['stock'] < med['reorder_point']:
             stock_color = "tertiary"
             stock_status = "Low Stock"
         
@@ -189,9 +189,9 @@ def PharmacistMedicineSearch():
             params.append(category)
         
         if stock_status == "In Stock":
-            sql += " AND stock > 10"
+            sql += " AND id NOT IN (SELECT medicine_id FROM reorder_queue)"
         elif stock_status == "Low Stock":
-            sql += " AND stock > 0 AND stock <= 10"
+            sql += " AND stock > 0 AND id IN (SELECT medicine_id FROM reorder_queue)"
         elif stock_status == "Out of Stock":
             sql += " AND stock = 0"
         
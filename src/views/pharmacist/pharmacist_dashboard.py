@@ -2,6 +2,7 @@
 
 import flet as ft
 from services.database import get_db_connection
+from services.dashboards import get_pharmacist_dashboard
 from state.app_state import AppState
 from components.navigation_header import NavigationHeader
 from datetime import datetime
@@ -16,63 +17,14 @@ def PharmacistDashboard():
     conn = get_db_connection()
     cursor = conn.cursor()
     
-    # Metric: Pending Prescriptions
-    cursor.execute("SELECT COUNT(*) FROM prescriptions WHERE status = 'Pending'")
-    result = cursor.fetchone()
-    pending_rx = result[0] if result else 0
-    
-    # Metric: Today's Approved Prescriptions
-    cursor.execute("""
-        SELECT COUNT(*) FROM prescriptions 
-        WHERE status = 'Approved' 
-        AND DATE(reviewed_date) = DATE('now')
-    """)
-    result = cursor.fetchone()
-    approved_rx = result[0] if result else 0
-    
-    # Metric: Total Patient Count
-    cursor.execute("SELECT COUNT(*) FROM users WHERE role = 'Patient'")
-    result = cursor.fetchone()
-    total_patients = result[0] if result else 0
-    
-    # Metric: Valid Inventory Items
-    cursor.execute("SELECT COUNT(*) FROM medicines WHERE stock > 0")
-    result = cursor.fetchone()
-    medicines_available = result[0] if result else 0
-    
-    # Fetch pending prescription details
-    cursor.execute("""
-        SELECT p.id, p.created_at, p.status,
-               u.full_name as patient_name,
-               m.name as medicine_name
-        FROM prescriptions p
-        LEFT JOIN users u ON p.patient_id = u.id
-        LEFT JOIN medicines m ON p.medicine_id = m.id
-        WHERE p.status = 'Pending'
-        ORDER BY p.created_at DESC
-        LIMIT 5
-    """)
-    pending_prescriptions = cursor.fetchall()
-    
-    # Fetch recent activity history
-    cursor.execute("""
-        SELECT action, details, timestamp
-        FROM activity_log
-        WHERE user_id = ?
-        ORDER BY timestamp DESC
-        LIMIT 5
-    """, (user['id'],))
-    recent_activities = cursor.fetchall()
-    
-    # Fetch inventory shortage alerts
-    cursor.execute("""
-        SELECT name, stock
-        FROM medicines
-        WHERE stock < 10  
-        ORDER BY stock ASC
-        LIMIT 15
-    """)
-    low_stock_medicines = cursor.fetchall()
+    data = get_pharmacist_dashboard(cursor, user['id'])
+    pending_rx = data['pending_rx']
+    approved_rx = data['approved_rx']
+    total_patients = data['total_patients']
+    medicines_available = data['medicines_available']
+    pending_prescriptions = data['pending_prescriptions']
+    recent_activities = data['recent_activities']
+    low_stock_medicines = data['low_stock_medicines']
     
     conn.close()
     
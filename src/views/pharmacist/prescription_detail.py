@@ -1,8 +1,10 @@
 """Detailed prescription review view - With Editable Prescription Details."""
 
 import flet as ft
-from datetime import datetime
+import threading
 from services.database import get_db_connection
+from services.review_queue import claim, claim_next, prefetch_next, release_claim, complete_review
+from services.versioning import compare_and_set
 from state.app_state import AppState
 from components.navigation_header import NavigationHeader
 
@@ -40,7 +42,8 @@ def PrescriptionDetailView(prescription_id):
                 u.phone,            -- 14
                 m.name,             -- 15
                 m.stock,            -- 16
-                m.price             -- 17
+                m.price,            -- 17
+                p.version           -- 18
             FROM prescriptions p
             LEFT JOIN users u ON p.patient_id = u.id
             LEFT JOIN medicines m ON p.medicine_id = m.id
@@ -71,6 +74,7 @@ def PrescriptionDetailView(prescription_id):
             'medicine_name': row[15] or 'Not specified',
             'medicine_stock': row[16] if row[16] is not None else 0,
             'medicine_price': row[17] if row[17] is not None else 0.0,
+            'version': row[18],
         }
     
     # Initialize component data state
@@ -79,6 +83,17 @@ def PrescriptionDetailView(prescription_id):
     # Validate data integrity
     if not rx:
         return ft.Text("Prescription not found")
+
+    # Take the review lease so no other pharmacist works on it concurrently
+    claimed_by_other = None
+    next_rx = {"id": None}
+    if rx['status'] == 'Pending' and user:
+        has_claim, claimed_by_other = claim(user['id'], rx['id'])
+        if has_claim:
+            # Lease the next prescription in the background while this one is reviewed
+            def _prefetch():
+                next_rx["id"] = prefetch_next(user['id'], rx['id'])
+            threading.Thread(target=_prefetch, daemon=True).start()
     
     # Map prescription status to theme colors
     status_colors = {
@@ -119,26 +134,27 @@ def PrescriptionDetailView(prescription_id):
             match = cursor.fetchone()
             new_med_id = match[0] if match else None
             
-            # Execute persistence update
-            cursor.execute("""
-                UPDATE prescriptions 
-                SET medicine_id = ?, 
-                    dosage = ?,
-                    frequency = ?,
-                    duration = ?,
-                    doctor_name = ?
-                WHERE id = ?
-            """, (
-                new_med_id,
-                dosage_field.value,
-                frequency_field.value,
-                int(duration_field.value) if duration_field.value.isdigit() else 0,
-                doctor_field.value,
-                prescription_id
-            ))
+            # Execute persistence update (only if nobody changed it since it was loaded)
+            ok, reason = compare_and_set(cursor, 'prescriptions', prescription_id, {
+                'medicine_id': new_med_id,
+                'dosage': dosage_field.value,
+                'frequency': frequency_field.value,
+                'duration': int(duration_field.value) if duration_field.value.isdigit() else 0,
+                'doctor_name': doctor_field.value,
+            }, expected_version=rx['version'])
             
             conn.commit()
             conn.close()
+
+            if not ok:
+                e.page.snack_bar = ft.SnackBar(content=ft.Text(f"Not saved: this prescription {reason}. Reopen it to see the latest details."), bgcolor="error")
+                e.page.snack_bar.open = True
+                e.page.update()
+                return
+            rx['version'] += 1
+
+            # Editing counts as activity on the review; extend the lease
+            claim(user['id'], prescription_id)
             
             # Update local component state
             rx['medicine_name'] = medicine_field.value
@@ -259,63 +275,58 @@ def PrescriptionDetailView(prescription_id):
         # Trigger component repaint
         if e: e.page.update()
     
-    # Workflow Handler: Approve Prescription
-    def approve_prescription(e):
+    # Workflow Handler: Approve or Reject, then continue with the next queued prescription
+    def finish_review(e, status):
         try:
             conn = get_db_connection()
             cursor = conn.cursor()
             
-            # Execute status update transaction
-            cursor.execute("""
-                UPDATE prescriptions 
-                SET status = 'Approved', pharmacist_id = ?, pharmacist_notes = ?, reviewed_date = ?
-                WHERE id = ?
-            """, (user['id'], pharmacist_notes_field.value or "", datetime.now().strftime("%Y-%m-%d %H:%M:%S"), rx['id']))
-            
+            # Only succeeds while this pharmacist holds the review lease
+            done = complete_review(cursor, user['id'], rx['id'], status, pharmacist_notes_field.value or "",
+                                   expected_version=rx['version'])
             conn.commit()
             conn.close()
+
+            if not done:
+                e.page.snack_bar = ft.SnackBar(content=ft.Text("This prescription was changed, reviewed or claimed by another pharmacist. Reopen it to see the latest details."), bgcolor="error")
+                e.page.snack_bar.open = True
+                e.page.update()
+                return
             
             # Render success notification
-            e.page.snack_bar = ft.SnackBar(content=ft.Text("Prescription Approved Successfully"), bgcolor="primary")
+            e.page.snack_bar = ft.SnackBar(
+                content=ft.Text(f"Prescription {status} Successfully"),
+                bgcolor="primary" if status == 'Approved' else "error",
+            )
             e.page.snack_bar.open = True
             e.page.update()
             
-            # Trigger route transition
-            e.page.go("/pharmacist/prescriptions")
+            # Prefetched prescription is already leased to us; otherwise claim one now
+            next_id = next_rx["id"] or claim_next(user['id'], skip=rx['id'])
+            e.page.go(f"/pharmacist/prescription/{next_id}" if next_id else "/pharmacist/prescriptions")
             
         except Exception as ex:
             e.page.snack_bar = ft.SnackBar(content=ft.Text(f"Error: {str(ex)}"), bgcolor="error")
             e.page.snack_bar.open = True
             e.page.update()
 
-    # Workflow Handler: Reject Prescription
+    def approve_prescription(e):
+        finish_review(e, 'Approved')
+
     def reject_prescription(e):
-        try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # Execute status update transaction
-            cursor.execute("""
-                UPDATE prescriptions 
-                SET status = 'Rejected', pharmacist_id = ?, pharmacist_notes = ?, reviewed_date = ?
-                WHERE id = ?
-            """, (user['id'], pharmacist_notes_field.value or "", datetime.now().strftime("%Y-%m-%d %H:%M:%S"), rx['id']))
-            
-            conn.commit()
-            conn.close()
-            
-            # Show success message
-            e.page.snack_bar = ft.SnackBar(content=ft.Text("Prescription Rejected Successfully"), bgcolor="error")
-            e.page.snack_bar.open = True
-            e.page.update()
-            
-            # Navigate back to prescriptions list
-            e.page.go("/pharmacist/prescriptions")
-            
-        except Exception as ex:
-            e.page.snack_bar = ft.SnackBar(content=ft.Text(f"Error: {str(ex)}"), bgcolor="error")
-            e.page.snack_bar.open = True
-            e.page.update()
+        finish_review(e, 'Rejected')
+
+    # Leave the review: hand this and the prefetched prescription back to the queue
+    def cancel_review(e):
+        if user:
+            release_claim(user['id'], rx['id'])
+            if next_rx["id"]:
+                release_claim(user['id'], next_rx["id"])
+        e.page.go("/pharmacist/prescriptions")
+
+    def review_next(e):
+        next_id = claim_next(user['id'], skip=rx['id'])
+        e.page.go(f"/pharmacist/prescription/{next_id}" if next_id else "/pharmacist/prescriptions")
 
     # Initial component mount render
     update_prescription_display(None)
@@ -365,7 +376,7 @@ def PrescriptionDetailView(prescription_id):
                 ft.Row([
                     ft.Text("Prescription Details", size=20, weight="bold", expand=True),
                     # Contextual action visibility
-                    ft.IconButton(icon=ft.Icons.EDIT, tooltip="Edit Details", on_click=toggle_edit_mode, visible=rx['status']=='Pending')
+                    ft.IconButton(icon=ft.Icons.EDIT, tooltip="Edit Details", on_click=toggle_edit_mode, visible=rx['status']=='Pending' and not claimed_by_other)
                 ]),
                 
                 # Dynamic component mounting area
@@ -385,10 +396,18 @@ def PrescriptionDetailView(prescription_id):
                         ft.Row([
                             ft.ElevatedButton("Approve Prescription", icon=ft.Icons.CHECK_CIRCLE, bgcolor="primary", color="white", on_click=approve_prescription),
                             ft.ElevatedButton("Reject Prescription", icon=ft.Icons.CANCEL, bgcolor="error", color="white", on_click=reject_prescription),
-                            ft.OutlinedButton("Cancel", icon=ft.Icons.ARROW_BACK, on_click=lambda e: e.page.go("/pharmacist/prescriptions"))
+                            ft.OutlinedButton("Cancel", icon=ft.Icons.ARROW_BACK, on_click=cancel_review)
                         ], spacing=10)
                     ]),
                     visible=rx['status'] == 'Pending'
+                ) if rx['status'] == 'Pending' and not claimed_by_other else ft.Container(
+                    # Another pharmacist holds the review lease
+                    content=ft.Column([
+                        ft.Icon(ft.Icons.LOCK_CLOCK, size=40, color="tertiary"),
+                        ft.Text(f"{claimed_by_other} is reviewing this prescription", size=16, color="tertiary"),
+                        ft.OutlinedButton("Review Next Available", icon=ft.Icons.SKIP_NEXT, on_click=review_next),
+                    ], horizontal_alignment=ft.CrossAxisAlignment.CENTER),
+                    padding=30, alignment=ft.alignment.center
                 ) if rx['status'] == 'Pending' else ft.Container(
                     # Render final state summary
                     content=ft.Column([
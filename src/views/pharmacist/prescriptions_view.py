@@ -1,8 +1,11 @@
 """Prescriptions list and management with real database."""
 
 import flet as ft
-from datetime import datetime
 from services.database import get_db_connection
+from services.audit_logger import log_activity, log_activities
+from services.review_queue import claim_next, complete_review, bulk_review, get_active_claims, count_available
+from services.prescriptions import get_prescriptions
+from components.highlighted_text import HighlightedText
 from state.app_state import AppState
 from components.navigation_header import NavigationHeader
 
@@ -30,69 +33,24 @@ def PrescriptionsView():
     
     # Search input configuration
     search_field = ft.TextField(
-        hint_text="Search by customer name or prescription ID...",
+        hint_text="Search by customer name, prescription ID or notes...",
         prefix_icon=ft.Icons.SEARCH,
         border_color="primary",
         expand=True,
     )
     
-    # Data Retrieval Logic
-    def get_prescriptions_from_db(status_val="All", search_query=""):
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Base query
-        query = """
-            SELECT p.id, p.status, p.created_at, p.dosage, p.frequency, p.duration,
-                   p.notes, p.pharmacist_notes, p.reviewed_date,
-                   u.full_name as patient_name, u.id as patient_id,
-                   m.name as medicine_name
-            FROM prescriptions p
-            LEFT JOIN users u ON p.patient_id = u.id
-            LEFT JOIN medicines m ON p.medicine_id = m.id
-            WHERE 1=1
-        """
-        
-        params = []
-        
-        # Apply status filter constraint
-        if status_val != "All":
-            query += " AND p.status = ?"
-            params.append(status_val)
-        
-        # Apply text search constraint
-        if search_query:
-            query += " AND (u.full_name LIKE ? OR p.id LIKE ?)"
-            params.append(f"%{search_query}%")
-            params.append(f"%{search_query}%")
-        
-        # Apply chronological sort
-        query += " ORDER BY p.created_at DESC"
-        
-        cursor.execute(query, params)
-        results = cursor.fetchall()
-        conn.close()
-        
-        # Map database rows to dictionaries
-        prescriptions = []
-        for row in results:
-            prescriptions.append({
-                'id': row[0],
-                'status': row[1],
-                'created_at': row[2],
-                'dosage': row[3],
-                'frequency': row[4],
-                'duration': row[5],
-                'notes': row[6],
-                'pharmacist_notes': row[7],
-                'reviewed_date': row[8],
-                'patient_name': row[9],
-                'patient_id': row[10],
-                'medicine': row[11],
-            })
-        
-        return prescriptions
-    
+    # Best note match per prescription for the current search
+    note_matches = {}
+
+    # Live review leases: prescription id -> (pharmacist id, name)
+    active_claims = {}
+    user = AppState.get_user()
+
+    # Multi-select state for bulk review: id -> version shown on the card,
+    # so the bulk action is a compare-and-set against what the pharmacist saw
+    selected_rx = {}
+    selectable_rx = {}
+
     # UI Component: Prescription Card
     def create_prescription_card(rx):
         # Status color mappings
@@ -104,16 +62,35 @@ def PrescriptionsView():
         }
         
         status_color = status_colors.get(rx['status'], "outline")
+
+        # Locked while another pharmacist holds the review lease
+        holder_id, holder_name = active_claims.get(rx['id'], (None, None))
+        in_review_by_other = holder_id is not None and holder_id != user['id']
+        can_select = rx['status'] == "Pending" and not in_review_by_other
+        if can_select:
+            selectable_rx[rx['id']] = rx['version']
         
         return ft.Container(
             content=ft.Column([
                 # Header and Status Panel
                 ft.Row([
+                    ft.Checkbox(
+                        value=rx['id'] in selected_rx,
+                        visible=can_select,
+                        on_change=lambda e, rx_id=rx['id'], version=rx['version']: toggle_selected(e, rx_id, version),
+                    ),
                     ft.Column([
                         ft.Text(f"Prescription #{rx['id']}", size=16, weight="bold"),
                         ft.Text(f"Customer: {rx['patient_name']} (ID: {rx['patient_id']})", 
                                size=13, color="outline"),
                     ], spacing=2, expand=True),
+                    ft.Container(
+                        content=ft.Row([
+                            ft.Icon(ft.Icons.LOCK_CLOCK, size=14, color="tertiary"),
+                            ft.Text(f"In review by {holder_name}", size=12, color="tertiary"),
+                        ], spacing=4),
+                        visible=in_review_by_other,
+                    ),
                     ft.Container(
                         content=ft.Text(
                             rx['status'],
@@ -161,11 +138,22 @@ def PrescriptionsView():
                         ft.Icon(ft.Icons.NOTE, size=16, color="tertiary"),
                         ft.Text(rx['notes'], size=12, italic=True),
                     ], spacing=5),
-                    visible=bool(rx.get('notes')),
+                    visible=bool(rx.get('notes')) and rx['id'] not in note_matches,
                     bgcolor=ft.Colors.with_opacity(0.1, "tertiary"),
                     padding=8,
                     border_radius=5,
                 ),
+
+                # Note that matched the search (patient or pharmacist notes)
+                ft.Container(
+                    content=ft.Row([
+                        ft.Icon(ft.Icons.MANAGE_SEARCH, size=16, color="tertiary"),
+                        HighlightedText(note_matches[rx['id']]['snippet'], size=12),
+                    ], spacing=5),
+                    bgcolor=ft.Colors.with_opacity(0.1, "tertiary"),
+                    padding=8,
+                    border_radius=5,
+                ) if rx['id'] in note_matches else ft.Container(),
                 
                 # Workflow Actions Panel
                 ft.Row([
@@ -179,13 +167,13 @@ def PrescriptionsView():
                     ft.OutlinedButton(
                         "Quick Approve",
                         icon=ft.Icons.CHECK_CIRCLE,
-                        disabled=rx['status'] != "Pending",
-                        on_click=lambda e, rx_id=rx['id']: quick_approve(e, rx_id),
+                        disabled=rx['status'] != "Pending" or in_review_by_other,
+                        on_click=lambda e, rx_id=rx['id'], version=rx['version']: quick_approve(e, rx_id, version),
                     ),
                     ft.OutlinedButton(
                         "Quick Reject",
                         icon=ft.Icons.CANCEL,
-                        disabled=rx['status'] != "Pending",
+                        disabled=rx['status'] != "Pending" or in_review_by_other,
                         on_click=lambda e, rx_id=rx['id']: quick_reject(e, rx_id),
                     ),
                 ], spacing=10, wrap=True),
@@ -197,31 +185,20 @@ def PrescriptionsView():
         )
     
     # Action Handlers
-    def quick_approve(e, rx_id):
-        user = AppState.get_user()
+    def quick_approve(e, rx_id, version):
         conn = get_db_connection()
         cursor = conn.cursor()
         
         try:
-            cursor.execute("""
-                UPDATE prescriptions 
-                SET status = 'Approved',
-                    pharmacist_id = ?,
-                    reviewed_date = ?
-                WHERE id = ?
-            """, (user['id'], datetime.now().strftime("%Y-%m-%d %H:%M:%S"), rx_id))
-            
-            cursor.execute("""
-                INSERT INTO activity_log (user_id, action, details, timestamp)
-                VALUES (?, ?, ?, ?)
-            """, (
-                user['id'],
-                'prescription_approved',
-                f"Quick approved prescription #{rx_id}",
-                datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            ))
-            
+            # Refuses if another pharmacist claimed or finished it meanwhile
+            if not complete_review(cursor, user['id'], rx_id, 'Approved', expected_version=version):
+                conn.rollback()
+                e.page.snack_bar = ft.SnackBar(content=ft.Text(f"Prescription #{rx_id} was changed or is being reviewed by another pharmacist. The list has been reloaded."), bgcolor="error")
+                e.page.snack_bar.open = True
+                return
+
             conn.commit()
+            log_activity(user['id'], 'prescription_approved', f"Quick approved prescription #{rx_id}")
             e.page.snack_bar = ft.SnackBar(content=ft.Text(f"Prescription #{rx_id} approved!"), bgcolor="primary")
             e.page.snack_bar.open = True
             
@@ -237,14 +214,105 @@ def PrescriptionsView():
     def quick_reject(e, rx_id):
         e.page.go(f"/pharmacist/prescription/{rx_id}")
     
+    # Bulk Selection Handlers
+    selection_label = ft.Text("", size=14, weight="bold")
+
+    def update_bulk_bar():
+        selection_label.value = f"{len(selected_rx)} selected"
+        approve_selected_button.disabled = reject_selected_button.disabled = not selected_rx
+        bulk_bar.visible = bool(selectable_rx)
+
+    def toggle_selected(e, rx_id, version):
+        if e.control.value:
+            selected_rx[rx_id] = version
+        else:
+            selected_rx.pop(rx_id, None)
+        update_bulk_bar()
+        bulk_bar.update()
+
+    def select_all(e):
+        selected_rx.update(selectable_rx)
+        load_prescriptions(e)
+
+    def clear_selection(e):
+        selected_rx.clear()
+        load_prescriptions(e)
+
+    def bulk_action(e, status):
+        try:
+            # One transaction for the whole selection, one batched log write
+            done, failed = bulk_review(user['id'], dict(selected_rx), status)
+            action = 'prescription_approved' if status == 'Approved' else 'prescription_rejected'
+            log_activities([(user['id'], action, f"Bulk {status.lower()} prescription #{rx_id}") for rx_id in done])
+
+            message = f"{len(done)} prescription(s) {status.lower()}"
+            if failed:
+                reasons = ", ".join(f"#{rx_id} {reason}" for rx_id, reason in list(failed.items())[:5])
+                more = f" and {len(failed) - 5} more" if len(failed) > 5 else ""
+                message += f"; {len(failed)} skipped: {reasons}{more}"
+            e.page.snack_bar = ft.SnackBar(content=ft.Text(message), bgcolor="error" if failed else "primary")
+        except Exception as ex:
+            e.page.snack_bar = ft.SnackBar(content=ft.Text(f"Error: {str(ex)}"), bgcolor="error")
+        e.page.snack_bar.open = True
+        selected_rx.clear()
+        load_prescriptions(e)
+
+    approve_selected_button = ft.ElevatedButton(
+        "Approve Selected", icon=ft.Icons.DONE_ALL, bgcolor="primary", color="onPrimary",
+        on_click=lambda e: bulk_action(e, 'Approved'),
+    )
+    reject_selected_button = ft.ElevatedButton(
+        "Reject Selected", icon=ft.Icons.CANCEL, bgcolor="error", color="onError",
+        on_click=lambda e: bulk_action(e, 'Rejected'),
+    )
+
+    bulk_bar = ft.Container(
+        content=ft.Row([
+            ft.Icon(ft.Icons.CHECKLIST, color="primary"),
+            selection_label,
+            approve_selected_button,
+            reject_selected_button,
+            ft.TextButton("Select All Pending", on_click=select_all),
+            ft.TextButton("Clear", on_click=clear_selection),
+        ], spacing=10, wrap=True),
+        visible=False,
+        padding=10,
+        bgcolor=ft.Colors.with_opacity(0.08, "primary"),
+        border_radius=10,
+    )
+
+    # Claim the oldest unclaimed prescription and open it
+    def review_next(e):
+        rx_id = claim_next(user['id'])
+        if rx_id:
+            e.page.go(f"/pharmacist/prescription/{rx_id}")
+        else:
+            e.page.snack_bar = ft.SnackBar(content=ft.Text("No pending prescriptions left to review"), bgcolor="primary")
+            e.page.snack_bar.open = True
+            load_prescriptions(e)
+
+    review_next_button = ft.ElevatedButton(
+        "Review Next",
+        icon=ft.Icons.PLAYLIST_PLAY,
+        bgcolor="tertiary",
+        color="onTertiary",
+        on_click=review_next,
+    )
+
     # Data Loading Logic
     def load_prescriptions(e=None):
         prescriptions_container.controls.clear()
+        selectable_rx.clear()
+        active_claims.clear()
+        active_claims.update(get_active_claims())
+        review_next_button.text = f"Review Next ({count_available(user['id'])})"
         
         status = status_filter.value
         query = search_field.value if search_field.value else ""
         
-        all_prescriptions = get_prescriptions_from_db(status, query)
+        all_prescriptions, matches = get_prescriptions(status, query)
+        note_matches.clear()
+        note_matches.update(matches)
         
         if all_prescriptions:
             prescriptions_container.controls.append(
@@ -267,6 +335,15 @@ def PrescriptionsView():
                 )
             )
         
+        # Drop selections that are no longer reviewable; the rest now show
+        # their current version
+        for rx_id in list(selected_rx):
+            if rx_id in selectable_rx:
+                selected_rx[rx_id] = selectable_rx[rx_id]
+            else:
+                del selected_rx[rx_id]
+        update_bulk_bar()
+
         if e and hasattr(e, 'page'):
             e.page.update()
     
@@ -299,9 +376,12 @@ def PrescriptionsView():
                         color="onPrimary",
                         on_click=load_prescriptions,
                     ),
+                    review_next_button,
                 ], spacing=10),
                 
-                ft.Container(height=20),
+                ft.Container(height=10),
+                bulk_bar,
+                ft.Container(height=10),
                 
                 # Active List
                 prescriptions_container,
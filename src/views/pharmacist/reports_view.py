@@ -2,7 +2,8 @@
 
 import flet as ft
 from datetime import datetime, timedelta
-from services.database import get_db_connection
+from services.analytics_snapshot import get_report_connection, freshness_label
+from services.prescriptions import get_pharmacy_report
 from state.app_state import AppState
 from components.navigation_header import NavigationHeader
 from utils.notifications import show_success, show_error
@@ -28,68 +29,22 @@ def ReportsView():
     )
     
     report_container = ft.Column(spacing=15)
+    freshness = ft.Text(freshness_label(), size=12, color="outline", italic=True)
     
     def generate_report(e):
         """Generate pharmacy report."""
         report_container.controls.clear()
         
-        conn = get_db_connection()
+        conn = get_report_connection()
         cursor = conn.cursor()
         
         try:
-            # Get prescription statistics
-            cursor.execute("""
-                SELECT 
-                    COUNT(*) as total,
-                    SUM(CASE WHEN status = 'Pending' THEN 1 ELSE 0 END) as pending,
-                    SUM(CASE WHEN status = 'Approved' THEN 1 ELSE 0 END) as approved,
-                    SUM(CASE WHEN status = 'Rejected' THEN 1 ELSE 0 END) as rejected,
-                    SUM(CASE WHEN status = 'Dispensed' THEN 1 ELSE 0 END) as dispensed
-                FROM prescriptions
-                WHERE DATE(created_at) BETWEEN ? AND ?
-            """, (date_from.value, date_to.value))
-            
-            stats = cursor.fetchone()
+            report = get_pharmacy_report(cursor, date_from.value, date_to.value)
+            stats = report['stats']
             total, pending, approved, rejected, dispensed = stats if stats else (0, 0, 0, 0, 0)
-            
-            # Get top prescribed medicines
-            cursor.execute("""
-                SELECT m.name, COUNT(p.id) as count
-                FROM prescriptions p
-                LEFT JOIN medicines m ON p.medicine_id = m.id
-                WHERE DATE(p.created_at) BETWEEN ? AND ?
-                GROUP BY m.name
-                ORDER BY count DESC
-                LIMIT 5
-            """, (date_from.value, date_to.value))
-            
-            top_medicines = cursor.fetchall()
-            
-            # Get pharmacist activity
-            cursor.execute("""
-                SELECT 
-                    u.full_name,
-                    COUNT(p.id) as reviewed_count
-                FROM prescriptions p
-                LEFT JOIN users u ON p.pharmacist_id = u.id
-                WHERE p.pharmacist_id IS NOT NULL
-                AND DATE(p.reviewed_date) BETWEEN ? AND ?
-                GROUP BY u.full_name
-                ORDER BY reviewed_count DESC
-            """, (date_from.value, date_to.value))
-            
-            pharmacist_activity = cursor.fetchall()
-            
-            # Get low stock medicines
-            cursor.execute("""
-                SELECT name, stock, expiry_date
-                FROM medicines
-                WHERE stock < 10
-                ORDER BY stock ASC
-                LIMIT 10
-            """)
-            
-            low_stock = cursor.fetchall()
+            top_medicines = report['top_medicines']
+            pharmacist_activity = report['pharmacist_activity']
+            low_stock = report['low_stock']
             
             conn.close()
             
@@ -215,6 +170,7 @@ def ReportsView():
                 ], spacing=10),
             ])
 
+            freshness.value = freshness_label()
             e.page.update()
             show_success(e.page, f"Report generated successfully!")
 
@@ -270,7 +226,8 @@ def ReportsView():
             "Reports & Analytics",
             "Generate reports and view pharmacy statistics",
             show_back=True,
-            back_route="/dashboard"
+            back_route="/dashboard",
+            note=freshness,
         ),
         
         ft.Container(
@@ -3,6 +3,12 @@
 import flet as ft
 from state.app_state import AppState
 from services.database import get_db_connection
+from services.orders import get_orders, get_order_items, bulk_verify_items, bulk_update_status, LOCKED_STATUSES, ITEM_APPROVED, ITEM_REJECTED
+from services.audit_logger import log_activities
+from services.versioning import compare_and_set, transition_allowed
+from services.live_updates import ORDERS_TOPIC, publish
+from components.highlighted_text import HighlightedText
+from components.live_region import LiveRegion
 from datetime import datetime
 
 def StaffOrderTracking():
@@ -26,7 +32,7 @@ def StaffOrderTracking():
     status_options = ["All", "Pending", "Processing", "Ready", "Completed", "Cancelled"]
 
     # Search field and status dropdown (defined early so refresh_orders can access them)
-    search_field = ft.TextField(label="Search by Patient Name or Order ID", expand=True)
+    search_field = ft.TextField(label="Search by Patient Name, Order ID or Notes", expand=True)
     status_dropdown = ft.Dropdown(
         label="Status",
         options=[ft.dropdown.Option(s) for s in status_options],
@@ -35,50 +41,25 @@ def StaffOrderTracking():
         on_change=lambda e: refresh_orders(),
     )
     
-    # Database functions
-    def load_orders(search_text="", status_filter="All"):
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        sql = """
-            SELECT o.id, o.patient_id, u.full_name, u.phone, o.status, 
-                   o.total_amount, o.order_date, COALESCE(o.updated_at, o.order_date), o.pharmacy_notes,
-                   o.discount_request, o.discount_verified
-            FROM orders o
-            JOIN users u ON o.patient_id = u.id
-            WHERE 1=1
-        """
-        params = []
-
-        if status_filter != "All":
-            sql += " AND o.status = ?"
-            params.append(status_filter)
+    # Best note match per order for the current search (order id -> hit)
+    note_matches = {}
 
-        if search_text:
-            sql += " AND (u.full_name LIKE ? OR CAST(o.id AS TEXT) LIKE ?)"
-            params.append(f"%{search_text}%")
-            params.append(f"%{search_text}%")
+    # Multi-select state for bulk actions (orders map to the version their card shows)
+    selected_orders = {}
+    selected_items = set()
+    can_verify_items = user['role'] == "Pharmacist"
 
-        sql += " ORDER BY o.id ASC"
-        cursor.execute(sql, params)
-        orders = cursor.fetchall()
-        conn.close()
+    # Database functions
+    def load_orders(search_text="", status_filter="All", order_ids=None):
+        orders, matches = get_orders(search_text, status_filter, order_ids)
+        if order_ids is None:
+            note_matches.clear()
+        else:
+            for order_id in order_ids:
+                note_matches.pop(order_id, None)
+        note_matches.update(matches)
         return orders
     
-    def get_order_items(order_id):
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT oi.id, m.name, oi.quantity, oi.unit_price, oi.pharmacist_approved, 
-                   ph.full_name, oi.approval_notes
-            FROM order_items oi
-            JOIN medicines m ON oi.medicine_id = m.id
-            LEFT JOIN users ph ON oi.pharmacist_id = ph.id
-            WHERE oi.order_id = ?
-        """, (order_id,))
-        items = cursor.fetchall()
-        conn.close()
-        return items
-    
     def format_date(date_str):
         try:
             return datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S").strftime("%b %d, %Y %I:%M %p")
@@ -88,70 +69,93 @@ def StaffOrderTracking():
     def create_order_card(order):
         order_id, patient_id, patient_name, phone = order[0:4]
         status, total, created_at, updated_at, pharmacy_notes = order[4:9]
-        discount_request, discount_verified = order[9], order[10]
+        discount_request, discount_verified, version = order[9], order[10], order[11]
         items = get_order_items(order_id)
         color = {'Pending': 'orange', 'Processing': 'blue', 'Ready': 'teal', 'Completed': 'green', 'Cancelled': 'red'}.get(status, 'grey')
         
+        # Disable status buttons if order is Completed or Cancelled
+        is_locked = status in LOCKED_STATUSES
+
         # Check if ALL medicines were approved by pharmacist
-        all_approved = all(item[4] for item in items) if items else False
+        all_approved = all(item[4] == ITEM_APPROVED for item in items) if items else False
         approval_summary = "✅ All Medicines Approved" if all_approved else "⚠️ Some Medicines Pending Approval"
         
         items_list = []
         for item in items:
-            med_name, qty, unit_price, is_approved, pharm_name, pharm_notes = item[1], item[2], item[3], item[4], item[5], item[6]
-            approval_icon = ft.Icon(ft.Icons.CHECK_CIRCLE, color="green", size=16) if is_approved else ft.Icon(ft.Icons.PENDING, color="orange", size=16)
-            approval_text = "✅ Approved by Pharmacist" if is_approved else "⏳ Waiting for Pharmacist Approval"
+            item_id, med_name, qty, unit_price, pharm_name, pharm_notes = item[0], item[1], item[2], item[3], item[5], item[6]
+            is_approved, is_rejected = item[4] == ITEM_APPROVED, item[4] == ITEM_REJECTED
+            if is_approved:
+                approval_icon = ft.Icon(ft.Icons.CHECK_CIRCLE, color="green", size=16)
+                approval_text, item_color = "✅ Approved by Pharmacist", "green"
+            elif is_rejected:
+                approval_icon = ft.Icon(ft.Icons.CANCEL, color="red", size=16)
+                approval_text, item_color = "❌ Rejected by Pharmacist", "red"
+            else:
+                approval_icon = ft.Icon(ft.Icons.PENDING, color="orange", size=16)
+                approval_text, item_color = "⏳ Waiting for Pharmacist Approval", "orange"
+            can_select_item = can_verify_items and not is_approved and not is_rejected and not is_locked
             
             items_list.append(
                 ft.Container(
                     content=ft.Column([
                         ft.Row([
+                            ft.Checkbox(
+                                value=item_id in selected_items,
+                                visible=can_select_item,
+                                on_change=lambda e, item_id=item_id: toggle_item(e, item_id),
+                            ),
                             ft.Text(f"• {med_name}", weight="bold", expand=True),
                             ft.Text(f"Qty: {qty}", color="outline", size=11),
                         ], spacing=10),
                         ft.Row([
                             approval_icon,
-                            ft.Text(approval_text, size=11, weight="bold", color="green" if is_approved else "orange"),
+                            ft.Text(approval_text, size=11, weight="bold", color=item_color),
                             ft.Text(f"₱{unit_price:.2f}", color="primary", weight="bold"),
                         ], spacing=8),
                         *([ft.Text(f"🔬 Reviewed by: {pharm_name}", size=10, color="secondary", italic=True)] if pharm_name else []),
                         *([ft.Text(f"📝 {pharm_notes}", size=9, color="outline", italic=True)] if pharm_notes else []),
                     ], spacing=3),
                     padding=10,
-                    bgcolor=ft.Colors.with_opacity(0.05, "green" if is_approved else "orange"),
+                    bgcolor=ft.Colors.with_opacity(0.05, item_color),
                     border_radius=8,
-                    border=ft.border.all(1, "green" if is_approved else "orange"),
+                    border=ft.border.all(1, item_color),
                 )
             )
         
         # Status update function
-        def update_status(new_status):
+        # Compare-and-set against the version this card was rendered from
+        def save(e, changes, new_status=None):
             conn = get_db_connection()
             cursor = conn.cursor()
-            cursor.execute("UPDATE orders SET status = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?", (new_status, order_id))
+            ok, reason = compare_and_set(cursor, 'orders', order_id, changes, expected_version=version, to_status=new_status)
             conn.commit()
             conn.close()
+            if ok:
+                publish(ORDERS_TOPIC, [order_id])
+            else:
+                e.page.snack_bar = ft.SnackBar(content=ft.Text(f"Order #{order_id} {reason}. The list has been reloaded."), bgcolor="error")
+                e.page.snack_bar.open = True
             refresh_orders()
+            e.page.update()
+
+        def update_status(e, new_status):
+            save(e, {'staff_id': staff_id, 'updated_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S")}, new_status)
             
         def verify_discount(e):
             # Calculate new total (remove 12% tax, apply 20% discount)
             subtotal = total / 1.12
             new_total = subtotal * 0.80
-            
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute("UPDATE orders SET discount_verified = 1, total_amount = ? WHERE id = ?", (new_total, order_id))
-            conn.commit()
-            conn.close()
-            refresh_orders()
-        
-        # Disable status buttons if order is Completed or Cancelled
-        is_locked = status in ["Completed", "Cancelled"]
+            save(e, {'discount_verified': 1, 'total_amount': new_total})
         
         return ft.Container(
             content=ft.Column([
                 # Header with order info
                 ft.Row([
+                    ft.Checkbox(
+                        value=order_id in selected_orders,
+                        visible=not is_locked,
+                        on_change=lambda e: toggle_order(e, order_id, version),
+                    ),
                     ft.Column([
                         ft.Text(f"Order #{order_id}", size=16, weight="bold"),
                         ft.Text(patient_name, size=13),
@@ -164,6 +168,12 @@ def StaffOrderTracking():
                     ], spacing=10, alignment=ft.MainAxisAlignment.CENTER),
                 ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
                 
+                # Note that matched the search
+                *([ft.Row([
+                    ft.Icon(ft.Icons.NOTE, size=16, color="tertiary"),
+                    HighlightedText(note_matches[order_id]['snippet'], size=12),
+                ], spacing=8)] if order_id in note_matches else []),
+
                 # Discount section if requested
                 *([ft.Row([
                     ft.Icon(ft.Icons.DISCOUNT, size=16, color="green" if discount_verified == 1 else "orange"),
@@ -212,32 +222,32 @@ def StaffOrderTracking():
                         ft.ElevatedButton(
                             "Pending",
                             icon=ft.Icons.PENDING_ACTIONS,
-                            on_click=lambda e: update_status("Pending"),
-                            disabled=is_locked,
+                            on_click=lambda e: update_status(e, "Pending"),
+                            disabled=not transition_allowed('orders', status, "Pending"),
                         ),
                         ft.ElevatedButton(
                             "Processing",
                             icon=ft.Icons.HOURGLASS_BOTTOM,
-                            on_click=lambda e: update_status("Processing"),
-                            disabled=is_locked,
+                            on_click=lambda e: update_status(e, "Processing"),
+                            disabled=not transition_allowed('orders', status, "Processing"),
                         ),
                         ft.ElevatedButton(
                             "Ready",
                             icon=ft.Icons.CHECK_BOX,
-                            on_click=lambda e: update_status("Ready"),
-                            disabled=is_locked,
+                            on_click=lambda e: update_status(e, "Ready"),
+                            disabled=not transition_allowed('orders', status, "Ready"),
                         ),
                         ft.ElevatedButton(
                             "Completed",
                             icon=ft.Icons.DONE_ALL,
-                            on_click=lambda e: update_status("Completed"),
-                            disabled=is_locked,
+                            on_click=lambda e: update_status(e, "Completed"),
+                            disabled=not transition_allowed('orders', status, "Completed"),
                         ),
                         ft.ElevatedButton(
                             "Cancelled",
                             icon=ft.Icons.CANCEL,
-                            on_click=lambda e: update_status("Cancelled"),
-                            disabled=is_locked,
+                            on_click=lambda e: update_status(e, "Cancelled"),
+                            disabled=not transition_allowed('orders', status, "Cancelled"),
                         ),
                     ], wrap=True, spacing=8),
                 ], spacing=8),
@@ -246,9 +256,98 @@ def StaffOrderTracking():
             border=ft.border.all(2, "red" if is_locked else color),
             border_radius=10,
             bgcolor="surface",
+            data=order_id,
         )
     
+    # Bulk Selection Handlers
+    selection_label = ft.Text("", size=13, weight="bold")
+    bulk_status_dropdown = ft.Dropdown(
+        label="Set status",
+        options=[ft.dropdown.Option(s) for s in status_options if s != "All"],
+        value="Processing",
+        width=160,
+    )
+
+    def update_bulk_bar():
+        selection_label.value = f"{len(selected_orders)} order(s), {len(selected_items)} item(s) selected"
+        bulk_bar.visible = bool(selected_orders or selected_items)
+        apply_status_button.disabled = not selected_orders
+        approve_items_button.disabled = reject_items_button.disabled = not selected_items
+
+    def toggle_order(e, order_id, version):
+        if e.control.value:
+            selected_orders[order_id] = version
+        else:
+            selected_orders.pop(order_id, None)
+        update_bulk_bar()
+        bulk_bar.update()
+
+    def toggle_item(e, item_id):
+        (selected_items.add if e.control.value else selected_items.discard)(item_id)
+        update_bulk_bar()
+        bulk_bar.update()
+
+    def report(e, message, failed):
+        if failed:
+            reasons = ", ".join(f"#{key} {reason}" for key, reason in list(failed.items())[:5])
+            more = f" and {len(failed) - 5} more" if len(failed) > 5 else ""
+            message += f"; {len(failed)} skipped: {reasons}{more}"
+        e.page.snack_bar = ft.SnackBar(content=ft.Text(message), bgcolor="error" if failed else "primary")
+        e.page.snack_bar.open = True
+
+    def bulk_status(e):
+        new_status = bulk_status_dropdown.value
+        try:
+            # One transaction for all selected orders, one batched log write
+            done, failed = bulk_update_status(staff_id, dict(selected_orders), new_status)
+            log_activities([(staff_id, 'order_status_updated', f"Order #{order_id} set to {new_status}") for order_id in done])
+            report(e, f"{len(done)} order(s) set to {new_status}", failed)
+        except Exception as ex:
+            report(e, f"Error: {str(ex)}", {})
+        refresh_orders()
+        e.page.update()
+
+    def bulk_verify(e, approve):
+        try:
+            done, failed = bulk_verify_items(staff_id, sorted(selected_items), approve)
+            action = 'order_item_approved' if approve else 'order_item_rejected'
+            verb = "approved" if approve else "rejected"
+            log_activities([(staff_id, action, f"{verb.capitalize()} {name} on order #{order_id}") for _, order_id, name in done])
+            report(e, f"{len(done)} item(s) {verb}", failed)
+        except Exception as ex:
+            report(e, f"Error: {str(ex)}", {})
+        refresh_orders()
+        e.page.update()
+
+    def clear_selection(e):
+        refresh_orders()
+
+    apply_status_button = ft.ElevatedButton("Apply to Orders", icon=ft.Icons.SYNC_ALT, on_click=bulk_status)
+    approve_items_button = ft.ElevatedButton("Approve Items", icon=ft.Icons.DONE_ALL, bgcolor="green", color="white",
+                                             on_click=lambda e: bulk_verify(e, True), visible=can_verify_items)
+    reject_items_button = ft.ElevatedButton("Reject Items", icon=ft.Icons.CANCEL, bgcolor="red", color="white",
+                                            on_click=lambda e: bulk_verify(e, False), visible=can_verify_items)
+
+    bulk_bar = ft.Container(
+        content=ft.Row([
+            ft.Icon(ft.Icons.CHECKLIST, color="primary"),
+            selection_label,
+            bulk_status_dropdown,
+            apply_status_button,
+            approve_items_button,
+            reject_items_button,
+            ft.TextButton("Clear", on_click=clear_selection),
+        ], spacing=10, wrap=True),
+        visible=False,
+        padding=10,
+        bgcolor=ft.Colors.with_opacity(0.08, "primary"),
+        border_radius=10,
+    )
+
     def refresh_orders(e=None):
+        # Selections only apply to the cards currently rendered
+        selected_orders.clear()
+        selected_items.clear()
         orders_container.controls.clear()
         try:
             search_text = search_field.value or ""
@@ -261,8 +360,36 @@ def StaffOrderTracking():
                     orders_container.controls.append(create_order_card(order))
         except Exception as ex:
             orders_container.controls.append(ft.Text(f"Error: {str(ex)}", color="error", size=12))
+        update_bulk_bar()
         if orders_container.page:
             orders_container.update()
+            bulk_bar.update()
+
+    # Live update: re-render only the cards of orders changed in other sessions
+    def patch_orders(order_ids):
+        order_ids = sorted(order_ids)
+        changed = {order[0]: order for order in load_orders(search_field.value or "", status_dropdown.value or "All", order_ids)}
+        cards = [card for card in orders_container.controls if card.data is not None]
+        for order_id in order_ids:
+            index = next((i for i, card in enumerate(cards) if card.data == order_id), None)
+            order = changed.get(order_id)
+            if order is None or order[4] in LOCKED_STATUSES:
+                selected_orders.pop(order_id, None)
+            elif order_id in selected_orders:
+                # The re-rendered card shows the new version; the selection follows it
+                selected_orders[order_id] = order[11]
+            if order is None:
+                # No longer matches the current search/filter
+                if index is not None:
+                    cards.pop(index)
+            elif index is None:
+                # Keep the list in order id order
+                position = next((i for i, card in enumerate(cards) if card.data > order_id), len(cards))
+                cards.insert(position, create_order_card(order))
+            else:
+                cards[index] = create_order_card(order)
+        orders_container.controls = cards or [ft.Text("No orders found", size=14, color="outline", text_align=ft.TextAlign.CENTER)]
+        update_bulk_bar()
     
     # Load initial orders
     try:
@@ -275,8 +402,8 @@ def StaffOrderTracking():
     except Exception as ex:
         orders_container.controls.append(ft.Text(f"Error: {str(ex)}", color="error", size=12))
     
-    return ft.Container(
-        content=ft.Column([
+    return LiveRegion(
+        ft.Column([
             ft.Container(
                 content=ft.Column([
                     ft.Text("📦 Order Tracking", size=24, weight="bold"),
@@ -295,12 +422,13 @@ def StaffOrderTracking():
                     on_click=refresh_orders,
                 ),
             ], spacing=15),
+            bulk_bar,
             ft.Divider(),
             ft.Container(
                 content=ft.ListView([orders_container], expand=True, spacing=15),
                 expand=True,
             ),
         ], spacing=15, expand=True),
+        {ORDERS_TOPIC: patch_orders},
         padding=15,
-        expand=True,
     )
\ No newline at end of file
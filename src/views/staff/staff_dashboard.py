@@ -2,6 +2,7 @@
 
 import flet as ft
 from services.database import get_db_connection
+from services.dashboards import get_staff_dashboard
 from state.app_state import AppState
 from components.navigation_header import NavigationHeader
 
@@ -17,30 +18,11 @@ def StaffDashboard():
     conn = get_db_connection()
     cursor = conn.cursor()
     
-    # Aggregate patient total
-    cursor.execute("SELECT COUNT(*) FROM users WHERE role = 'Patient'")
-    total_patients = cursor.fetchone()[0]
-    
-    # Retrieve current day new user metrics
-    cursor.execute("""
-        SELECT COUNT(*) FROM users 
-        WHERE role = 'Patient' AND DATE(created_at) = DATE('now')
-    """)
-    new_today = cursor.fetchone()[0]
-    
-    # Calculate pending prescription volume
-    cursor.execute("SELECT COUNT(*) FROM prescriptions WHERE status = 'Pending'")
-    active_prescriptions = cursor.fetchone()[0]
-    
-    # Retrieve most recent user records
-    cursor.execute("""
-        SELECT id, full_name, phone, email, created_at
-        FROM users
-        WHERE role = 'Patient'
-        ORDER BY created_at DESC
-        LIMIT 5
-    """)
-    recent_patients = cursor.fetchall()
+    data = get_staff_dashboard(cursor)
+    total_patients = data['total_patients']
+    new_today = data['new_today']
+    active_prescriptions = data['active_prescriptions']
+    recent_patients = data['recent_patients']
     
     # Terminate DB Connection
     conn.close()
@@ -0,0 +1,27 @@
+"""Known hot queries must keep using their indexes (services.index_advisor.KNOWN_QUERIES)."""
+
+import sqlite3
+
+import pytest
+
+from services import database, index_advisor, synthetic_data
+
+
+@pytest.fixture
+def seeded_db(tmp_path, monkeypatch):
+    """A small synthetic dataset in a temporary file, with planner statistics."""
+    db_file = str(tmp_path / "plans.db")
+    monkeypatch.setattr(database, 'DB_FILE', db_file)
+    synthetic_data.generate('small', seed=synthetic_data.DEFAULT_SEED, db_file=db_file, verbose=False,
+                            patients=100, medicines=100, orders=1000, days=60)
+    conn = sqlite3.connect(db_file)
+    conn.execute("ANALYZE")
+    yield conn
+    conn.close()
+
+
+def test_known_queries_use_indexes(seeded_db):
+    failures = index_advisor.check_known(seeded_db)
+    assert failures == [], "\n".join(
+        f"{name}:\n    " + "\n    ".join(plan) for name, plan in failures
+    )